@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Benchmark the metrics refresh against local stand-in upstreams.
+
+Cases (each run in a fresh child process, inside a scratch copy of metrics/
+so nothing in the repo is overwritten):
+
+  refresh        fetch_metrics.main()          full pipeline (Dune, market, RPC, analytics, render)
+  market_only    fetch_metrics.update_market_only()
+  build_payload  build_staking_analytics.build_payload()   on-chain reads + payload
+  validators     validate_staking_analytics.validate_file() on the built payload (x VALIDATOR_LOOPS)
+
+Every upstream is answered by metrics/replay.py from a synthetic cassette
+(benchmarks/synthetic.py, sizes small/medium/large) running in this process,
+optionally with injected latency. Per case and size it records median wall
+time, median CPU time (user+sys of the child), peak RSS, HTTP calls and
+JSON-RPC round trips (from the tracing.py run report). A case that sends a
+request the cassette cannot answer is an error (exit 1).
+
+Results are written as JSON; --compare flags any metric that got worse than
+the baseline by more than --threshold (exit 1).
+
+Run:
+  python3 benchmarks/run_benchmarks.py                         # all cases, small+medium
+  python3 benchmarks/run_benchmarks.py --sizes large --cases build_payload,validators
+  python3 benchmarks/run_benchmarks.py --save-baseline
+  python3 benchmarks/run_benchmarks.py --compare benchmarks/baseline.json --threshold 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+METRICS_DIR = ROOT / "metrics"
+RESULTS_DIR = HERE / "results"
+BASELINE = HERE / "baseline.json"
+
+CASES = ("refresh", "market_only", "build_payload", "validators")
+DEFAULT_SIZES = ("small", "medium")
+VALIDATOR_LOOPS = 200
+# Lower is better for all of these; rpc_round_trips is exact, so any increase is flagged.
+COMPARED = ("wall_s", "cpu_s", "peak_rss_kb", "http_calls", "rpc_round_trips")
+# Dummy key: fetch_metrics refuses to run without one; the stand-in ignores it.
+BENCH_DUNE_KEY = "bench" * 8
+
+# Local state left by earlier refreshes would change which requests a case makes.
+_COPY_IGNORE = shutil.ignore_patterns(
+    ".env", ".pipeline-cache", "__pycache__", "cassettes", "run-report.*", "run-profile.*",
+    ".block-times.bin", ".stake-txs.bin", ".claims-ledger.json", ".chain-index.json", ".dune-budget.json",
+    ".upstream-breakers*.json*",
+)
+
+
+# =============================================================================
+# CHILD - runs one case and prints one JSON line
+# =============================================================================
+
+def _trace_rows(workdir: Path) -> list[dict[str, Any]]:
+    import tracing
+
+    rows = list(tracing.events())
+    report = workdir / tracing.REPORT_JSONL
+    if report.is_file():
+        rows += [json.loads(line) for line in report.read_text(encoding="utf-8").splitlines() if line.strip()]
+    return rows
+
+
+def run_child(case: str, workdir: Path) -> dict[str, Any]:
+    sys.path.insert(0, str(workdir))
+    os.chdir(workdir)
+    import tracing
+
+    def build_payload() -> None:
+        import build_staking_analytics as bsa
+
+        md = json.loads((workdir / "metrics-data.json").read_text(encoding="utf-8"))
+        bsa.build_payload(bsa.bonzi_slice_from_metrics(md), bsa.resolve_rpc_urls())
+
+    def validators() -> None:
+        import validate_staking_analytics as vsa
+
+        for _ in range(VALIDATOR_LOOPS):
+            vsa.validate_file(workdir / "staking_analytics.json", freshness_hours=None, allow_leaderboard_empty=True)
+
+    def refresh() -> None:
+        import fetch_metrics
+
+        # The stand-in completes executions at once; don't time the wait for Dune's engine.
+        fetch_metrics.EXECUTE_POLL_S = 0
+        fetch_metrics.main()
+
+    def market_only() -> None:
+        import fetch_metrics
+
+        fetch_metrics.update_market_only()
+
+    fn = {"refresh": refresh, "market_only": market_only, "build_payload": build_payload, "validators": validators}[case]
+    tracing.start(f"bench-{case}")
+    ru0 = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - t0
+    ru1 = resource.getrusage(resource.RUSAGE_SELF)
+
+    calls = [r for r in _trace_rows(workdir) if r.get("kind") == "call"]
+    rss = ru1.ru_maxrss // 1024 if sys.platform == "darwin" else ru1.ru_maxrss
+    return {
+        "wall_s": round(wall, 4),
+        "cpu_s": round((ru1.ru_utime - ru0.ru_utime) + (ru1.ru_stime - ru0.ru_stime), 4),
+        "peak_rss_kb": rss,
+        "http_calls": len(calls),
+        "rpc_round_trips": sum(1 for r in calls if str(r.get("upstream", "")).startswith("rpc:")),
+    }
+
+
+# =============================================================================
+# PARENT
+# =============================================================================
+
+def _scratch_metrics(tmp: Path) -> Path:
+    workdir = tmp / "metrics"
+    shutil.copytree(METRICS_DIR, workdir, ignore=_COPY_IGNORE)
+    return workdir
+
+
+def run_case(case: str, size: str, base_url: str, repeat: int) -> dict[str, Any]:
+    samples = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix=f"bench-{case}-") as tmp:
+            workdir = _scratch_metrics(Path(tmp))
+            env = dict(
+                os.environ,
+                METRICS_UPSTREAM_BASE=base_url,
+                DUNE_API_KEY=BENCH_DUNE_KEY,
+                STAKING_RPC_URLS="",
+            )
+            r = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "--child", case, "--workdir", str(workdir)],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if r.returncode != 0:
+                return {"case": case, "size": size, "error": (r.stderr.strip().splitlines() or ["?"])[-1]}
+            samples.append(json.loads(r.stdout.strip().splitlines()[-1]))
+    return {
+        "case": case,
+        "size": size,
+        "repeat": repeat,
+        "wall_s": round(statistics.median(s["wall_s"] for s in samples), 4),
+        "cpu_s": round(statistics.median(s["cpu_s"] for s in samples), 4),
+        "peak_rss_kb": max(s["peak_rss_kb"] for s in samples),
+        "http_calls": max(s["http_calls"] for s in samples),
+        "rpc_round_trips": max(s["rpc_round_trips"] for s in samples),
+    }
+
+
+def _git_rev() -> str | None:
+    r = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=False)
+    return r.stdout.strip() or None
+
+
+def run_all(cases: list[str], sizes: list[str], repeat: int, latency_ms: float) -> dict[str, Any]:
+    sys.path.insert(0, str(HERE))
+    sys.path.insert(0, str(METRICS_DIR))
+    import replay
+    from synthetic import build_cassette
+
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="bench-cassette-") as tmp:
+            cassette = Path(tmp) / f"{size}.json"
+            cassette.write_text(json.dumps(build_cassette(size)), encoding="utf-8")
+            srv = replay.start_server(cassette, faults=replay.Faults(latency_ms=latency_ms))
+            try:
+                for case in cases:
+                    seen = len(srv.misses)
+                    res = run_case(case, size, srv.base_url, repeat)
+                    # A request the cassette cannot answer benchmarks an error path, not the refresh.
+                    missed = srv.misses[seen:]
+                    if missed and "error" not in res:
+                        res = {"case": case, "size": size,
+                               "error": f"{len(missed)} request(s) not in the cassette, e.g. {missed[0]}"}
+                    results.append(res)
+                    _print_row(res)
+            finally:
+                srv.shutdown()
+                srv.server_close()
+    return {
+        "meta": {
+            "created_at_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_ms": latency_ms,
+        },
+        "results": results,
+    }
+
+
+def _print_row(res: dict[str, Any]) -> None:
+    if "error" in res:
+        print(f"  {res['case']:<14} {res['size']:<7} ERROR {res['error']}")
+        return
+    print(
+        f"  {res['case']:<14} {res['size']:<7} wall {res['wall_s']:8.3f}s  cpu {res['cpu_s']:8.3f}s  "
+        f"rss {res['peak_rss_kb'] / 1024:7.1f} MB  http {res['http_calls']:4}  rpc {res['rpc_round_trips']:3}"
+    )
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    base = {(r["case"], r["size"]): r for r in baseline.get("results", []) if "error" not in r}
+    regressions = []
+    for r in current.get("results", []):
+        b = base.get((r["case"], r["size"]))
+        if not b or "error" in r:
+            continue
+        for metric in COMPARED:
+            old, new = b.get(metric), r.get(metric)
+            if old is None or new is None:
+                continue
+            limit = old if metric == "rpc_round_trips" else old * (1 + threshold)
+            if new > limit and new - old > 1e-3:
+                pct = (new / old - 1) * 100 if old else float("inf")
+                regressions.append(f"{r['case']}/{r['size']} {metric}: {old} -> {new} (+{pct:.0f}%)")
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cases", default=",".join(CASES), help=f"Comma-separated subset of {', '.join(CASES)}")
+    ap.add_argument("--sizes", default=",".join(DEFAULT_SIZES), help="small, medium, large")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per case (median reported)")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Injected per-request upstream latency")
+    ap.add_argument("--out", type=Path, default=None, help="Results JSON (default: benchmarks/results/<time>.json)")
+    ap.add_argument("--save-baseline", action="store_true", help=f"Also write {BASELINE.relative_to(ROOT)}")
+    ap.add_argument("--compare", type=Path, help="Baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown (0.2 = 20%%)")
+    ap.add_argument("--child", choices=CASES, help=argparse.SUPPRESS)
+    ap.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.workdir)))
+        return 0
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        ap.error(f"unknown case(s): {', '.join(unknown)}")
+
+    print(f"Benchmarking {', '.join(cases)} on {', '.join(sizes)} (x{args.repeat})...")
+    report = run_all(cases, sizes, args.repeat, args.latency_ms)
+
+    out = args.out or RESULTS_DIR / f"{report['meta']['created_at_utc'].replace(':', '')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"Results: {out}")
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline: {BASELINE}")
+
+    failed = [r for r in report["results"] if "error" in r]
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} vs {args.compare}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
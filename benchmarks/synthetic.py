@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Synthetic upstream datasets for the metrics benchmarks, as replay cassettes.
+
+build_cassette(size) returns a cassette (metrics/replay.py format) that
+answers every request a full refresh makes: each Dune query in
+fetch_metrics.QUERIES (its result, execution and status poll, and daemon.py's
+execution check on it), the CoinGecko / DeFiLlama / Etherscan market calls
+and the JSON-RPC reads of build_staking_analytics.read_onchain for every token
+in the registry (tokens.json), plus the claims stage's backfill of a fresh
+claims ledger (claims_ledger.sync) over a fake_node.py chain.
+
+SIZES scale the things that grow in production:
+  query_rows    rows per Dune result (holder / claimer lists behind the aggregates)
+  wallets       distinct wallet addresses those rows are drawn from, which also
+                drives the aggregate counts (holders, stakers, claimers)
+  chain_blocks  blocks of claim history the claims ledger backfills
+
+Data is deterministic per size (seeded; the fake chain's block timestamps
+follow the clock), so runs are comparable.
+
+  python3 benchmarks/synthetic.py medium > /tmp/medium.json
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+METRICS_DIR = ROOT / "metrics"
+if str(METRICS_DIR) not in sys.path:
+    sys.path.insert(0, str(METRICS_DIR))
+
+import build_staking_analytics as bsa  # noqa: E402
+import dune_queries  # noqa: E402
+import replay  # noqa: E402
+
+SIZES: dict[str, dict[str, int]] = {
+    "small": {"query_rows": 12, "wallets": 200, "chain_blocks": 2_000},
+    "medium": {"query_rows": 2_000, "wallets": 20_000, "chain_blocks": 20_000},
+    "large": {"query_rows": 20_000, "wallets": 400_000, "chain_blocks": 100_000},
+}
+HEAD_BLOCK = 21_000_000
+
+# Dune query ids: the same query_ids.json fetch_metrics.QUERIES is read from.
+def _queries() -> dict[str, str]:
+    return dune_queries.query_ids()
+
+
+def _wallet(rng: random.Random, wallets: int) -> str:
+    return "0x" + f"{rng.randrange(wallets):040x}"
+
+
+def _dune_rows(name: str, rows: int, wallets: int, rng: random.Random) -> list[dict[str, Any]]:
+    """Rows shaped like each query's real result; the head row carries the aggregate."""
+    metric = name.split("_", 1)[1]
+    stakers = max(1, wallets // 10)
+    if metric == "weekly_trend":
+        return [
+            {"week": f"2026-{(i // 4) % 12 + 1:02d}-{i % 4 * 7 + 1:02d} 00:00:00.000 UTC",
+             "stakes": rng.randrange(stakers // 50 + 2), "unstakes": rng.randrange(stakers // 80 + 2)}
+            for i in range(rows)
+        ]
+    if metric == "staker_retention":
+        head = [{"action": "staking", "wallets": stakers * 6 // 10}, {"action": "exited", "wallets": stakers * 4 // 10}]
+        return head + [{"action": "wallet", "wallet": _wallet(rng, wallets)} for _ in range(max(0, rows - 2))]
+    head: dict[str, Any] = {
+        "hhi": {"hhi_score": rng.randrange(200, 2500), "top_10_pct": round(rng.uniform(20, 80), 2), "total_holders": wallets},
+        "diamond_hands": {"diamond_hands": stakers // 5},
+        "tenure": {"avg_tenure_days": rng.uniform(20, 200), "max_tenure_days": rng.randrange(200, 600)},
+        "1k_holders": {"holders_1k_plus": wallets // 40, "holders_10k_plus": wallets // 400, "total_holders": wallets},
+        "eth_distributed": {"total_eth_distributed": round(rng.uniform(1, 500), 6), "unique_claimers": stakers // 2,
+                            "avg_claim_eth": 0.01, "max_single_claim": 2.5},
+        "lp_distributed": {"total_eth_distributed": round(rng.uniform(1, 100), 6), "total_distributions": rows,
+                           "unique_recipients": stakers // 3},
+        "all_distributions": {"total_eth": round(rng.uniform(1, 600), 6)},
+        "nakamoto": {"nakamoto_coefficient": rng.randrange(3, 40)},
+    }.get(metric, {})
+    tail = [
+        {"wallet": _wallet(rng, wallets), "balance": rng.randrange(10**6, 10**12), "eth": round(rng.random(), 8)}
+        for _ in range(max(0, rows - 1))
+    ]
+    return [head] + tail
+
+
+def _interaction(method: str, url: str, body: str | None, response: Any) -> dict[str, Any]:
+    u = urlsplit(url)
+    path = u.path or "/"
+    return {
+        "key": replay.interaction_key(method, u.netloc, path, u.query, body),
+        "host": u.netloc,
+        "method": method,
+        "path": path,
+        "query": replay.scrub_query(u.query),
+        "rpc": replay.rpc_signature(body) if method == "POST" else None,
+        "request_body": body,
+        "status": 200,
+        "content_type": "application/json",
+        "body": json.dumps(response, separators=(",", ":")),
+    }
+
+
+def _rpc(body: dict[str, Any], result: str) -> dict[str, Any]:
+    return _interaction(
+        "POST", bsa.DEFAULT_RPC_URLS[0], json.dumps(body), {"jsonrpc": "2.0", "id": 1, "result": result}
+    )
+
+
+def _eth_call(to: str, data: str, result: str) -> dict[str, Any]:
+    return _rpc({"jsonrpc": "2.0", "id": 1, "method": "eth_call", "params": [{"to": to, "data": data}, "latest"]}, result)
+
+
+def _word(n: int | str) -> str:
+    return (n[2:].lower() if isinstance(n, str) else f"{n:x}").rjust(64, "0")
+
+
+def _claims_stage(blocks: int, seed: int) -> list[dict[str, Any]]:
+    """The JSON-RPC of pipeline.stage_claims on a fresh ledger, answered by a fake_node.py chain.
+
+    claims_ledger.sync finds the first launch block (block_times.launch_block:
+    the head, then the earliest block, which predates every launch_date here),
+    backfills the finalized range with eth_getLogs, anchors the last finalized
+    block and lets the Indexer catch up to the head in one poll.
+    """
+    import checkpoints
+    import claims_ledger
+    import fake_node
+
+    chain = fake_node.Chain(seed=seed, start=HEAD_BLOCK - blocks, history=blocks)
+
+    def rpc(method: str, params: list[Any]) -> dict[str, Any]:
+        return _rpc({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}, chain.call(method, params))
+
+    hardstakes = sorted(t.hardstake.lower() for t in bsa.REGISTRY.values())
+    first, head = chain.blocks[0]["number"], chain.head["number"]
+    final = head - checkpoints.FINALITY_DEPTH
+    its = [rpc("eth_getBlockByNumber", [tag, False]) for tag in ("latest", "earliest")]
+    for lo in range(first, final + 1, claims_ledger.BACKFILL_RANGE):
+        hi = min(final, lo + claims_ledger.BACKFILL_RANGE - 1)
+        its.append(rpc("eth_getLogs", [{"fromBlock": hex(lo), "toBlock": hex(hi), "address": hardstakes,
+                                        "topics": [claims_ledger.CLAIM_TOPIC]}]))
+    its += [rpc("eth_getBlockByNumber", [hex(n), False]) for n in range(final, head + 1)]
+    its.append(rpc("eth_getLogs", [{"fromBlock": hex(final + 1), "toBlock": hex(head), "address": hardstakes}]))
+    return its
+
+
+def build_cassette(size: str) -> dict[str, Any]:
+    spec = SIZES[size]
+    rng = random.Random(f"bench-{size}")
+    its: list[dict[str, Any]] = []
+
+    for name, qid in sorted(_queries().items()):
+        rows = _dune_rows(name, spec["query_rows"], spec["wallets"], rng)
+        its.append(_interaction("GET", f"https://api.dune.com/api/v1/query/{qid}/results", None,
+                                {"query_id": int(qid), "result": {"rows": rows}}))
+        if name.endswith("_weekly_trend"):
+            # fetch_metrics reads only the last 12 weeks.
+            its.append(_interaction("GET", f"https://api.dune.com/api/v1/query/{qid}/results?limit=12", None,
+                                    {"query_id": int(qid), "result": {"rows": rows[:12]}}))
+        # daemon.py's execution check.
+        its.append(_interaction("GET", f"https://api.dune.com/api/v1/query/{qid}/results?limit=1", None,
+                                {"query_id": int(qid), "execution_id": f"01BENCH{size.upper()}{qid}",
+                                 "result": {"rows": rows[:1]}}))
+        # dune_budget's re-run of a stale query: execute, then one status poll.
+        execution_id = f"01BENCHEXEC{size.upper()}{qid}"
+        its.append(_interaction("POST", f"https://api.dune.com/api/v1/query/{qid}/execute", None,
+                                {"execution_id": execution_id, "state": "QUERY_STATE_PENDING"}))
+        its.append(_interaction("GET", f"https://api.dune.com/api/v1/execution/{execution_id}/status", None,
+                                {"execution_id": execution_id, "query_id": int(qid), "state": "QUERY_STATE_COMPLETED"}))
+
+    memes = {c: {"usd": rng.uniform(1e-6, 0.2), "usd_24h_change": rng.uniform(-10, 10)}
+             for c in ("pepe", "shiba-inu", "dogecoin", "floki", "bonk")}
+    its += [
+        _interaction("GET", "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd&include_24hr_change=true",
+                     None, {"ethereum": {"usd": 3000.0, "usd_24h_change": 1.5}}),
+        _interaction("GET", "https://api.coingecko.com/api/v3/simple/price?ids=pepe,shiba-inu,dogecoin,floki,bonk&vs_currencies=usd&include_24hr_change=true",
+                     None, memes),
+        _interaction("GET", "https://api.coingecko.com/api/v3/global", None,
+                     {"data": {"market_cap_percentage": {"btc": 52.1, "eth": 13.4}}}),
+        _interaction("GET", "https://api.etherscan.io/api?module=gastracker&action=gasoracle", None,
+                     {"status": "1", "result": {"SafeGasPrice": "8", "ProposeGasPrice": "10", "FastGasPrice": "14"}}),
+        _interaction("GET", "https://api.llama.fi/overview/dexs?excludeTotalDataChart=true&excludeTotalDataChartBreakdown=true",
+                     None, {"total24h": 3.1e9, "change_1d": 4.2}),
+        _interaction("GET", "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd", None,
+                     {"ethereum": {"usd": 3000.0}}),
+    ]
+    # All registry tokens in one call (full refresh) and BONZI alone (build_payload case).
+    for addrs in ([t.token for t in bsa.REGISTRY.values()], [bsa.TOKEN]):
+        its.append(_interaction("GET", "https://api.coingecko.com/api/v3/simple/token_price/ethereum"
+                                f"?contract_addresses={','.join(addrs)}&vs_currencies=usd",
+                                None, {a: {"usd": 0.00012} for a in addrs}))
+
+    supply = 10**27
+    staked = supply * 3 // 10
+    its += [
+        _rpc({"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}, hex(HEAD_BLOCK)),
+        _eth_call(bsa.FACTORY, bsa.SEL_ROUTER, "0x" + _word(bsa.ROUTER_EXPECTED_CANONICAL)),
+    ]
+    # Single-call recordings; replay answers the analytics build's JSON-RPC batches from these.
+    for t in bsa.REGISTRY.values():
+        its += [
+            _eth_call(t.hardstake, bsa.SEL_TOTAL_SUPPLY, "0x" + _word(staked)),
+            _eth_call(t.token, bsa.SEL_TOTAL_SUPPLY, "0x" + _word(supply)),
+            _eth_call(t.lp_pair, bsa.SEL_PAIR_TOKEN0, "0x" + _word(t.token)),
+            _eth_call(t.lp_pair, bsa.SEL_PAIR_TOKEN1, "0x" + _word(bsa.WETH_MAINNET)),
+            _eth_call(t.lp_pair, bsa.SEL_PAIR_GET_RESERVES, "0x" + _word(supply // 10) + _word(40 * 10**18) + _word(0)),
+        ]
+    its += _claims_stage(spec["chain_blocks"], rng.randrange(2**32))
+    return {"recorded_at_utc": None, "synthetic": {"size": size, **spec}, "interactions": its}
+
+
+def main() -> int:
+    size = sys.argv[1] if len(sys.argv) > 1 else "small"
+    if size not in SIZES:
+        print(f"Unknown size {size!r}; choose from {', '.join(SIZES)}", file=sys.stderr)
+        return 1
+    json.dump(build_cassette(size), sys.stdout, indent=1)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
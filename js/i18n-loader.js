@@ -13,6 +13,8 @@
  * The loader:
  *   - Reads language preference from localStorage('bonzi_lang')
  *   - Falls back to English if translation key is missing
+ *   - Prefers the per-page bundle i18n/pages/<slug>.<lang>.json (built by
+ *     scripts/build_i18n_bundles.py), falling back to the full i18n/<lang>.json
  *   - Caches loaded translations for performance
  */
 
@@ -37,6 +39,39 @@
     // Cache for loaded translations
     const translationCache = {};
 
+    // Page slug matching scripts/build_i18n_bundles.py:
+    // /manual/ -> manual__index, /stake-tg.html -> stake-tg
+    function getPageSlug() {
+        let path = window.location.pathname.replace(/^\/+/, '');
+        if (!path || path.endsWith('/')) {
+            path += 'index.html';
+        }
+        return path.replace(/\.html$/, '').split('/').join('__');
+    }
+
+    async function fetchJson(url) {
+        try {
+            const response = await fetch(url);
+            return response.ok ? await response.json() : null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    // Per-page bundle (only this page's keys) merged over the shared nav bundle.
+    // Returns null when the page has no bundle so the caller can use the full file.
+    async function loadBundle(lang) {
+        const bundlePath = i18nPath + 'pages/';
+        const [page, nav] = await Promise.all([
+            fetchJson(bundlePath + getPageSlug() + '.' + lang + '.json'),
+            fetchJson(bundlePath + '_nav.' + lang + '.json')
+        ]);
+        if (!page) {
+            return null;
+        }
+        return Object.assign({}, nav || {}, page);
+    }
+
     // Load translations for a language
     async function loadTranslations(lang) {
         // Return cached version if available
@@ -44,6 +79,12 @@
             return translationCache[lang];
         }
 
+        const bundle = await loadBundle(lang);
+        if (bundle) {
+            translationCache[lang] = bundle;
+            return bundle;
+        }
+
         try {
             const response = await fetch(i18nPath + lang + '.json');
             if (!response.ok) {
@@ -113,6 +154,7 @@
         applyTranslations,
         loadTranslations,
         getBasePath,
+        getPageSlug,
         init
     };
 
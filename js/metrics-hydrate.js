@@ -0,0 +1,177 @@
+/**
+ * Metrics hydration for pre-rendered pages (metrics/render_metrics_page.py).
+ *
+ * The HTML already carries the numbers, plus the snapshot they were rendered
+ * from in <script type="application/json" id="metrics-snapshot">. This script
+ * only refetches metrics-data.json / staking_analytics.json in the background
+ * and, when either is newer than the snapshot (its timestamps compared as
+ * times; an older copy is ignored), patches:
+ *   - [data-metric="path"][data-fmt="kind"] text nodes
+ *   - [data-trend="token"] weekly bars
+ *   - [data-signals] market signal list
+ *
+ * Formatting mirrors format_value() in render_metrics_page.py so a hydrated
+ * value looks exactly like a pre-rendered one.
+ */
+
+(function() {
+    'use strict';
+
+    const snapEl = document.getElementById('metrics-snapshot');
+    if (!snapEl) return;
+
+    let snapshot;
+    try {
+        snapshot = JSON.parse(snapEl.textContent);
+    } catch (error) {
+        return;
+    }
+    const labels = snapshot.labels || {};
+    const locale = document.documentElement.lang || 'en';
+
+    function lookup(data, path) {
+        return path.split('.').reduce((cur, part) => (cur && typeof cur === 'object') ? cur[part] : undefined, data);
+    }
+
+    function pairs(spec) {
+        return (spec || '').split('|').filter(p => p.includes(':')).map(p => {
+            const i = p.indexOf(':');
+            return [p.slice(0, i), p.slice(i + 1)];
+        });
+    }
+
+    function format(el, value) {
+        const fmt = el.dataset.fmt || 'num';
+        if (value === null || value === undefined || value === '') return '-';
+        if (fmt === 'text') return String(value);
+        if (fmt === 'map') {
+            const hit = pairs(el.dataset.map).find(p => p[0] === String(value));
+            return hit ? hit[1] : String(value);
+        }
+        const v = Number(value);
+        if (!isFinite(v)) return String(value);
+        if (fmt === 'band') {
+            const bands = pairs(el.dataset.bands);
+            const hit = bands.find(p => !p[0] || v < Number(p[0]));
+            return hit ? hit[1] : (bands.length ? bands[bands.length - 1][1] : '-');
+        }
+        if (fmt === 'int') return Math.round(v).toLocaleString(locale);
+        if (fmt === 'signed') {
+            const n = Math.round(v);
+            return (n > 0 ? '+' : '') + n.toLocaleString(locale);
+        }
+        if (fmt === 'usd0') return '$' + Math.round(v).toLocaleString(locale);
+        if (fmt === 'fixed2') return v.toLocaleString(locale, { minimumFractionDigits: 2, maximumFractionDigits: 2 });
+        return v.toLocaleString(locale, { maximumFractionDigits: 4 });
+    }
+
+    function renderTrend(box, weekly) {
+        const months = labels.months || [];
+        const maxStake = Math.max(0, ...weekly.map(w => w.stakes || 0)) || 1;
+        box.textContent = '';
+        weekly.forEach(w => {
+            const week = String(w.week || '');
+            const bar = document.createElement('div');
+            bar.className = 'trend-bar';
+            bar.innerHTML = '<div class="bar-stake"></div><div class="bar-unstake"></div><div class="bar-label"></div>';
+            bar.children[0].style.height = ((w.stakes || 0) / maxStake * 100) + 'px';
+            bar.children[1].style.height = ((w.unstakes || 0) / maxStake * 30) + 'px';
+            bar.children[2].textContent = months[parseInt(week.slice(5, 7), 10) - 1] || week.split(' ')[0];
+            box.appendChild(bar);
+        });
+    }
+
+    function apply(data) {
+        document.querySelectorAll('[data-metric]').forEach(el => {
+            const value = lookup(data, el.dataset.metric);
+            el.textContent = format(el, value);
+            if (el.dataset.fmt === 'signed') {
+                const card = el.closest('.metric-card');
+                if (card) {
+                    card.classList.toggle('positive', value > 0);
+                    card.classList.toggle('negative', !(value > 0));
+                }
+            }
+        });
+
+        document.querySelectorAll('[data-trend]').forEach(box => {
+            renderTrend(box, lookup(data, 'metrics.' + box.dataset.trend + '.weekly_trend') || []);
+        });
+
+        const signals = lookup(data, 'metrics.market_context.signals') || [];
+        const translated = labels.signals || {};
+        document.querySelectorAll('[data-signals]').forEach(list => {
+            list.textContent = '';
+            signals.forEach(s => {
+                const li = document.createElement('li');
+                li.textContent = translated[s] || s;
+                list.appendChild(li);
+            });
+        });
+    }
+
+    function getJson(url) {
+        // js/versioned-json.js (when loaded) downloads only the delta since the cached version.
+        const load = window.fetchVersionedJson
+            ? window.fetchVersionedJson(url, { cache: 'no-cache' })
+            : fetch(url, { cache: 'no-cache' }).then(r => r.ok ? r.json() : null);
+        return load.catch(() => null);
+    }
+
+    function toTime(value) {
+        // '2026-01-25', '2026-01-25 02:21 UTC' and '2026-06-04T17:17:32Z' are all UTC.
+        if (!value) return NaN;
+        const s = String(value).trim().replace(/ UTC$/, '').replace(' ', 'T');
+        return Date.parse(s.length > 10 && !/[zZ]|[+-]\d\d:?\d\d$/.test(s) ? s + 'Z' : s);
+    }
+
+    // -1 older, 0 same (or unknown), 1 newer: per stamp, compared as times.
+    function compareTimes(next, prev) {
+        const a = toTime(next), b = toTime(prev);
+        if (isNaN(a) || isNaN(b)) return isNaN(a) ? (isNaN(b) ? 0 : -1) : 1;
+        return Math.sign(a - b);
+    }
+
+    // Newer only when no stamp went back and at least one moved forward; a
+    // stale copy (e.g. the service worker's cache) never replaces fresher HTML.
+    function isNewer(stamps) {
+        const cmp = stamps.map(([next, prev]) => compareTimes(next, prev));
+        return !cmp.includes(-1) && cmp.includes(1);
+    }
+
+    function hydrate() {
+        Promise.all([getJson('metrics-data.json'), getJson('staking_analytics.json')]).then(([metrics, staking]) => {
+            const snapMetrics = snapshot.metrics || {};
+            const snapStaking = snapshot.staking || {};
+            const metricsNewer = !!metrics && isNewer([
+                [metrics.updated, snapMetrics.updated],
+                [lookup(metrics, 'market_context.fetched_at'), lookup(snapMetrics, 'market_context.fetched_at')]
+            ]);
+            const stakingNewer = !!staking && isNewer([[staking.generated_at_utc, snapStaking.generated_at_utc]]);
+            if (!metricsNewer && !stakingNewer) return;
+            const m = metricsNewer ? metrics : snapMetrics;
+            const next = {
+                metrics: {
+                    updated: m.updated,
+                    vista: m.vista || {},
+                    bonzi: m.bonzi || {},
+                    market_context: m.market_context || {}
+                },
+                staking: stakingNewer ? {
+                    generated_at_utc: staking.generated_at_utc,
+                    onchain_live: staking.onchain_live || {}
+                } : snapStaking
+            };
+            const tokenEth = t => (next.metrics[t].total_eth_distributed || 0) + (next.metrics[t].lp_total_eth || 0);
+            next.derived = { total_eth_paid: tokenEth('vista') + tokenEth('bonzi') };
+            apply(next);
+            console.log('Metrics hydrated:', next.metrics.updated);
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', hydrate);
+    } else {
+        hydrate();
+    }
+})();
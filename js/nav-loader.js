@@ -350,14 +350,33 @@
         return segs.length === 0 ? './' : '../'.repeat(segs.length);
     }
 
+    // Same slug as scripts/build_i18n_bundles.py: /manual/ -> manual__index.
+    function _i18nPageSlug() {
+        var path = window.location.pathname.replace(/^\/+/, '');
+        if (!path || path.slice(-1) === '/') path += 'index.html';
+        return path.replace(/\.html$/, '').split('/').join('__');
+    }
+
+    function _i18nFetchJson(url) {
+        return fetch(url)
+            .then(function(r) { return r.ok ? r.json() : null; })
+            .catch(function() { return null; });
+    }
+
+    // Per-page bundle (+ shared nav bundle) first; full i18n/{lang}.json only
+    // when this page has no bundle.
     function _i18nLoadCentral(lang) {
         if (_i18nCentralCache[lang] !== undefined) {
             return Promise.resolve(_i18nCentralCache[lang]);
         }
-        return fetch(_i18nBasePath() + 'i18n/' + lang + '.json')
-            .then(function(r) { return r.ok ? r.json() : null; })
-            .then(function(j) { _i18nCentralCache[lang] = j || null; return _i18nCentralCache[lang]; })
-            .catch(function() { _i18nCentralCache[lang] = null; return null; });
+        var base = _i18nBasePath() + 'i18n/';
+        return Promise.all([
+            _i18nFetchJson(base + 'pages/' + _i18nPageSlug() + '.' + lang + '.json'),
+            _i18nFetchJson(base + 'pages/_nav.' + lang + '.json')
+        ]).then(function(res) {
+            if (res[0]) return Object.assign({}, res[1] || {}, res[0]);
+            return _i18nFetchJson(base + lang + '.json');
+        }).then(function(j) { _i18nCentralCache[lang] = j || null; return _i18nCentralCache[lang]; });
     }
 
     // Central JSON is authority; per-page BONZI_I18N dict is fallback during
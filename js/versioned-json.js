@@ -0,0 +1,127 @@
+/**
+ * Delta-aware fetch for the published metrics JSON (metrics/delta.py).
+ *
+ * window.fetchVersionedJson(url, init) resolves to the parsed document, like
+ * fetch(url, init).then(r => r.json()), but:
+ *   1. reads versions.json next to the file (tiny, always revalidated);
+ *   2. if localStorage holds the current version, returns it without a download;
+ *   3. if it holds an older version with a delta chain to the current one that
+ *      is smaller than the full file, fetches only those JSON Patches;
+ *   4. otherwise (no index, missing link, bad patch, storage off) fetches the
+ *      full file exactly as before.
+ */
+
+(function() {
+    'use strict';
+
+    const PREFIX = 'vjson:';
+    const MAX_HOPS = 8;
+
+    function dirOf(url) {
+        return url.slice(0, url.lastIndexOf('/') + 1);
+    }
+
+    function nameOf(url) {
+        return url.slice(url.lastIndexOf('/') + 1).split('?')[0];
+    }
+
+    function readCache(key) {
+        try {
+            return JSON.parse(localStorage.getItem(key) || 'null');
+        } catch (error) {
+            return null;
+        }
+    }
+
+    function writeCache(key, version, data) {
+        if (!version) return;
+        try {
+            localStorage.setItem(key, JSON.stringify({ version: version, data: data }));
+        } catch (error) {
+            // Quota or privacy mode: the next load just fetches the full file.
+        }
+    }
+
+    function getJson(url, init) {
+        return fetch(url, init).then(r => {
+            if (!r.ok) throw new Error(url + ' HTTP ' + r.status);
+            return r.json();
+        });
+    }
+
+    function unescape(part) {
+        return part.replace(/~1/g, '/').replace(/~0/g, '~');
+    }
+
+    // Mirror of apply_patch() in metrics/delta.py (add / remove / replace).
+    function applyPatch(doc, patch) {
+        patch.forEach(op => {
+            const parts = op.path.split('/').slice(1).map(unescape);
+            if (!parts.length) {
+                doc = op.value;
+                return;
+            }
+            let parent = doc;
+            parts.slice(0, -1).forEach(p => {
+                parent = parent[Array.isArray(parent) ? Number(p) : p];
+                if (parent === null || typeof parent !== 'object') throw new Error('bad path ' + op.path);
+            });
+            const last = Array.isArray(parent) ? Number(parts[parts.length - 1]) : parts[parts.length - 1];
+            if (op.op === 'remove') {
+                if (Array.isArray(parent)) parent.splice(last, 1); else delete parent[last];
+            } else if (op.op === 'replace') {
+                if (!(last in parent)) throw new Error('missing ' + op.path);
+                parent[last] = op.value;
+            } else if (op.op === 'add') {
+                if (Array.isArray(parent)) parent.splice(last, 0, op.value); else parent[last] = op.value;
+            } else {
+                throw new Error('unsupported op ' + op.op);
+            }
+        });
+        return doc;
+    }
+
+    function chainFrom(entry, version) {
+        const links = [];
+        let bytes = 0;
+        while (version !== entry.version) {
+            const link = (entry.deltas || {})[version];
+            if (!link || links.length >= MAX_HOPS) return null;
+            links.push(link);
+            bytes += link.bytes || 0;
+            version = link.to;
+        }
+        return bytes < entry.bytes ? links : null;
+    }
+
+    function fetchVersionedJson(url, init) {
+        const key = PREFIX + url;
+        const dir = dirOf(url);
+        // ?v= pins the exact version (sw.js serves it from the network, never a stale copy).
+        const full = version => getJson(version ? url + (url.includes('?') ? '&' : '?') + 'v=' + version : url, init).then(data => {
+            writeCache(key, version, data);
+            return data;
+        });
+
+        return getJson(dir + 'versions.json', { cache: 'no-cache' }).then(index => {
+            const entry = index && index.files && index.files[nameOf(url)];
+            if (!entry) return full(null);
+            const cached = readCache(key);
+            if (cached && cached.version === entry.version) return cached.data;
+            const links = cached && chainFrom(entry, cached.version);
+            if (!links) return full(entry.version);
+            return Promise.all(links.map(link => getJson(dir + link.url)))
+                .then(deltas => {
+                    const data = deltas.reduce((doc, d, i) => {
+                        if (d.to !== links[i].to) throw new Error('delta chain changed');
+                        return applyPatch(doc, d.patch);
+                    }, cached.data);
+                    writeCache(key, entry.version, data);
+                    return data;
+                })
+                .catch(() => full(entry.version));
+        }, () => getJson(url, init));
+    }
+
+    window.fetchVersionedJson = fetchVersionedJson;
+})();
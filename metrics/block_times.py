@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Block-timestamp cache for event-time analytics (tenure, weekly trend, pool age).
+
+Turning events into days or weeks needs block timestamps. Fetching one header
+per event costs one eth_getBlockByNumber per event. BlockTimes keeps every
+timestamp it has seen in .block-times.bin and answers from it:
+
+  timestamps(numbers)   exact timestamps; misses are fetched in JSON-RPC
+                        batches of --batch headers. With tolerance_blocks,
+                        a block between two cached samples at most that far
+                        apart is interpolated instead (post-merge slots are
+                        12 s, so a 300-block gap is off by a missed slot or two).
+  blocks_at(times)      first block at or after each unix time. All targets
+                        are searched together: each round sends one batch
+                        with an interpolated probe per target, bracketed by
+                        cached samples, with bisection when a probe does not
+                        halve the bracket. That is a handful of rounds.
+  week_starts(a, b)     Monday 00:00 UTC boundaries (Dune's date_trunc('week'))
+                        as first blocks; bucket_by_week() then assigns any
+                        number of events by block number with bisect, with
+                        no per-event RPC.
+
+File format: b"BTS2", the 32-byte hash of the node's earliest block (the
+genesis on mainnet), uint32 count, then count uint32 block numbers (ascending)
+and count uint32 timestamps, so loading is two array.frombytes calls. A cache
+written for another chain (a fake_node.py chain, a testnet) is dropped when
+loaded. $METRICS_CACHE_DIR, if set, holds the cache instead of this directory
+(fake_node.py run points it at a temporary one).
+
+Usage:
+  python3 block_times.py ts 21000000 21000100
+  python3 block_times.py at 2025-01-06T00:00:00Z
+  python3 block_times.py weeks --since 2024-06-03 [--verify]
+  python3 fake_node.py run --history 300000 -- python3 block_times.py weeks --verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable
+
+import build_staking_analytics as bsa
+from token_registry import Token
+
+HERE = Path(__file__).resolve().parent
+CACHE_DIR_ENV = "METRICS_CACHE_DIR"
+DEFAULT_PATH = Path(os.environ.get(CACHE_DIR_ENV) or HERE) / ".block-times.bin"
+MAGIC = b"BTS2"
+HEADER = struct.Struct("<4s32sI")
+BATCH_SIZE = 100
+
+
+class BlockTimes:
+    def __init__(self, rpc_url: str, path: Path | None = DEFAULT_PATH, *, batch_size: int = BATCH_SIZE) -> None:
+        self.rpc_url = rpc_url
+        self.path = path
+        self.batch_size = batch_size
+        self.numbers = array("I")
+        self.times = array("I")
+        self.rpc_calls = 0
+        self._earliest: int | None = None
+        self._genesis: str | None = None
+        self._dirty = False
+        if path is not None and path.is_file():
+            self._load(path)
+
+    # ---- storage ------------------------------------------------------
+
+    def genesis(self) -> str:
+        """Hash of the node's earliest block: the chain this cache belongs to."""
+        if self._genesis is None:
+            self._tagged("earliest")
+        return self._genesis  # type: ignore[return-value]
+
+    def _load(self, path: Path) -> None:
+        raw = path.read_bytes()
+        if raw[:4] == b"BTS1":
+            print(f"  {path.name}: no chain recorded (old format), starting empty")
+            return
+        if raw[:4] != MAGIC:
+            raise ValueError(f"{path}: not a block-times file")
+        _, chain, count = HEADER.unpack_from(raw)
+        body = raw[HEADER.size:]
+        if len(body) != 8 * count:
+            raise ValueError(f"{path}: truncated ({len(body)} bytes for {count} entries)")
+        numbers, times = array("I"), array("I")
+        numbers.frombytes(body[: 4 * count])
+        times.frombytes(body[4 * count:])
+        if sys.byteorder != "little":
+            numbers.byteswap()
+            times.byteswap()
+        self.numbers, self.times = numbers, times
+        if "0x" + chain.hex() != self.genesis():
+            print(f"  {path.name}: cached for another chain, starting empty")
+            self.numbers, self.times = array("I"), array("I")
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        numbers, times = array("I", self.numbers), array("I", self.times)
+        if sys.byteorder != "little":
+            numbers.byteswap()
+            times.byteswap()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        head = HEADER.pack(MAGIC, bytes.fromhex(self.genesis()[2:]), len(numbers))
+        tmp.write_bytes(head + numbers.tobytes() + times.tobytes())
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def cached(self, number: int) -> int | None:
+        i = bisect_left(self.numbers, number)
+        return self.times[i] if i < len(self.numbers) and self.numbers[i] == number else None
+
+    def _insert(self, found: dict[int, int]) -> None:
+        new = sorted((n, t) for n, t in found.items() if self.cached(n) is None)
+        if not new:
+            return
+        if not self.numbers or new[0][0] > self.numbers[-1]:
+            self.numbers.extend(n for n, _ in new)
+            self.times.extend(t for _, t in new)
+        else:
+            merged = sorted(list(zip(self.numbers, self.times)) + new)
+            self.numbers = array("I", (n for n, _ in merged))
+            self.times = array("I", (t for _, t in merged))
+        self._dirty = True
+
+    # ---- lookups ------------------------------------------------------
+
+    def _fetch(self, numbers: list[int]) -> dict[int, int]:
+        out: dict[int, int] = {}
+        for i in range(0, len(numbers), self.batch_size):
+            chunk = numbers[i:i + self.batch_size]
+            self.rpc_calls += 1
+            headers = bsa.rpc_requests(self.rpc_url, [("eth_getBlockByNumber", [hex(n), False]) for n in chunk])
+            for n, h in zip(chunk, headers):
+                if not isinstance(h, dict) or not h.get("timestamp"):
+                    raise RuntimeError(f"block {n} not available")
+                out[n] = int(h["timestamp"], 16)
+        self._insert(out)
+        return out
+
+    def _tagged(self, tag: str) -> tuple[int, int]:
+        self.rpc_calls += 1
+        h = bsa.rpc_request(self.rpc_url, "eth_getBlockByNumber", [tag, False])
+        n, t = int(h["number"], 16), int(h["timestamp"], 16)
+        if tag == "earliest":
+            self._earliest, self._genesis = n, h["hash"]
+        self._insert({n: t})
+        return n, t
+
+    def head(self) -> tuple[int, int]:
+        """(number, timestamp) of the latest block (always asked, never cached)."""
+        return self._tagged("latest")
+
+    def _interpolate(self, number: int, tolerance_blocks: int) -> int | None:
+        i = bisect_left(self.numbers, number)
+        if i == 0 or i >= len(self.numbers):
+            return None
+        lo_n, hi_n = self.numbers[i - 1], self.numbers[i]
+        if hi_n - lo_n > tolerance_blocks:
+            return None
+        lo_t, hi_t = self.times[i - 1], self.times[i]
+        return lo_t + (hi_t - lo_t) * (number - lo_n) // (hi_n - lo_n)
+
+    def timestamps(self, numbers: Iterable[int], *, tolerance_blocks: int = 0) -> dict[int, int]:
+        """Timestamp per block number: cached, interpolated (within tolerance_blocks) or batch-fetched."""
+        out: dict[int, int] = {}
+        missing: list[int] = []
+        for n in sorted(set(numbers)):
+            t = self.cached(n)
+            if t is None and tolerance_blocks:
+                t = self._interpolate(n, tolerance_blocks)
+            if t is None:
+                missing.append(n)
+            else:
+                out[n] = t
+        if missing:
+            out.update(self._fetch(missing))
+        return out
+
+    def timestamp(self, number: int) -> int:
+        return self.timestamps([number])[number]
+
+    def blocks_at(self, targets: Iterable[int], *, floor: int | None = None) -> dict[int, int]:
+        """First block whose timestamp is >= each unix time (the head + 1 if none is yet).
+
+        floor is the lowest block considered (e.g. the token's deployment
+        block); default the node's earliest block.
+        """
+        targets = sorted(set(targets))
+        if not targets:
+            return {}
+        head_n, head_t = self.head()
+        if floor is None:
+            if self._earliest is None:
+                self._tagged("earliest")
+            floor = self._earliest
+        self.timestamps([floor])
+        # Bracket per target: ts(lo) < target <= ts(hi); hi may be head + 1 (not mined yet).
+        brackets: dict[int, list[int]] = {}
+        result: dict[int, int] = {}
+        for t in targets:
+            if t <= self.cached(floor):
+                result[t] = floor
+            elif t > head_t:
+                result[t] = head_n + 1
+            else:
+                brackets[t] = self._cached_bracket(t, floor, head_n)
+        bisect_next: set[int] = set()
+        while brackets:
+            probes: dict[int, int] = {}
+            for t, (lo, hi) in brackets.items():
+                if hi - lo <= 1:
+                    continue
+                if t in bisect_next:
+                    probes[t] = (lo + hi) // 2
+                else:
+                    lo_t, hi_t = self.cached(lo), self.cached(hi)
+                    est = lo + (t - lo_t) * (hi - lo) // max(1, hi_t - lo_t)
+                    probes[t] = min(hi - 1, max(lo + 1, est))
+            self.timestamps(probes.values())
+            for t in list(brackets):
+                lo, hi = brackets[t]
+                if hi - lo <= 1:
+                    result[t] = hi
+                    del brackets[t]
+                    continue
+                p = probes[t]
+                if self.cached(p) < t:
+                    lo = p
+                else:
+                    hi = p
+                # Interpolation that did not halve the bracket falls back to bisection next round.
+                if (hi - lo) * 2 > brackets[t][1] - brackets[t][0]:
+                    bisect_next.add(t)
+                else:
+                    bisect_next.discard(t)
+                brackets[t] = [lo, hi]
+        return {t: result[t] for t in targets}
+
+    def _cached_bracket(self, target: int, floor: int, head_n: int) -> list[int]:
+        """Tightest cached (lo, hi) with ts(lo) < target <= ts(hi)."""
+        lo, hi = floor, head_n
+        # Times are ascending along with the numbers, so the cache itself is bisectable by time.
+        i = bisect_left(self.times, target)
+        if i > 0 and self.numbers[i - 1] >= floor:
+            lo = max(lo, self.numbers[i - 1])
+        if i < len(self.times) and self.numbers[i] <= head_n:
+            hi = min(hi, self.numbers[i])
+        return [lo, hi]
+
+    def week_starts(self, since: date, until: date | None = None, *, floor: int | None = None) -> list[tuple[date, int]]:
+        """(Monday, first block of that week) for every week from since's week through until's."""
+        monday = since - timedelta(days=since.weekday())
+        until = until or datetime.now(timezone.utc).date()
+        weeks = []
+        while monday <= until:
+            weeks.append(monday)
+            monday += timedelta(days=7)
+        unix = {w: int(datetime(w.year, w.month, w.day, tzinfo=timezone.utc).timestamp()) for w in weeks}
+        blocks = self.blocks_at(unix.values(), floor=floor)
+        return [(w, blocks[unix[w]]) for w in weeks]
+
+
+def launch_block(rpc_url: str, tokens: list[Token]) -> int:
+    """First block of the earliest registry launch_date (the node's earliest block if none is set)."""
+    dates = sorted(t.launch_date for t in tokens if t.launch_date)
+    ts = int(datetime.strptime(dates[0], "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()) if dates else 0
+    bt = BlockTimes(rpc_url)
+    block = bt.blocks_at([ts])[ts]
+    bt.save()
+    return block
+
+
+def bucket_by_week(blocks: Iterable[int], week_starts: list[tuple[date, int]]) -> dict[str, int]:
+    """Event count per week ("YYYY-MM-DD" Monday) from event block numbers; no RPC."""
+    firsts = [b for _, b in week_starts]
+    counts = {w.isoformat(): 0 for w, _ in week_starts}
+    for b in blocks:
+        i = bisect_right(firsts, b) - 1
+        if i >= 0:
+            counts[week_starts[i][0].isoformat()] += 1
+    return counts
+
+
+def _parse_time(value: str) -> int:
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=timezone.utc).timestamp())
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cache", type=Path, default=DEFAULT_PATH, help="Timestamp cache file")
+    ap.add_argument("--batch", type=int, default=BATCH_SIZE, help="Headers per JSON-RPC batch")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("ts", help="Timestamps of block numbers")
+    p.add_argument("numbers", type=int, nargs="+")
+    p = sub.add_parser("at", help="First block at or after a time (ISO-8601 or unix)")
+    p.add_argument("times", nargs="+")
+    p = sub.add_parser("weeks", help="First block of each week")
+    p.add_argument("--since", type=date.fromisoformat, help="Default: 8 weeks ago")
+    p.add_argument("--verify", action="store_true", help="Check each boundary against its neighbours")
+    args = ap.parse_args()
+
+    bt = BlockTimes(bsa.pick_working_rpc(bsa.resolve_rpc_urls()), args.cache, batch_size=args.batch)
+    cached_before = len(bt)
+    status = 0
+    if args.cmd == "ts":
+        for n, t in sorted(bt.timestamps(args.numbers).items()):
+            print(f"{n}  {t}  {datetime.fromtimestamp(t, timezone.utc):%Y-%m-%dT%H:%M:%SZ}")
+    elif args.cmd == "at":
+        found = bt.blocks_at(_parse_time(v) for v in args.times)
+        for v in args.times:
+            print(f"{v}  {found[_parse_time(v)]}")
+    else:
+        since = args.since or datetime.now(timezone.utc).date() - timedelta(weeks=8)
+        weeks = bt.week_starts(since)
+        head_n = bt.numbers[-1] if bt.numbers else 0
+        for w, b in weeks:
+            print(f"{w}  {b}")
+        if args.verify:
+            bad = []
+            checks = [b for _, b in weeks if (bt._earliest or 0) < b <= head_n]
+            ts = bt.timestamps(checks + [b - 1 for b in checks])
+            for w, b in weeks:
+                if b in checks:
+                    start = int(datetime(w.year, w.month, w.day, tzinfo=timezone.utc).timestamp())
+                    if not ts[b - 1] < start <= ts[b]:
+                        bad.append(f"{w}: block {b} ({ts[b - 1]}, {ts[b]}) does not straddle {start}")
+            for line in bad:
+                print(f"  WRONG {line}")
+            print("All week boundaries verified." if not bad else f"{len(bad)} wrong boundary(ies).")
+            status = 1 if bad else 0
+    bt.save()
+    print(f"{bt.rpc_calls} RPC request(s); cache {cached_before} -> {len(bt)} blocks ({args.cache})")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Per-upstream circuit breakers, kept across runs in .upstream-breakers.json.
+
+Every outbound call of the refresh goes through tracing.span(), which asks
+before() whether the host may be called and reports the outcome to after().
+There is one circuit per host (api.coingecko.com, api.etherscan.io, each
+JSON-RPC node, ...):
+
+  closed     calls go through; FAILURE_THRESHOLD consecutive failures
+             (connection errors, timeouts, HTTP 5xx) open the circuit
+  open       calls fail at once with CircuitOpen until cooldown_s has passed
+             since it opened
+  half-open  one probe call goes through: success closes the circuit, failure
+             opens it again with the cooldown doubled (up to MAX_COOLDOWN_S)
+
+CircuitOpen is a ConnectionError, so each caller's existing error path takes
+over without waiting on a timeout: market sources keep their last good value,
+Dune reads fall back to the budget cache (dune_budget.py), and
+pick_working_rpc moves straight to the next node. A 429 or other 4xx answer
+does not count as a failure, since the host is up.
+
+The state file is read once per process and rewritten whenever a circuit
+changes, so the next cron run or daemon cycle starts where this one stopped.
+Several processes share it (daemon, chain_stream, cron): each write re-reads
+the file under an exclusive lock and replaces only the hosts this process
+changed, taking every other host from the file. Runs against the replay.py
+stand-in use .upstream-breakers.standin.json, commands under fake_node.py run
+.upstream-breakers.fake-node.json.
+write_report() adds every known circuit to the run report ("breaker" events).
+
+Usage:
+  python3 breaker.py                          # every known circuit
+  python3 breaker.py --reset api.coingecko.com
+  python3 breaker.py --reset all
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from contextlib import contextmanager
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within the process
+    fcntl = None  # type: ignore[assignment]
+
+HERE = Path(__file__).resolve().parent
+STATE_PATH = HERE / ".upstream-breakers.json"
+# Runs against the replay.py stand-in (METRICS_UPSTREAM_BASE set) see injected
+# faults; they keep their circuits apart from the real upstreams'.
+STANDIN_STATE_PATH = HERE / ".upstream-breakers.standin.json"
+# Set by fake_node.py run: its 127.0.0.1 node and injected failures stay out of the real state too.
+FAKE_NODE_ENV = "METRICS_FAKE_NODE"
+FAKE_NODE_STATE_PATH = HERE / ".upstream-breakers.fake-node.json"
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+MAX_COOLDOWN_S = 3600.0
+# A closed circuit with no failures is forgotten this long after its last change.
+FORGET_AFTER_S = 7 * 86400
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+FAILURE_THRESHOLD = max(1, int(_env_float("BREAKER_FAILURES", 3)))
+COOLDOWN_S = _env_float("BREAKER_COOLDOWN_S", 300.0)
+
+
+class CircuitOpen(ConnectionError):
+    """Raised instead of calling a host whose circuit is open."""
+
+
+_lock = threading.Lock()
+_circuits: dict[str, dict[str, Any]] | None = None
+_path = STATE_PATH
+# Hosts whose half-open probe is in flight in this process.
+_probing: set[str] = set()
+# Hosts this process changed (or reset) since its last write; every other host is taken from the file.
+_dirty: set[str] = set()
+
+
+def _iso(ts: float | None) -> str | None:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if ts else None
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).hostname or "?"
+
+
+def _read(path: Path) -> dict[str, dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("circuits", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _load() -> dict[str, dict[str, Any]]:
+    global _circuits, _path
+    if _circuits is None:
+        if os.environ.get("METRICS_UPSTREAM_BASE"):
+            _path = STANDIN_STATE_PATH
+        elif os.environ.get(FAKE_NODE_ENV):
+            _path = FAKE_NODE_STATE_PATH
+        else:
+            _path = STATE_PATH
+        _circuits = _read(_path)
+    return _circuits
+
+
+@contextmanager
+def _file_lock() -> Iterator[None]:
+    """Exclusive across processes (flock on a sibling .lock file) for one read-merge-write."""
+    if fcntl is None:
+        yield
+        return
+    with open(_path.with_name(_path.name + ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _save() -> None:
+    """Merge this process's changed hosts into the file (caller holds _lock)."""
+    circuits = _load()
+    try:
+        with _file_lock():
+            on_disk = _read(_path)
+            for host in [h for h in circuits if h not in _dirty and h not in on_disk]:
+                del circuits[host]  # reset or forgotten by another process
+            circuits.update({h: c for h, c in on_disk.items() if h not in _dirty})
+            now = time.time()
+            for host in [h for h, c in circuits.items() if c["state"] == CLOSED and not c["failures"]
+                         and now - c["changed_at"] > FORGET_AFTER_S]:
+                del circuits[host]
+            tmp = _path.with_name(f"{_path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"circuits": circuits}, indent=1, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, _path)
+        _dirty.clear()
+    except OSError as e:
+        print(f"  breaker state not saved: {e}")
+
+
+def _open(c: dict[str, Any], now: float, cooldown_s: float) -> None:
+    c.update(state=OPEN, opened_at=now, cooldown_s=min(cooldown_s, MAX_COOLDOWN_S), changed_at=now)
+    c["trips"] = c.get("trips", 0) + 1
+
+
+def before(url: str) -> None:
+    """Raise CircuitOpen unless a call to url's host may go out now."""
+    host = _host(url)
+    with _lock:
+        c = _load().get(host)
+        if c is None or c["state"] == CLOSED:
+            return
+        now = time.time()
+        if c["state"] == OPEN:
+            retry_at = c["opened_at"] + c["cooldown_s"]
+            if now < retry_at:
+                raise CircuitOpen(f"{host}: circuit open until {_iso(retry_at)} ({c.get('last_error')})")
+            c.update(state=HALF_OPEN, changed_at=now)
+            _dirty.add(host)
+            _save()
+        if host in _probing:
+            raise CircuitOpen(f"{host}: circuit half-open, probe in flight")
+        _probing.add(host)
+
+
+def after(url: str, failed: bool, error: str | None = None) -> None:
+    """Outcome of a call before() let through."""
+    host = _host(url)
+    with _lock:
+        circuits = _load()
+        c = circuits.get(host)
+        _probing.discard(host)
+        now = time.time()
+        if not failed:
+            if c is None or (c["state"] == CLOSED and not c["failures"]):
+                return
+            c.update(state=CLOSED, failures=0, cooldown_s=COOLDOWN_S, changed_at=now)
+            _dirty.add(host)
+            _save()
+            return
+        if c is None:
+            c = circuits[host] = {
+                "state": CLOSED, "failures": 0, "trips": 0, "cooldown_s": COOLDOWN_S,
+                "opened_at": None, "changed_at": now, "last_error": None,
+            }
+        c["failures"] += 1
+        c["last_error"] = error
+        if c["state"] == HALF_OPEN:
+            _open(c, now, c["cooldown_s"] * 2)
+        elif c["state"] == CLOSED and c["failures"] >= FAILURE_THRESHOLD:
+            _open(c, now, COOLDOWN_S)
+        _dirty.add(host)
+        _save()
+
+
+def snapshot() -> list[dict[str, Any]]:
+    """Every known circuit, as reported in the run report."""
+    with _lock:
+        circuits = _load()
+        out = []
+        for host, c in sorted(circuits.items()):
+            retry_at = c["opened_at"] + c["cooldown_s"] if c["state"] == OPEN else None
+            out.append({
+                "host": host,
+                "state": c["state"],
+                "failures": c["failures"],
+                "trips": c.get("trips", 0),
+                "cooldown_s": c["cooldown_s"],
+                "retry_at": _iso(retry_at),
+                "changed_at": _iso(c["changed_at"]),
+                "last_error": c.get("last_error"),
+            })
+        return out
+
+
+def reset(host: str | None = None) -> list[str]:
+    """Forget one host's circuit (all of them when None); returns the hosts reset."""
+    with _lock:
+        circuits = _load()
+        hosts = list(circuits) if host is None else [h for h in (host,) if h in circuits]
+        for h in hosts:
+            del circuits[h]
+        _dirty.update(hosts)
+        if hosts:
+            _save()
+        return hosts
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--reset", metavar="HOST", help='Close and forget a circuit ("all" for every one)')
+    args = ap.parse_args()
+
+    if args.reset:
+        hosts = reset(None if args.reset == "all" else args.reset)
+        print(f"Reset: {', '.join(hosts)}" if hosts else f"No circuit for {args.reset}")
+        return 0
+    rows = snapshot()
+    if not rows:
+        print(f"No circuits recorded ({_path.name}): every upstream is closed.")
+        return 0
+    print(f"{'host':<32} {'state':<9} {'fails':>5} {'trips':>5} {'retry at':<20} last error")
+    for r in rows:
+        print(f"{r['host'][:32]:<32} {r['state']:<9} {r['failures']:>5} {r['trips']:>5} "
+              f"{r['retry_at'] or '-':<20} {r['last_error'] or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
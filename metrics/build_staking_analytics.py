@@ -1,39 +1,68 @@
 #!/usr/bin/env python3
 """
-Build metrics/staking_analytics.json — public-facing only (safe to GitHub Pages).
+Build per-token staking analytics — public-facing only (safe to GitHub Pages).
+
+One file per token in the registry (tokens.json, token_registry.py):
+BONZI -> staking_analytics.json, VISTA -> staking_analytics.vista.json, ...
+plus staking_analytics.index.json listing them. Every file has the
+staking_analytics.json shape (schema.STAKING_ANALYTICS); the bonzi_* key
+names are the original ones and refer to that file's token.
 
 Reads:
   - Ethereum mainnet JSON-RPC (no key required; uses resilient URL list).
-  - Optional CoinGecko contract price + ETH price (no key).
-  - metrics-data.json bonzi aggregate (typically from Dune via fetch_metrics.py).
+    Tokens are built concurrently; their eth_calls go through one RpcBatcher,
+    which coalesces them into JSON-RPC batch requests and reads shared state
+    (factory router) once.
+  - Optional CoinGecko contract prices (one call for all tokens) + ETH price (no key).
+  - metrics-data.json per-token aggregates (typically from Dune via fetch_metrics.py).
 
 Never writes secrets. API keys for DUNE_ETHERSCAN stay in operator .env when extending.
 
 Usage:
-  python3 build_staking_analytics.py
-  python3 build_staking_analytics.py --metrics-path metrics-data.json --out staking_analytics.json
+  python3 build_staking_analytics.py                      # every registry token
+  python3 build_staking_analytics.py --token vista
+  python3 build_staking_analytics.py --metrics-path metrics-data.json --out staking_analytics.json   # BONZI only
 """
 
 from __future__ import annotations
 
 import argparse
+import bisect
+import http.client
 import json
+import math
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
 from urllib.request import Request, urlopen
 
+import delta
+import replay
+import token_registry
+import tracing
+from token_registry import Token
+
+HERE = Path(__file__).resolve().parent
+REGISTRY = token_registry.load()
+_PROTOCOL = token_registry.protocol()
+INDEX_NAME = "staking_analytics.index.json"
+DEFAULT_WORKERS = 4
+
 # Hard facts (immutable for this analytics surface — validator enforces canonical router casing)
 CHAIN_ID = 1
-TOKEN = "0xd6175692026bcd7cb12a515e39cf0256ef35cb86"
-HARDSTAKE = "0x3618158bb8d07111e476f4de28676dff050d1a53"
-FACTORY = "0x9a27cb5ae0B2cEe0bb71f9A85C0D60f3920757B4"
-ROUTER_EXPECTED_CANONICAL = "0x9bD63C5D44fF28390df1EaaFD4eB4BD73E94A72a"
+BONZI = REGISTRY["bonzi"]
+TOKEN = BONZI.token
+HARDSTAKE = BONZI.hardstake
+FACTORY = _PROTOCOL["factory"]
+ROUTER_EXPECTED_CANONICAL = _PROTOCOL["router"]
 
 # Bonzi/WETH Univ2-style pair (Ethervista) — ETH/BONZI mid only, not USD.
-BONZI_PAIR = "0x970cf9b7346fbaea0588f03356a104100eb675e2".lower()
+BONZI_PAIR = BONZI.lp_pair
 WETH_MAINNET = "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2"
 
 SEL_PAIR_TOKEN0 = "0x0dfe1681"  # token0()
@@ -44,9 +73,13 @@ SEL_PAIR_GET_RESERVES = "0x0902f1ac"  # getReserves()
 # Ethervista HARDSTAKE template: pool aggregate is public `totalSupply` (not ERC20 — staked wei).
 # Fallback: some deployments may expose `totalStaked(address)`.
 SEL_TOTAL_SUPPLY = "0x18160ddd"  # totalSupply()
-SEL_TOTAL_STAKED_ADDRESS = (
-    "0x9bfd8d61" + TOKEN[2:].lower().rjust(64, "0")
-)  # totalStaked(address) — optional
+
+
+def _sel_total_staked(token: str) -> str:
+    return "0x9bfd8d61" + token[2:].lower().rjust(64, "0")  # totalStaked(address) — optional
+
+
+SEL_TOTAL_STAKED_ADDRESS = _sel_total_staked(TOKEN)
 SEL_ROUTER = "0xf887ea40"  # router()
 
 DEFAULT_RPC_URLS = (
@@ -56,28 +89,99 @@ DEFAULT_RPC_URLS = (
     "https://cloudflare-eth.com",
 )
 
-# Public lens: ~1% of 1B supply (supply share != share of staking pool).
-REFERENCE_STAKE_BONZI_UNITS = 10_000_000.0
 
+def _eth_call_body(to: str, data: str, id_: int = 1) -> dict[str, Any]:
+    return {
+        "jsonrpc": "2.0",
+        "id": id_,
+        "method": "eth_call",
+        "params": [{"to": to, "data": data}, "latest"],
+    }
 
-def _rpc_call(rpc_url: str, to: str, data: str, timeout: int = 20) -> str:
-    """Return raw 0x-prefixed hex result or raise."""
-    payload = json.dumps(
-        {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "eth_call",
-            "params": [{"to": to, "data": data}, "latest"],
-        }
-    ).encode()
-    req = Request(
-        rpc_url,
-        data=payload,
-        headers={"Content-Type": "application/json", "User-Agent": "bonzi-staking-analytics/1"},
-        method="POST",
-    )
-    with urlopen(req, timeout=timeout) as resp:
-        body = json.loads(resp.read().decode())
+
+class _KeepAlivePool:
+    """Idle HTTP(S) connections per host, reused across JSON-RPC POSTs.
+
+    urlopen() opens (and TLS-handshakes) a fresh connection per request; a
+    long-running process (daemon.py) posting every few minutes keeps them here
+    instead. A request on a reused connection the server has since closed is
+    retried once on a new one.
+    """
+
+    def __init__(self, max_idle: int = 4) -> None:
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+
+    def _take(self, key: tuple[str, str]) -> http.client.HTTPConnection | None:
+        with self._lock:
+            conns = self._idle.get(key)
+            return conns.pop() if conns else None
+
+    def _give(self, key: tuple[str, str], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.max_idle:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def post(self, url: str, body: bytes, headers: dict[str, str], timeout: float) -> tuple[int, bytes]:
+        """Status and body; raises HTTPError on 4xx/5xx like urlopen."""
+        u = urlsplit(url)
+        key = (u.scheme, u.netloc)
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        for attempt in range(2):
+            conn = self._take(key) if attempt == 0 else None
+            reused = conn is not None
+            if conn is None:
+                cls = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+                conn = cls(u.netloc, timeout=timeout)
+            elif conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused:
+                    continue  # Server closed the idle connection; retry once on a new one.
+                if isinstance(e, OSError):
+                    raise
+                raise URLError(e) from e
+            if resp.will_close:
+                conn.close()
+            else:
+                self._give(key, conn)
+            if resp.status >= 400:
+                raise HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            return resp.status, raw
+        raise URLError(f"{url}: no connection")
+
+
+_POOL = _KeepAlivePool()
+
+
+def _rpc_post(rpc_url: str, payload: Any, endpoint: str, timeout: int) -> Any:
+    with tracing.span(rpc_url, method="POST", endpoint=endpoint) as rec:
+        status, raw = _POOL.post(
+            replay.route(rpc_url),
+            json.dumps(payload).encode(),
+            {"Content-Type": "application/json", "User-Agent": "bonzi-staking-analytics/1"},
+            timeout,
+        )
+        rec["status"] = status
+        rec["bytes"] = len(raw)
+        body = json.loads(raw.decode())
+        if isinstance(body, dict) and body.get("error"):
+            rec["error"] = "rpc_error"
+    return body
+
+
+def _eth_call_result(body: Any) -> str:
+    if not isinstance(body, dict):
+        raise RuntimeError("Invalid eth_call response")
     if body.get("error"):
         raise RuntimeError(str(body["error"]))
     result = body.get("result")
@@ -86,6 +190,99 @@ def _rpc_call(rpc_url: str, to: str, data: str, timeout: int = 20) -> str:
     return result
 
 
+def _rpc_call(rpc_url: str, to: str, data: str, timeout: int = 20) -> str:
+    """Return raw 0x-prefixed hex result or raise."""
+    body = _rpc_post(rpc_url, _eth_call_body(to, data), f"eth_call {to[:10]}:{data[:10]}", timeout)
+    return _eth_call_result(body)
+
+
+def _rpc_batch(rpc_url: str, calls: list[tuple[str, str]], timeout: int = 20) -> list[str | Exception]:
+    """One JSON-RPC batch of eth_calls: per call, the hex result or the error it raised.
+
+    Raises if the node does not answer with a batch (some public RPCs disable them).
+    """
+    payload = [_eth_call_body(to, data, i) for i, (to, data) in enumerate(calls)]
+    body = _rpc_post(rpc_url, payload, f"eth_call batch[{len(calls)}]", timeout)
+    if not isinstance(body, list):
+        raise RuntimeError(f"JSON-RPC batch rejected: {body.get('error') if isinstance(body, dict) else body!r}")
+    by_id = {r.get("id"): r for r in body if isinstance(r, dict)}
+    out: list[str | Exception] = []
+    for i in range(len(calls)):
+        try:
+            out.append(_eth_call_result(by_id.get(i)))
+        except RuntimeError as e:
+            out.append(e)
+    return out
+
+
+class RpcBatcher:
+    """Coalesces eth_calls from concurrent token builds into JSON-RPC batch round trips.
+
+    call() returns a Future. Calls made within window_s of the first pending one
+    (or until max_batch are pending) go out as one batch; an identical (to, data)
+    read is sent once per batcher and shared by every caller. A node that rejects
+    batches gets per-call requests from then on.
+    """
+
+    def __init__(self, rpc_url: str, *, window_s: float = 0.02, max_batch: int = 40) -> None:
+        self.rpc_url = rpc_url
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending: list[tuple[tuple[str, str], Future]] = []  # ((to, data) as given, future)
+        self._memo: dict[tuple[str, str], Future] = {}
+        self._timer: threading.Timer | None = None
+        self._batch_ok = True
+
+    def call(self, to: str, data: str) -> Future:
+        key = (to.lower(), data.lower())
+        flush_now = False
+        with self._lock:
+            fut = self._memo.get(key)
+            if fut is not None:
+                return fut
+            fut = Future()
+            self._memo[key] = fut
+            self._pending.append(((to, data), fut))
+            if len(self._pending) >= self.max_batch:
+                flush_now = True
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window_s, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+        return fut
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not batch:
+            return
+        calls = [call for call, _ in batch]
+        results: list[str | Exception] | None = None
+        if self._batch_ok and len(calls) > 1:
+            try:
+                results = _rpc_batch(self.rpc_url, calls)
+            except (OSError, ValueError, RuntimeError):
+                self._batch_ok = False
+        if results is None:
+            results = []
+            for to, data in calls:
+                try:
+                    results.append(_rpc_call(self.rpc_url, to, data))
+                except Exception as e:  # noqa: BLE001 - every future must resolve
+                    results.append(e)
+        for (_, fut), res in zip(batch, results):
+            if isinstance(res, Exception):
+                fut.set_exception(res)
+            else:
+                fut.set_result(res)
+
+
 def _hex_to_int(h: str) -> int:
     return int(h, 16)
 
@@ -104,15 +301,18 @@ def _decode_reserves_two_uints(result_hex: str) -> tuple[int, int]:
     return int(hx[0:64], 16), int(hx[64:128], 16)
 
 
-def _pair_bonzi_weth_reserves_wei(rpc: str) -> tuple[int, int] | None:
-    """Uniswap-V2 reserves: returns (bonzi_wei, weth_wei) for the canonical BONZI/WETH pair."""
+def _pair_token_weth_reserves_wei(token: Token, reads: list[Future]) -> tuple[int, int] | None:
+    """Uniswap-V2 reserves: returns (token_wei, weth_wei) for the token's canonical TOKEN/WETH pair.
+
+    reads are the pending token0() / token1() / getReserves() calls on token.lp_pair.
+    """
     try:
-        t0 = _decode_address_words(_rpc_call(rpc, BONZI_PAIR, SEL_PAIR_TOKEN0))
-        t1 = _decode_address_words(_rpc_call(rpc, BONZI_PAIR, SEL_PAIR_TOKEN1))
-        r0, r1 = _decode_reserves_two_uints(_rpc_call(rpc, BONZI_PAIR, SEL_PAIR_GET_RESERVES))
+        t0 = _decode_address_words(reads[0].result())
+        t1 = _decode_address_words(reads[1].result())
+        r0, r1 = _decode_reserves_two_uints(reads[2].result())
     except (OSError, RuntimeError, ValueError, IndexError):
         return None
-    tok = TOKEN.lower()
+    tok = token.token.lower()
     weth_l = WETH_MAINNET.lower()
     if t0 == tok and t1 == weth_l:
         bonzi_wei, eth_wei = r0, r1
@@ -125,86 +325,289 @@ def _pair_bonzi_weth_reserves_wei(rpc: str) -> tuple[int, int] | None:
     return bonzi_wei, eth_wei
 
 
-def _pair_implied_eth_per_bonzi_tokens(rpc: str) -> float | None:
+def _eth_per_bonzi_from_reserves(reserves: tuple[int, int] | None) -> float | None:
     """Rough mid: WETH_reserve / BONZI_reserve (18-decimal floats)."""
-    tup = _pair_bonzi_weth_reserves_wei(rpc)
-    if not tup:
+    if not reserves:
         return None
-    bonzi_wei, eth_wei = tup
+    bonzi_wei, eth_wei = reserves
     return (eth_wei / 10**18) / (bonzi_wei / 10**18)
 
 
-def _pick_working_rpc(urls: list[str]) -> str:
+def rpc_request(rpc_url: str, method: str, params: list[Any], timeout: int = 20) -> Any:
+    """Result of one JSON-RPC call; raises RuntimeError on an error reply."""
+    body = _rpc_post(rpc_url, {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}, method, timeout)
+    if not isinstance(body, dict) or body.get("error") or "result" not in body:
+        raise RuntimeError(f"{method}: {body.get('error') if isinstance(body, dict) else body!r}"[:200])
+    return body["result"]
+
+
+def rpc_requests(rpc_url: str, calls: list[tuple[str, list[Any]]], timeout: int = 20) -> list[Any]:
+    """Results of several JSON-RPC calls sent as one batch; raises if any call failed."""
+    if not calls:
+        return []
+    payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": p} for i, (m, p) in enumerate(calls)]
+    body = _rpc_post(rpc_url, payload, f"{calls[0][0]} batch[{len(calls)}]", timeout)
+    if not isinstance(body, list):
+        raise RuntimeError(f"JSON-RPC batch rejected: {body.get('error') if isinstance(body, dict) else body!r}"[:200])
+    by_id = {r.get("id"): r for r in body if isinstance(r, dict)}
+    out = []
+    for i, (method, _) in enumerate(calls):
+        r = by_id.get(i) or {}
+        if r.get("error") or "result" not in r:
+            raise RuntimeError(f"{method}: {r.get('error') or 'missing result'}"[:200])
+        out.append(r["result"])
+    return out
+
+
+def block_number(rpc_url: str, timeout: int = 12) -> int:
+    result = rpc_request(rpc_url, "eth_blockNumber", [], timeout)
+    if not result or not isinstance(result, str):
+        raise RuntimeError(f"Invalid eth_blockNumber result: {result!r}"[:200])
+    return _hex_to_int(result)
+
+
+# First answering endpoint per URL list, kept for the life of the process (daemon.py
+# calls forget_rpc() after a failed read so the next cycle probes the list again).
+_picked_rpc: dict[tuple[str, ...], str] = {}
+
+
+def forget_rpc() -> None:
+    _picked_rpc.clear()
+
+
+def pick_working_rpc(urls: list[str]) -> str:
+    key = tuple(urls)
+    if key in _picked_rpc:
+        return _picked_rpc[key]
     for u in urls:
         try:
-            payload = json.dumps(
-                {"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}
-            ).encode()
-            req = Request(
-                u,
-                data=payload,
-                headers={"Content-Type": "application/json", "User-Agent": "bonzi-staking-analytics/1"},
-                method="POST",
-            )
-            with urlopen(req, timeout=12) as resp:
-                body = json.loads(resp.read().decode())
-            if body.get("result"):
-                return u
-        except (OSError, HTTPError, URLError, ValueError, RuntimeError):
+            block_number(u)
+        except (OSError, ValueError, RuntimeError):
             continue
+        _picked_rpc[key] = u
+        return u
     return urls[0]
 
 
 def _http_get_json(url: str, timeout: int = 15) -> dict[str, Any]:
-    req = Request(url, headers={"User-Agent": "bonzi-staking-analytics/1"}, method="GET")
-    with urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode())
+    req = Request(replay.route(url), headers={"User-Agent": "bonzi-staking-analytics/1"}, method="GET")
+    with tracing.span(url) as rec:
+        with urlopen(req, timeout=timeout) as resp:
+            raw = resp.read()
+            rec["status"] = resp.status
+        rec["bytes"] = len(raw)
+    return json.loads(raw.decode())
 
 
-def _fetch_coingecko_prices() -> tuple[float | None, float | None]:
-    """(bonzi_usd, eth_usd) from CoinGecko simple token price by contract."""
-    eth_usd: float | None = None
-    bonzi_usd: float | None = None
+def fetch_eth_usd() -> float | None:
     try:
         j = _http_get_json(
             "https://api.coingecko.com/api/v3/simple/price"
             "?ids=ethereum&vs_currencies=usd"
         )
-        eth_usd = float(j.get("ethereum", {}).get("usd") or 0) or None
+        return float(j.get("ethereum", {}).get("usd") or 0) or None
     except (OSError, ValueError, TypeError, KeyError):
-        pass
+        return None
+
+
+def fetch_token_usd(addresses: list[str]) -> dict[str, float | None]:
+    """CoinGecko USD price per token contract, all tokens in one request."""
+    prices: dict[str, float | None] = {a.lower(): None for a in addresses}
+    if not prices:
+        return prices
     try:
         j2 = _http_get_json(
             "https://api.coingecko.com/api/v3/simple/token_price/ethereum"
-            f"?contract_addresses={TOKEN}&vs_currencies=usd"
+            f"?contract_addresses={','.join(prices)}&vs_currencies=usd"
         )
-        row = j2.get(TOKEN.lower()) or j2.get(TOKEN)
-        if row:
-            bonzi_usd = float(row.get("usd") or 0) or None
-    except (OSError, ValueError, TypeError, KeyError):
+        for addr in prices:
+            row = j2.get(addr)
+            if row:
+                prices[addr] = float(row.get("usd") or 0) or None
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
         pass
-    return bonzi_usd, eth_usd
+    return prices
+
+
+def fetch_bonzi_usd() -> float | None:
+    return fetch_token_usd([TOKEN])[TOKEN]
+
+
+def read_onchain(
+    rpc_urls: list[str],
+    token: Token | None = None,
+    *,
+    batcher: RpcBatcher | None = None,
+) -> dict[str, Any]:
+    """All JSON-RPC state build_payload needs for one token, read once (the pipeline's "onchain" stage).
+
+    Every read is issued before any is awaited, so they leave in one batch
+    (shared with other tokens when a batcher is passed in).
+    Plain ints/strings only, so the snapshot can be cached as JSON and handed over in memory.
+    """
+    token = token or BONZI
+    if batcher is None:
+        batcher = RpcBatcher(pick_working_rpc(rpc_urls))
+    staked_f = batcher.call(token.hardstake, SEL_TOTAL_SUPPLY)
+    router_f = batcher.call(FACTORY, SEL_ROUTER)
+    supply_f = batcher.call(token.token, SEL_TOTAL_SUPPLY)
+    pair_fs = (
+        [batcher.call(token.lp_pair, sel) for sel in (SEL_PAIR_TOKEN0, SEL_PAIR_TOKEN1, SEL_PAIR_GET_RESERVES)]
+        if token.lp_pair
+        else None
+    )
+    pool_total_method = "hardstake_totalSupply"
+    try:
+        staked_hex = staked_f.result()
+    except RuntimeError:
+        pool_total_method = "totalStaked_token"
+        staked_hex = batcher.call(token.hardstake, _sel_total_staked(token.token)).result()
+    router_hex = router_f.result()
+    supply_hex = supply_f.result()
+    reserves = _pair_token_weth_reserves_wei(token, pair_fs) if pair_fs else None
+    return {
+        "rpc": batcher.rpc_url,
+        "pool_total_method": pool_total_method,
+        "staked_wei": _hex_to_int(staked_hex),
+        "supply_wei": _hex_to_int(supply_hex),
+        "router_live": ("0x" + router_hex[-40:]).lower(),
+        "pair_reserves_wei": list(reserves) if reserves else None,
+    }
+
+
+# Yield scenario table (build_payload): stake sizes SCENARIO_POINTS_PER_DECADE to a
+# power of ten, from SCENARIO_DECADES under the supply up to it, plus the live pool total.
+SCENARIO_POINTS_PER_DECADE = 4
+SCENARIO_DECADES = 7
+SCENARIO_COLUMNS = (
+    "stake_units",
+    "share_of_live_staking_pool_pct",
+    "monthly_eth_linear",
+    "annual_eth_linear",
+    "usd_apr_proxy_pct",
+    "eth_mid_apr_proxy_pct",
+)
+_SCENARIO_DIGITS = (4, 6, 14, 14, 6, 6)
+
+
+def _scenario_grid(supply_tokens: float, staked_tokens: float) -> list[float]:
+    top = math.ceil(math.log10(supply_tokens)) * SCENARIO_POINTS_PER_DECADE
+    bottom = top - SCENARIO_DECADES * SCENARIO_POINTS_PER_DECADE
+    grid = [10 ** (e / SCENARIO_POINTS_PER_DECADE) for e in range(bottom, top + 1)]
+    # The pool total is where the linear pace stops growing; interpolation is exact on either side.
+    if staked_tokens > 0:
+        grid.append(staked_tokens)
+    return sorted(set(grid))
+
+
+def _scenario_columns_numpy(np: Any, grid: list[float], staked: float, eth_year: float | None,
+                            token_usd: float | None, eth_usd: float | None, mid: float | None) -> list[list[float]]:
+    s = np.asarray(grid, dtype=float)
+    nan = np.full_like(s, np.nan)
+    within = s <= staked if staked > 0 else np.zeros_like(s, dtype=bool)
+    share = np.where(within, 100.0 * (s / staked if staked > 0 else nan), nan)
+    annual = nan if eth_year is None or staked <= 0 else np.where(within, eth_year * (s / staked), eth_year)
+    usd_apr = np.where(annual > 0, annual * eth_usd / (s * token_usd) * 100.0, nan) if eth_usd and token_usd else nan
+    mid_apr = annual / (s * mid) * 100.0 if mid else nan
+    return np.stack([s, share, annual / 12.0, annual, usd_apr, mid_apr], axis=1).tolist()
+
+
+def _scenario_row(s: float, staked: float, eth_year: float | None,
+                  token_usd: float | None, eth_usd: float | None, mid: float | None) -> list[float]:
+    nan = math.nan
+    within = staked > 0 and s <= staked
+    share = 100.0 * (s / staked) if within else nan
+    annual = nan if eth_year is None or staked <= 0 else eth_year * (s / staked) if within else eth_year
+    usd_apr = annual * eth_usd / (s * token_usd) * 100.0 if eth_usd and token_usd and annual > 0 else nan
+    mid_apr = annual / (s * mid) * 100.0 if mid else nan
+    return [s, share, annual / 12.0, annual, usd_apr, mid_apr]
+
+
+def yield_scenarios(
+    supply_tokens: float,
+    staked_tokens: float,
+    eth_per_year: float | None,
+    token_usd: float | None,
+    eth_usd: float | None,
+    eth_per_token_mid: float | None,
+    eth_mid_suppressed: bool,
+) -> dict[str, Any] | None:
+    """The wallet lens over a log-spaced grid of stake sizes, one row per size (SCENARIO_COLUMNS).
+
+    Same rules as the reference-stake lens: a stake above the live pool total has no
+    pool share and earns the whole pool's linear pace; the ETH-mid APR column is null
+    when the pair is too thin for the hero percent (eth_mid_suppressed). Stake
+    calculators read it by interpolating between the rows around an amount.
+    Computed in one NumPy pass when NumPy is installed, row by row otherwise.
+    """
+    if supply_tokens <= 0:
+        return None
+    grid = _scenario_grid(supply_tokens, staked_tokens)
+    mid = None if eth_mid_suppressed else eth_per_token_mid
+    try:
+        import numpy as np
+    except ImportError:
+        rows = [_scenario_row(s, staked_tokens, eth_per_year, token_usd, eth_usd, mid) for s in grid]
+    else:
+        rows = _scenario_columns_numpy(np, grid, staked_tokens, eth_per_year, token_usd, eth_usd, mid)
+    return {
+        "columns": list(SCENARIO_COLUMNS),
+        "rows": [
+            [None if math.isnan(v) else round(v, d) for v, d in zip(row, _SCENARIO_DIGITS)]
+            for row in rows
+        ],
+        "eth_mid_apr_suppressed": eth_mid_suppressed,
+        "grid_note_public": (
+            f"{SCENARIO_POINTS_PER_DECADE} stake sizes per power of ten up to total supply, plus today's "
+            "pool total; between rows, interpolate linearly in stake size."
+        ),
+    }
+
+
+def scenario_at(table: dict[str, Any], stake_units: float) -> dict[str, float | None] | None:
+    """Row of a yield_scenarios table at any stake inside the grid, interpolated linearly in stake size."""
+    rows = table.get("rows") or []
+    stakes = [r[0] for r in rows]
+    i = bisect.bisect_left(stakes, stake_units)
+    if not rows or i == len(rows) or stake_units < stakes[0]:
+        return None
+    lo, hi = rows[max(i - 1, 0)], rows[i]
+    t = 0.0 if hi[0] == lo[0] else (stake_units - lo[0]) / (hi[0] - lo[0])
+    out: dict[str, float | None] = {}
+    for name, a, b in zip(table["columns"], lo, hi):
+        out[name] = None if a is None or b is None else a + (b - a) * t
+    return out
+
+
 def build_payload(
     metrics_bonzi: dict[str, Any] | None,
     rpc_urls: list[str],
+    *,
+    onchain: dict[str, Any] | None = None,
+    prices: tuple[float | None, float | None] | None = None,
+    token: Token | None = None,
 ) -> dict[str, Any]:
+    """Assemble the public payload for one token (BONZI unless token is given).
+
+    metrics_bonzi is that token's metrics-data.json slice. onchain (from read_onchain)
+    and prices ((token_usd, eth_usd)) are fetched here when not supplied; the pipeline
+    passes both in so nothing is requested twice.
+    """
+    token = token or BONZI
+    sym = token.symbol
     now = datetime.now(timezone.utc)
     generated_iso = now.strftime("%Y-%m-%dT%H:%M:%SZ")
     snapshot_date = now.strftime("%Y-%m-%d")
 
-    rpc = _pick_working_rpc(rpc_urls)
-    pool_total_method = "hardstake_totalSupply"
-    try:
-        staked_hex = _rpc_call(rpc, HARDSTAKE, SEL_TOTAL_SUPPLY)
-    except RuntimeError:
-        pool_total_method = "totalStaked_token"
-        staked_hex = _rpc_call(rpc, HARDSTAKE, SEL_TOTAL_STAKED_ADDRESS)
-    router_hex = _rpc_call(rpc, FACTORY, SEL_ROUTER)
-    supply_hex = _rpc_call(rpc, TOKEN, SEL_TOTAL_SUPPLY)
-    supply_wei = _hex_to_int(supply_hex)
-    staked_wei = _hex_to_int(staked_hex)
-    router_live = ("0x" + router_hex[-40:]).lower()
+    if onchain is None:
+        onchain = read_onchain(rpc_urls, token)
+    rpc = onchain["rpc"]
+    pool_total_method = onchain["pool_total_method"]
+    supply_wei = int(onchain["supply_wei"])
+    staked_wei = int(onchain["staked_wei"])
+    router_live = onchain["router_live"]
     expected_lower = ROUTER_EXPECTED_CANONICAL.lower()
+    pres = tuple(onchain["pair_reserves_wei"]) if onchain.get("pair_reserves_wei") else None
 
     locked_pct = 0.0
     if supply_wei > 0:
@@ -213,17 +616,18 @@ def build_payload(
     decimals = 10**18
     supply_tokens = supply_wei / decimals
     staked_tokens = staked_wei / decimals
+    # Public lens: ~1% of supply (supply share != share of staking pool); BONZI pins 10M in tokens.json.
+    reference_units = float(token.reference_stake_units or max(1, round(supply_tokens / 100)))
 
     pair_bonzi_reserve_tokens: float | None = None
     pair_bonzi_pct_of_supply: float | None = None
-    pres = _pair_bonzi_weth_reserves_wei(rpc)
     if pres:
         bwei, _ = pres
         pair_bonzi_reserve_tokens = round(bwei / decimals, 8)
         if supply_tokens > 0:
             pair_bonzi_pct_of_supply = round(100.0 * (pair_bonzi_reserve_tokens / supply_tokens), 6)
 
-    bonzi_usd, eth_usd = _fetch_coingecko_prices()
+    bonzi_usd, eth_usd = prices if prices is not None else (fetch_token_usd([token.token])[token.token], fetch_eth_usd())
     mb = metrics_bonzi or {}
     total_eth_claimed = mb.get("total_eth_distributed")
     unique_claimers = mb.get("unique_claimers")
@@ -267,8 +671,8 @@ def build_payload(
     share_of_live_staking_pool_pct: float | None = None
     reference_vs_pool_note: str | None = None
     if supply_tokens > 0 and staked_tokens > 0:
-        raw_share = 100.0 * (REFERENCE_STAKE_BONZI_UNITS / staked_tokens)
-        if REFERENCE_STAKE_BONZI_UNITS > staked_tokens:
+        raw_share = 100.0 * (reference_units / staked_tokens)
+        if reference_units > staked_tokens:
             reference_vs_pool_note = (
                 "Reference exceeds live staking aggregate; pacing below uses the whole pool slice."
             )
@@ -291,8 +695,8 @@ def build_payload(
     ):
         daily_mean_eth_claimed = total_eth_claimed_f / float(pool_age_days)
         annualized_pool_eth_pace_estimate = round(daily_mean_eth_claimed * 365.0, 12)
-        if REFERENCE_STAKE_BONZI_UNITS <= staked_tokens:
-            stake_frac = REFERENCE_STAKE_BONZI_UNITS / staked_tokens
+        if reference_units <= staked_tokens:
+            stake_frac = reference_units / staked_tokens
             linear_annual_eth_for_reference_stake = round(
                 daily_mean_eth_claimed * 365.0 * stake_frac, 14
             )
@@ -309,7 +713,7 @@ def build_payload(
                     "Live pool smaller than reference; pacing uses entire pool disbursement baseline."
                 )
         if eth_usd and bonzi_usd and bonzi_usd > 0 and linear_monthly_eth_for_reference_stake:
-            principal_usd = REFERENCE_STAKE_BONZI_UNITS * bonzi_usd
+            principal_usd = reference_units * bonzi_usd
             annual_eth = linear_monthly_eth_for_reference_stake * 12.0
             linear_yield_usd_apr_proxy_on_reference_pct = round(
                 (annual_eth * eth_usd / principal_usd) * 100.0, 6
@@ -330,8 +734,8 @@ def build_payload(
     }
 
     wallet_lens_illustrative: dict[str, Any] = {
-        "reference_bonzi_units": REFERENCE_STAKE_BONZI_UNITS,
-        "supply_fraction_pct": round((REFERENCE_STAKE_BONZI_UNITS / supply_tokens) * 100, 8)
+        "reference_bonzi_units": reference_units,
+        "supply_fraction_pct": round((reference_units / supply_tokens) * 100, 8)
         if supply_tokens > 0
         else None,
         "share_of_live_staking_pool_pct": share_of_live_staking_pool_pct,
@@ -361,10 +765,7 @@ def build_payload(
     annualized_yield_eth_mid_proxy_pct_computed_optional: float | None = None
     eth_mid_proxy_unreliable_for_hero_pct = False
     eth_mid_proxy_unreliable_public_reason: str | None = None
-    try:
-        eth_per_bonzi_pair_mid = _pair_implied_eth_per_bonzi_tokens(rpc)
-    except (OSError, RuntimeError, ValueError, IndexError, TypeError):
-        eth_per_bonzi_pair_mid = None
+    eth_per_bonzi_pair_mid = _eth_per_bonzi_from_reserves(pres)
     if (
         eth_per_bonzi_pair_mid
         and eth_per_bonzi_pair_mid > 0
@@ -395,12 +796,23 @@ def build_payload(
                 annualized_pool_reward_yield_estimate_eth_mid_proxy_pct = None
                 eth_mid_proxy_unreliable_for_hero_pct = True
                 eth_mid_proxy_unreliable_public_reason = (
-                    "APR percent not shown: the main BONZI/WETH pair has very little WETH next to "
-                    "BONZI reserves, so 'ETH value of locked BONZI' from that mid (~"
+                    f"APR percent not shown: the main {sym}/WETH pair has very little WETH next to "
+                    f"{sym} reserves, so 'ETH value of locked {sym}' from that mid (~"
                     + f"{staking_tvl_eth_proxy_from_pair_mid:.2f}"
                     + " ETH here) is not a fair TVL denominator. Use pool ETH/year pace instead."
                 )
 
+    # The lens above at every stake size, for the stake calculators.
+    scenarios = yield_scenarios(
+        supply_tokens,
+        staked_tokens,
+        daily_mean_eth_claimed * 365.0 if daily_mean_eth_claimed is not None else None,
+        bonzi_usd,
+        eth_usd,
+        eth_per_bonzi_pair_mid,
+        eth_mid_proxy_unreliable_for_hero_pct,
+    )
+
     bonzi_qty_1000: float | None = None
     if bonzi_usd and bonzi_usd > 0:
         bonzi_qty_1000 = round(1000.0 / bonzi_usd, 8)
@@ -456,6 +868,22 @@ def build_payload(
         except (TypeError, ValueError):
             pass
 
+    aggregate_claims: dict[str, Any] = {
+        "total_eth_distributed_aggregate": total_eth_claimed_f,
+        "unique_claimers": unique_claimers,
+        "currently_staking_wallets_aggregate": currently_staking,
+        "source": mb.get("_claims_source") or "metrics_data_json_bonzi_slice_dune_derived",
+    }
+    if mb.get("_dune_claims") is not None:
+        # Ledger figures published above; the (older) Dune ones stay alongside as a cross-check.
+        aggregate_claims["dune_cross_check_optional"] = {
+            **mb["_dune_claims"],
+            "ledger_through_block": mb.get("_claims_through_block"),
+        }
+    elif mb.get("_claims_mismatch") is not None:
+        # The ledger disagreed with Dune (or saw no claims): Dune figures published, ledger shown for review.
+        aggregate_claims["ledger_cross_check_optional"] = {"status": "mismatch", **mb["_claims_mismatch"]}
+
     return {
         "schema_version": 1,
         "generated_at_utc": generated_iso,
@@ -463,8 +891,9 @@ def build_payload(
         "chain_id": CHAIN_ID,
         "access_model": "public_json_only",
         "contracts": {
-            "bonzi_token": TOKEN.lower(),
-            "bonzi_hardstake": HARDSTAKE.lower(),
+            "token_symbol": sym,
+            "bonzi_token": token.token.lower(),
+            "bonzi_hardstake": token.hardstake.lower(),
             "factory": FACTORY.lower(),
             "router_expected_canonical": ROUTER_EXPECTED_CANONICAL,
             "router_read_from_factory": router_live.lower(),
@@ -489,12 +918,7 @@ def build_payload(
                 "differ. Used only for illustrative USD denominators."
             ),
         },
-        "aggregate_claims_optional": {
-            "total_eth_distributed_aggregate": total_eth_claimed_f,
-            "unique_claimers": unique_claimers,
-            "currently_staking_wallets_aggregate": currently_staking,
-            "source": "metrics_data_json_bonzi_slice_dune_derived",
-        },
+        "aggregate_claims_optional": aggregate_claims,
         "leaderboards": {
             "top_stakers_by_amount": top_stakers,
             "top_stakers_source": stakers_src,
@@ -507,12 +931,13 @@ def build_payload(
         },
         "pool_health_pulse_illustrative": pool_health_pulse,
         "wallet_lens_10m_supply_illustrative": wallet_lens_illustrative,
+        "yield_scenarios_illustrative": scenarios,
         "roi_pool_aggregate_illustrative": {
             "snapshot_datetime_utc": generated_iso,
             "usd_notional": 1000,
             "bonzi_units_representing_1000_usd": bonzi_qty_1000,
             "historical_aggregate_label": (
-                "Cumulative ETH paid to claiming stakers vs rough TVL proxy (live locks × CoinGecko BONZI). "
+                f"Cumulative ETH paid to claiming stakers vs rough TVL proxy (live locks × CoinGecko {sym}). "
                 "Not your personal IRR. Does not imply future returns."
             ),
             "tvl_proxy_usd": tvl_proxy_usd,
@@ -532,9 +957,9 @@ def build_payload(
             "pool_aggregate_eth_reward_pace_per_year_illustrative": annualized_pool_eth_pace_estimate,
             "pool_aggregate_eth_claimed_total_optional": total_eth_claimed_f,
             "eth_mid_apr_method_note_public": (
-                "ETH mid from main BONZI/WETH pair reserves; headline % = linear annual ETH paid (indexer/Dune "
-                "cumulative ÷ pool age × 365) ÷ ETH notional of locked BONZI implied by pair mid. Thin WETH vs "
-                "BONZI in the pair makes that denominator unreliable — we omit the % and show ETH/year pace instead."
+                f"ETH mid from main {sym}/WETH pair reserves; headline % = linear annual ETH paid (indexer/Dune "
+                f"cumulative ÷ pool age × 365) ÷ ETH notional of locked {sym} implied by pair mid. Thin WETH vs "
+                f"{sym} in the pair makes that denominator unreliable — we omit the % and show ETH/year pace instead."
             ),
             "realized_vs_estimated_clarifier": (
                 "realized_aggregate = summed claims from indexer (Dune) in metrics slice; "
@@ -545,63 +970,267 @@ def build_payload(
         "benchmarks_illustrative": benchmarks,
         "methodology_public": (
             "On-chain pool total uses HARDSTAKE.totalSupply() per Ethervista HARDSTAKE template; "
-            "BONZI denominator uses token totalSupply(). Fallback: totalStaked(BONZI) if deployed with that view. "
-            "LP % = BONZI reserve in listed BONZI/WETH pair ÷ minted supply. "
-            "Staked % = BONZI in hardstake lock ÷ same supply. Wallet count is indexer-derived (metrics-data). "
+            f"{sym} denominator uses token totalSupply(). Fallback: totalStaked({sym}) if deployed with that view. "
+            f"LP % = {sym} reserve in listed {sym}/WETH pair ÷ minted supply. "
+            f"Staked % = {sym} in hardstake lock ÷ same supply. Wallet count is indexer-derived (metrics-data). "
             "Regenerated by metrics/build_staking_analytics.py. Dune aggregates only as fresh as metrics-data.json. "
             "Run metrics/validate_staking_analytics.py before publishing."
         ),
     }
 
 
+def token_slice_from_metrics(
+    md: dict[str, Any], token: Token, claims: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """metrics-data.json -> one token's slice for build_payload (non-VISTA tokens also get vista ETH for benchmarks).
+
+    claims (claims_ledger.published()[token.key]) replaces the Dune claim
+    fields if the ledger saw claims and claims_ledger.cross_check() finds it
+    consistent with Dune; the Dune values are then kept under _dune_claims for
+    the cross-check. Otherwise the Dune fields stay and _claims_mismatch says why.
+    """
+    token_slice = dict(md.get(token.key) or {})
+    # Tokens without Dune queries yet still get a pool age from the registry.
+    token_slice.setdefault("launch_date", token.launch_date)
+    if claims:
+        from claims_ledger import CLAIM_FIELDS, cross_check
+
+        # No claims at all most likely means the claim event (CLAIM_TOPIC) is not the contract's.
+        problems = [] if claims.get("claims") else ["ledger saw no claim events"]
+        problems += cross_check({token.key: claims}, md)
+        if problems:
+            print(f"  {token.key}: claims ledger not published, keeping Dune ({'; '.join(problems)})")
+            token_slice["_claims_mismatch"] = {
+                "problems": problems,
+                **{f: claims.get(f) for f in CLAIM_FIELDS},
+                "ledger_through_block": claims.get("through_block"),
+            }
+        else:
+            token_slice["_dune_claims"] = {f: token_slice.get(f) for f in CLAIM_FIELDS}
+            token_slice.update({f: claims.get(f) for f in CLAIM_FIELDS})
+            token_slice["_claims_source"] = "local_claims_ledger"
+            token_slice["_claims_through_block"] = claims.get("through_block")
+    if token.key != "vista":
+        token_slice["_vista_eth_distributed"] = (md.get("vista") or {}).get("total_eth_distributed")
+    return token_slice
+
+
+def bonzi_slice_from_metrics(md: dict[str, Any]) -> dict[str, Any]:
+    """metrics-data.json -> the bonzi slice build_payload reads (plus vista ETH for benchmarks)."""
+    return token_slice_from_metrics(md, BONZI)
+
+
+def read_onchain_many(
+    tokens: list[Token],
+    rpc_urls: list[str],
+    *,
+    batcher: RpcBatcher | None = None,
+    workers: int = DEFAULT_WORKERS,
+) -> tuple[dict[str, dict[str, Any]], dict[str, str]]:
+    """read_onchain for every token concurrently over one shared batcher: (chains, errors) by token key."""
+    batcher = batcher or RpcBatcher(pick_working_rpc(rpc_urls))
+    chains: dict[str, dict[str, Any]] = {}
+    errors: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tokens)))) as pool:
+        futures = {t.key: pool.submit(read_onchain, rpc_urls, t, batcher=batcher) for t in tokens}
+        for key, fut in futures.items():
+            try:
+                chains[key] = fut.result()
+            except (OSError, RuntimeError, ValueError) as e:
+                errors[key] = f"{type(e).__name__}: {e}"
+    return chains, errors
+
+
+def build_payloads(
+    md: dict[str, Any],
+    rpc_urls: list[str],
+    *,
+    tokens: list[Token] | None = None,
+    onchain: dict[str, dict[str, Any]] | None = None,
+    usd: dict[str, float | None] | None = None,
+    eth_usd: float | None = None,
+    claims: dict[str, dict[str, Any]] | None = None,
+    workers: int = DEFAULT_WORKERS,
+) -> tuple[dict[str, dict[str, Any]], dict[str, str]]:
+    """Payload per token, built concurrently: (payloads, errors) by token key.
+
+    onchain (token key -> read_onchain snapshot) and usd (token address -> price) are
+    fetched when not supplied: chain reads through one shared RpcBatcher, prices in
+    one CoinGecko request. One token failing does not stop the others. claims
+    (token key -> claims_ledger figures) overrides the Dune claim aggregates.
+    """
+    claims = claims or {}
+    tokens = tokens if tokens is not None else list(REGISTRY.values())
+    onchain = dict(onchain or {})
+    if usd is None:
+        usd = fetch_token_usd([t.token for t in tokens])
+    if eth_usd is None:
+        eth_usd = fetch_eth_usd()
+    batcher = RpcBatcher(pick_working_rpc(rpc_urls)) if any(t.key not in onchain for t in tokens) else None
+
+    def build(t: Token) -> dict[str, Any]:
+        chain = onchain.get(t.key) or read_onchain(rpc_urls, t, batcher=batcher)
+        return build_payload(
+            token_slice_from_metrics(md, t, claims.get(t.key)),
+            rpc_urls,
+            onchain=chain,
+            prices=(usd.get(t.token), eth_usd),
+            token=t,
+        )
+
+    payloads: dict[str, dict[str, Any]] = {}
+    errors: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tokens)))) as pool:
+        futures = {t.key: pool.submit(build, t) for t in tokens}
+        for key, fut in futures.items():
+            try:
+                payloads[key] = fut.result()
+            except (OSError, RuntimeError, ValueError, KeyError, TypeError) as e:
+                errors[key] = f"{type(e).__name__}: {e}"
+    return payloads, errors
+
+
+def write_outputs(
+    payloads: dict[str, dict[str, Any]],
+    out_dir: Path = HERE,
+    *,
+    errors: dict[str, str] | None = None,
+) -> dict[str, Any]:
+    """Write each token's file plus staking_analytics.index.json; returns the index.
+
+    Tokens not built this run keep their previous index entry (failed ones with last_error).
+    """
+    index_path = out_dir / INDEX_NAME
+    try:
+        previous = {e["key"]: e for e in json.loads(index_path.read_bytes()).get("tokens", [])}
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        previous = {}
+
+    entries = dict(previous)
+    for key, payload in payloads.items():
+        t = REGISTRY[key]
+        dump_payload(payload, out_dir / t.analytics_output)
+        live = payload["onchain_live"]
+        entries[key] = {
+            "key": key,
+            "symbol": t.symbol,
+            "path": t.analytics_output,
+            "token": t.token,
+            "hardstake": t.hardstake,
+            "generated_at_utc": payload["generated_at_utc"],
+            "snapshot_date": payload["snapshot_date"],
+            "pool_total_staked_tokens": live["pool_total_staked_tokens"],
+            "locked_percent_of_supply_rounded": live["locked_percent_of_supply_rounded"],
+            "factory_router_equals_expected": payload["contracts"]["factory_router_equals_expected"],
+        }
+    for key, err in (errors or {}).items():
+        if key in entries:
+            entries[key] = {**entries[key], "last_error": err}
+
+    index = {
+        "schema_version": 1,
+        "generated_at_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "chain_id": CHAIN_ID,
+        # Registry order, so the file is stable between runs.
+        "tokens": [entries[k] for k in REGISTRY if k in entries],
+    }
+    delta.write_json(index_path, index, json.dumps(index, indent=2) + "\n")
+    return index
+
+
+def resolve_rpc_urls(rpc_urls: list[str] | None = None) -> list[str]:
+    urls = rpc_urls or list(DEFAULT_RPC_URLS)
+    extra = os.environ.get("STAKING_RPC_URLS")
+    if extra:
+        urls = [u.strip() for u in extra.split(",") if u.strip()] + urls
+    return urls
+
+
+def payload_text(payload: dict[str, Any]) -> str:
+    """The exact serialized form written to disk (validators scan this text)."""
+    return json.dumps(payload, indent=2, sort_keys=False) + "\n"
+
+
+def dump_payload(payload: dict[str, Any], output_path: Path) -> str:
+    text = payload_text(payload)
+    delta.write_json(output_path, payload, text)
+    return text
+
+
 def write_staking_analytics_json(
     metrics_json_path: Path,
     output_path: Path,
     rpc_urls: list[str] | None = None,
 ) -> dict[str, Any]:
     bonzi_slice: dict[str, Any] = {}
-    vista_eth = None
     if metrics_json_path.is_file():
         with open(metrics_json_path, encoding="utf-8") as f:
-            md = json.load(f)
-            bonzi_slice = md.get("bonzi") or {}
-            vista_eth = md.get("vista", {}).get("total_eth_distributed")
-            bonzi_slice = dict(bonzi_slice)
-            bonzi_slice["_vista_eth_distributed"] = vista_eth
-    urls = rpc_urls or list(DEFAULT_RPC_URLS)
-    extra = os.environ.get("STAKING_RPC_URLS")
-    if extra:
-        urls = [u.strip() for u in extra.split(",") if u.strip()] + urls
+            bonzi_slice = bonzi_slice_from_metrics(json.load(f))
 
-    payload = build_payload(metrics_bonzi=bonzi_slice, rpc_urls=urls)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, sort_keys=False)
-        f.write("\n")
+    payload = build_payload(metrics_bonzi=bonzi_slice, rpc_urls=resolve_rpc_urls(rpc_urls))
+    dump_payload(payload, output_path)
     return payload
 
 
-def main() -> None:
-    ap = argparse.ArgumentParser(description=__doc__)
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     ap.add_argument(
         "--metrics-path",
-        default=str(Path(__file__).resolve().parent / "metrics-data.json"),
-        help="metrics-data.json (bonzi vista slices)",
+        default=str(HERE / "metrics-data.json"),
+        help="metrics-data.json (per-token slices)",
     )
     ap.add_argument(
         "--out",
-        default=str(Path(__file__).resolve().parent / "staking_analytics.json"),
-        help="Public output path",
+        default=None,
+        help="Build BONZI only, to this path (original single-file mode)",
+    )
+    ap.add_argument(
+        "--token",
+        action="append",
+        choices=sorted(REGISTRY),
+        help="Registry token to build (repeatable; default: all)",
+    )
+    ap.add_argument("--out-dir", type=Path, default=HERE, help="Where per-token files + index go")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Tokens built concurrently")
+    ap.add_argument(
+        "--claims-ledger",
+        type=Path,
+        default=None,
+        help="claims_ledger.py state file: publish its claim figures instead of the Dune ones",
     )
     args = ap.parse_args()
 
-    outp = Path(args.out)
-    p = write_staking_analytics_json(Path(args.metrics_path), outp)
-    eq = p["contracts"].get("factory_router_equals_expected")
-    print(f"Wrote {outp}")
-    print(f"  factory_router_equals_expected: {eq}")
-    print(f"  locked_percent_of_supply_rounded: {p['onchain_live']['locked_percent_of_supply_rounded']}")
+    if args.out:
+        outp = Path(args.out)
+        p = write_staking_analytics_json(Path(args.metrics_path), outp)
+        eq = p["contracts"].get("factory_router_equals_expected")
+        print(f"Wrote {outp}")
+        print(f"  factory_router_equals_expected: {eq}")
+        print(f"  locked_percent_of_supply_rounded: {p['onchain_live']['locked_percent_of_supply_rounded']}")
+        return 0
+
+    md: dict[str, Any] = {}
+    if Path(args.metrics_path).is_file():
+        with open(args.metrics_path, encoding="utf-8") as f:
+            md = json.load(f)
+    tokens = [REGISTRY[k] for k in (args.token or REGISTRY)]
+    claims = None
+    if args.claims_ledger:
+        from claims_ledger import load_claims
+
+        claims = load_claims(args.claims_ledger)
+        print(f"Claim figures from {args.claims_ledger}: {', '.join(sorted(claims)) or 'none (missing or partial)'}")
+    payloads, errors = build_payloads(md, resolve_rpc_urls(), tokens=tokens, claims=claims, workers=args.workers)
+    write_outputs(payloads, args.out_dir, errors=errors)
+    for key, p in payloads.items():
+        print(f"Wrote {args.out_dir / REGISTRY[key].analytics_output}")
+        print(f"  factory_router_equals_expected: {p['contracts'].get('factory_router_equals_expected')}")
+        print(f"  locked_percent_of_supply_rounded: {p['onchain_live']['locked_percent_of_supply_rounded']}")
+    for key, err in errors.items():
+        print(f"FAILED {key}: {err}")
+    print(f"Index: {args.out_dir / INDEX_NAME}")
+    return 1 if errors else 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
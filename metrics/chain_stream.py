@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Near-real-time staking snapshot: rebuild a token's staking analytics when its contracts emit logs.
+
+build_staking_analytics.py reads totalSupply, the staked total and the pair
+reserves once per run, so locked_percent_of_supply_rounded can be hours old.
+This process follows the chain instead:
+
+  1. new block numbers arrive from an eth_subscribe("newHeads") WebSocket
+     (--ws / STAKING_WS_URL); without one, or while it is down, it polls
+     eth_blockNumber every --poll seconds and retries the socket with backoff;
+  2. for every new block range, one eth_getLogs filtered to the watched
+     addresses (each registry token's TOKEN, HARDSTAKE and LP pair) says which
+     tokens were touched; blocks without such logs cost nothing more;
+  3. touched tokens are rebuilt after --debounce seconds without a further
+     touch (at most --max-wait after the first one), so a burst of swaps is
+     one rebuild: read_onchain through one RpcBatcher, build_payloads with the
+     metrics-data.json slices and cached prices, validation, write_outputs
+     (delta-published like every other writer), and a page re-render when
+     BONZI changed.
+
+Try it against the local fake node:
+  python3 fake_node.py run --block-time 1 --touch-rate 0.4 -- python3 chain_stream.py --max-blocks 20 --out-dir /tmp/stream
+  python3 fake_node.py run --no-ws -- python3 chain_stream.py --max-blocks 10 --out-dir /tmp/stream
+
+Run for real:
+  STAKING_WS_URL=wss://... python3 chain_stream.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import build_staking_analytics as bsa
+import tracing
+import validate_staking_analytics as vsa
+import ws
+from token_registry import Token
+
+HERE = Path(__file__).resolve().parent
+WS_ENV = "STAKING_WS_URL"
+
+POLL_S = 12.0
+DEBOUNCE_S = 15.0
+MAX_WAIT_S = 60.0
+PRICE_TTL_S = 600.0
+WS_STALL_S = 90.0  # no head for this long: treat the socket as dead
+WS_RETRY_MAX_S = 300.0
+# A gap wider than this (downtime, long outage) marks every token touched instead of scanning it.
+MAX_LOG_RANGE = 500
+
+
+def watched_addresses(tokens: list[Token]) -> dict[str, set[str]]:
+    """Lower-cased contract address -> keys of the tokens whose snapshot it moves."""
+    out: dict[str, set[str]] = {}
+    for t in tokens:
+        for addr in (t.token, t.hardstake, t.lp_pair):
+            if addr:
+                out.setdefault(addr.lower(), set()).add(t.key)
+    return out
+
+
+class Heads:
+    """New head numbers from a newHeads subscription, or from polling while there is none."""
+
+    def __init__(self, rpc_url: str, ws_url: str | None, poll_s: float = POLL_S) -> None:
+        self.rpc_url = rpc_url
+        self.ws_url = ws_url
+        self.poll_s = poll_s
+        self.conn: ws.WebSocket | None = None
+        self.mode = "poll"
+        self._ws_retry_at = 0.0
+        self._ws_backoff = 5.0
+        self._last_head_at = time.monotonic()
+        self._next_poll = 0.0
+
+    def _subscribe(self) -> None:
+        try:
+            conn = ws.connect(self.ws_url, timeout=10)
+            conn.send_text(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+            reply = json.loads(conn.recv_text(10) or "null")
+            if not isinstance(reply, dict) or not reply.get("result"):
+                conn.close()
+                raise ws.WebSocketClosed(f"eth_subscribe refused: {reply!r}"[:200])
+        except (OSError, ValueError) as e:
+            self._drop(e)
+            return
+        self.conn = conn
+        self.mode = "ws"
+        self._ws_backoff = 5.0
+        self._last_head_at = time.monotonic()
+        print(f"Subscribed to newHeads at {self.ws_url}")
+
+    def _drop(self, err: Exception) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self.mode = "poll"
+        self._ws_retry_at = time.monotonic() + self._ws_backoff
+        print(f"  newHeads unavailable ({type(err).__name__}: {err}); polling, retry in {self._ws_backoff:.0f}s")
+        self._ws_backoff = min(WS_RETRY_MAX_S, self._ws_backoff * 2)
+
+    def next(self, timeout: float) -> int | None:
+        """A new head number seen within timeout, or None."""
+        now = time.monotonic()
+        if self.conn is None and self.ws_url and now >= self._ws_retry_at:
+            self._subscribe()
+        if self.conn is not None:
+            if now - self._last_head_at > WS_STALL_S:
+                self._drop(TimeoutError(f"no head for {WS_STALL_S:.0f}s"))
+                return None
+            try:
+                msg = self.conn.recv_text(timeout)
+                if msg is None:
+                    return None
+                obj = json.loads(msg)
+            except (OSError, ValueError) as e:
+                self._drop(e)
+                return None
+            if obj.get("method") != "eth_subscription":
+                return None
+            self._last_head_at = time.monotonic()
+            return int(obj["params"]["result"]["number"], 16)
+
+        wait = max(0.0, self._next_poll - now)
+        if wait > timeout:
+            time.sleep(timeout)
+            return None
+        time.sleep(wait)
+        self._next_poll = time.monotonic() + self.poll_s
+        try:
+            return bsa.block_number(self.rpc_url)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"  eth_blockNumber failed: {type(e).__name__}: {e}")
+            return None
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class Streamer:
+    def __init__(
+        self,
+        rpc_urls: list[str],
+        *,
+        ws_url: str | None,
+        tokens: list[Token] | None = None,
+        metrics_path: Path = HERE / "metrics-data.json",
+        out_dir: Path = HERE,
+        poll_s: float = POLL_S,
+        debounce_s: float = DEBOUNCE_S,
+        max_wait_s: float = MAX_WAIT_S,
+        render: bool = True,
+    ) -> None:
+        self.rpc_urls = rpc_urls
+        self.tokens = tokens if tokens is not None else list(bsa.REGISTRY.values())
+        self.watch = watched_addresses(self.tokens)
+        self.metrics_path = metrics_path
+        self.out_dir = out_dir
+        self.debounce_s = debounce_s
+        self.max_wait_s = max_wait_s
+        self.render = render
+        self.rpc_url = bsa.pick_working_rpc(rpc_urls)
+        self.heads = Heads(self.rpc_url, ws_url, poll_s)
+        self.stop = threading.Event()
+        self.last_block: int | None = None
+        self.pending: set[str] = set()
+        self.first_touch: float | None = None
+        self.due: float | None = None
+        self.rebuilds = 0
+        self._prices: tuple[float, dict[str, float | None], float | None] | None = None
+
+    # ---- relevance ----------------------------------------------------
+
+    def touched(self, from_block: int, to_block: int) -> set[str]:
+        if to_block - from_block + 1 > MAX_LOG_RANGE:
+            print(f"  {to_block - from_block + 1} blocks since the last check - rebuilding every token")
+            return {t.key for t in self.tokens}
+        logs = bsa.rpc_request(
+            self.rpc_url,
+            "eth_getLogs",
+            [{"fromBlock": hex(from_block), "toBlock": hex(to_block), "address": sorted(self.watch)}],
+        )
+        keys: set[str] = set()
+        for log in logs or []:
+            if not log.get("removed"):
+                keys |= self.watch.get(str(log.get("address", "")).lower(), set())
+        return keys
+
+    def on_head(self, head: int) -> None:
+        if self.last_block is None:
+            self.last_block = head
+            print(f"Following from block {head}")
+            return
+        if head <= self.last_block:
+            return
+        keys = self.touched(self.last_block + 1, head)
+        self.last_block = head
+        if not keys:
+            return
+        now = time.monotonic()
+        print(f"  block {head}: {', '.join(sorted(keys))} touched")
+        self.pending |= keys
+        self.first_touch = self.first_touch or now
+        self.due = min(now + self.debounce_s, self.first_touch + self.max_wait_s)
+
+    # ---- rebuild ------------------------------------------------------
+
+    def _load_metrics(self) -> dict[str, Any]:
+        try:
+            with open(self.metrics_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def prices(self) -> tuple[dict[str, float | None], float | None]:
+        """Token USD prices + ETH USD, refetched at most every PRICE_TTL_S."""
+        if self._prices is None or time.monotonic() - self._prices[0] > PRICE_TTL_S:
+            self._prices = (
+                time.monotonic(),
+                bsa.fetch_token_usd([t.token for t in self.tokens]),
+                bsa.fetch_eth_usd(),
+            )
+        return self._prices[1], self._prices[2]
+
+    def rebuild(self) -> None:
+        keys, self.pending, self.first_touch, self.due = self.pending, set(), None, None
+        tokens = [t for t in self.tokens if t.key in keys]
+        tracing.start("stream")
+        try:
+            from claims_ledger import load_claims  # imports checkpoints, which imports this module
+
+            chains, errors = bsa.read_onchain_many(tokens, [self.rpc_url])
+            usd, eth_usd = self.prices()
+            payloads, build_errors = bsa.build_payloads(
+                self._load_metrics(),
+                [self.rpc_url],
+                tokens=[t for t in tokens if t.key in chains],
+                onchain=chains,
+                usd=usd,
+                eth_usd=eth_usd,
+                claims=load_claims(),
+            )
+            errors.update(build_errors)
+            for key, payload in list(payloads.items()):
+                errs = vsa.validate_text(bsa.payload_text(payload), freshness_hours=None, allow_leaderboard_empty=True)
+                if errs:
+                    errors[key] = "; ".join(errs)
+                    del payloads[key]
+            if payloads:
+                bsa.write_outputs(payloads, self.out_dir, errors=errors)
+            for key, payload in payloads.items():
+                live = payload["onchain_live"]
+                print(f"  rebuilt {bsa.REGISTRY[key].analytics_output}: "
+                      f"{live['locked_percent_of_supply_rounded']}% of supply staked")
+            for key, err in errors.items():
+                print(f"  {key}: {err}")
+            if self.render and bsa.BONZI.key in payloads:
+                self._render(payloads[bsa.BONZI.key])
+        finally:
+            tracing.write_report(self.out_dir)
+        self.rebuilds += 1
+
+    def _render(self, staking: dict[str, Any]) -> None:
+        from render_metrics_page import render_all
+
+        try:
+            render_all(self.metrics_path, self.out_dir / bsa.BONZI.analytics_output, self.out_dir, staking=staking)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  page re-render skipped: {e}")
+
+    # ---- loop ---------------------------------------------------------
+
+    def run(self, *, max_blocks: int | None = None) -> None:
+        seen = 0
+        while not self.stop.is_set():
+            timeout = self.heads.poll_s
+            if self.due is not None:
+                timeout = max(0.0, self.due - time.monotonic())
+            head = self.heads.next(timeout)
+            if head is not None:
+                try:
+                    self.on_head(head)
+                except (OSError, ValueError, RuntimeError) as e:
+                    # Logs for this range are unknown: assume every token moved rather than miss one.
+                    print(f"  eth_getLogs failed ({type(e).__name__}: {e}); rebuilding every token")
+                    self.last_block = head
+                    self.pending |= {t.key for t in self.tokens}
+                    self.first_touch = self.first_touch or time.monotonic()
+                    self.due = self.first_touch + self.debounce_s
+                seen += 1
+            if self.due is not None and time.monotonic() >= self.due:
+                self.rebuild()
+            if max_blocks is not None and seen >= max_blocks:
+                if self.pending:
+                    self.rebuild()
+                break
+        self.heads.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ws", default=os.environ.get(WS_ENV), help=f"newHeads WebSocket URL (default ${WS_ENV})")
+    ap.add_argument("--token", action="append", help="Registry key to follow (repeatable; default all)")
+    ap.add_argument("--metrics-path", type=Path, default=HERE / "metrics-data.json")
+    ap.add_argument("--out-dir", type=Path, default=HERE, help="Where the analytics files are published")
+    ap.add_argument("--poll", type=float, default=POLL_S, help="Polling interval without a WebSocket")
+    ap.add_argument("--debounce", type=float, default=DEBOUNCE_S, help="Quiet seconds before a rebuild")
+    ap.add_argument("--max-wait", type=float, default=MAX_WAIT_S, help="Longest delay after the first touch")
+    ap.add_argument("--no-render", action="store_true", help="Do not re-render the metrics pages")
+    ap.add_argument("--max-blocks", type=int, help="Exit after this many heads (testing)")
+    args = ap.parse_args()
+
+    unknown = [k for k in args.token or [] if k not in bsa.REGISTRY]
+    if unknown:
+        ap.error(f"unknown token(s): {', '.join(unknown)} (see tokens.json)")
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    streamer = Streamer(
+        bsa.resolve_rpc_urls(),
+        ws_url=args.ws,
+        tokens=[bsa.REGISTRY[k] for k in args.token] if args.token else None,
+        metrics_path=args.metrics_path,
+        out_dir=args.out_dir,
+        poll_s=args.poll,
+        debounce_s=args.debounce,
+        max_wait_s=args.max_wait,
+        render=not args.no_render,
+    )
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: streamer.stop.set())
+    print(f"Streaming {', '.join(t.symbol for t in streamer.tokens)} via {streamer.rpc_url}")
+    streamer.run(max_blocks=args.max_blocks)
+    print(f"Stopped after {streamer.rebuilds} rebuild(s) at block {streamer.last_block}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Reorg-safe checkpoints for local chain indexes (hardstake / Transfer / pair logs).
+
+An index that consumes logs block by block must not keep events from blocks
+the chain later abandoned, and must not rescan from scratch to get rid of
+them. CheckpointStore keeps the hash of each of the last --finality blocks
+the index consumed; older blocks are folded into one finalized anchor, so
+memory stays bounded however long the index runs. Every Indexer.poll():
+
+  1. asks the node for the hash at the stored tip; if it changed, walks the
+     stored tail back until a hash still matches (the fork point), rolls the
+     index back to it, drops the stale tail, and carries on from fork + 1;
+     nothing matching within the window raises ReorgTooDeep;
+  2. reads the new headers in one JSON-RPC batch and accepts them only if
+     each parentHash links to the previous hash;
+  3. reads the range's logs with one eth_getLogs and accepts them only if
+     every log's blockHash is the header just recorded for its number, so a
+     reorg landing between the two reads is caught before anything is applied.
+
+The index behind it implements apply(number, logs), rollback(to_number),
+finalize(through_number) and to_json(). EventIndex is the generic one:
+per-block event detail for the unfinalized window, counts per (address,
+topic0) folded in as blocks finalize. Store and index are saved together in
+one file, written atomically, so a restart never sees one without the other.
+The file also records the hash of the node's earliest block; a state left by
+another chain (say, a fake_node.py run) is discarded instead of failing the
+first poll with ReorgTooDeep.
+
+Follow the watched contracts of every registry token (tokens.json):
+  python3 checkpoints.py --state idx.json
+Against the local fake node, with reorgs of up to 6 blocks, then compare
+the index with the node's canonical logs:
+  python3 fake_node.py run --block-time 0.2 --reorg-rate 0.1 --max-reorg-depth 6 -- \\
+      python3 checkpoints.py --state /tmp/idx.json --polls 100 --interval 0.3 --verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Protocol
+
+import build_staking_analytics as bsa
+from chain_stream import watched_addresses
+
+HERE = Path(__file__).resolve().parent
+FINALITY_DEPTH = 64  # Ethereum finalizes after two epochs (64 slots)
+MAX_RANGE = 200  # blocks consumed per poll
+
+
+class ReorgTooDeep(RuntimeError):
+    """The node no longer has any block hash the store remembers."""
+
+
+class CheckpointStore:
+    """(number, hash) of the last finality_depth consumed blocks, plus the finalized anchor before them."""
+
+    def __init__(self, finality_depth: int = FINALITY_DEPTH) -> None:
+        self.finality_depth = finality_depth
+        self.tail: deque[tuple[int, str]] = deque()
+        self.anchor: tuple[int, str] | None = None
+
+    @property
+    def tip(self) -> tuple[int, str] | None:
+        return self.tail[-1] if self.tail else self.anchor
+
+    def append(self, number: int, block_hash: str, parent_hash: str) -> int | None:
+        """Record the next block. Returns the number that just finalized, if any.
+
+        Raises ValueError if the block does not extend the tip.
+        """
+        tip = self.tip
+        if tip is not None and (number != tip[0] + 1 or parent_hash != tip[1]):
+            raise ValueError(f"block {number} does not extend tip {tip[0]}")
+        self.tail.append((number, block_hash))
+        if len(self.tail) > self.finality_depth:
+            self.anchor = self.tail.popleft()
+            return self.anchor[0]
+        return None
+
+    def rollback(self, to_number: int) -> None:
+        """Forget every block after to_number."""
+        while self.tail and self.tail[-1][0] > to_number:
+            self.tail.pop()
+
+    def to_json(self) -> dict[str, Any]:
+        return {"finality_depth": self.finality_depth, "anchor": self.anchor, "tail": list(self.tail)}
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any], finality_depth: int | None = None) -> CheckpointStore:
+        store = cls(finality_depth or int(data.get("finality_depth") or FINALITY_DEPTH))
+        store.anchor = tuple(data["anchor"]) if data.get("anchor") else None  # type: ignore[assignment]
+        store.tail = deque((int(n), h) for n, h in data.get("tail") or [])
+        while len(store.tail) > store.finality_depth:
+            store.anchor = store.tail.popleft()
+        return store
+
+
+class ChainIndex(Protocol):
+    def apply(self, number: int, logs: list[dict[str, Any]]) -> None: ...
+    def rollback(self, to_number: int) -> None: ...
+    def finalize(self, through_number: int) -> None: ...
+    def to_json(self) -> dict[str, Any]: ...
+
+
+class EventIndex:
+    """Event counts per (address, topic0): final totals plus per-block detail for the unfinalized window."""
+
+    def __init__(self) -> None:
+        self.final: dict[str, int] = {}
+        self.recent: dict[int, dict[str, int]] = {}
+
+    @staticmethod
+    def _key(log: dict[str, Any]) -> str:
+        topics = log.get("topics") or [""]
+        return f"{str(log.get('address', '')).lower()}:{topics[0]}"
+
+    def apply(self, number: int, logs: list[dict[str, Any]]) -> None:
+        counts: dict[str, int] = {}
+        for log in logs:
+            counts[self._key(log)] = counts.get(self._key(log), 0) + 1
+        self.recent[number] = counts
+
+    def rollback(self, to_number: int) -> None:
+        for n in [n for n in self.recent if n > to_number]:
+            del self.recent[n]
+
+    def finalize(self, through_number: int) -> None:
+        for n in sorted(n for n in self.recent if n <= through_number):
+            for k, c in self.recent.pop(n).items():
+                self.final[k] = self.final.get(k, 0) + c
+
+    def totals(self) -> dict[str, int]:
+        out = dict(self.final)
+        for counts in self.recent.values():
+            for k, c in counts.items():
+                out[k] = out.get(k, 0) + c
+        return out
+
+    def to_json(self) -> dict[str, Any]:
+        return {"final": self.final, "recent": {str(n): c for n, c in sorted(self.recent.items())}}
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> EventIndex:
+        idx = cls()
+        idx.final = dict(data.get("final") or {})
+        idx.recent = {int(n): dict(c) for n, c in (data.get("recent") or {}).items()}
+        return idx
+
+
+def _header(raw: Any) -> tuple[int, str, str]:
+    if not isinstance(raw, dict) or not raw.get("hash"):
+        raise RuntimeError(f"bad block header: {raw!r}"[:200])
+    return int(raw["number"], 16), raw["hash"], raw["parentHash"]
+
+
+class Indexer:
+    def __init__(
+        self,
+        rpc_url: str,
+        addresses: list[str],
+        store: CheckpointStore,
+        index: ChainIndex,
+        *,
+        max_range: int = MAX_RANGE,
+    ) -> None:
+        self.rpc_url = rpc_url
+        self.addresses = sorted(a.lower() for a in addresses)
+        self.store = store
+        self.index = index
+        self.max_range = max_range
+        self.reorgs: list[int] = []  # depth of each reorg handled
+
+    def _hashes(self, numbers: list[int]) -> list[str | None]:
+        heads = bsa.rpc_requests(self.rpc_url, [("eth_getBlockByNumber", [hex(n), False]) for n in numbers])
+        return [h.get("hash") if isinstance(h, dict) else None for h in heads]
+
+    def _reconcile(self) -> None:
+        """Roll back to the fork point if the stored tip is no longer canonical."""
+        tip = self.store.tip
+        if tip is None or self._hashes([tip[0]])[0] == tip[1]:
+            return
+        known = list(self.store.tail)
+        # One batch for the whole window: reorgs are usually shallow, but this keeps a deep one to one round trip.
+        canonical = self._hashes([n for n, _ in known])
+        for (n, h), live in zip(reversed(known), reversed(canonical)):
+            if h == live:
+                break
+        else:
+            anchor = self.store.anchor
+            if anchor is None or self._hashes([anchor[0]])[0] != anchor[1]:
+                raise ReorgTooDeep(f"no stored hash after block {known[0][0] if known else tip[0]} is canonical")
+            n = anchor[0]
+        self.reorgs.append(tip[0] - n)
+        print(f"  reorg at {tip[0]}: {tip[0] - n} block(s) replaced, re-indexing from {n + 1}")
+        self.index.rollback(n)
+        self.store.rollback(n)
+
+    def poll(self, start_block: int | None = None) -> int:
+        """Consume new blocks up to the node's head (at most max_range). Returns how many were applied."""
+        self._reconcile()
+        head = bsa.block_number(self.rpc_url)
+        tip = self.store.tip
+        first = tip[0] + 1 if tip else (start_block if start_block is not None else head)
+        last = min(head, first + self.max_range - 1)
+        if last < first:
+            return 0
+
+        numbers = list(range(first, last + 1))
+        raw = bsa.rpc_requests(self.rpc_url, [("eth_getBlockByNumber", [hex(n), False]) for n in numbers])
+        headers = [_header(h) for h in raw]
+        expected_parent = tip[1] if tip else headers[0][2]
+        for number, block_hash, parent in headers:
+            if parent != expected_parent:
+                return 0  # Reorged between calls; the next poll's reconcile sorts it out.
+            expected_parent = block_hash
+
+        logs = bsa.rpc_request(
+            self.rpc_url,
+            "eth_getLogs",
+            [{"fromBlock": hex(first), "toBlock": hex(last), "address": self.addresses}],
+        )
+        by_block: dict[int, list[dict[str, Any]]] = {n: [] for n in numbers}
+        hashes = {n: h for n, h, _ in headers}
+        for log in logs or []:
+            n = int(log["blockNumber"], 16)
+            if log.get("removed") or hashes.get(n) != log.get("blockHash"):
+                return 0  # Logs from another branch than the headers: retry next poll.
+            by_block[n].append(log)
+
+        for number, block_hash, parent in headers:
+            self.index.apply(number, by_block[number])
+            finalized = self.store.append(number, block_hash, parent)
+            if finalized is not None:
+                self.index.finalize(finalized)
+        return len(headers)
+
+
+def chain_genesis(rpc_url: str) -> str:
+    """Hash of the node's earliest block: the chain a saved state belongs to."""
+    return bsa.rpc_request(rpc_url, "eth_getBlockByNumber", ["earliest", False])["hash"]
+
+
+def load_state(
+    path: Path, finality_depth: int | None = None, index_type: Any = EventIndex, *, genesis: str | None = None
+) -> tuple[CheckpointStore, Any, dict[str, Any]]:
+    """(store, index, whole document); index_type is any ChainIndex class with from_json().
+
+    With genesis (chain_genesis()), a state saved for another chain, or without one, starts fresh.
+    """
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        data = {}
+    if data and genesis is not None and data.get("genesis") != genesis:
+        print(f"  {path}: indexed from another chain, starting fresh")
+        data = {}
+    if not data:
+        return CheckpointStore(finality_depth or FINALITY_DEPTH), index_type(), {}
+    store = CheckpointStore.from_json(data.get("checkpoints") or {}, finality_depth)
+    return store, index_type.from_json(data.get("index") or {}), data
+
+
+def save_state(
+    path: Path, store: CheckpointStore, index: ChainIndex, *, genesis: str | None = None, **extra: Any
+) -> None:
+    doc = {"schema_version": 1, "genesis": genesis, **extra, "checkpoints": store.to_json(), "index": index.to_json()}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(doc, indent=1) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def verify(rpc_url: str, addresses: list[str], store: CheckpointStore, index: EventIndex, start: int) -> list[str]:
+    """Differences between the index and the node's canonical logs for start..tip (empty = consistent)."""
+    tip = store.tip
+    if tip is None:
+        return []
+    expected: dict[str, int] = {}
+    for log in bsa.rpc_request(rpc_url, "eth_getLogs",
+                               [{"fromBlock": hex(start), "toBlock": hex(tip[0]), "address": addresses}]) or []:
+        k = EventIndex._key(log)
+        expected[k] = expected.get(k, 0) + 1
+    got = index.totals()
+    diffs = [f"{k}: index {got.get(k, 0)}, node {expected.get(k, 0)}"
+             for k in sorted(set(expected) | set(got)) if got.get(k, 0) != expected.get(k, 0)]
+    if (bsa.rpc_request(rpc_url, "eth_getBlockByNumber", [hex(tip[0]), False]) or {}).get("hash") != tip[1]:
+        diffs.append(f"tip {tip[0]} is no longer canonical")
+    return diffs
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--state", type=Path, default=HERE / ".chain-index.json", help="Checkpoint + index file")
+    ap.add_argument("--finality", type=int, default=None, help=f"Blocks kept reorg-able (default {FINALITY_DEPTH})")
+    ap.add_argument("--from-block", type=int, help="First block on a fresh state (default: the current head)")
+    ap.add_argument("--interval", type=float, default=12.0, help="Seconds between polls")
+    ap.add_argument("--polls", type=int, help="Stop after this many polls (default: run forever)")
+    ap.add_argument("--verify", action="store_true", help="On exit, compare the index with the node's logs")
+    args = ap.parse_args()
+
+    rpc_url = bsa.pick_working_rpc(bsa.resolve_rpc_urls())
+    addresses = sorted(watched_addresses(list(bsa.REGISTRY.values())))
+    genesis = chain_genesis(rpc_url)
+    store, index, saved = load_state(args.state, args.finality, genesis=genesis)
+    start = saved.get("start_block")
+    if start is None:
+        start = args.from_block if args.from_block is not None else bsa.block_number(rpc_url)
+    indexer = Indexer(rpc_url, addresses, store, index)
+    print(f"Indexing {len(addresses)} contracts via {rpc_url} from block {store.tip[0] + 1 if store.tip else start}")
+
+    polls = 0
+    try:
+        while args.polls is None or polls < args.polls:
+            try:
+                applied = indexer.poll(start)
+            except ReorgTooDeep as e:
+                print(f"Error: {e}; delete {args.state} to rescan from --from-block")
+                return 1
+            except (OSError, ValueError, RuntimeError) as e:
+                print(f"  poll failed: {type(e).__name__}: {e}")
+                applied = 0
+            if applied:
+                save_state(args.state, store, index, genesis=genesis, start_block=start)
+            polls += 1
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    save_state(args.state, store, index, genesis=genesis, start_block=start)
+    tip = store.tip
+    print(f"Tip {tip[0] if tip else '-'}; {len(indexer.reorgs)} reorg(s) handled"
+          + (f" (depths {sorted(indexer.reorgs)})" if indexer.reorgs else ""))
+    if args.verify:
+        # The node keeps mining (and reorging) meanwhile: catch up and compare, a few times if needed.
+        for _ in range(3):
+            indexer.poll(start)
+            diffs = verify(rpc_url, addresses, store, index, start)
+            if not diffs:
+                break
+        for d in diffs:
+            print(f"  MISMATCH {d}")
+        print("Index matches the canonical chain." if not diffs else f"{len(diffs)} mismatch(es).")
+        return 1 if diffs else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Local claims ledger: hardstake ETH distributed, replacing the *_eth_distributed Dune queries.
+
+total_eth_distributed, unique_claimers, avg_claim_eth and max_single_claim
+used to come only from Dune, so every yield / APR figure in the analytics
+was as old as the last monthly Dune run. ClaimsLedger indexes the claim
+events of every registry hardstake contract (CLAIM_TOPIC, i.e.
+RewardPaid(address indexed user, uint256 reward); --topic if a deployment
+emits another event) and keeps running aggregates per token: each claim is
+one add to the total, count and max plus one dict update for the claimer,
+so nothing is ever re-summed.
+
+It is a checkpoints.ChainIndex, driven by the same reorg-safe Indexer: a
+rollback subtracts the orphaned claims again (the max is recomputed from the
+finalized max and the unfinalized window, at most --finality blocks).
+
+A fresh ledger first backfills the finalized history from the earliest
+launch_date in tokens.json (block_times.launch_block) with
+eth_getLogs over BACKFILL_RANGE blocks at a time, filtered on the claim topic
+and halved whenever the node refuses a range; the Indexer then takes over
+from the finalized block. State lives in .claims-ledger.json.
+
+build_staking_analytics.build_payloads(claims=...) publishes the ledger's
+figures instead of the Dune ones and keeps those as
+aggregate_claims_optional.dune_cross_check_optional, but only for a token
+whose ledger saw claims and passes cross_check() against Dune (CLAIM_TOPIC is
+not confirmed for every deployment). Otherwise the Dune figures stay and the
+ledger's go to aggregate_claims_optional.ledger_cross_check_optional with the
+problems found. pipeline.py syncs the ledger in its claims stage before
+analytics.
+
+Usage:
+  python3 claims_ledger.py                    # backfill or catch up, print aggregates
+  python3 claims_ledger.py --check            # ... and compare with Dune (metrics-data.json)
+  python3 claims_ledger.py --follow --interval 12
+  python3 fake_node.py run --history 50000 --touch-rate 0.5 -- python3 claims_ledger.py --verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import build_staking_analytics as bsa
+from block_times import launch_block
+from checkpoints import FINALITY_DEPTH, CheckpointStore, Indexer, ReorgTooDeep, chain_genesis, load_state, save_state
+from token_registry import Token
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_STATE = HERE / ".claims-ledger.json"
+CLAIM_TOPIC = "0xe2403640ba68fed3a2f88b7557551d1993f84b99bb10ff833f0cf8db0c5e0486"  # RewardPaid(address,uint256)
+BACKFILL_RANGE = 10_000
+CROSS_CHECK_TOLERANCE_PCT = 1.0
+CLAIM_FIELDS = ("total_eth_distributed", "unique_claimers", "avg_claim_eth", "max_single_claim")
+WEI = 10**18
+
+
+class Claims:
+    """Running claim aggregates for one hardstake contract (amounts in wei)."""
+
+    def __init__(self) -> None:
+        self.total_wei = 0
+        self.count = 0
+        self.max_wei = 0
+        self.final_max_wei = 0  # max over finalized claims only, what a rollback falls back to
+        self.claimers: dict[str, int] = {}
+
+    def add(self, claimer: str, wei: int) -> None:
+        self.total_wei += wei
+        self.count += 1
+        self.max_wei = max(self.max_wei, wei)
+        self.claimers[claimer] = self.claimers.get(claimer, 0) + 1
+
+    def remove(self, claimer: str, wei: int) -> None:
+        self.total_wei -= wei
+        self.count -= 1
+        left = self.claimers[claimer] - 1
+        if left:
+            self.claimers[claimer] = left
+        else:
+            del self.claimers[claimer]
+
+    def summary(self) -> dict[str, Any]:
+        """The metrics-data.json claim fields, in ETH."""
+        return {
+            "total_eth_distributed": self.total_wei / WEI,
+            "unique_claimers": len(self.claimers),
+            "avg_claim_eth": self.total_wei / self.count / WEI if self.count else None,
+            "max_single_claim": self.max_wei / WEI if self.count else None,
+            "claims": self.count,
+        }
+
+    def to_json(self) -> dict[str, Any]:
+        return {"total_wei": str(self.total_wei), "count": self.count, "max_wei": str(self.max_wei),
+                "final_max_wei": str(self.final_max_wei), "claimers": self.claimers}
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> Claims:
+        c = cls()
+        c.total_wei = int(data.get("total_wei") or 0)
+        c.count = int(data.get("count") or 0)
+        c.max_wei = int(data.get("max_wei") or 0)
+        c.final_max_wei = int(data.get("final_max_wei") or 0)
+        c.claimers = {a: int(n) for a, n in (data.get("claimers") or {}).items()}
+        return c
+
+
+class ClaimsLedger:
+    """ChainIndex of claim events: Claims per token plus the unfinalized claims per block."""
+
+    def __init__(self, contracts: dict[str, str] | None = None, topic: str = CLAIM_TOPIC) -> None:
+        self.contracts = {a.lower(): key for a, key in (contracts or {}).items()}  # hardstake -> token key
+        self.topic = topic.lower()
+        self.claims = {key: Claims() for key in self.contracts.values()}
+        self.recent: dict[int, list[tuple[str, str, int]]] = {}  # block -> (token key, claimer, wei)
+
+    def _claims_in(self, logs: Iterable[dict[str, Any]]) -> Iterator[tuple[str, str, int]]:
+        for log in logs:
+            topics = log.get("topics") or []
+            key = self.contracts.get(str(log.get("address", "")).lower())
+            if key is None or len(topics) < 2 or str(topics[0]).lower() != self.topic or log.get("removed"):
+                continue
+            data = str(log.get("data") or "0x")
+            yield key, "0x" + topics[1][-40:].lower(), int(data[2:66] or "0", 16)
+
+    def apply(self, number: int, logs: list[dict[str, Any]]) -> None:
+        entries = list(self._claims_in(logs))
+        for key, claimer, wei in entries:
+            self.claims[key].add(claimer, wei)
+        if entries:
+            self.recent[number] = entries
+
+    def apply_final(self, logs: list[dict[str, Any]]) -> None:
+        """Claims from blocks already past finality (backfill): nothing to keep for rollback."""
+        for key, claimer, wei in self._claims_in(logs):
+            c = self.claims[key]
+            c.add(claimer, wei)
+            c.final_max_wei = max(c.final_max_wei, wei)
+
+    def rollback(self, to_number: int) -> None:
+        touched = set()
+        for n in sorted((n for n in self.recent if n > to_number), reverse=True):
+            for key, claimer, wei in self.recent.pop(n):
+                self.claims[key].remove(claimer, wei)
+                touched.add(key)
+        for key in touched:
+            c = self.claims[key]
+            c.max_wei = max([c.final_max_wei] + [w for es in self.recent.values() for k, _, w in es if k == key])
+
+    def finalize(self, through_number: int) -> None:
+        for n in [n for n in self.recent if n <= through_number]:
+            for key, _, wei in self.recent.pop(n):
+                c = self.claims[key]
+                c.final_max_wei = max(c.final_max_wei, wei)
+
+    def aggregates(self) -> dict[str, dict[str, Any]]:
+        return {key: c.summary() for key, c in self.claims.items()}
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "topic": self.topic,
+            "contracts": self.contracts,
+            "claims": {key: c.to_json() for key, c in self.claims.items()},
+            "recent": {str(n): [[k, a, str(w)] for k, a, w in es] for n, es in sorted(self.recent.items())},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> ClaimsLedger:
+        ledger = cls(data.get("contracts") or {}, data.get("topic") or CLAIM_TOPIC)
+        for key, c in (data.get("claims") or {}).items():
+            ledger.claims[key] = Claims.from_json(c)
+        ledger.recent = {int(n): [(k, a, int(w)) for k, a, w in es] for n, es in (data.get("recent") or {}).items()}
+        return ledger
+
+
+def backfill(rpc_url: str, ledger: ClaimsLedger, from_block: int, to_block: int, *, max_range: int = BACKFILL_RANGE) -> int:
+    """Apply every claim in from_block..to_block (all finalized). Returns the eth_getLogs calls made."""
+    addresses = sorted(ledger.contracts)
+    n, step, calls = from_block, max_range, 0
+    while n <= to_block:
+        hi = min(to_block, n + step - 1)
+        calls += 1
+        try:
+            logs = bsa.rpc_request(
+                rpc_url,
+                "eth_getLogs",
+                [{"fromBlock": hex(n), "toBlock": hex(hi), "address": addresses, "topics": [ledger.topic]}],
+                timeout=60,
+            )
+        except RuntimeError:
+            # Providers cap the block range or the result count; retry the same start with half the range.
+            if step == 1:
+                raise
+            step = max(1, step // 2)
+            continue
+        ledger.apply_final(logs or [])
+        n = hi + 1
+    return calls
+
+
+def _backfilled(
+    rpc_url: str, tokens: list[Token], topic: str, from_block: int | None, finality: int | None
+) -> tuple[ClaimsLedger, CheckpointStore, dict[str, Any]]:
+    """A new ledger holding every finalized claim since from_block (default: the first launch block)."""
+    store = CheckpointStore(finality or FINALITY_DEPTH)
+    ledger = ClaimsLedger({t.hardstake: t.key for t in tokens}, topic)
+    first = launch_block(rpc_url, tokens)
+    start = from_block if from_block is not None else first
+    final = max(start - 1, bsa.block_number(rpc_url) - store.finality_depth)
+    t0 = time.perf_counter()
+    calls = backfill(rpc_url, ledger, start, final)
+    header = bsa.rpc_request(rpc_url, "eth_getBlockByNumber", [hex(final), False])
+    store.anchor = (final, header["hash"])
+    print(f"  claims ledger: backfilled blocks {start}..{final} with {calls} eth_getLogs call(s) "
+          f"in {time.perf_counter() - t0:.1f}s")
+    return ledger, store, {"start_block": start, "complete": start <= first}
+
+
+def sync(
+    rpc_url: str,
+    path: Path = DEFAULT_STATE,
+    *,
+    tokens: list[Token] | None = None,
+    topic: str = CLAIM_TOPIC,
+    from_block: int | None = None,
+    finality: int | None = None,
+) -> tuple[ClaimsLedger, CheckpointStore, dict[str, Any]]:
+    """Backfill a fresh ledger or catch an existing one up to the head, then save it.
+
+    Returns (ledger, store, extra) where extra holds start_block and complete
+    (False if --from-block started after the first launch, so totals are partial).
+    """
+    tokens = tokens if tokens is not None else list(bsa.REGISTRY.values())
+    contracts = {t.hardstake.lower(): t.key for t in tokens}
+    genesis = chain_genesis(rpc_url)
+    store, ledger, doc = load_state(path, finality, ClaimsLedger, genesis=genesis)
+    extra = {"start_block": doc.get("start_block"), "complete": doc.get("complete", True)}
+    if store.tip is None or ledger.contracts != contracts or ledger.topic != topic.lower():
+        if store.tip is not None:
+            print("  claims ledger: contracts or claim topic changed, rebuilding")
+        ledger, store, extra = _backfilled(rpc_url, tokens, topic, from_block, finality)
+
+    for attempt in (1, 2):
+        indexer = Indexer(rpc_url, sorted(contracts), store, ledger)
+        try:
+            while indexer.poll() == indexer.max_range:
+                pass
+            break
+        except ReorgTooDeep as e:
+            # Nothing stored is canonical any more (or this is another chain): rescanning is a few eth_getLogs.
+            if attempt == 2:
+                raise
+            print(f"  claims ledger: {e}; rebuilding")
+            ledger, store, extra = _backfilled(rpc_url, tokens, topic, extra["start_block"], finality)
+    save_state(path, store, ledger, genesis=genesis, **extra)
+    return ledger, store, extra
+
+
+def published(ledger: ClaimsLedger, store: CheckpointStore, extra: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Per-token claim fields for build_payloads(claims=...); empty if the ledger is partial."""
+    if not extra.get("complete") or store.tip is None:
+        return {}
+    return {key: {**agg, "through_block": store.tip[0]} for key, agg in ledger.aggregates().items()}
+
+
+def load_claims(path: Path = DEFAULT_STATE) -> dict[str, dict[str, Any]]:
+    """published() from the saved state without touching the node ({} if there is none)."""
+    store, ledger, doc = load_state(path, None, ClaimsLedger)
+    return published(ledger, store, {"complete": doc.get("complete", False)})
+
+
+def cross_check(
+    claims: dict[str, dict[str, Any]], md: dict[str, Any], tolerance_pct: float = CROSS_CHECK_TOLERANCE_PCT
+) -> list[str]:
+    """Ledger figures that fall short of metrics-data.json's Dune ones (empty = consistent).
+
+    Dune lags by up to a month, so the ledger being ahead is expected. Being
+    behind by more than tolerance_pct means claims the ledger does not see
+    (another claim event, a gap in the history).
+    """
+    problems = []
+    for key, agg in sorted(claims.items()):
+        dune = md.get(key) or {}
+        for field in ("total_eth_distributed", "unique_claimers"):
+            try:
+                theirs = float(dune[field])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if agg[field] < theirs * (1 - tolerance_pct / 100):
+                problems.append(f"{key}.{field}: ledger {agg[field]:g} < Dune {theirs:g}")
+    return problems
+
+
+def verify(rpc_url: str, ledger: ClaimsLedger, store: CheckpointStore, start: int) -> list[str]:
+    """Differences between the ledger and a from-scratch rescan of start..tip (empty = consistent)."""
+    if store.tip is None:
+        return []
+    fresh = ClaimsLedger(ledger.contracts, ledger.topic)
+    backfill(rpc_url, fresh, start, store.tip[0])
+    diffs = []
+    for key, c in ledger.claims.items():
+        f = fresh.claims[key]
+        for name in ("total_wei", "count", "max_wei"):
+            if getattr(c, name) != getattr(f, name):
+                diffs.append(f"{key}.{name}: ledger {getattr(c, name)}, rescan {getattr(f, name)}")
+        if c.claimers != f.claimers:
+            diffs.append(f"{key}.claimers: ledger {len(c.claimers)}, rescan {len(f.claimers)}")
+    return diffs
+
+
+def _print(claims: dict[str, dict[str, Any]], ledger: ClaimsLedger, store: CheckpointStore) -> None:
+    tip = store.tip[0] if store.tip else "-"
+    for key, agg in (claims or ledger.aggregates()).items():
+        avg, top = agg["avg_claim_eth"], agg["max_single_claim"]
+        print(f"  {key:<8} {agg['total_eth_distributed']:.6f} ETH in {agg['claims']} claim(s) by "
+              f"{agg['unique_claimers']} wallet(s); avg {avg or 0:.6f}, max {top or 0:.6f} (through block {tip})")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--state", type=Path, default=DEFAULT_STATE, help="Ledger + checkpoint file")
+    ap.add_argument("--topic", default=CLAIM_TOPIC, help="topic0 of the hardstake claim event")
+    ap.add_argument("--from-block", type=int, help="Backfill start on a fresh ledger (default: first launch block)")
+    ap.add_argument("--finality", type=int, default=None, help=f"Blocks kept reorg-able (default {FINALITY_DEPTH})")
+    ap.add_argument("--follow", action="store_true", help="Keep polling for new claims")
+    ap.add_argument("--interval", type=float, default=12.0, help="Seconds between --follow polls")
+    ap.add_argument("--check", action="store_true", help="Compare with the Dune figures in metrics-data.json")
+    ap.add_argument("--metrics", type=Path, default=HERE / "metrics-data.json")
+    ap.add_argument("--tolerance", type=float, default=CROSS_CHECK_TOLERANCE_PCT, help="--check tolerance, %%")
+    ap.add_argument("--verify", action="store_true", help="Rescan the indexed range and compare (slow on mainnet)")
+    args = ap.parse_args()
+
+    rpc_url = bsa.pick_working_rpc(bsa.resolve_rpc_urls())
+    print(f"Claims ledger via {rpc_url}")
+    ledger, store, extra = sync(rpc_url, args.state, topic=args.topic, from_block=args.from_block,
+                                finality=args.finality)
+    try:
+        while args.follow:
+            time.sleep(args.interval)
+            ledger, store, extra = sync(rpc_url, args.state, topic=args.topic, finality=args.finality)
+    except KeyboardInterrupt:
+        pass
+    claims = published(ledger, store, extra)
+    if not claims:
+        print(f"  partial ledger (from block {extra['start_block']}): not published to the analytics")
+    _print(claims, ledger, store)
+
+    status = 0
+    if args.check:
+        try:
+            md = json.loads(args.metrics.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: cannot read {args.metrics}: {e}")
+            return 1
+        for key, agg in sorted((claims or ledger.aggregates()).items()):
+            dune = md.get(key) or {}
+            print(f"  {key:<8} Dune {dune.get('total_eth_distributed')} ETH / {dune.get('unique_claimers')} claimers"
+                  f" vs ledger {agg['total_eth_distributed']:.6f} / {agg['unique_claimers']}")
+        problems = cross_check(claims or ledger.aggregates(), md, args.tolerance)
+        for p in problems:
+            print(f"  MISMATCH {p}")
+        print("Ledger covers the Dune figures." if not problems else f"{len(problems)} mismatch(es).")
+        status = 1 if problems else status
+    if args.verify:
+        diffs = verify(rpc_url, ledger, store, extra["start_block"])
+        for d in diffs:
+            print(f"  MISMATCH {d}")
+        print("Ledger matches a full rescan." if not diffs else f"{len(diffs)} mismatch(es).")
+        status = 1 if diffs else status
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
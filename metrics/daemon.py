@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Long-running metrics refresh: every source on its own schedule, connections kept warm.
+
+Cron used to start fetch_metrics.py from scratch (hourly --market-only, monthly
+full run), paying interpreter start-up, .env parsing, RPC endpoint discovery
+and cold TLS connections each time. This process stays up and keeps them: the
+requests session (fetch_metrics._get), the JSON-RPC keep-alive pool and chosen
+endpoint (build_staking_analytics) and the stage cache (pipeline.py).
+
+Sources (run one at a time, so two refreshes never write the same files):
+
+  market   every --market-every seconds: market context into metrics-data.json,
+           then the pages re-render.
+  onchain  polls eth_blockNumber every --block-poll seconds; once the head is
+           --blocks past the last build, catches up the claims ledger and
+           rebuilds the on-chain reads and staking analytics
+           (pipeline.py --from onchain, plus the claims stage).
+  dune     polls each query's latest execution id every --dune-poll seconds;
+           when one changed, refetches Dune and rebuilds everything downstream.
+           Needs DUNE_API_KEY.
+
+Each delay is spread by +/- --jitter of itself. A failed run is retried after
+--retry-base seconds, doubling per consecutive failure up to --max-backoff.
+Outputs are written atomically (delta.write_json, page render, stage cache).
+
+daemon-status.json (not committed) is rewritten after every run: per source the
+last success / attempt, last error, consecutive failures, next run and the
+marker last built (block number, execution ids). It is read back on start-up,
+so a restart neither refetches unchanged Dune results nor runs early.
+
+Usage:
+  python3 daemon.py                        # until SIGTERM / Ctrl-C
+  python3 daemon.py --once                 # one pass over every source, then exit
+  python3 daemon.py --sources market,onchain
+  python3 fetch_metrics.py --daemon [...]  # same
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import build_staking_analytics as bsa
+import delta
+import dune_queries
+import fetch_metrics as fm
+import pipeline
+import tracing
+
+HERE = Path(__file__).resolve().parent
+STATUS_PATH = HERE / "daemon-status.json"
+
+MARKET_EVERY_S = 3600
+BLOCK_POLL_S = 120
+BLOCKS_PER_BUILD = 300  # ~1 h of 12 s blocks
+DUNE_POLL_S = 6 * 3600
+JITTER = 0.1
+RETRY_BASE_S = 60
+MAX_BACKOFF_S = 3600
+
+
+def _utc(ts: float | None) -> str | None:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_utc(value: Any) -> float | None:
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class Source:
+    name: str
+    interval_s: float
+    refresh: Callable[[Any], None]
+    # (marker last built) -> (due, marker now). None: due on every interval.
+    probe: Callable[[Any], tuple[bool, Any]] | None = None
+    marker: Any = None
+    next_run: float = 0.0
+    failures: int = 0
+    status: dict[str, Any] = field(default_factory=dict)
+
+
+class Daemon:
+    def __init__(
+        self,
+        sources: list[Source],
+        *,
+        cfg: pipeline.PipelineConfig,
+        status_path: Path = STATUS_PATH,
+        jitter: float = JITTER,
+        retry_base_s: float = RETRY_BASE_S,
+        max_backoff_s: float = MAX_BACKOFF_S,
+    ) -> None:
+        self.sources = sources
+        self.cfg = cfg
+        self.status_path = status_path
+        self.jitter = jitter
+        self.retry_base_s = retry_base_s
+        self.max_backoff_s = max_backoff_s
+        self.stop = threading.Event()
+        self.started = time.time()
+        self._restore()
+
+    def _restore(self) -> None:
+        """Pick up markers and schedule from the previous process's status file."""
+        try:
+            saved = json.loads(self.status_path.read_text(encoding="utf-8")).get("sources") or {}
+        except (FileNotFoundError, ValueError, AttributeError):
+            return
+        for src in self.sources:
+            prev = saved.get(src.name)
+            if not isinstance(prev, dict):
+                continue
+            src.status = {k: v for k, v in prev.items() if k != "next_run_utc"}
+            src.marker = prev.get("marker")
+            src.failures = int(prev.get("consecutive_failures") or 0)
+            src.next_run = _parse_utc(prev.get("next_run_utc")) or 0.0
+
+    def _delay(self, base: float) -> float:
+        return max(1.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def run_source(self, src: Source) -> None:
+        t0 = time.time()
+        src.status["last_attempt_utc"] = _utc(t0)
+        try:
+            due, marker = src.probe(src.marker) if src.probe else (True, None)
+            if due:
+                print(f"\n=== DAEMON {src.name} ({_utc(t0)}) ===")
+                tracing.start(f"daemon-{src.name}")
+                try:
+                    src.refresh(marker)
+                finally:
+                    tracing.write_report(self.cfg.report_dir)  # no-op if run_pipeline already wrote it
+                src.marker = marker
+                src.status.update(
+                    last_success_utc=_utc(time.time()),
+                    last_duration_s=round(time.time() - t0, 2),
+                    runs=int(src.status.get("runs") or 0) + 1,
+                )
+            src.failures = 0
+            src.status["last_error"] = None
+            delay = src.interval_s
+        except Exception as e:  # noqa: BLE001 - one failing source must not stop the others
+            src.failures += 1
+            src.status["last_error"] = f"{type(e).__name__}: {e}"[:500]
+            print(f"  daemon {src.name} failed ({src.failures}x): {src.status['last_error']}")
+            if src.name == "onchain":
+                bsa.forget_rpc()
+            delay = min(self.max_backoff_s, self.retry_base_s * 2 ** (src.failures - 1))
+        src.status["consecutive_failures"] = src.failures
+        if src.probe:
+            src.status["marker"] = src.marker
+        src.next_run = time.time() + self._delay(delay)
+        self.write_status()
+
+    def write_status(self) -> None:
+        doc = {
+            "pid": os.getpid(),
+            "started_utc": _utc(self.started),
+            "updated_utc": _utc(time.time()),
+            "sources": {s.name: {**s.status, "next_run_utc": _utc(s.next_run)} for s in self.sources},
+        }
+        tmp = self.status_path.with_name(self.status_path.name + ".tmp")
+        tmp.write_text(json.dumps(doc, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, self.status_path)
+
+    def run(self, *, once: bool = False) -> None:
+        if once:
+            for src in self.sources:
+                self.run_source(src)
+            return
+        while not self.stop.is_set():
+            now = time.time()
+            for src in sorted(self.sources, key=lambda s: s.next_run):
+                if self.stop.is_set():
+                    break
+                if src.next_run <= now:
+                    self.run_source(src)
+            self.stop.wait(max(0.0, min(s.next_run for s in self.sources) - time.time()))
+
+
+# =============================================================================
+# SOURCES
+# =============================================================================
+
+def _check(result: pipeline.RunResult) -> None:
+    if result.failed:
+        raise RuntimeError("; ".join(f"{k}: {v}" for k, v in result.failed.items()))
+
+
+def market_source(cfg: pipeline.PipelineConfig, every_s: float) -> Source:
+    def refresh(_: Any) -> None:
+        metrics = fm.load_existing(str(cfg.metrics_path))
+        if not metrics:
+            raise RuntimeError(f"{cfg.metrics_path} missing - the dune source builds it first")
+        market = pipeline.stage_market(cfg)
+        fm.with_market_context(metrics, market)
+        delta.write_json(cfg.metrics_path, metrics)
+        # Later onchain / dune runs take market + metrics_data from the stage cache.
+        pipeline.save_cached(cfg, "market", market)
+        pipeline.save_cached(cfg, "metrics_data", metrics)
+        pipeline.stage_render(cfg, metrics, None)
+
+    return Source("market", every_s, refresh)
+
+
+def onchain_source(cfg: pipeline.PipelineConfig, poll_s: float, blocks: int) -> Source:
+    def probe(last: Any) -> tuple[bool, int]:
+        head = bsa.block_number(bsa.pick_working_rpc(list(cfg.rpc_urls)))
+        return (not isinstance(last, int) or head - last >= blocks), head
+
+    def refresh(_: Any) -> None:
+        # New blocks can carry claims too: catch the claims ledger up in the same run.
+        _check(pipeline.run_pipeline(sorted(pipeline.downstream("onchain") | {"claims"}), cfg=cfg))
+
+    return Source("onchain", poll_s, refresh, probe)
+
+
+def dune_source(cfg: pipeline.PipelineConfig, poll_s: float) -> Source:
+    # Only the queries a fetch reads: merged ones stand in for their per-token variants.
+    query_ids = sorted(set(dune_queries.in_use(fm.QUERIES).values()))
+
+    def probe(last: Any) -> tuple[bool, dict[str, str]]:
+        last = last if isinstance(last, dict) else {}
+        seen = {q: fm.fetch_execution_id(q) for q in query_ids}
+        if not any(seen.values()):
+            raise RuntimeError("no Dune execution id could be read")
+        # A query whose check failed keeps its previous id rather than forcing a refetch.
+        now = {q: seen[q] or last.get(q) for q in query_ids}
+        return now != last, now
+
+    def refresh(_: Any) -> None:
+        only = sorted(pipeline.downstream("dune_merged"))
+        _check(pipeline.run_pipeline(only, cfg=cfg))
+
+    return Source("dune", poll_s, refresh, probe)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sources", default="market,onchain,dune", help="Comma-separated sources to schedule")
+    ap.add_argument("--once", action="store_true", help="Run every source once and exit")
+    ap.add_argument("--market-every", type=float, default=MARKET_EVERY_S, help="Seconds between market refreshes")
+    ap.add_argument("--block-poll", type=float, default=BLOCK_POLL_S, help="Seconds between block-height checks")
+    ap.add_argument("--blocks", type=int, default=BLOCKS_PER_BUILD, help="New blocks that trigger an on-chain rebuild")
+    ap.add_argument("--dune-poll", type=float, default=DUNE_POLL_S, help="Seconds between Dune execution checks")
+    ap.add_argument("--jitter", type=float, default=JITTER, help="Random spread, as a fraction of each delay")
+    ap.add_argument("--retry-base", type=float, default=RETRY_BASE_S, help="First retry delay after a failure")
+    ap.add_argument("--max-backoff", type=float, default=MAX_BACKOFF_S, help="Longest retry delay")
+    ap.add_argument("--status", type=Path, default=STATUS_PATH, help="Health/status file")
+    args = ap.parse_args(argv)
+
+    cfg = pipeline.PipelineConfig()
+    factories: dict[str, Callable[[], Source]] = {
+        "market": lambda: market_source(cfg, args.market_every),
+        "onchain": lambda: onchain_source(cfg, args.block_poll, args.blocks),
+        "dune": lambda: dune_source(cfg, args.dune_poll),
+    }
+    names = [n.strip() for n in args.sources.split(",") if n.strip()]
+    unknown = [n for n in names if n not in factories]
+    if unknown:
+        ap.error(f"unknown source(s): {', '.join(unknown)}")
+    if "dune" in names and not fm.API_KEY:
+        print("DUNE_API_KEY not set - dune source disabled")
+        names.remove("dune")
+    if not names:
+        return 1
+
+    daemon = Daemon(
+        [factories[n]() for n in names],
+        cfg=cfg,
+        status_path=args.status,
+        jitter=args.jitter,
+        retry_base_s=args.retry_base,
+        max_backoff_s=args.max_backoff,
+    )
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: daemon.stop.set())
+    print(f"Metrics daemon: {', '.join(names)} (status: {args.status})")
+    daemon.run(once=args.once)
+    print("Metrics daemon stopped.")
+    return 1 if any(s.failures for s in daemon.sources) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Delta publishing for the public metrics JSON (staking_analytics.json, metrics-data.json).
+
+Every writer goes through write_json(). Besides the full file it emits:
+
+  versions.json                       tiny index, always fetched fresh by clients
+  deltas/<stem>.<from-version>.json   RFC 6902 JSON Patch: previous snapshot -> this one
+
+A version is the first 16 hex chars of sha256 over the exact bytes published.
+Deltas form a chain (v1 -> v2 -> ... -> current) of at most MAX_CHAIN links,
+so a client a few refreshes behind still only downloads patches:
+
+  {
+    "schema_version": 1,
+    "files": {
+      "staking_analytics.json": {
+        "version": "3f0c9a...", "bytes": 6581, "updated_utc": "...",
+        "deltas": {"<from>": {"to": "<version>", "url": "deltas/staking_analytics.<from>.json", "bytes": 412}}
+      }
+    }
+  }
+
+js/versioned-json.js follows the chain from the version it has cached and
+falls back to the full file whenever a link is missing, a patch fails to
+apply, or the chain would cost more bytes than the full document. The full
+file is always written, so plain fetches keep working.
+
+Show what the index currently offers:
+  python3 delta.py
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+HERE = Path(__file__).resolve().parent
+INDEX_NAME = "versions.json"
+DELTA_DIR = "deltas"
+MAX_CHAIN = 8
+
+_MISSING = object()
+
+
+def version_of(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+# =============================================================================
+# JSON PATCH (RFC 6902 subset: add / remove / replace)
+# =============================================================================
+
+def _pointer(path: str, key: str | int) -> str:
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def diff(old: Any, new: Any, path: str = "") -> list[dict[str, Any]]:
+    """Patch ops turning old into new. Objects are diffed per key; arrays per
+    index when the length is unchanged, otherwise replaced whole."""
+    if type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    if isinstance(old, dict):
+        ops: list[dict[str, Any]] = []
+        for k in old:
+            if k not in new:
+                ops.append({"op": "remove", "path": _pointer(path, k)})
+        for k, v in new.items():
+            if k not in old:
+                ops.append({"op": "add", "path": _pointer(path, k), "value": v})
+            elif old[k] != v:
+                ops += diff(old[k], v, _pointer(path, k))
+        return ops
+    if isinstance(old, list):
+        if len(old) != len(new):
+            return [{"op": "replace", "path": path, "value": new}]
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            if a != b:
+                ops += diff(a, b, _pointer(path, i))
+        return ops
+    return [] if old == new else [{"op": "replace", "path": path, "value": new}]
+
+
+def _parts(path: str) -> list[str]:
+    return [p.replace("~1", "/").replace("~0", "~") for p in path.split("/")[1:]]
+
+
+def apply_patch(doc: Any, patch: list[dict[str, Any]]) -> Any:
+    """Apply ops to a deep copy of doc. Raises KeyError / IndexError / ValueError on a bad patch."""
+    doc = copy.deepcopy(doc)
+    for op in patch:
+        parts = _parts(op["path"])
+        if not parts:
+            if op["op"] == "remove":
+                raise ValueError("cannot remove the document root")
+            doc = copy.deepcopy(op["value"])
+            continue
+        parent = doc
+        for p in parts[:-1]:
+            parent = parent[int(p)] if isinstance(parent, list) else parent[p]
+        last: Any = int(parts[-1]) if isinstance(parent, list) else parts[-1]
+        if op["op"] == "remove":
+            del parent[last]
+        elif op["op"] == "replace":
+            if isinstance(parent, dict) and last not in parent:
+                raise KeyError(op["path"])
+            parent[last] = copy.deepcopy(op["value"])
+        elif op["op"] == "add":
+            if isinstance(parent, list):
+                parent.insert(last, copy.deepcopy(op["value"]))
+            else:
+                parent[last] = copy.deepcopy(op["value"])
+        else:
+            raise ValueError(f"unsupported op {op['op']!r}")
+    return doc
+
+
+# =============================================================================
+# PUBLISH
+# =============================================================================
+
+def _atomic_write(path: Path, raw: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(raw)
+    os.replace(tmp, path)
+
+
+def load_index(out_dir: Path) -> dict[str, Any]:
+    try:
+        idx = json.loads((out_dir / INDEX_NAME).read_bytes())
+        if isinstance(idx.get("files"), dict):
+            return idx
+    except (FileNotFoundError, ValueError):
+        pass
+    return {"schema_version": 1, "files": {}}
+
+
+def _prune(out_dir: Path, stem: str, keep: dict[str, Any]) -> None:
+    wanted = {(out_dir / d["url"]).name for d in keep.values()}
+    # Exactly <stem>.<version>.json: a glob would also take staking_analytics.vista.<v>.json for "staking_analytics".
+    ours = re.compile(rf"^{re.escape(stem)}\.[0-9a-f]{{16}}\.json$")
+    for f in (out_dir / DELTA_DIR).glob(f"{stem}.*.json"):
+        if ours.match(f.name) and f.name not in wanted:
+            f.unlink()
+
+
+def write_json(path: Path, data: Any, text: str | None = None) -> str:
+    """Publish data to path (atomically) plus its delta from the file being replaced.
+
+    text is the exact serialization to write; defaults to json.dumps(data, indent=2).
+    Returns the new version.
+    """
+    path = Path(path)
+    raw = (text if text is not None else json.dumps(data, indent=2)).encode("utf-8")
+    out_dir = path.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        old_raw = path.read_bytes()
+        old: Any = json.loads(old_raw)
+    except (FileNotFoundError, ValueError):
+        old_raw, old = None, _MISSING
+
+    _atomic_write(path, raw)
+
+    idx = load_index(out_dir)
+    entry = idx["files"].get(path.name) or {}
+    new_version = version_of(raw)
+    old_version = version_of(old_raw) if old_raw is not None else None
+    # If the file was replaced outside write_json, the recorded chain ends at a version no client gets.
+    chain: dict[str, Any] = dict(entry.get("deltas") or {}) if entry.get("version") == old_version else {}
+
+    if old_version != new_version:
+        patch = None
+        if old is not _MISSING:
+            # Round-trip through JSON so the patch is checked against exactly what clients parse.
+            new_parsed = json.loads(raw)
+            patch = diff(old, new_parsed)
+            if apply_patch(old, patch) != new_parsed:
+                patch = None
+        body = None
+        if patch is not None:
+            body = json.dumps(
+                {"file": path.name, "from": old_version, "to": new_version, "patch": patch},
+                separators=(",", ":"),
+            ).encode("utf-8")
+        if body is not None and len(body) < len(raw) and old_version is not None:
+            (out_dir / DELTA_DIR).mkdir(exist_ok=True)
+            rel = f"{DELTA_DIR}/{path.stem}.{old_version}.json"
+            _atomic_write(out_dir / rel, body)
+            chain.pop(new_version, None)  # A revert would otherwise make a cycle.
+            chain.pop(old_version, None)
+            chain[old_version] = {"to": new_version, "url": rel, "bytes": len(body)}
+            chain = dict(list(chain.items())[-MAX_CHAIN:])
+        else:
+            # Without a link into the new version the old chain only leads to dead ends.
+            chain = {}
+
+    idx["files"][path.name] = {
+        "version": new_version,
+        "bytes": len(raw),
+        "updated_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "deltas": chain,
+    }
+    _prune(out_dir, path.stem, chain)
+    _atomic_write(out_dir / INDEX_NAME, (json.dumps(idx, indent=2) + "\n").encode("utf-8"))
+    return new_version
+
+
+def main() -> int:
+    out_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else HERE
+    idx = load_index(out_dir)
+    if not idx["files"]:
+        print(f"No {INDEX_NAME} in {out_dir}")
+        return 1
+    for name, entry in sorted(idx["files"].items()):
+        print(f"{name:<28} {entry['version']}  {entry['bytes']:>8,} bytes  {entry['updated_utc']}")
+        for frm, link in entry["deltas"].items():
+            print(f"  {frm} -> {link['to']}  {link['bytes']:>8,} bytes  {link['url']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
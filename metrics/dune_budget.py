@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Dune credit and rate budget: which queries a refresh executes, reads, reuses or skips.
+
+Every metric fetch_metrics reads from Dune has a cost class (the engine its
+execution needs) and a priority (METRICS): 1 for the hero staking metrics,
+2 for holder concentration and distributions, 3 for Tier 3 (1K+ holders,
+Nakamoto). Before the first Dune call of a run, plan() gives each query in
+use one decision within the run's credit budget (DUNE_CREDITS_PER_RUN):
+
+  execute  its last execution is older than the metric's max age: re-run it
+           (ENGINE_CREDITS) and read the new result
+  read     read the latest stored result (READ_CREDITS_PER_1K datapoints,
+           estimated from the last read)
+  cache    reuse the rows read on an earlier run (.dune-budget.json): read
+           recently enough, or nothing else is affordable
+  skip     nothing affordable and nothing cached; the metric stays null
+
+Every query first gets a current result (read or cache), highest priority
+first. The credits left then re-run stale queries, highest priority and
+stalest first, so they keep the hero metrics fresh before anything else.
+A failed execution is not charged and falls back to a read of the latest
+stored result; a failed read falls back to the cached rows.
+
+Every Dune request in the process (fetch_metrics, dune_queries / setup_queries,
+the daemon's execution checks) takes a slot from one sliding-window limiter
+(DUNE_CALLS_PER_MINUTE). A 429 pauses all of them for its Retry-After.
+
+.dune-budget.json keeps, per query id, the last rows read, when they were
+read and when Dune executed them. It also holds the spend of the last runs
+(credits, executions, reads, cache hits, skips, failures). Each decision is also
+a "dune" event in the run report (tracing.py).
+
+Credit figures are estimates from Dune's published pricing. Set them to match
+the plan in use.
+
+Usage:
+  python3 dune_budget.py                 # the plan the next refresh would follow + recent spend
+  python3 dune_budget.py --credits 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import tracing
+
+HERE = Path(__file__).resolve().parent
+STATE_PATH = HERE / ".dune-budget.json"
+KEEP_RUNS = 50
+
+DEFAULT_CREDITS_PER_RUN = 60.0
+DEFAULT_CALLS_PER_MINUTE = 40
+ENGINE_CREDITS = {"medium": 10.0, "large": 20.0}
+READ_CREDITS_PER_1K = 1.0
+# A result read more recently than max_age / READS_PER_MAX_AGE is served from the cache.
+READS_PER_MAX_AGE = 4
+
+
+@dataclass(frozen=True)
+class Metric:
+    cost_class: str
+    priority: int
+    max_age_h: float
+
+
+METRICS: dict[str, Metric] = {
+    "staker_retention": Metric("medium", 1, 24),
+    "diamond_hands": Metric("medium", 1, 24),
+    "tenure": Metric("medium", 1, 24),
+    "weekly_trend": Metric("medium", 1, 24),
+    "eth_distributed": Metric("medium", 1, 24),
+    "hhi": Metric("large", 2, 72),
+    "lp_distributed": Metric("medium", 2, 72),
+    "all_distributions": Metric("large", 2, 72),
+    "1k_holders": Metric("large", 3, 168),
+    "nakamoto": Metric("large", 3, 168),
+}
+UNKNOWN = Metric("large", 3, 168)
+
+
+def metric(key: str) -> Metric:
+    """METRICS entry for a QUERIES key ("bonzi_tenure", "merged_tenure")."""
+    return METRICS.get(key.partition("_")[2], UNKNOWN)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name) or default)
+    except ValueError:
+        return default
+
+
+def _parse_ts(ts: str | None) -> float | None:
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00").replace(" UTC", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# =============================================================================
+# RATE
+# =============================================================================
+
+class RateLimiter:
+    """At most `per_minute` calls in any 60 s window, shared by every thread; pause() holds all of them."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.per_minute = max(1, per_minute)
+        self._calls: deque[float] = deque()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a call may go out; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= 60:
+                    self._calls.popleft()
+                delay = self._paused_until - now
+                if delay <= 0 and len(self._calls) < self.per_minute:
+                    self._calls.append(now)
+                    return waited
+                if delay <= 0:
+                    delay = 60 - (now - self._calls[0])
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+RATE = RateLimiter(int(_env_float("DUNE_CALLS_PER_MINUTE", DEFAULT_CALLS_PER_MINUTE)))
+
+
+# =============================================================================
+# LEDGER
+# =============================================================================
+
+def load_state(path: Path = STATE_PATH) -> dict[str, Any]:
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        state = {}
+    state.setdefault("queries", {})
+    state.setdefault("runs", [])
+    return state
+
+
+def save_state(state: dict[str, Any], path: Path = STATE_PATH) -> None:
+    state["runs"] = state["runs"][-KEEP_RUNS:]
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def new_run(run_id: str, budget: float) -> dict[str, Any]:
+    return {
+        "run_id": run_id, "at": _iso(time.time()), "budget": budget, "credits": 0.0,
+        "execute": 0, "read": 0, "cache": 0, "skip": 0, "failed": 0,
+    }
+
+
+def record_run(run: dict[str, Any], path: Path = STATE_PATH) -> None:
+    state = load_state(path)
+    state["runs"].append(run)
+    save_state(state, path)
+
+
+def credits_per_run() -> float:
+    return _env_float("DUNE_CREDITS_PER_RUN", DEFAULT_CREDITS_PER_RUN)
+
+
+def execution_credits(key: str) -> float:
+    return ENGINE_CREDITS.get(metric(key).cost_class, ENGINE_CREDITS["large"])
+
+
+def read_credits(entry: dict[str, Any] | None) -> float:
+    points = (entry or {}).get("datapoints") or 0
+    return max(1.0, math.ceil(points / 1000) * READ_CREDITS_PER_1K)
+
+
+def plan(
+    queries: dict[str, str],
+    state: dict[str, Any],
+    credits: float,
+    now: float | None = None,
+) -> dict[str, tuple[str, float]]:
+    """{key: (decision, credits reserved)} for the queries in use.
+
+    First every query gets a current result (read, or cache if read recently),
+    highest priority first; then stale ones are upgraded to execute, highest
+    priority and stalest first, while credits last.
+    """
+    now = now or time.time()
+
+    def age_h(ts: str | None) -> float:
+        t = _parse_ts(ts)
+        return math.inf if t is None else (now - t) / 3600
+
+    def entry(key: str) -> dict[str, Any]:
+        return state["queries"].get(queries[key]) or {}
+
+    order = sorted(queries, key=lambda k: (metric(k).priority, -age_h(entry(k).get("executed_at")), k))
+    out: dict[str, tuple[str, float]] = {}
+    left = credits
+    for key in order:
+        e = entry(key)
+        cached = e.get("rows") is not None
+        if cached and age_h(e.get("read_at")) < metric(key).max_age_h / READS_PER_MAX_AGE:
+            out[key] = ("cache", 0.0)
+        elif left >= read_credits(e):
+            out[key] = ("read", read_credits(e))
+            left -= read_credits(e)
+        else:
+            out[key] = ("cache", 0.0) if cached else ("skip", 0.0)
+    for key in order:
+        decision, cost = out[key]
+        m = metric(key)
+        if decision == "skip" or age_h(entry(key).get("executed_at")) <= m.max_age_h:
+            continue
+        extra = execution_credits(key) + (0.0 if decision == "read" else read_credits(entry(key)))
+        if left >= extra:
+            out[key] = ("execute", cost + extra)
+            left -= extra
+    return out
+
+
+# =============================================================================
+# SCHEDULER
+# =============================================================================
+
+# (query id, row limit, dict for the body's other fields) -> rows, or None if the read failed
+Reader = Callable[[str, "int | None", dict], "list | None"]
+
+
+class Scheduler:
+    """One run's Dune budget: plans on first use, then serves rows(key) by that plan."""
+
+    def __init__(
+        self,
+        queries: dict[str, str],
+        *,
+        read: Reader,
+        execute: Callable[[str], bool],
+        credits: float | None = None,
+        path: Path = STATE_PATH,
+        run_id: str | None = None,
+    ) -> None:
+        self.queries = {k: q for k, q in queries.items() if q}
+        self.credits = credits_per_run() if credits is None else credits
+        self.path = path
+        self.run_id = run_id
+        self._read = read
+        self._execute = execute
+        self._lock = threading.Lock()
+        self._state = load_state(path)
+        self._plan: dict[str, tuple[str, float]] | None = None
+        self._run = new_run(run_id or f"run-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}", self.credits)
+
+    def plan(self) -> dict[str, tuple[str, float]]:
+        with self._lock:
+            if self._plan is None:
+                self._plan = plan(self.queries, self._state, self.credits)
+                self._state["runs"].append(self._run)
+            return self._plan
+
+    def rows(self, key: str, limit: int | None = None) -> list:
+        qid = self.queries.get(key)
+        if not qid:
+            return []
+        decision, _ = self.plan().get(key, ("read", 0.0))
+        spent = 0.0
+        served = decision
+        rows: list | None = None
+        if decision == "execute":
+            if self._execute(qid):
+                spent += execution_credits(key)
+            else:
+                # Not charged; the read below serves the latest stored result.
+                self._bump("failed")
+                served = "read"
+        if decision in ("execute", "read"):
+            found: dict[str, Any] = {}
+            rows = self._read(qid, limit, found)  # None: the read failed
+            if rows is not None:
+                spent += read_credits({"datapoints": len(rows) * len(rows[0]) if rows else 0})
+                self._remember(key, qid, rows, found)
+            else:
+                self._bump("failed")
+        if rows is None:
+            cached = (self._state["queries"].get(qid) or {}).get("rows")
+            rows = [] if cached is None else cached[:limit]
+            served = "skip" if cached is None else "cache"
+        self._account(key, qid, decision, served, spent)
+        return rows
+
+    def _remember(self, key: str, qid: str, rows: list, found: dict[str, Any]) -> None:
+        with self._lock:
+            self._state["queries"][qid] = {
+                "key": key,
+                "rows": rows,
+                "datapoints": len(rows) * len(rows[0]) if rows else 0,
+                "read_at": _iso(time.time()),
+                "executed_at": found.get("execution_ended_at") or found.get("execution_started_at"),
+            }
+
+    def _bump(self, field: str) -> None:
+        with self._lock:
+            self._run[field] += 1
+
+    def _account(self, key: str, qid: str, decision: str, served: str, spent: float) -> None:
+        with self._lock:
+            self._run[served] += 1
+            self._run["credits"] = round(self._run["credits"] + spent, 2)
+            save_state(self._state, self.path)
+        tracing.record_dune(key, qid, decision, served, spent, metric(key).priority)
+        if served != decision:
+            print(f"  Dune budget: {key} planned {decision}, served from {served}")
+
+
+def main() -> int:
+    import dune_queries
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--credits", type=float, help=f"Credits per run (default: $DUNE_CREDITS_PER_RUN or {DEFAULT_CREDITS_PER_RUN:g})")
+    ap.add_argument("--state", type=Path, default=STATE_PATH)
+    args = ap.parse_args()
+
+    credits = credits_per_run() if args.credits is None else args.credits
+    state = load_state(args.state)
+    queries = dune_queries.in_use(dune_queries.query_ids())
+    p = plan(queries, state, credits)
+    print(f"Plan for {credits:g} credits ({RATE.per_minute} calls/min):")
+    for key, (decision, cost) in sorted(p.items(), key=lambda kv: (metric(kv[0]).priority, kv[0])):
+        entry = state["queries"].get(queries[key]) or {}
+        print(f"  P{metric(key).priority} {key:<28} {decision:<8} {cost:>5g} cr  "
+              f"executed {entry.get('executed_at') or '?'}  read {entry.get('read_at') or 'never'}")
+    print(f"  total {sum(c for _, c in p.values()):g} credits")
+    if state["runs"]:
+        print("\nRecent runs:")
+        for r in state["runs"][-10:]:
+            print(f"  {r['run_id']:<36} {r['credits']:>6g}/{r['budget']:g} cr  exec {r['execute']}  read {r['read']}  "
+                  f"cache {r['cache']}  skip {r['skip']}  failed {r['failed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Dune queries as code: metric SQL templates rendered per token and synced by SQL hash.
+
+Each TEMPLATES entry is the SQL of one metric with $hardstake, $token and
+$launch_date placeholders. It is rendered for every token in tokens.json
+(token_registry, the source of fetch_metrics.CONTRACTS) as "<key>_<name>",
+which is the key fetch_metrics.QUERIES and fetch_token_metrics use.
+
+query_ids.json records, per key, the Dune query id and the sha256 of the SQL
+last pushed to it:
+
+  {"bonzi_tenure": {"query_id": "6591445", "sql_sha256": "9f0c..."}, ...}
+
+--sync is idempotent. A key whose hash matches is left alone. A changed
+template updates its query in place (PATCH /query/{id}), and a new token gets
+its queries created. An entry with no hash (ids made by hand) has its remote
+SQL read once and is adopted if it already matches. Queries with no template
+here (PINNED: their SQL only lives in Dune) are kept as they are.
+
+--merged adds one "merged_<name>" query per template. It is the per-token
+queries under UNION ALL with a leading token column, so every token's rows
+come back from a single execution. That halves executions and credits with
+two tokens. fetch_metrics reads them in the pipeline's dune_merged stage and
+splits the rows by token; the per-token queries stay synced as its fallback.
+--per-token drops them again.
+
+--execute (after --sync, or alone) runs each query fetch_metrics reads, once
+per distinct query id; with --sync alone only queries whose SQL changed run.
+Executions go highest priority first and stop at the dune_budget.py credit
+budget (--credits); every API call shares its rate limit.
+
+Usage:
+  python3 dune_queries.py                            # rendered queries vs query_ids.json (no API calls)
+  python3 dune_queries.py --show tenure --token bonzi
+  python3 dune_queries.py --sync --dry-run
+  python3 dune_queries.py --sync [--merged | --per-token] [--execute]
+
+Requires: DUNE_API_KEY for --sync / --execute (.env is read as in fetch_metrics.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from string import Template as _SqlTemplate
+from typing import Any
+
+import dune_budget
+import token_registry
+from token_registry import Token
+
+HERE = Path(__file__).resolve().parent
+IDS_PATH = HERE / "query_ids.json"
+BASE_URL = "https://api.dune.com/api/v1"
+MERGED = "merged"
+
+# Load from .env if exists
+ENV_FILE = HERE / '.env'
+if ENV_FILE.exists():
+    with open(ENV_FILE) as f:
+        for line in f:
+            if '=' in line and not line.startswith('#'):
+                key, val = line.strip().split('=', 1)
+                os.environ.setdefault(key, val.strip('"\''))
+
+
+@dataclass(frozen=True)
+class Template:
+    name: str
+    title: str
+    sql: str
+    # Ordering of the merged result after the token column (per-token queries order themselves).
+    order_by: str | None = None
+
+
+@dataclass(frozen=True)
+class Query:
+    key: str
+    title: str
+    sql: str
+
+    @property
+    def sha256(self) -> str:
+        return sql_sha256(self.sql)
+
+
+TEMPLATES: dict[str, Template] = {
+    t.name: t
+    for t in (
+        Template("staker_retention", "Staker Retention", '''
+SELECT
+    action,
+    COUNT(DISTINCT wallet) as wallets
+FROM (
+    SELECT
+        "from" as wallet,
+        CASE WHEN bytearray_substring(data,1,4) = 0x666da64f THEN 'staking' ELSE 'exited' END as action,
+        ROW_NUMBER() OVER (PARTITION BY "from" ORDER BY block_time DESC) as rn
+    FROM ethereum.transactions
+    WHERE "to" = $hardstake
+        AND success = true
+        AND block_time > DATE '$launch_date'
+        AND bytearray_substring(data,1,4) IN (0x666da64f, 0x2e1a7d4d)
+)
+WHERE rn = 1
+GROUP BY action
+''', order_by="action"),
+        Template("diamond_hands", "Diamond Hands", '''
+SELECT COUNT(DISTINCT "from") as diamond_hands
+FROM ethereum.transactions t1
+WHERE "to" = $hardstake
+    AND success = true
+    AND block_time > DATE '$launch_date'
+    AND bytearray_substring(data,1,4) = 0x666da64f
+    AND NOT EXISTS (
+        SELECT 1 FROM ethereum.transactions t2
+        WHERE t2."from" = t1."from"
+            AND t2."to" = $hardstake
+            AND t2.block_time > DATE '$launch_date'
+            AND bytearray_substring(t2.data,1,4) = 0x2e1a7d4d
+    )
+'''),
+        Template("tenure", "Tenure", '''
+SELECT
+    ROUND(AVG(DATE_DIFF('day', first_stake, NOW()))) as avg_tenure_days,
+    MAX(DATE_DIFF('day', first_stake, NOW())) as max_tenure_days
+FROM (
+    SELECT "from" as wallet, MIN(block_time) as first_stake
+    FROM ethereum.transactions
+    WHERE "to" = $hardstake
+        AND success = true
+        AND bytearray_substring(data,1,4) = 0x666da64f
+        AND block_time > DATE '$launch_date'
+    GROUP BY 1
+)
+'''),
+        Template("weekly_trend", "Weekly Trend", '''
+SELECT
+    DATE_TRUNC('week', block_time) as week,
+    COUNT(*) FILTER (WHERE bytearray_substring(data,1,4) = 0x666da64f) as stakes,
+    COUNT(*) FILTER (WHERE bytearray_substring(data,1,4) = 0x2e1a7d4d) as unstakes
+FROM ethereum.transactions
+WHERE "to" = $hardstake
+    AND success = true
+    AND block_time > DATE '$launch_date'
+GROUP BY 1
+ORDER BY 1 DESC
+LIMIT 12
+''', order_by="week DESC"),
+        Template("hhi", "HHI (Holder Concentration Index)", '''
+WITH holder_balances AS (
+    SELECT
+        "to" as holder,
+        SUM(CASE WHEN "from" = 0x0000000000000000000000000000000000000000 THEN value ELSE 0 END)
+        - SUM(CASE WHEN "to" = 0x0000000000000000000000000000000000000000 THEN value ELSE 0 END)
+        + SUM(CASE WHEN "to" = holder THEN value ELSE 0 END)
+        - SUM(CASE WHEN "from" = holder THEN value ELSE 0 END) as balance
+    FROM erc20_ethereum.evt_Transfer
+    WHERE contract_address = $token
+    GROUP BY 1
+    HAVING balance > 0
+),
+total AS (
+    SELECT SUM(balance) as total_supply FROM holder_balances
+),
+shares AS (
+    SELECT
+        holder,
+        balance,
+        100.0 * balance / total.total_supply as pct_share
+    FROM holder_balances, total
+)
+SELECT
+    COUNT(*) as total_holders,
+    ROUND(SUM(CASE WHEN rn <= 10 THEN pct_share ELSE 0 END), 2) as top_10_pct,
+    ROUND(SUM(pct_share * pct_share), 0) as hhi_score
+FROM (
+    SELECT *, ROW_NUMBER() OVER (ORDER BY balance DESC) as rn FROM shares
+)
+'''),
+    )
+}
+
+# Metrics whose SQL is maintained in Dune itself (token-specific price constants or
+# not in this repo); their ids in query_ids.json are used as they are.
+PINNED = ("1k_holders", "eth_distributed", "lp_distributed", "all_distributions", "nakamoto")
+
+
+def sql_sha256(sql: str) -> str:
+    return hashlib.sha256(sql.strip().encode("utf-8")).hexdigest()
+
+
+def render(name: str, token: Token) -> Query:
+    t = TEMPLATES[name]
+    sql = _SqlTemplate(t.sql.strip()).substitute(
+        hardstake=token.hardstake.lower(),
+        token=token.token.lower(),
+        launch_date=token.launch_date or "1970-01-01",
+    )
+    return Query(f"{token.key}_{name}", f"{token.symbol} {t.title}", sql)
+
+
+def render_merged(name: str, tokens: list[Token]) -> Query:
+    """Every token's query in one: UNION ALL of the per-token SQL, tagged with a token column."""
+    t = TEMPLATES[name]
+    parts = [f"SELECT '{tok.key}' AS token, q.*\nFROM (\n{render(name, tok).sql}\n) q" for tok in tokens]
+    order = "token" + (f", {t.order_by}" if t.order_by else "")
+    sql = "\nUNION ALL\n".join(parts) + f"\nORDER BY {order}"
+    return Query(f"{MERGED}_{name}", f"{'+'.join(tok.symbol for tok in tokens)} {t.title}", sql)
+
+
+def rendered(tokens: list[Token], merged: bool) -> list[Query]:
+    out = [render(name, tok) for name in TEMPLATES for tok in tokens]
+    if merged:
+        out += [render_merged(name, tokens) for name in TEMPLATES]
+    return out
+
+
+# =============================================================================
+# QUERY IDS (query_ids.json)
+# =============================================================================
+
+def load_state(path: Path = IDS_PATH) -> dict[str, dict[str, Any]]:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    # setup_queries.py used to write bare ids
+    return {k: v if isinstance(v, dict) else {"query_id": str(v), "sql_sha256": None} for k, v in raw.items()}
+
+
+def save_state(state: dict[str, dict[str, Any]], path: Path = IDS_PATH) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(dict(sorted(state.items())), indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def query_ids(path: Path = IDS_PATH) -> dict[str, str]:
+    """fetch_metrics.QUERIES: key -> Dune query id."""
+    return {k: str(e["query_id"]) for k, e in load_state(path).items() if e.get("query_id")}
+
+
+def split_key(key: str) -> tuple[str, str]:
+    """"bonzi_weekly_trend" -> ("bonzi", "weekly_trend"); "merged_tenure" -> ("merged", "tenure")."""
+    prefix, _, name = key.partition("_")
+    return prefix, name
+
+
+def merged_names(queries: dict[str, str]) -> set[str]:
+    return {split_key(k)[1] for k, q in queries.items() if q and split_key(k)[0] == MERGED}
+
+
+def in_use(queries: dict[str, str]) -> dict[str, str]:
+    """The queries a fetch reads: a merged query replaces its per-token variants."""
+    merged = merged_names(queries)
+    return {
+        k: q for k, q in queries.items()
+        if q and (split_key(k)[0] == MERGED or split_key(k)[1] not in merged)
+    }
+
+
+# =============================================================================
+# DUNE API
+# =============================================================================
+
+def _api(method: str, path: str, payload: dict[str, Any] | None = None) -> dict[str, Any]:
+    import requests
+
+    api_key = os.environ.get("DUNE_API_KEY")
+    if not api_key:
+        raise RuntimeError("DUNE_API_KEY not set")
+    dune_budget.RATE.acquire()
+    response = requests.request(method, f"{BASE_URL}{path}", headers={"x-dune-api-key": api_key},
+                                json=payload, timeout=30)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{method} {path}: HTTP {response.status_code}: {response.text[:200]}")
+    return response.json()
+
+
+def create_query(query: Query) -> str:
+    res = _api("POST", "/query", {"name": query.title, "query_sql": query.sql, "is_private": False})
+    return str(res["query_id"])
+
+
+def update_query(query_id: str, query: Query) -> None:
+    _api("PATCH", f"/query/{query_id}", {"name": query.title, "query_sql": query.sql})
+
+
+def remote_sql(query_id: str) -> str:
+    return _api("GET", f"/query/{query_id}").get("query_sql") or ""
+
+
+def execute_query(query_id: str) -> str | None:
+    return _api("POST", f"/query/{query_id}/execute").get("execution_id")
+
+
+# =============================================================================
+# SYNC
+# =============================================================================
+
+def sync(
+    state: dict[str, dict[str, Any]],
+    queries: list[Query],
+    *,
+    dry_run: bool = False,
+) -> dict[str, str]:
+    """Bring Dune in line with the rendered queries; {key: action}. `state` is updated in place."""
+    actions: dict[str, str] = {}
+    for q in queries:
+        entry = state.get(q.key) or {}
+        qid = entry.get("query_id")
+        sha = q.sha256
+        if qid and entry.get("sql_sha256") == sha:
+            actions[q.key] = "unchanged"
+            continue
+        # Another key on the same id (created by hand or shared) must not be rewritten under it.
+        shared = qid and any(e.get("query_id") == qid for k, e in state.items() if k != q.key)
+        if dry_run:
+            actions[q.key] = ("verify" if qid and not entry.get("sql_sha256") else "update") if qid and not shared else "create"
+            continue
+        if qid and not shared and not entry.get("sql_sha256") and sql_sha256(remote_sql(qid)) == sha:
+            actions[q.key] = "adopted"
+        elif qid and not shared:
+            update_query(qid, q)
+            actions[q.key] = "updated"
+        else:
+            qid = create_query(q)
+            actions[q.key] = "created"
+        state[q.key] = {"query_id": qid, "sql_sha256": sha}
+    return actions
+
+
+def execute(queries: dict[str, str], credits: float | None = None) -> dict[str, str | None]:
+    """Run each distinct query id once, highest priority first, within the credit budget
+    (dune_budget.py; recorded with the refresh runs); {query id: execution id}."""
+    budget = dune_budget.credits_per_run() if credits is None else credits
+    run = dune_budget.new_run(f"dune_queries-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}", budget)
+    out: dict[str, str | None] = {}
+    for key in sorted(queries, key=lambda k: (dune_budget.metric(k).priority, k)):
+        qid = queries[key]
+        if qid in out:
+            continue
+        cost = dune_budget.execution_credits(key)
+        if run["credits"] + cost > budget:
+            print(f"  execute {key}: skipped, {budget - run['credits']:g} of {budget:g} credits left")
+            run["skip"] += 1
+            continue
+        try:
+            out[qid] = execute_query(qid)
+            run["execute"] += 1
+            run["credits"] += cost
+        except RuntimeError as e:
+            print(f"  execute {key}: {e}")
+            out[qid] = None
+            run["failed"] += 1
+    dune_budget.record_run(run)
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ids", type=Path, default=IDS_PATH, help="Query id / SQL hash file")
+    ap.add_argument("--show", choices=sorted(TEMPLATES), help="Print one rendered query")
+    ap.add_argument("--token", choices=sorted(token_registry.load()) + [MERGED], help="With --show (default: all)")
+    ap.add_argument("--sync", action="store_true", help="Create / update queries on Dune")
+    ap.add_argument("--dry-run", action="store_true", help="With --sync: print the plan only")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--merged", action="store_true", help="Also keep one merged query per template")
+    mode.add_argument("--per-token", action="store_true", help="Drop the merged queries")
+    ap.add_argument("--execute", action="store_true", help="Run every query fetch_metrics reads (once per id)")
+    ap.add_argument("--credits", type=float, help="Execution budget (default: $DUNE_CREDITS_PER_RUN, dune_budget.py)")
+    args = ap.parse_args()
+
+    tokens = list(token_registry.load().values())
+    state = load_state(args.ids)
+
+    if args.show:
+        if args.token == MERGED:
+            print(render_merged(args.show, tokens).sql)
+        for tok in tokens:
+            if args.token in (None, tok.key):
+                print(f"-- {render(args.show, tok).title}\n{render(args.show, tok).sql}\n")
+        return 0
+
+    merged = args.merged or (not args.per_token and bool(merged_names(query_ids(args.ids))))
+    queries = rendered(tokens, merged)
+    if args.per_token:
+        for key in [k for k in state if split_key(k)[0] == MERGED]:
+            del state[key]
+
+    if not args.sync:
+        for q in queries:
+            entry = state.get(q.key) or {}
+            status = ("in sync" if entry.get("sql_sha256") == q.sha256
+                      else "unverified" if entry.get("query_id") and not entry.get("sql_sha256")
+                      else "changed" if entry.get("query_id") else "missing")
+            print(f"  {q.key:<28} {entry.get('query_id') or '-':>9}  {status}")
+        pinned = sorted(k for k in state if split_key(k)[1] in PINNED)
+        print(f"\n{len(queries)} templated query(ies); pinned in Dune: {', '.join(pinned) or 'none'}")
+        if args.execute:
+            ran = execute(in_use(query_ids(args.ids)), args.credits)
+            print(f"Executed {sum(1 for e in ran.values() if e)}/{len(ran)} query(ies)")
+        return 0
+
+    try:
+        actions = sync(state, queries, dry_run=args.dry_run)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        save_state(state, args.ids)  # keep what was created before the failure
+        return 1
+    for key, action in actions.items():
+        print(f"  {key:<28} {(state.get(key) or {}).get('query_id') or '-':>9}  {action}")
+    if args.dry_run:
+        return 0
+    save_state(state, args.ids)
+    print(f"Saved {args.ids.name}")
+
+    used = in_use({k: str(e["query_id"]) for k, e in state.items() if e.get("query_id")})
+    changed = {state[k]["query_id"] for k, a in actions.items() if a in ("created", "updated")}
+    to_run = used if args.execute else {k: q for k, q in used.items() if q in changed}
+    if to_run:
+        ran = execute(to_run, args.credits)
+        print(f"Executed {sum(1 for e in ran.values() if e)}/{len(ran)} query(ies)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Local stand-in Ethereum node for the streaming / indexing code (chain_stream.py, checkpoints.py, block_times.py,
+claims_ledger.py, stake_index.py).
+
+Mines a block every --block-time seconds. With probability --touch-rate a
+block carries a log from one watched contract of a random registry token
+(tokens.json): a Staked-style event on the hardstake (pool total moves) or a
+RewardPaid claim by one of CLAIMERS wallets, a Transfer on the token, or a
+Sync on the LP pair (reserves move). State is kept
+per block, so eth_call answers from the head of the canonical chain. Block
+timestamps advance one 12 s slot per block (occasionally two, a missed
+slot); --history pre-mines that many blocks ending at the current time.
+
+With --reorg-rate, a block tick instead replaces the newest 1..--max-reorg-depth
+blocks with a competing branch one block longer (new hashes, new logs), as a
+chain reorganization does; orphaned blocks stop being served by number.
+
+Answers, over HTTP (keep-alive) and WebSocket on the same port:
+
+  eth_chainId, eth_blockNumber, eth_getBlockByNumber (full transactions too),
+  eth_getBlockByHash, eth_getBlockReceipts, eth_getTransactionReceipt,
+  eth_getLogs (address / topic0 / range / blockHash filters), eth_call (the reads of
+  build_staking_analytics.read_onchain), JSON-RPC batches, and over
+  WebSocket eth_subscribe("newHeads") / eth_unsubscribe.
+
+Every block body holds up to MAX_FILLER_TXS random transfers, then one
+transaction per contract call: stake / unstake (fetch_metrics selectors) and
+claim() on the hardstake, a share of them reverted (status 0, no logs).
+
+--no-ws refuses the WebSocket upgrade, to exercise the polling fallback.
+
+Run:
+  python3 fake_node.py serve --port 8546 --block-time 2 --touch-rate 0.3
+  python3 fake_node.py run --block-time 1 -- python3 chain_stream.py --max-blocks 20 --out-dir /tmp/stream
+  python3 fake_node.py run --block-time 0.2 --reorg-rate 0.1 --max-reorg-depth 6 -- python3 checkpoints.py --polls 100 --verify
+  python3 fake_node.py run --history 300000 -- python3 block_times.py weeks --verify
+  python3 fake_node.py run --history 50000 --touch-rate 0.5 -- python3 claims_ledger.py --verify
+  python3 fake_node.py run --history 20000 --touch-rate 0.5 -- python3 stake_index.py --metrics
+
+run sets STAKING_RPC_URLS / STAKING_WS_URL for the command, so everything
+that resolves RPC endpoints (build_staking_analytics.resolve_rpc_urls) talks
+to the fake node first, and METRICS_CACHE_DIR to a temporary directory, so the
+fake chain's block timestamps never land in the mainnet cache. METRICS_FAKE_NODE
+sends its circuit breakers to .upstream-breakers.fake-node.json (breaker.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+import build_staking_analytics as bsa
+import ws
+from block_times import CACHE_DIR_ENV
+from breaker import FAKE_NODE_ENV
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_PORT = 8546
+START_BLOCK = 21_000_000
+WS_ENV = "STAKING_WS_URL"
+
+TOPIC_TRANSFER = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+TOPIC_SYNC = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+TOPIC_STAKED = "0x9e71bc8eea02a63969f509818f2dafb9254532904319f9dbda79b67bd34a5f3d"
+TOPIC_REWARD_PAID = "0xe2403640ba68fed3a2f88b7557551d1993f84b99bb10ff833f0cf8db0c5e0486"
+CLAIMERS = 50
+STAKERS = 200
+
+SEL_STAKE = "0x666da64f"  # fetch_metrics.STAKE_METHOD
+SEL_UNSTAKE = "0x2e1a7d4d"  # fetch_metrics.UNSTAKE_METHOD
+SEL_CLAIM = "0x4e71d92d"  # claim()
+SEL_TRANSFER = "0xa9059cbb"  # transfer(address,uint256)
+SEL_SWAP = "0x022c0d9f"  # swap(uint256,uint256,address,bytes)
+FAILED_CALL_RATE = 0.05
+MAX_FILLER_TXS = 6
+
+SLOT_S = 12
+MISSED_SLOT_RATE = 0.02
+
+_SUPPLY = 10**27
+
+
+def _tx_hash(block_hash: str, index: int) -> str:
+    return "0x" + hashlib.sha256(f"{block_hash}:tx:{index}".encode()).hexdigest()
+
+
+def _word(n: int | str) -> str:
+    if isinstance(n, str):
+        return n[2:].lower().rjust(64, "0")
+    return format(n, "064x")
+
+
+class Chain:
+    """Canonical chain of blocks; each block carries its logs and the contract state after it."""
+
+    def __init__(
+        self,
+        *,
+        seed: int | None = None,
+        touch_rate: float = 0.3,
+        start: int = START_BLOCK,
+        history: int = 0,
+        block_receipts: bool = True,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.touch_rate = touch_rate
+        self.block_receipts = block_receipts
+        self.by_tx: dict[str, dict[str, Any]] = {}  # contract-call tx hash -> block (fillers are not looked up)
+        self.lock = threading.Lock()
+        self.tokens = list(bsa.REGISTRY.values())
+        state = {t.key: {"staked": _SUPPLY * 3 // 10, "reserves": [_SUPPLY // 10, 40 * 10**18]} for t in self.tokens}
+        # history blocks are pre-mined behind the current time, roughly one per slot.
+        # Each seed (each unseeded run) is its own chain, so state saved against one is told apart from another's.
+        salt = f"genesis:{seed if seed is not None else os.urandom(8).hex()}"
+        genesis = self._block(start, "0x" + "00" * 32, int(time.time()) - SLOT_S * history, state, [], salt=salt)
+        self.blocks: list[dict[str, Any]] = [genesis]
+        self.by_hash: dict[str, dict[str, Any]] = {genesis["hash"]: genesis}
+        self.listeners: list[queue.Queue] = []
+        self.reorgs: list[int] = []  # depth of each reorg so far
+        for _ in range(history):
+            self._extend("main")
+
+    def _block(
+        self,
+        number: int,
+        parent: str,
+        timestamp: int,
+        state: dict,
+        logs: list[dict[str, Any]],
+        salt: str,
+        calls: list[tuple[str, str, str, bool]] = (),  # type: ignore[assignment]
+    ) -> dict[str, Any]:
+        h = "0x" + hashlib.sha256(f"{parent}:{number}:{salt}".encode()).hexdigest()
+        # Filler transactions come first, then the block's contract calls; log i belongs to call i.
+        fillers = random.Random(h).randrange(MAX_FILLER_TXS + 1)
+        for i, log in enumerate(logs):
+            log.update(blockNumber=hex(number), blockHash=h, logIndex=hex(i), removed=False,
+                       transactionHash=_tx_hash(h, fillers + i))
+        return {"number": number, "hash": h, "parentHash": parent, "timestamp": timestamp,
+                "state": state, "logs": logs, "calls": list(calls), "fillers": fillers}
+
+    def _extend(self, salt: str) -> dict[str, Any]:
+        """Append one block on the head (caller holds the lock or owns the chain)."""
+        parent = self.head
+        state, logs, calls = self._next_state(parent["state"])
+        # Mostly one block per 12 s slot, now and then a missed slot.
+        ts = parent["timestamp"] + SLOT_S * (2 if self.rng.random() < MISSED_SLOT_RATE else 1)
+        block = self._block(parent["number"] + 1, parent["hash"], ts, state, logs, salt=salt, calls=calls)
+        self.blocks.append(block)
+        self.by_hash[block["hash"]] = block
+        for i in range(len(calls)):
+            self.by_tx[_tx_hash(block["hash"], block["fillers"] + i)] = block
+        return block
+
+    @property
+    def head(self) -> dict[str, Any]:
+        return self.blocks[-1]
+
+    def _wallet(self, pool: int) -> str:
+        return "0x" + format(self.rng.randrange(pool) + 1, "040x")
+
+    def _next_state(self, state: dict) -> tuple[dict, list[dict[str, Any]], list[tuple[str, str, str, bool]]]:
+        """State after the block, its logs, and its calls (from, to, selector, success); calls[i] emitted logs[i]."""
+        logs: list[dict[str, Any]] = []
+        calls: list[tuple[str, str, str, bool]] = []
+        if self.rng.random() < self.touch_rate:
+            state = json.loads(json.dumps(state))  # Untouched blocks share their parent's state.
+            t = self.rng.choice(self.tokens)
+            kind = self.rng.choice(["hardstake", "token"] + (["lp_pair"] if t.lp_pair else []))
+            amount = self.rng.randrange(10**20, 10**24)
+            if kind == "hardstake" and self.rng.random() < 0.3:
+                # A claim: ETH leaves the pool, staked amount unchanged.
+                claimer = self._wallet(CLAIMERS)
+                logs.append({"address": t.hardstake.lower(), "topics": [TOPIC_REWARD_PAID, "0x" + _word(claimer)],
+                             "data": "0x" + _word(self.rng.randrange(10**15, 10**18))})
+                calls.append((claimer, t.hardstake.lower(), SEL_CLAIM, True))
+            elif kind == "hardstake":
+                sign = self.rng.choice((1, -1))
+                staker = self._wallet(STAKERS)
+                state[t.key]["staked"] = max(0, state[t.key]["staked"] + sign * amount)
+                logs.append({"address": t.hardstake.lower(), "topics": [TOPIC_STAKED, "0x" + _word(staker)],
+                             "data": "0x" + _word(amount)})
+                calls.append((staker, t.hardstake.lower(), SEL_STAKE if sign > 0 else SEL_UNSTAKE, True))
+            elif kind == "lp_pair":
+                res = state[t.key]["reserves"]
+                res[0] = max(1, res[0] + self.rng.choice((1, -1)) * amount)
+                logs.append({"address": t.lp_pair.lower(), "topics": [TOPIC_SYNC],
+                             "data": "0x" + _word(res[0]) + _word(res[1])})
+                calls.append((self._wallet(STAKERS), t.lp_pair.lower(), SEL_SWAP, True))
+            else:
+                logs.append({"address": t.token.lower(), "topics": [TOPIC_TRANSFER], "data": "0x" + _word(amount)})
+                calls.append((self._wallet(STAKERS), t.token.lower(), SEL_TRANSFER, True))
+            if self.rng.random() < FAILED_CALL_RATE:
+                # A reverted stake / unstake: no log, no state change, status 0.
+                calls.append((self._wallet(STAKERS), t.hardstake.lower(),
+                              self.rng.choice((SEL_STAKE, SEL_UNSTAKE)), False))
+        return state, logs, calls
+
+    def _publish(self, blocks: list[dict[str, Any]]) -> None:
+        with self.lock:
+            listeners = list(self.listeners)
+        for block in blocks:
+            for q in listeners:
+                q.put(self.header(block))
+
+    def mine(self) -> dict[str, Any]:
+        with self.lock:
+            block = self._extend("main")
+        self._publish([block])
+        return block
+
+    def reorg(self, depth: int) -> list[dict[str, Any]]:
+        """Replace the newest depth blocks with a competing branch one block longer."""
+        with self.lock:
+            depth = max(1, min(depth, len(self.blocks) - 1))
+            del self.blocks[-depth:]
+            self.reorgs.append(depth)
+            branch = [self._extend(f"fork{len(self.reorgs)}") for _ in range(depth + 1)]
+        self._publish(branch)
+        return branch
+
+    # ---- JSON-RPC views -------------------------------------------------
+
+    @staticmethod
+    def header(block: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "number": hex(block["number"]),
+            "hash": block["hash"],
+            "parentHash": block["parentHash"],
+            "timestamp": hex(block["timestamp"]),
+            "logsBloom": "0x" + "00" * 256,
+        }
+
+    @staticmethod
+    def _calls(block: dict[str, Any]) -> list[tuple[str, str, str, bool]]:
+        """Every transaction as (from, to, selector, success): random fillers, then the contract calls."""
+        rng = random.Random(block["hash"] + ":fillers")
+        fillers = [("0x" + rng.randbytes(20).hex(), "0x" + rng.randbytes(20).hex(), "0x" + rng.randbytes(4).hex(), True)
+                   for _ in range(block["fillers"])]
+        return fillers + block["calls"]
+
+    def transactions(self, block: dict[str, Any]) -> list[dict[str, Any]]:
+        h, n = block["hash"], hex(block["number"])
+        return [{"hash": _tx_hash(h, i), "blockHash": h, "blockNumber": n, "transactionIndex": hex(i),
+                 "from": frm, "to": to, "input": sel + "00" * 32, "value": "0x0"}
+                for i, (frm, to, sel, _) in enumerate(self._calls(block))]
+
+    def receipts(self, block: dict[str, Any]) -> list[dict[str, Any]]:
+        h, n = block["hash"], hex(block["number"])
+        logs: dict[str, list[dict[str, Any]]] = {}
+        for log in block["logs"]:
+            logs.setdefault(log["transactionHash"], []).append(dict(log))
+        return [{"transactionHash": _tx_hash(h, i), "blockHash": h, "blockNumber": n, "transactionIndex": hex(i),
+                 "from": frm, "to": to, "status": "0x1" if ok else "0x0", "logs": logs.get(_tx_hash(h, i), [])}
+                for i, (frm, to, _, ok) in enumerate(self._calls(block))]
+
+    def _by_number(self, tag: Any) -> dict[str, Any] | None:
+        if tag in ("latest", "safe", "finalized", "pending", None):
+            return self.head
+        if tag == "earliest":
+            return self.blocks[0]
+        i = int(tag, 16) - self.blocks[0]["number"]
+        return self.blocks[i] if 0 <= i < len(self.blocks) else None
+
+    def _logs(self, flt: dict[str, Any]) -> list[dict[str, Any]]:
+        if flt.get("blockHash"):
+            blocks = [self.by_hash[flt["blockHash"]]] if flt["blockHash"] in self.by_hash else []
+        else:
+            lo = self._by_number(flt.get("fromBlock", "latest"))
+            hi = self._by_number(flt.get("toBlock", "latest"))
+            first = self.blocks[0]["number"]
+            blocks = self.blocks[lo["number"] - first:hi["number"] - first + 1] if lo and hi else []
+        addrs = flt.get("address")
+        want = {a.lower() for a in ([addrs] if isinstance(addrs, str) else addrs or [])}
+        topic0 = (flt.get("topics") or [None])[0]
+        want_topic = {t.lower() for t in ([topic0] if isinstance(topic0, str) else topic0 or [])}
+        return [dict(log) for b in blocks for log in b["logs"]
+                if (not want or log["address"] in want) and (not want_topic or log["topics"][0] in want_topic)]
+
+    def _eth_call(self, call: dict[str, Any]) -> str:
+        to, data = call["to"].lower(), call["data"].lower()
+        if to == bsa.FACTORY.lower() and data == bsa.SEL_ROUTER:
+            return "0x" + _word(bsa.ROUTER_EXPECTED_CANONICAL)
+        state = self.head["state"]
+        for t in self.tokens:
+            s = state[t.key]
+            if to == t.hardstake.lower() and data == bsa.SEL_TOTAL_SUPPLY:
+                return "0x" + _word(s["staked"])
+            if to == t.token.lower() and data == bsa.SEL_TOTAL_SUPPLY:
+                return "0x" + _word(_SUPPLY)
+            if t.lp_pair and to == t.lp_pair.lower():
+                if data == bsa.SEL_PAIR_TOKEN0:
+                    return "0x" + _word(t.token)
+                if data == bsa.SEL_PAIR_TOKEN1:
+                    return "0x" + _word(bsa.WETH_MAINNET)
+                if data == bsa.SEL_PAIR_GET_RESERVES:
+                    return "0x" + _word(s["reserves"][0]) + _word(s["reserves"][1]) + _word(0)
+        raise ValueError("execution reverted")
+
+    def call(self, method: str, params: list[Any]) -> Any:
+        with self.lock:
+            if method == "eth_chainId":
+                return hex(bsa.CHAIN_ID)
+            if method == "eth_blockNumber":
+                return hex(self.head["number"])
+            if method == "eth_getBlockByNumber":
+                block = self._by_number(params[0])
+                if block is None:
+                    return None
+                full = len(params) > 1 and params[1]
+                txs = self.transactions(block)
+                return {**self.header(block), "transactions": txs if full else [tx["hash"] for tx in txs]}
+            if method == "eth_getBlockReceipts" and self.block_receipts:
+                block = self._by_number(params[0])
+                return self.receipts(block) if block else None
+            if method == "eth_getTransactionReceipt":
+                block = self.by_tx.get(params[0])
+                if block is None or not self._canonical(block):
+                    return None
+                return next(r for r in self.receipts(block) if r["transactionHash"] == params[0])
+            if method == "eth_getBlockByHash":
+                block = self.by_hash.get(params[0])
+                return self.header(block) if block and self._canonical(block) else None
+            if method == "eth_getLogs":
+                return self._logs(params[0])
+            if method == "eth_call":
+                return self._eth_call(params[0])
+        raise KeyError(method)
+
+    def _canonical(self, block: dict[str, Any]) -> bool:
+        i = block["number"] - self.blocks[0]["number"]
+        return 0 <= i < len(self.blocks) and self.blocks[i]["hash"] == block["hash"]
+
+    def answer(self, req: Any) -> Any:
+        if isinstance(req, list):
+            return [self.answer(r) for r in req]
+        out: dict[str, Any] = {"jsonrpc": "2.0", "id": req.get("id")}
+        try:
+            out["result"] = self.call(req.get("method"), req.get("params") or [])
+        except KeyError:
+            out["error"] = {"code": -32601, "message": f"method not found: {req.get('method')}"}
+        except ValueError as e:
+            out["error"] = {"code": 3, "message": str(e)}
+        return out
+
+
+class FakeNode(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: tuple[str, int], chain: Chain, *, allow_ws: bool = True) -> None:
+        super().__init__(addr, _Handler)
+        self.chain = chain
+        self.allow_ws = allow_ws
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ws_url(self) -> str:
+        return self.base_url.replace("http://", "ws://", 1)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeNode
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"null")
+            body = json.dumps(self.server.chain.answer(req)).encode()
+            status = 200
+        except (ValueError, AttributeError):
+            body, status = b'{"jsonrpc":"2.0","id":null,"error":{"code":-32700,"message":"parse error"}}', 400
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not self.server.allow_ws:
+            self.send_error(400, "WebSocket upgrade required" if self.server.allow_ws else "WebSocket disabled")
+            return
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", ws.accept_key(self.headers.get("Sec-WebSocket-Key", "")))
+        self.end_headers()
+        self.wfile.flush()
+        self._serve_ws()
+        self.close_connection = True
+
+    def _serve_ws(self) -> None:
+        chain = self.server.chain
+        sock = self.connection
+        sock.settimeout(None)
+        send_lock = threading.Lock()
+        heads: queue.Queue = queue.Queue()
+        subs: set[str] = set()
+        closed = threading.Event()
+
+        def send(obj: Any) -> None:
+            with send_lock:
+                ws.write_frame(sock, ws.OP_TEXT, json.dumps(obj).encode(), mask=False)
+
+        def pump() -> None:
+            while not closed.is_set():
+                try:
+                    header = heads.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                for sub in list(subs):
+                    try:
+                        send({"jsonrpc": "2.0", "method": "eth_subscription",
+                              "params": {"subscription": sub, "result": header}})
+                    except OSError:
+                        closed.set()
+
+        threading.Thread(target=pump, daemon=True).start()
+        try:
+            while not closed.is_set():
+                _, op, payload = ws.read_frame(sock)
+                if op == ws.OP_CLOSE:
+                    break
+                if op == ws.OP_PING:
+                    with send_lock:
+                        ws.write_frame(sock, ws.OP_PONG, payload, mask=False)
+                    continue
+                if op != ws.OP_TEXT:
+                    continue
+                req = json.loads(payload)
+                if req.get("method") == "eth_subscribe":
+                    if (req.get("params") or [None])[0] != "newHeads":
+                        send({"jsonrpc": "2.0", "id": req.get("id"),
+                              "error": {"code": -32602, "message": "only newHeads is supported"}})
+                        continue
+                    sub = "0x" + os.urandom(8).hex()
+                    subs.add(sub)
+                    with chain.lock:
+                        chain.listeners.append(heads)
+                    send({"jsonrpc": "2.0", "id": req.get("id"), "result": sub})
+                elif req.get("method") == "eth_unsubscribe":
+                    found = (req.get("params") or [None])[0] in subs
+                    subs.discard((req.get("params") or [None])[0])
+                    send({"jsonrpc": "2.0", "id": req.get("id"), "result": found})
+                else:
+                    send(chain.answer(req))
+        except (OSError, ValueError, ws.WebSocketClosed):
+            pass
+        finally:
+            closed.set()
+            with chain.lock:
+                if heads in chain.listeners:
+                    chain.listeners.remove(heads)
+
+
+def start_node(
+    *,
+    block_time: float = 2.0,
+    touch_rate: float = 0.3,
+    seed: int | None = None,
+    history: int = 0,
+    reorg_rate: float = 0.0,
+    max_reorg_depth: int = 3,
+    allow_ws: bool = True,
+    block_receipts: bool = True,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> FakeNode:
+    """Serve and mine on background threads (port 0 = any free port)."""
+    chain = Chain(seed=seed, touch_rate=touch_rate, history=history, block_receipts=block_receipts)
+    node = FakeNode((host, port), chain, allow_ws=allow_ws)
+    threading.Thread(target=node.serve_forever, name="fake-node", daemon=True).start()
+    rng = random.Random(None if seed is None else seed + 1)
+
+    def miner() -> None:
+        while True:
+            time.sleep(block_time)
+            if len(chain.blocks) > 1 and rng.random() < reorg_rate:
+                chain.reorg(rng.randint(1, max_reorg_depth))
+            else:
+                chain.mine()
+
+    threading.Thread(target=miner, name="fake-node-miner", daemon=True).start()
+    return node
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("serve", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--port", type=int, default=DEFAULT_PORT if name == "serve" else 0)
+        p.add_argument("--block-time", type=float, default=2.0, help="Seconds between blocks")
+        p.add_argument("--touch-rate", type=float, default=0.3, help="Fraction of blocks with a watched-contract log")
+        p.add_argument("--history", type=int, default=0, help="Blocks pre-mined before serving (12 s slots)")
+        p.add_argument("--reorg-rate", type=float, default=0.0, help="Fraction of block ticks that reorg instead")
+        p.add_argument("--max-reorg-depth", type=int, default=3, help="Reorg depth is uniform in 1..this")
+        p.add_argument("--no-ws", action="store_true", help="Refuse WebSocket upgrades (polling only)")
+        p.add_argument("--no-block-receipts", action="store_true",
+                       help="Answer eth_getBlockReceipts with method-not-found, as many public RPCs do")
+        p.add_argument("--seed", type=int, default=None)
+    sub.choices["run"].add_argument("command", nargs=argparse.REMAINDER, help="-- command to run against it")
+    args = ap.parse_args()
+
+    node = start_node(block_time=args.block_time, touch_rate=args.touch_rate, seed=args.seed, history=args.history,
+                      reorg_rate=args.reorg_rate, max_reorg_depth=args.max_reorg_depth,
+                      allow_ws=not args.no_ws, block_receipts=not args.no_block_receipts, port=args.port)
+    print(f"Fake node at {node.base_url} (WebSocket: {'off' if args.no_ws else node.ws_url})")
+    try:
+        if args.cmd == "serve":
+            threading.Event().wait()
+            return 0
+        command = args.command[1:] if args.command[:1] == ["--"] else args.command
+        if not command:
+            ap.error("run needs a command after --")
+        with tempfile.TemporaryDirectory(prefix="fake-node-cache-") as cache_dir:
+            env = dict(os.environ, STAKING_RPC_URLS=node.base_url)
+            env.update({CACHE_DIR_ENV: cache_dir, FAKE_NODE_ENV: node.base_url})
+            if not args.no_ws:
+                env[WS_ENV] = node.ws_url
+            return subprocess.run(command, cwd=str(HERE), env=env, check=False).returncode
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        node.shutdown()
+        if node.chain.reorgs:
+            print(f"Fake node reorged {len(node.chain.reorgs)}x (depths {sorted(node.chain.reorgs)})")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
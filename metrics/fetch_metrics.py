@@ -5,6 +5,11 @@ Fetch VISTA and BONZI metrics from Dune API + external market context.
 Usage:
   python fetch_metrics.py              # Full fetch (Dune + market) - monthly
   python fetch_metrics.py --market-only # Market context only - hourly/daily
+  python fetch_metrics.py --daemon      # Stay running; each source on its own schedule (daemon.py)
+  python fetch_metrics.py --market-bench # p95 of the market fetch against the replay.py stand-in (0.8 s and shipped deadline)
+
+The full fetch runs pipeline.py (Dune, market, on-chain, staking analytics,
+validation, page render); use pipeline.py --from/--only to re-run part of it.
 
 Requires: DUNE_API_KEY environment variable (for full fetch)
 Market context APIs are free and require no keys.
@@ -13,9 +18,22 @@ Never commit API keys. Use .env file or export.
 
 import os
 import json
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator
+
+import breaker
+import delta
+import dune_budget
+import dune_queries
+import json_stream
+import replay
+import token_registry
+import tracing
 
 # Load from .env if exists
 ENV_FILE = Path(__file__).parent / '.env'
@@ -34,99 +52,275 @@ if API_KEY and (len(API_KEY) < 30 or ' ' in API_KEY):
     print("Warning: DUNE_API_KEY looks invalid")
     API_KEY = None
 
-# Dune Query IDs - Update after creating queries in Dune UI
-QUERIES = {
-    # VISTA (existing)
-    'vista_hhi': '6591451',
-    'vista_staker_retention': '6591349',
-    'vista_diamond_hands': '6591316',
-    'vista_weekly_trend': '6591328',
-    'vista_tenure': '6591332',
-    'vista_1k_holders': '6591686',  # Tier 3: $1K+ Holders
-    'vista_eth_distributed': '6591480',
-    'vista_lp_distributed': '6591489',
-    'vista_all_distributions': '6591567',  # Comprehensive: LP + Hardlock LP + Hardstake
-    'vista_nakamoto': '6591646',  # Tier 3: Nakamoto Coefficient
-
-    # BONZI (new - ADD IDs after creating queries)
-    'bonzi_lp_distributed': '6591492',
-    'bonzi_hhi': '6591469',
-    'bonzi_staker_retention': '6591406',
-    'bonzi_diamond_hands': '6591411',
-    'bonzi_weekly_trend': '6591436',
-    'bonzi_tenure': '6591445',
-    'bonzi_1k_holders': '6591684',  # Tier 3: $1K+ Holders
-    'bonzi_eth_distributed': '6591483',
-    'bonzi_nakamoto': '6591678',  # Tier 3: Nakamoto Coefficient
-}
+# Dune Query IDs: query_ids.json, kept in sync with the SQL templates by dune_queries.py
+# (python3 dune_queries.py --sync). Keys are "<token>_<metric>", plus "merged_<metric>"
+# for queries that return every token's rows in one execution.
+QUERIES = dune_queries.query_ids()
 
 # Contract addresses
-CONTRACTS = {
-    'vista': {
-        'token': '0xc9bca88b04581699fab5aa276ccaff7df957cbbf',
-        'lp_pair': '0xfdd05552f1377aa488afed744c8024358af02041',
-        'hardstake': '0xee5a6f8a55b02689138c195031d09bafdc7d278f',
-        'hardlock_lp': '0x9099ef7f34dc1af0d27e49dc5b604bccc03dcb21',
-        'launch_date': '2024-09-01',
-    },
-    'bonzi': {
-        'token': '0xd6175692026bcd7cb12a515e39cf0256ef35cb86',
-        'lp_pair': '0x970cf9b7346fbaea0588f03356a104100eb675e2',
-        'hardstake': '0x3618158bb8d07111e476f4de28676dff050d1a53',
-        'launch_date': '2024-12-01',
-    },
-    # Ethervista Protocol (shared infrastructure)
-    'protocol': {
-        'router': '0x9bD63C5D44fF28390df1EaaFD4eB4BD73E94A72a',
-        'factory': '0x9a27cb5ae0B2cEe0bb71f9A85C0D60f3920757B4',
-        'token_factory': '0x1a97A037A120Db530dDCe8370e24EaD0FE9cf5d0',
-        'hardlock_universal': '0xF6B510928ab880507246CD6946b7F061Eb8A9C78',
-        'autobuy_burner': '0xe17A0C382c8332A889EC9D026D6948e26C7f617D',
-    }
-}
+# Token + protocol addresses live in tokens.json (token_registry.py), shared with the analytics build.
+CONTRACTS = token_registry.contracts_map()
 
 # Function selectors
 STAKE_METHOD = "0x666da64f"
 UNSTAKE_METHOD = "0x2e1a7d4d"
 
 
-def fetch_query(query_id: str, retries: int = 3) -> list:
-    """Fetch results from a Dune query with retry logic."""
-    if not query_id:
-        return []
+# One session per process: Dune / CoinGecko / DefiLlama connections stay open
+# between calls (and between cycles when running under daemon.py).
+_SESSION = requests.Session()
+
+# Bytes handed to the streaming row parser per read.
+ROW_CHUNK_BYTES = 64 * 1024
+EXECUTE_TIMEOUT_S = 300
+EXECUTE_POLL_S = 5
+
+# Market context: the five sources are fetched at once; whatever has not answered
+# by the deadline keeps its last good value (fetch_market_context). The deadline
+# leaves a slow-but-working DefiLlama (~3 s) room to answer on every path.
+MARKET_DEADLINE_S = float(os.environ.get('METRICS_MARKET_DEADLINE_S') or 5.0)
+# --market-bench: the tight deadline it times against the p95 target, next to the shipped one.
+MARKET_BENCH_DEADLINE_S = 0.8
+MARKET_P95_TARGET_S = 1.0
+
+_scheduler: dune_budget.Scheduler | None = None
+_scheduler_lock = threading.Lock()
+# Per-thread end of the current market fetch (time.monotonic()); _get caps timeouts to it.
+_deadline = threading.local()
+
+
+def _get(url: str, attempt: int = 0, **kwargs) -> requests.Response:
+    """GET through the shared session, recorded as a call in the run report (tracing.py).
+
+    Dune calls first wait for a slot under dune_budget.RATE. Inside a market fetch the
+    timeout never runs past its deadline.
+
+    replay.route() sends it to the record/replay stand-in when one is configured.
+    """
+    at = getattr(_deadline, 'at', None)
+    capped = False
+    if at is not None:
+        left = at - time.monotonic()
+        if left <= 0:
+            raise requests.exceptions.Timeout("market context deadline passed")
+        capped = left < (kwargs.get('timeout') or float('inf'))
+        kwargs['timeout'] = min(kwargs.get('timeout') or left, left)
+    if tracing.upstream_for(url) == 'dune':
+        dune_budget.RATE.acquire()  # one per-minute limit for every Dune call in the process
+    with tracing.span(url, attempt=attempt) as rec:
+        try:
+            response = _SESSION.get(replay.route(url), **kwargs)
+        except requests.exceptions.Timeout:
+            # Cut short by the market deadline, not slow past the host's own timeout: not a host failure.
+            rec['deadline'] = capped
+            raise
+        rec['status'] = response.status_code
+        # A streamed body is not read here; its size is only known from the header.
+        rec['bytes'] = int(response.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(response.content)
+    return response
 
-    url = f"{BASE_URL}/{query_id}/results"
+
+def _open_results(url: str, params: dict, retries: int) -> requests.Response | None:
+    """GET a Dune results page with retry logic; the body is left unread (stream=True)."""
     headers = {"x-dune-api-key": API_KEY}
 
     for attempt in range(retries):
         try:
-            response = requests.get(url, headers=headers, timeout=30)
+            response = _get(url, attempt=attempt, headers=headers, params=params or None, timeout=30, stream=True)
 
             if response.status_code == 401:
+                response.close()
                 print("  Error: Invalid API key")
-                return []
+                return None
             if response.status_code == 429:
-                print(f"  Rate limited, waiting... (attempt {attempt + 1})")
-                import time
-                time.sleep(5 * (attempt + 1))
+                response.close()
+                # Hold every Dune caller, not just this one; the next _get waits it out.
+                wait = float(response.headers.get('Retry-After') or 5 * 2 ** attempt)
+                print(f"  Rate limited, waiting {wait:g}s... (attempt {attempt + 1})")
+                dune_budget.RATE.pause(wait)
                 continue
 
             response.raise_for_status()
-            data = response.json()
-            return data.get('result', {}).get('rows', [])
+            return response
 
         except requests.exceptions.Timeout:
             print(f"  Timeout (attempt {attempt + 1}/{retries})")
+        except breaker.CircuitOpen as e:
+            print(f"  Skipped: {e}")
+            break
         except requests.exceptions.RequestException as e:
             print(f"  Request error: {e}")
             break
 
-    return []
+    return None
+
+
+def iter_query_rows(
+    query_id: str,
+    retries: int = 3,
+    *,
+    limit: int | None = None,
+    columns: list[str] | None = None,
+    page_size: int | None = None,
+    found: dict | None = None,
+) -> Iterator[dict]:
+    """Rows of a Dune query's latest results, parsed as they arrive (json_stream.py).
+
+    Memory stays at about one row whatever the result size. Reading stops
+    (and the connection is dropped) after `limit` rows, which are also all
+    Dune is asked for (it bills by datapoints returned); `columns` keeps only
+    those keys. With `page_size` the results are requested page by page
+    (limit / offset, following next_offset) instead of in one body. The
+    body's other fields (execution_ended_at, ...) of the first page go into
+    `found`. Raises RequestException if no results could be read.
+    """
+    url = f"{BASE_URL}/{query_id}/results"
+    offset = 0
+    left = limit
+    while left is None or left > 0:
+        params = {}
+        if page_size:
+            params = {'limit': page_size if left is None else min(page_size, left), 'offset': offset}
+        elif left is not None:
+            params = {'limit': left}
+        response = _open_results(url, params, retries)
+        if response is None:
+            raise requests.exceptions.RequestException(f"no results for query {query_id}")
+        page: dict = {} if offset or found is None else found
+        with response:
+            rows = json_stream.iter_array(response.iter_content(ROW_CHUNK_BYTES), ('result', 'rows'), page)
+            for row in json_stream.project(rows, columns):
+                yield row
+                if left is not None:
+                    left -= 1
+                    if left == 0:
+                        return
+        if not page_size or page.get('next_offset') is None:
+            return
+        offset = page['next_offset']
+
+
+def fetch_query(
+    query_id: str,
+    retries: int = 3,
+    *,
+    limit: int | None = None,
+    columns: list[str] | None = None,
+    page_size: int | None = None,
+) -> list:
+    """Fetch results from a Dune query with retry logic (see iter_query_rows)."""
+    if not query_id:
+        return []
+
+    try:
+        return list(iter_query_rows(query_id, retries, limit=limit, columns=columns, page_size=page_size))
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"  Read error: {e}")
+        return []
+
+
+def _read_for_budget(query_id: str, limit: int | None, found: dict) -> list | None:
+    try:
+        return list(iter_query_rows(query_id, limit=limit, found=found))
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"  Read error: {e}")
+        return None
 
 
-def fetch_token_metrics(token: str, queries: dict) -> dict:
-    """Fetch all metrics for a single token."""
+def execute_query(query_id: str, timeout_s: float = EXECUTE_TIMEOUT_S) -> bool:
+    """Re-run a Dune query and wait for it to finish (its result then becomes the latest)."""
+    api = BASE_URL.rsplit('/query', 1)[0]
+    headers = {"x-dune-api-key": API_KEY}
+    try:
+        dune_budget.RATE.acquire()
+        with tracing.span(f"{api}/query/{query_id}/execute", method="POST") as rec:
+            response = _SESSION.post(replay.route(f"{BASE_URL}/{query_id}/execute"), headers=headers, timeout=30)
+            rec['status'] = response.status_code
+        response.raise_for_status()
+        execution_id = response.json()['execution_id']
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            time.sleep(EXECUTE_POLL_S)
+            status = _get(f"{api}/execution/{execution_id}/status", headers=headers, timeout=30)
+            status.raise_for_status()
+            state = status.json().get('state')
+            if state == 'QUERY_STATE_COMPLETED':
+                return True
+            if state in ('QUERY_STATE_FAILED', 'QUERY_STATE_CANCELLED', 'QUERY_STATE_EXPIRED'):
+                print(f"  Execution of {query_id} ended in {state}")
+                return False
+        print(f"  Execution of {query_id} still running after {timeout_s:g}s")
+    except (requests.exceptions.RequestException, breaker.CircuitOpen, ValueError, KeyError) as e:
+        print(f"  Execute error for {query_id}: {e}")
+    return False
+
+
+def dune_scheduler() -> dune_budget.Scheduler:
+    """This run's credit budget (one per tracing run, shared by the concurrent token stages)."""
+    global _scheduler
+    run_id = tracing.run_id()
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler.run_id != run_id:
+            _scheduler = dune_budget.Scheduler(
+                dune_queries.in_use(QUERIES), read=_read_for_budget, execute=execute_query, run_id=run_id,
+            )
+        return _scheduler
+
+
+def fetch_execution_id(query_id: str) -> str | None:
+    """Id of the query's latest execution (one row fetched), or None if unavailable.
+
+    daemon.py polls these to refetch Dune results only after a query has re-run.
+    """
+    try:
+        response = _get(f"{BASE_URL}/{query_id}/results", headers={"x-dune-api-key": API_KEY},
+                        params={"limit": 1}, timeout=30)
+        response.raise_for_status()
+        return response.json().get('execution_id')
+    except (requests.exceptions.RequestException, breaker.CircuitOpen, ValueError) as e:
+        print(f"  Execution check failed for {query_id}: {e}")
+        return None
+
+
+def fetch_merged(queries: dict, budget: dune_budget.Scheduler | None = None) -> dict:
+    """Rows of each merged multi-token query ("merged_<metric>"), by metric; fetched once for all tokens."""
+    merged = {}
+    for key, query_id in queries.items():
+        prefix, name = dune_queries.split_key(key)
+        if prefix != dune_queries.MERGED or not query_id:
+            continue
+        rows = budget.rows(key) if budget is not None else fetch_query(query_id)
+        if rows:
+            merged[name] = rows
+            print(f"  Merged {name}: {len(rows)} rows")
+    return merged
+
+
+def fetch_token_metrics(
+    token: str,
+    queries: dict,
+    merged: dict | None = None,
+    budget: dune_budget.Scheduler | None = None,
+) -> dict:
+    """Fetch all metrics for a single token.
+
+    A metric in `merged` (fetch_merged) is read from the token's rows there
+    instead of from its own query. With a `budget` (dune_scheduler) each
+    query is executed, read, served from cache or skipped as it planned.
+    """
     prefix = token.lower()
+    merged = merged or {}
+
+    def has(name: str) -> bool:
+        return name in merged or bool(queries.get(f'{prefix}_{name}'))
+
+    def rows_for(name: str, limit: int | None = None) -> list:
+        if name in merged:
+            return [row for row in merged[name] if row.get('token') == prefix][:limit]
+        if budget is not None:
+            return budget.rows(f'{prefix}_{name}', limit)
+        return fetch_query(queries[f'{prefix}_{name}'], limit=limit)
+
     launch = CONTRACTS[token]['launch_date']
 
     metrics = {
@@ -161,9 +355,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
     }
 
     # Fetch HHI
-    if queries.get(f'{prefix}_hhi'):
+    if has('hhi'):
         try:
-            rows = fetch_query(queries[f'{prefix}_hhi'])
+            rows = rows_for('hhi', limit=1)
             if rows:
                 row = rows[0]
                 metrics['hhi_score'] = row.get('hhi_score')
@@ -174,9 +368,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} HHI: {e}")
 
     # Fetch staker retention
-    if queries.get(f'{prefix}_staker_retention'):
+    if has('staker_retention'):
         try:
-            rows = fetch_query(queries[f'{prefix}_staker_retention'])
+            rows = rows_for('staker_retention')
             staking = 0
             exited = 0
             for row in rows:
@@ -194,9 +388,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} retention: {e}")
 
     # Fetch diamond hands
-    if queries.get(f'{prefix}_diamond_hands'):
+    if has('diamond_hands'):
         try:
-            rows = fetch_query(queries[f'{prefix}_diamond_hands'])
+            rows = rows_for('diamond_hands', limit=1)
             if rows:
                 metrics['diamond_hands'] = rows[0].get('diamond_hands')
                 print(f"  {token} Diamond hands: {rows[0].get('diamond_hands')}")
@@ -204,9 +398,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} diamond hands: {e}")
 
     # Fetch tenure
-    if queries.get(f'{prefix}_tenure'):
+    if has('tenure'):
         try:
-            rows = fetch_query(queries[f'{prefix}_tenure'])
+            rows = rows_for('tenure', limit=1)
             if rows:
                 row = rows[0]
                 metrics['avg_tenure_days'] = round(row.get('avg_tenure_days', 0))
@@ -216,9 +410,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} tenure: {e}")
 
     # Fetch weekly trend
-    if queries.get(f'{prefix}_weekly_trend'):
+    if has('weekly_trend'):
         try:
-            rows = fetch_query(queries[f'{prefix}_weekly_trend'])
+            rows = rows_for('weekly_trend', limit=12)
             trend = []
             for row in rows[:12]:  # Last 12 weeks
                 trend.append({
@@ -235,9 +429,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} weekly trend: {e}")
 
     # Fetch $1K+ holders
-    if queries.get(f'{prefix}_1k_holders'):
+    if has('1k_holders'):
         try:
-            rows = fetch_query(queries[f'{prefix}_1k_holders'])
+            rows = rows_for('1k_holders', limit=1)
             if rows:
                 row = rows[0]
                 metrics['holders_1k_plus'] = row.get('holders_1k_plus')
@@ -249,9 +443,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} 1K holders: {e}")
 
     # Fetch ETH distributed
-    if queries.get(f'{prefix}_eth_distributed'):
+    if has('eth_distributed'):
         try:
-            rows = fetch_query(queries[f'{prefix}_eth_distributed'])
+            rows = rows_for('eth_distributed', limit=1)
             if rows:
                 row = rows[0]
                 metrics['total_eth_distributed'] = row.get('total_eth_distributed')
@@ -263,9 +457,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} ETH distributed: {e}")
 
     # Fetch LP distributions (separate from Hardstake claims)
-    if queries.get(f'{prefix}_lp_distributed'):
+    if has('lp_distributed'):
         try:
-            rows = fetch_query(queries[f'{prefix}_lp_distributed'])
+            rows = rows_for('lp_distributed', limit=1)
             if rows:
                 row = rows[0]
                 metrics['lp_total_eth'] = row.get('total_eth_distributed') or row.get('total_eth')
@@ -276,9 +470,9 @@ def fetch_token_metrics(token: str, queries: dict) -> dict:
             print(f"  Error fetching {token} LP distributions: {e}")
 
     # Fetch Nakamoto Coefficient (Tier 3)
-    if queries.get(f'{prefix}_nakamoto'):
+    if has('nakamoto'):
         try:
-            rows = fetch_query(queries[f'{prefix}_nakamoto'])
+            rows = rows_for('nakamoto', limit=1)
             if rows:
                 row = rows[0]
                 metrics['nakamoto_coefficient'] = row.get('nakamoto_coefficient')
@@ -319,7 +513,7 @@ def fetch_eth_price() -> dict:
             "vs_currencies": "usd",
             "include_24hr_change": "true"
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = _get(url, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         eth = data.get("ethereum", {})
@@ -337,7 +531,7 @@ def fetch_gas_price() -> dict:
     try:
         # Using Etherscan public gas oracle (no key needed for basic)
         url = "https://api.etherscan.io/api?module=gastracker&action=gasoracle"
-        response = requests.get(url, timeout=10)
+        response = _get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
         result = data.get("result", {})
@@ -377,7 +571,7 @@ def fetch_dex_volume() -> dict:
     """Fetch DEX volume from DeFiLlama."""
     try:
         url = "https://api.llama.fi/overview/dexs?excludeTotalDataChart=true&excludeTotalDataChartBreakdown=true"
-        response = requests.get(url, timeout=15)
+        response = _get(url, timeout=15)
         response.raise_for_status()
         data = response.json()
 
@@ -415,7 +609,7 @@ def fetch_memecoin_sector() -> dict:
             "vs_currencies": "usd",
             "include_24hr_change": "true"
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = _get(url, params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
 
@@ -457,7 +651,7 @@ def fetch_btc_dominance() -> dict:
     """Fetch BTC dominance to gauge alt season potential."""
     try:
         url = "https://api.coingecko.com/api/v3/global"
-        response = requests.get(url, timeout=10)
+        response = _get(url, timeout=10)
         response.raise_for_status()
         data = response.json().get("data", {})
 
@@ -483,132 +677,198 @@ def fetch_btc_dominance() -> dict:
         return {"btc_dominance_pct": None, "season": None}
 
 
-def fetch_market_context() -> dict:
-    """Fetch all external market data."""
-    print("\n=== MARKET CONTEXT ===")
+MARKET_SOURCES = {
+    "eth": fetch_eth_price,
+    "gas": fetch_gas_price,
+    "dex_volume": fetch_dex_volume,
+    "memecoin_sector": fetch_memecoin_sector,
+    "btc_dominance": fetch_btc_dominance,
+}
 
-    context = {
-        "fetched_at": datetime.now().strftime("%Y-%m-%d %H:%M UTC"),
-        "eth": fetch_eth_price(),
-        "gas": fetch_gas_price(),
-        "dex_volume": fetch_dex_volume(),
-        "memecoin_sector": fetch_memecoin_sector(),
-        "btc_dominance": fetch_btc_dominance(),
-    }
 
-    # Generate overall signal
+def _has_data(result: dict | None) -> bool:
+    """False for the all-null dict a market fetcher returns when its call failed."""
+    return bool(result) and any(v not in (None, {}, []) for k, v in result.items() if k != "impact")
+
+
+def _fetch_by(fetch, deadline: float) -> tuple[dict, float]:
+    """fetch() with its calls capped at the deadline: (result, time.monotonic() it finished)."""
+    _deadline.at = deadline
+    try:
+        return fetch(), time.monotonic()
+    finally:
+        _deadline.at = None
+
+
+def market_signals(context: dict, fresh: set[str] | None = None) -> list[str]:
+    """Trading signals from the market context, using only the sources in `fresh` (all if None)."""
+    def source(name: str) -> dict:
+        return (context.get(name) or {}) if fresh is None or name in fresh else {}
+
     signals = []
 
     # Gas signal
-    if context["gas"].get("level") == "low":
+    if source("gas").get("level") == "low":
         signals.append("✅ Low gas: favorable for trading activity")
-    elif context["gas"].get("level") == "high":
+    elif source("gas").get("level") == "high":
         signals.append("⚠️ High gas: may reduce trading volume")
 
     # DEX volume signal
-    if context["dex_volume"].get("sentiment") in ["very_active", "active"]:
+    if source("dex_volume").get("sentiment") in ["very_active", "active"]:
         signals.append("✅ DEX activity high: good for fee generation")
-    elif context["dex_volume"].get("sentiment") == "quiet":
+    elif source("dex_volume").get("sentiment") == "quiet":
         signals.append("⚠️ DEX activity low: reduced fee potential")
 
     # Memecoin sector signal
-    if context["memecoin_sector"].get("sentiment") in ["bullish", "positive"]:
+    if source("memecoin_sector").get("sentiment") in ["bullish", "positive"]:
         signals.append("✅ Memecoin sector strong: tailwind for VISTA/BONZI")
-    elif context["memecoin_sector"].get("sentiment") == "bearish":
+    elif source("memecoin_sector").get("sentiment") == "bearish":
         signals.append("⚠️ Memecoin sector weak: headwind for sentiment")
 
     # BTC dominance signal
-    if context["btc_dominance"].get("season") == "alt_season":
+    if source("btc_dominance").get("season") == "alt_season":
         signals.append("✅ Alt season: favorable for smaller caps")
-    elif context["btc_dominance"].get("season") == "btc_dominant":
+    elif source("btc_dominance").get("season") == "btc_dominant":
         signals.append("⚠️ BTC dominant: capital concentrated in Bitcoin")
 
-    context["signals"] = signals
+    return signals
+
+
+def fetch_market_context(previous: dict | None = None, deadline_s: float = MARKET_DEADLINE_S) -> dict:
+    """Fetch all external market data, the five sources concurrently, within deadline_s.
+
+    A source that fails or has not answered by the deadline keeps its value from
+    `previous` (the market_context last written). context["sources"] says which
+    values are fresh, stale (with the time they were fetched) or missing; the
+    signals only use fresh ones.
+    """
+    print("\n=== MARKET CONTEXT ===")
+    previous = previous or {}
+    started = time.monotonic()
+    fetched_at = datetime.now().strftime("%Y-%m-%d %H:%M UTC")
+
+    # A straggler is left behind at the deadline: its calls time out by then (_get).
+    pool = ThreadPoolExecutor(max_workers=len(MARKET_SOURCES), thread_name_prefix="market")
+    deadline = started + deadline_s
+    futures = {name: pool.submit(_fetch_by, fetch, deadline) for name, fetch in MARKET_SOURCES.items()}
+    wait(futures.values(), timeout=deadline_s)
+    pool.shutdown(wait=False)
+
+    context = {"fetched_at": fetched_at}
+    sources = {}
+    previous_sources = previous.get("sources") or {}
+    for name, future in futures.items():
+        result, finished = future.result() if future.done() else (None, deadline)
+        if _has_data(result):
+            context[name] = result
+            sources[name] = {"status": "fresh", "as_of": fetched_at}
+            continue
+        # A call cut short by the deadline fails with a timeout right at it.
+        reason = "timeout" if finished >= deadline else "error"
+        last = previous.get(name)
+        if _has_data(last):
+            as_of = (previous_sources.get(name) or {}).get("as_of") or previous.get("fetched_at")
+            context[name] = last
+            sources[name] = {"status": "stale", "as_of": as_of, "reason": reason}
+        else:
+            context[name] = result or {}
+            sources[name] = {"status": "missing", "as_of": None, "reason": reason}
+
+    context["sources"] = sources
+    context["signals"] = market_signals(context, {n for n, s in sources.items() if s["status"] == "fresh"})
 
     print(f"  ETH: ${context['eth'].get('price_usd')} ({context['eth'].get('change_24h_pct')}%)")
     print(f"  Gas: {context['gas'].get('standard_gwei')} gwei ({context['gas'].get('level')})")
     print(f"  DEX Vol: {context['dex_volume'].get('volume_24h_formatted')}")
     print(f"  Memecoin sector: {context['memecoin_sector'].get('sentiment')}")
     print(f"  BTC dominance: {context['btc_dominance'].get('btc_dominance_pct')}%")
+    fresh = sum(1 for s in sources.values() if s["status"] == "fresh")
+    print(f"  {fresh}/{len(sources)} sources fresh in {time.monotonic() - started:.2f}s")
+    for name, s in sources.items():
+        if s["status"] != "fresh":
+            print(f"  {name}: {s['status']} ({s['reason']}), as of {s['as_of']}")
 
     return context
 
 
-def main():
-    if not API_KEY:
-        print("Error: DUNE_API_KEY not set")
-        print("Export it: export DUNE_API_KEY=your_key_here")
-        return
+def render_pages():
+    """Pre-render metrics pages from the JSON just written (render_metrics_page.py)."""
+    try:
+        from render_metrics_page import render_all
 
-    print("Fetching VISTA and BONZI metrics from Dune...\n")
+        for page in render_all():
+            print(f"Rendered {page.name}")
+    except Exception as e:
+        print(f"Note: metrics page pre-render skipped: {e}")
 
-    # Load existing data to preserve educational/benchmark sections
-    output_path = os.path.join(os.path.dirname(__file__), 'metrics-data.json')
-    existing = {}
+
+def load_existing(output_path: str) -> dict:
+    """Current metrics-data.json (educational/benchmark sections are carried over)."""
     try:
         with open(output_path) as f:
-            existing = json.load(f)
+            return json.load(f)
     except FileNotFoundError:
-        pass
+        return {}
+
 
-    # Initialize metrics structure
+def assemble_metrics(vista: dict, bonzi: dict, market_context: dict, existing: dict) -> dict:
+    """Build the metrics-data.json document from the per-token and market results."""
     metrics = {
         "updated": datetime.now().strftime("%Y-%m-%d"),
-        "vista": {},
-        "bonzi": {},
+        "vista": vista,
+        "bonzi": bonzi,
         "dune_queries": QUERIES,
         "contracts": CONTRACTS,
+        "market_context": market_context,
     }
 
-    # Fetch VISTA metrics
-    print("=== VISTA ===")
-    metrics['vista'] = fetch_token_metrics('vista', QUERIES)
-
     # Manual overrides for missing queries
     if not metrics['vista'].get('hhi_score'):
         metrics['vista']['hhi_score'] = 691  # Manual value since query was overwritten
 
-    # Fetch BONZI metrics
-    print("\n=== BONZI ===")
-    metrics['bonzi'] = fetch_token_metrics('bonzi', QUERIES)
-
-    # Fetch external market context
-    metrics['market_context'] = fetch_market_context()
-
     # Preserve educational tooltips and benchmarks from existing file
     if existing.get('educational'):
         metrics['educational'] = existing['educational']
     if existing.get('benchmarks'):
         metrics['benchmarks'] = existing['benchmarks']
+    return metrics
 
-    # Save to JSON
-    with open(output_path, 'w') as f:
-        json.dump(metrics, f, indent=2)
 
-    print(f"\nSaved to {output_path}")
+def main():
+    if not API_KEY:
+        print("Error: DUNE_API_KEY not set")
+        print("Export it: export DUNE_API_KEY=your_key_here")
+        return
 
-    try:
-        import subprocess
-        import sys
-
-        bs = Path(__file__).resolve().parent / "build_staking_analytics.py"
-        if bs.is_file():
-            r = subprocess.run([sys.executable, str(bs)], cwd=str(bs.parent), check=False)
-            if r.returncode != 0:
-                print(f"Warning: build_staking_analytics.py exited {r.returncode} (staking_analytics.json not refreshed)")
-            else:
-                print("Merged staking_analytics.json (run validate_staking_analytics.py before publish).")
-    except Exception as e:
-        print(f"Note: staking analytics merge skipped: {e}")
+    print("Fetching VISTA and BONZI metrics from Dune...\n")
+
+    # Dune, market context and the on-chain snapshot run concurrently; the staking
+    # analytics build, validation and page render reuse them in memory (pipeline.py).
+    from pipeline import run_pipeline
 
+    result = run_pipeline()
+    for name, reason in result.failed.items():
+        print(f"Warning: stage {name} failed: {reason}")
+    if "analytics" in result.outputs:
+        print("Merged staking_analytics.json.")
+
+    metrics = result.outputs.get('metrics_data') or {}
     print(f"\n=== SIGNALS ===")
-    for signal in metrics['market_context'].get('signals', []):
+    for signal in metrics.get('market_context', {}).get('signals', []):
         print(f"  {signal}")
 
 
+def with_market_context(metrics: dict, market: dict) -> dict:
+    """Put a fresh market context into metrics (in place) and return it."""
+    metrics['market_context'] = market
+    metrics['market_context']['updated'] = datetime.now().strftime("%Y-%m-%d %H:%M UTC")
+    return metrics
+
+
 def update_market_only():
     """Quick update of just market context (no Dune API calls)."""
     print("Updating market context only...\n")
+    tracing.start("market-only")
 
     # Load existing metrics
     output_path = os.path.join(os.path.dirname(__file__), 'metrics-data.json')
@@ -619,23 +879,140 @@ def update_market_only():
         print("Error: metrics-data.json not found. Run full fetch first.")
         return
 
-    # Update market context
-    metrics['market_context'] = fetch_market_context()
-    metrics['market_context']['updated'] = datetime.now().strftime("%Y-%m-%d %H:%M UTC")
+    # Update market context; sources that miss the deadline keep their last good value
+    with_market_context(metrics, fetch_market_context(metrics.get('market_context')))
 
     # Save
-    with open(output_path, 'w') as f:
-        json.dump(metrics, f, indent=2)
+    delta.write_json(Path(output_path), metrics)
 
     print(f"\nMarket context updated in {output_path}")
+    render_pages()
+    tracing.write_report()
     print(f"\n=== SIGNALS ===")
     for signal in metrics['market_context'].get('signals', []):
         print(f"  {signal}")
 
 
+# =============================================================================
+# MARKET BENCHMARK
+# =============================================================================
+
+# Recorded-shape answers for the five market calls, served by the replay.py stand-in.
+_MARKET_FIXTURES = {
+    "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd&include_24hr_change=true":
+        {"ethereum": {"usd": 2950.11, "usd_24h_change": -0.07}},
+    "https://api.etherscan.io/api?module=gastracker&action=gasoracle":
+        {"status": "1", "result": {"SafeGasPrice": "8", "ProposeGasPrice": "9", "FastGasPrice": "11"}},
+    "https://api.llama.fi/overview/dexs?excludeTotalDataChart=true&excludeTotalDataChartBreakdown=true":
+        {"total24h": 8906890392, "change_1d": -24.87},
+    "https://api.coingecko.com/api/v3/simple/price?ids=pepe,shiba-inu,dogecoin,floki,bonk&vs_currencies=usd&include_24hr_change=true":
+        {c: {"usd": 1e-05, "usd_24h_change": 1.5} for c in ("pepe", "shiba-inu", "dogecoin", "floki", "bonk")},
+    "https://api.coingecko.com/api/v3/global":
+        {"data": {"market_cap_percentage": {"btc": 57.45, "eth": 11.5}}},
+}
+
+
+def market_bench(argv: list[str]) -> int:
+    """Time fetch_market_context end to end against the replay.py stand-in, at --deadline and at
+    MARKET_DEADLINE_S (what the refresh ships); 1 if the --deadline p95 misses the target."""
+    import argparse
+    import contextlib
+    import io
+    import tempfile
+    from urllib.parse import urlsplit
+
+    ap = argparse.ArgumentParser(prog="fetch_metrics.py --market-bench",
+                                 description="p50/p95 of the market context fetch against local stand-ins.")
+    ap.add_argument("--runs", type=int, default=40)
+    ap.add_argument("--deadline", type=float, default=MARKET_BENCH_DEADLINE_S,
+                    help=f"Seconds (default {MARKET_BENCH_DEADLINE_S:g}; the refresh ships {MARKET_DEADLINE_S:g})")
+    ap.add_argument("--shipped-runs", type=int, default=10, help="Runs at the shipped MARKET_DEADLINE_S")
+    ap.add_argument("--latency-ms", type=float, default=150.0, help="Stand-in latency for every upstream")
+    ap.add_argument("--jitter-ms", type=float, default=100.0)
+    ap.add_argument("--upstream-latency", action="append", default=None, metavar="NAME=MS",
+                    help="Per-upstream latency (default: defillama=3000, one upstream far past the deadline)")
+    ap.add_argument("--error-rate", type=float, default=0.02, help="Fraction answered with HTTP 502")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--sequential", action="store_true", help="Also time the old one-source-at-a-time fetch")
+    args = ap.parse_args(argv)
+
+    interactions = []
+    for url, body in _MARKET_FIXTURES.items():
+        parts = urlsplit(url)
+        interactions.append({
+            "key": replay.interaction_key("GET", parts.netloc, parts.path, parts.query, None),
+            "host": parts.netloc, "method": "GET", "path": parts.path, "query": parts.query,
+            "status": 200, "content_type": "application/json", "body": json.dumps(body),
+        })
+    faults = replay.Faults(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        upstream_latency=replay.parse_upstream_latency(args.upstream_latency or ["defillama=3000"]),
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cassette = Path(tmp) / "market.json"
+        cassette.write_text(json.dumps({"interactions": interactions}), encoding="utf-8")
+        srv = replay.start_server(cassette, faults=faults)
+        os.environ[replay.BASE_ENV] = srv.base_url
+        try:
+            def timed(fetch) -> tuple[float, dict]:
+                t0 = time.monotonic()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    out = fetch()
+                return time.monotonic() - t0, out
+
+            # One run to have a last good value for every source, as metrics-data.json would.
+            _, last = timed(lambda: fetch_market_context(deadline_s=30))
+
+            def runs(n: int, deadline_s: float) -> tuple[list[float], dict[str, int]]:
+                nonlocal last
+                took, statuses = [], {}
+                for _ in range(n):
+                    secs, last = timed(lambda: fetch_market_context(last, deadline_s))
+                    took.append(secs)
+                    for s in last["sources"].values():
+                        statuses[s["status"]] = statuses.get(s["status"], 0) + 1
+                return took, statuses
+
+            took, statuses = runs(args.runs, args.deadline)
+            shipped, shipped_statuses = runs(args.shipped_runs, MARKET_DEADLINE_S) if args.shipped_runs else ([], {})
+            rows = [("concurrent, deadline %gs" % args.deadline, took, statuses)]
+            if shipped:
+                rows.append(("concurrent, shipped %gs" % MARKET_DEADLINE_S, shipped, shipped_statuses))
+            if args.sequential:
+                seq = [timed(lambda: {n: f() for n, f in MARKET_SOURCES.items()})[0] for _ in range(min(args.runs, 5))]
+                rows.append(("sequential (before)", seq, {}))
+        finally:
+            os.environ.pop(replay.BASE_ENV, None)
+            srv.shutdown()
+
+    print(f"Market context fetch, {args.runs} runs against {srv.base_url} "
+          f"({args.latency_ms:g}±{args.jitter_ms:g} ms, {', '.join(args.upstream_latency or ['defillama=3000'])}):")
+    for label, values, counts in rows:
+        print(f"  {label:<28} p50 {tracing.percentile(values, 0.5) * 1000:7.0f} ms  "
+              f"p95 {tracing.percentile(values, 0.95) * 1000:7.0f} ms  max {max(values) * 1000:7.0f} ms")
+        if counts:
+            print(f"  {'':<28} sources: " + ", ".join(f"{n} {k}" for k, n in sorted(counts.items())))
+    p95 = tracing.percentile(took, 0.95)
+    ok = p95 <= MARKET_P95_TARGET_S
+    print(f"  p95 {p95:.2f}s at the {args.deadline:g}s deadline {'within' if ok else 'OVER'} the {MARKET_P95_TARGET_S:g}s target")
+    if shipped:
+        print(f"  p95 {tracing.percentile(shipped, 0.95):.2f}s at the shipped {MARKET_DEADLINE_S:g}s deadline "
+              f"({shipped_statuses.get('fresh', 0)} of {sum(shipped_statuses.values())} source fetches fresh)")
+    return 0 if ok else 1
+
 if __name__ == '__main__':
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == '--market-only':
         update_market_only()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--market-bench':
+        sys.exit(market_bench(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == '--daemon':
+        # Long-running mode; remaining args go to daemon.py (see daemon.py --help).
+        import daemon
+        sys.exit(daemon.main(sys.argv[2:]))
     else:
         main()
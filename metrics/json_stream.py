@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON array reader for large API responses (Dune result pages).
+
+iter_array(chunks, ("result", "rows")) walks a JSON object arriving as byte
+chunks (requests' iter_content) down the given key path and yields the
+elements of the array found there one at a time. Only the current element
+and the unread tail of the last chunk are held in memory, so a page of tens
+of thousands of rows costs about as much as one row. Stop iterating (break,
+islice) and nothing after that element is read.
+
+Values met on the way that are not on the path (execution_id, state,
+next_offset, result.metadata, ...) are parsed whole and, when a dict is
+passed as `found`, stored under their dotted path ("result.metadata"). If
+the path ends early (result: null), `found` gets that value and nothing is
+yielded. Stdlib only: json.JSONDecoder.raw_decode does the element parsing.
+
+  python3 json_stream.py bench [--rows 50000]   # peak RSS: response.json() vs iter_array
+  python3 json_stream.py check [--runs 2000]    # iter_array == json.loads at random chunk splits
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import json
+import sys
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+_WS = " \t\n\r"
+# What may follow a complete number or literal.
+_AFTER_SCALAR = ",]}" + _WS
+_DECODER = json.JSONDecoder()
+# Drop consumed text once this much has piled up at the front of the buffer.
+_COMPACT_AT = 1 << 16
+
+
+class _Reader:
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        """Append the next chunk; False once the input is exhausted."""
+        if self.eof:
+            return False
+        if self.pos >= _COMPACT_AT:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        for chunk in self._chunks:
+            text = self._utf8.decode(chunk)
+            if text:
+                self.buf += text
+                return True
+        self.buf += self._utf8.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Next non-whitespace character, not consumed."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self.more():
+                raise ValueError("unexpected end of JSON input")
+
+    def take(self, allowed: str) -> str:
+        c = self.peek()
+        if c not in allowed:
+            raise ValueError(f"expected one of {allowed!r}, got {c!r}")
+        self.pos += 1
+        return c
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                v, end = _DECODER.raw_decode(self.buf, self.pos)
+                # A number cut by a chunk boundary ("12." + "5") decodes short: unless the value
+                # closed itself (string, array, object), it is only whole once a delimiter follows.
+                if self.eof or self.buf[end - 1] in '"]}' or (end < len(self.buf) and self.buf[end] in _AFTER_SCALAR):
+                    self.pos = end
+                    return v
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.more()
+
+
+def _walk(r: _Reader, path: tuple[str, ...], found: dict[str, Any] | None, prefix: str) -> Iterator[Any]:
+    r.take("{")
+    if r.peek() == "}":
+        r.pos += 1
+        return
+    while True:
+        key = r.value()
+        if not isinstance(key, str):
+            raise ValueError("object key is not a string")
+        r.take(":")
+        opener = "[" if len(path) == 1 else "{"
+        if path and key == path[0] and r.peek() == opener:
+            if len(path) > 1:
+                yield from _walk(r, path[1:], found, f"{prefix}{key}.")
+            else:
+                r.pos += 1
+                if r.peek() == "]":
+                    r.pos += 1
+                else:
+                    while True:
+                        yield r.value()
+                        if r.take(",]") == "]":
+                            break
+        else:
+            v = r.value()
+            if found is not None:
+                found[prefix + key] = v
+        if r.take(",}") == "}":
+            return
+
+
+def iter_array(
+    chunks: Iterable[bytes],
+    path: tuple[str, ...],
+    found: dict[str, Any] | None = None,
+) -> Iterator[Any]:
+    """Elements of the array at `path` in the JSON object read from `chunks`."""
+    r = _Reader(chunks)
+    yield from _walk(r, path, found, "")
+    while True:
+        rest = r.buf[r.pos:].strip(_WS)
+        if rest:
+            raise ValueError(f"unexpected data after JSON object: {rest[:20]!r}")
+        r.pos = len(r.buf)
+        if not r.more():
+            return
+
+
+def project(rows: Iterable[dict[str, Any]], columns: Iterable[str] | None) -> Iterator[dict[str, Any]]:
+    """Keep only `columns` of each row (all of them when None)."""
+    if columns is None:
+        yield from rows
+        return
+    cols = tuple(columns)
+    for row in rows:
+        yield {c: row.get(c) for c in cols}
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def _page(n_rows: int) -> bytes:
+    """A Dune-shaped results body with per-wallet leaderboard rows."""
+    rows = ",".join(
+        json.dumps({
+            "rank": i + 1,
+            "wallet": f"0x{i:040x}",
+            "staked_tokens": 1_000_000.0 / (i + 1),
+            "eth_claimed": 12.5 / (i + 1),
+            "first_stake": "2024-12-01 00:00:00.000 UTC",
+            "stakes": i % 17,
+            "unstakes": i % 5,
+        })
+        for i in range(n_rows)
+    )
+    return (
+        '{"execution_id":"01BENCH","query_id":1,"is_execution_finished":true,"state":"QUERY_STATE_COMPLETED",'
+        f'"result":{{"rows":[{rows}],"metadata":{{"column_names":["rank","wallet"],"total_row_count":{n_rows}}}}},'
+        '"next_offset":null}'
+    ).encode()
+
+
+def check(runs: int, seed: int = 1) -> int:
+    """Split random Dune-shaped bodies at random byte offsets; the number of runs that parsed differently."""
+    import random
+
+    rng = random.Random(seed)
+    scalars = (
+        lambda: rng.randint(-10**6, 10**6),
+        lambda: rng.uniform(-1e3, 1e3),
+        lambda: rng.uniform(-1, 1) * 10**rng.randint(-30, 30),  # exponents: 1e-05, 3.2e+21
+        lambda: rng.choice((True, False, None)),
+        lambda: "é✓" * rng.randint(0, 3),
+    )
+    failures = 0
+    for i in range(runs):
+        rows = [
+            rng.choice(scalars)() if rng.random() < 0.5 else {"v": rng.choice(scalars)(), "w": [rng.choice(scalars)()]}
+            for _ in range(rng.randint(0, 8))
+        ]
+        body = json.dumps({"state": "QUERY_STATE_COMPLETED", "result": {"rows": rows, "metadata": {"n": len(rows)}},
+                           "next_offset": rng.choice((None, 12, 1.5))}, ensure_ascii=False,
+                          separators=rng.choice(((",", ":"), (", ", ": ")))).encode()
+        cuts = sorted(rng.sample(range(1, len(body)), min(len(body) - 1, rng.randint(1, 12))))
+        chunks = [body[a:b] for a, b in zip([0] + cuts, cuts + [len(body)])]
+        found: dict[str, Any] = {}
+        try:
+            got = list(iter_array(chunks, ("result", "rows"), found))
+            want = json.loads(body)
+            ok = got == want["result"]["rows"] and found.get("next_offset") == want["next_offset"]
+        except ValueError as e:
+            got, ok = e, False
+        if not ok:
+            failures += 1
+            if failures <= 3:
+                print(f"  run {i}: chunks {chunks!r} -> {got!r}")
+    print(f"{runs - failures}/{runs} random chunk splits parsed like json.loads")
+    return failures
+
+
+def _rss_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+
+
+def _bench_child(mode: str, path: str, take: int | None) -> None:
+    import time
+
+    # Reset the high-water mark so interpreter start-up does not hide the parse (Linux).
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    base = _rss_kb("VmRSS")
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        chunks = iter(lambda: f.read(65536), b"")  # what iter_content(65536) yields off the socket
+        if mode == "json":
+            rows = json.loads(b"".join(chunks))["result"]["rows"]  # response.json()
+            kept = rows[:take] if take else rows
+        else:
+            it = project(iter_array(chunks, ("result", "rows")), ("wallet", "eth_claimed"))
+            kept = list(islice(it, take) if take else it)
+    took = time.perf_counter() - t0
+    peak = _rss_kb("VmHWM")
+    print(json.dumps({"rows": len(kept), "extra_rss_mb": round((peak - base) / 1024, 1), "ms": round(took * 1000)}))
+
+
+def bench(n_rows: int) -> None:
+    import os
+    import subprocess
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        f.write(_page(n_rows))
+    try:
+        print(f"Peak RSS growth while reading a {os.path.getsize(f.name) / 1e6:.1f} MB page of {n_rows} rows:")
+        # One interpreter per case, so memory freed by one case cannot be reused by the next.
+        for take in (None, 12, 1):
+            for mode, label in (("json", "response.json()"), ("stream", "iter_array + 2-column project")):
+                out = subprocess.run(
+                    [sys.executable, __file__, "_child", mode, f.name, str(take or 0)],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                r = json.loads(out)
+                print(f"  {label:<30} {'all' if take is None else f'first {take}':>8} rows: "
+                      f"+{r['extra_rss_mb']:>6} MB  {r['ms']:>6} ms")
+    finally:
+        os.unlink(f.name)
+
+
+def main() -> int:
+    if len(sys.argv) == 5 and sys.argv[1] == "_child":
+        _bench_child(sys.argv[2], sys.argv[3], int(sys.argv[4]) or None)
+        return 0
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="Peak RSS of response.json() vs iter_array on a synthetic page")
+    b.add_argument("--rows", type=int, default=50000)
+    c = sub.add_parser("check", help="Compare iter_array with json.loads over random chunk splits")
+    c.add_argument("--runs", type=int, default=2000)
+    args = ap.parse_args()
+    if args.cmd == "check":
+        # The reported case: a float cut right after its "." decoded as the integer before it.
+        assert list(iter_array([b'{"result":{"rows":[12.', b'5]}}'], ("result", "rows"))) == [12.5]
+        return 1 if check(args.runs) else 0
+    bench(args.rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Run the Dune staking SQL locally over the stake index.
+
+The staking templates in dune_queries.py (retention, diamond hands, tenure,
+weekly trend) are Trino SQL over ethereum.transactions. connect() loads the
+stake_index.py rows into an in-memory SQLite table of the same shape:
+
+  transactions(block_number, block_time, tx_index, "from", "to", data, success)
+
+"from" and "to" are 20-byte blobs, data the 4-byte selector (all the queries
+read of it), block_time 'YYYY-MM-DD HH:MM:SS' UTC text, with indexes on
+("to", "from", block_time) and ("to", block_time). to_sqlite() rewrites the
+few Trino-isms -- 0x... varbinary literals to X'...' blobs, DATE '...' to a
+timestamp string, ethereum.transactions to the local table -- and
+bytearray_substring, date_trunc, date_diff and now() are registered as
+functions (now() pinned per connection). The query text is otherwise run as
+written, so a metric refresh is a few milliseconds and no Dune credits.
+
+Each query is the one dune_queries.render() pushes to Dune for the token.
+metrics_from_rows() maps result rows to the metrics-data.json fields exactly
+as fetch_metrics.fetch_token_metrics does, for local and Dune rows alike.
+
+--parity checks the engine twice per token: against
+stake_index.token_metrics (the same semantics in plain Python; any difference
+is a failure) and against recorded Dune output -- the raw result rows in a
+replay.py cassette (--cassette, with now() pinned to its recording time) or,
+without one, the Dune-derived fields in metrics-data.json. Dune sees the whole
+chain up to its own refresh while the index starts at --from-block and stops
+at the finalized head, so the second check only reports differences unless
+--strict. A cassette that also carries the transactions the Dune rows were
+computed from (cassettes/local_sql_parity.json) replaces the stake index: both
+sides then see the same chain, so every difference, and every query the
+cassette lacks, fails.
+
+Usage:
+  python3 local_sql.py                                  # local metrics for every token
+  python3 local_sql.py --query tenure --token bonzi     # one query's raw rows
+  python3 local_sql.py --sql 'SELECT COUNT(*) AS n FROM ethereum.transactions'
+  python3 local_sql.py --parity [--cassette cassettes/dune.json] [--strict]
+  python3 local_sql.py --parity --cassette cassettes/local_sql_parity.json
+  python3 fake_node.py run --history 20000 --touch-rate 0.5 -- python3 local_sql.py --sync --parity
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import build_staking_analytics as bsa
+import dune_queries
+import fetch_metrics as fm
+import stake_index
+from token_registry import Token
+
+HERE = Path(__file__).resolve().parent
+METRIC_QUERIES = ("staker_retention", "diamond_hands", "tenure", "weekly_trend")
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+_HEX = re.compile(r"\b0x([0-9a-fA-F]+)\b")
+_DATE = re.compile(r"\bDATE\s+'(\d{4}-\d{2}-\d{2})'", re.IGNORECASE)
+_TABLE = re.compile(r"\bethereum\.transactions\b", re.IGNORECASE)
+_UNIT_S = {"second": 1, "minute": 60, "hour": 3600, "day": 86400, "week": 7 * 86400}
+
+
+def to_sqlite(sql: str) -> str:
+    """Trino literals and table name -> SQLite; the query structure is left alone."""
+    sql = _DATE.sub(r"'\1 00:00:00'", sql)
+    sql = _HEX.sub(lambda m: f"X'{m.group(1)}'", sql)
+    return _TABLE.sub("transactions", sql)
+
+
+def _parse(ts: str) -> datetime:
+    return datetime.strptime(ts[:19], TIME_FMT)
+
+
+def _bytearray_substring(data: bytes | None, start: int, length: int) -> bytes | None:
+    return None if data is None else bytes(data[start - 1:start - 1 + length])
+
+
+def _date_trunc(unit: str, ts: str | None) -> str | None:
+    if ts is None:
+        return None
+    t = _parse(ts)
+    unit = unit.lower()
+    if unit == "week":  # ISO weeks start on Monday
+        t = t - timedelta(days=t.weekday())
+    elif unit == "month":
+        t = t.replace(day=1)
+    elif unit != "day":
+        raise ValueError(f"date_trunc: unsupported unit {unit!r}")
+    return t.strftime("%Y-%m-%d 00:00:00")
+
+
+def _date_diff(unit: str, a: str | None, b: str | None) -> int | None:
+    if a is None or b is None:
+        return None
+    secs = int((_parse(b) - _parse(a)).total_seconds())
+    step = _UNIT_S[unit.lower()]
+    return secs // step if secs >= 0 else -(-secs // step)  # whole units, truncated toward zero
+
+
+def connect(index: stake_index.StakeIndex, now: datetime | None = None) -> sqlite3.Connection:
+    """In-memory ethereum.transactions holding the index rows; now() is fixed at `now` (default: connect time)."""
+    conn = sqlite3.connect(":memory:")
+    now_text = (now or datetime.now(timezone.utc)).strftime(TIME_FMT)
+    conn.create_function("bytearray_substring", 3, _bytearray_substring, deterministic=True)
+    conn.create_function("date_trunc", 2, _date_trunc, deterministic=True)
+    conn.create_function("date_diff", 3, _date_diff, deterministic=True)
+    conn.create_function("now", 0, lambda: now_text, deterministic=True)
+    conn.execute(
+        'CREATE TABLE transactions (block_number INTEGER, block_time TEXT, tx_index INTEGER,'
+        ' "from" BLOB, "to" BLOB, data BLOB, success BOOLEAN)'
+    )
+    to = [bytes.fromhex(c[2:]) for c in index.contracts]
+    conn.executemany(
+        "INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((n, time.strftime(TIME_FMT, time.gmtime(ts)), i, frm, to[c], sel, ok)
+         for n, ts, i, frm, sel, c, ok in index.rows),
+    )
+    conn.execute('CREATE INDEX tx_to_from_time ON transactions ("to", "from", block_time)')
+    conn.execute('CREATE INDEX tx_to_time ON transactions ("to", block_time)')
+    conn.commit()
+    return conn
+
+
+def run(conn: sqlite3.Connection, sql: str) -> list[dict[str, Any]]:
+    """Rows as Dune returns them: dicts keyed by column name, blobs as 0x hex."""
+    cur = conn.execute(to_sqlite(sql))
+    cols = [d[0] for d in cur.description]
+    return [
+        {c: "0x" + v.hex() if isinstance(v, bytes) else v for c, v in zip(cols, row)}
+        for row in cur
+    ]
+
+
+def metrics_from_rows(rows: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
+    """metrics-data.json fields from METRIC_QUERIES result rows (fetch_metrics.fetch_token_metrics' mapping)."""
+    out: dict[str, Any] = {
+        "total_stakers": None, "currently_staking": None, "retention_pct": None,
+        "diamond_hands": None, "diamond_hands_pct": None,
+        "avg_tenure_days": None, "max_tenure_days": None,
+        "weekly_trend": [], "net_flow_7d": None,
+    }
+    retention = rows.get("staker_retention") or []
+    staking = sum(r.get("wallets", 0) for r in retention if r.get("action") == "staking")
+    exited = sum(r.get("wallets", 0) for r in retention if r.get("action") == "exited")
+    total = staking + exited
+    if total:
+        out.update(currently_staking=staking, total_stakers=total, retention_pct=round(100 * staking / total, 1))
+    if rows.get("diamond_hands"):
+        out["diamond_hands"] = rows["diamond_hands"][0].get("diamond_hands")
+    if rows.get("tenure"):
+        row = rows["tenure"][0]
+        if row.get("avg_tenure_days") is not None:  # AVG over no stakers is NULL
+            out["avg_tenure_days"] = round(row["avg_tenure_days"])
+            out["max_tenure_days"] = row.get("max_tenure_days")
+    trend = [
+        {"week": (r.get("week") or "")[:10], "stakes": r.get("stakes", 0), "unstakes": r.get("unstakes", 0)}
+        for r in (rows.get("weekly_trend") or [])[:stake_index.WEEKS]
+    ]
+    out["weekly_trend"] = trend
+    if trend:
+        out["net_flow_7d"] = trend[0]["stakes"] - trend[0]["unstakes"]
+    if out["diamond_hands"] and out["total_stakers"]:
+        out["diamond_hands_pct"] = round(100 * out["diamond_hands"] / out["total_stakers"], 1)
+    return out
+
+
+def token_metrics(conn: sqlite3.Connection, token: Token) -> tuple[dict[str, Any], float]:
+    """(metrics, seconds spent in SQL) for one token."""
+    t0 = time.perf_counter()
+    rows = {name: run(conn, dune_queries.render(name, token).sql) for name in METRIC_QUERIES}
+    return metrics_from_rows(rows), time.perf_counter() - t0
+
+
+def recorded_dune_rows(cassette: Path, key: str) -> dict[str, list[dict[str, Any]]]:
+    """The last recorded full result rows of each of the token's METRIC_QUERIES in a replay.py cassette."""
+    data = json.loads(cassette.read_text(encoding="utf-8"))
+    found: dict[str, list[dict[str, Any]]] = {}
+    for name in METRIC_QUERIES:
+        qid = fm.QUERIES.get(f"{key}_{name}")
+        if not qid:
+            continue
+        for it in data.get("interactions", []):
+            # fetch_metrics asks for the rows it uses (?limit=N); later pages (offset) are not needed here
+            if (it.get("path") == f"/api/v1/query/{qid}/results" and it.get("status") == 200
+                    and "offset=" not in (it.get("query") or "")):
+                body = json.loads(it.get("body") or "{}")
+                found[name] = body.get("result", {}).get("rows", [])
+    return found
+
+
+def cassette_index(cassette: Path) -> stake_index.StakeIndex | None:
+    """The cassette's "transactions" (ethereum.transactions rows, hex text) as an in-memory stake index, if any."""
+    txs = json.loads(cassette.read_text(encoding="utf-8")).get("transactions")
+    if not txs:
+        return None
+    index = stake_index.StakeIndex(stake_index.hardstakes(), None)
+    contract = {c: i for i, c in enumerate(index.contracts)}
+    for tx in txs:
+        ts = int(datetime.strptime(tx["block_time"], TIME_FMT).replace(tzinfo=timezone.utc).timestamp())
+        index.rows.append((tx["block_number"], ts, tx["tx_index"], bytes.fromhex(tx["from"][2:]),
+                           bytes.fromhex(tx["data"][2:10]), contract[tx["to"].lower()], int(tx["success"])))
+    index.rows.sort(key=lambda r: (r[0], r[2]))
+    index.first_block, index.through_block = index.rows[0][0], index.rows[-1][0]
+    return index
+
+
+def _diff(a: dict[str, Any], b: dict[str, Any]) -> list[str]:
+    return [f for f in a if f in b and a[f] != b[f]]
+
+
+def parity(
+    index: stake_index.StakeIndex,
+    keys: list[str],
+    *,
+    cassette: Path | None = None,
+    strict: bool = False,
+) -> int:
+    """Compare local SQL with stake_index.token_metrics and recorded Dune output; the number of failures."""
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    if cassette is not None:
+        recorded = json.loads(cassette.read_text(encoding="utf-8")).get("recorded_at_utc")
+        if recorded:
+            now = datetime.strptime(recorded, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    conn = connect(index, now)
+    md = fm.load_existing(str(HERE / "metrics-data.json"))
+    failures = 0
+    for key in keys:
+        token = bsa.REGISTRY[key]
+        local, took = token_metrics(conn, token)
+        python = stake_index.token_metrics(index, token.hardstake, token.launch_date or "1970-01-01", now)
+        if cassette is not None:
+            dune_rows = recorded_dune_rows(cassette, key)
+            dune = metrics_from_rows(dune_rows) if dune_rows else {}
+            dune_from = f"cassette ({', '.join(sorted(dune_rows)) or 'no recorded queries'})"
+            if strict and len(dune_rows) < len(METRIC_QUERIES):
+                failures += 1
+                dune_from += f", missing {', '.join(q for q in METRIC_QUERIES if q not in dune_rows)}"
+        else:
+            dune = {f: v for f, v in (md.get(key) or {}).items() if f in local}
+            dune_from = "metrics-data.json"
+        index_diff = _diff(local, python)
+        dune_diff = _diff(local, dune)
+        failures += bool(index_diff) + bool(strict and dune_diff)
+        print(f"\n=== {token.symbol} ({took * 1000:.1f} ms) ===")
+        print(f"  vs stake_index.token_metrics: {'MISMATCH ' + ', '.join(index_diff) if index_diff else 'identical'}")
+        print(f"  vs Dune [{dune_from}]: {'differs in ' + ', '.join(dune_diff) if dune_diff else 'identical'}")
+        for field in index_diff + [f for f in dune_diff if f not in index_diff]:
+            print(f"    {field:<18} local={local[field]!s:.60}  index={python.get(field)!s:.60}  dune={dune.get(field)!s:.60}")
+    print(f"\nParity: {failures} failure(s) over {len(keys)} token(s); "
+          f"{len(index.rows)} indexed transaction(s), now() = {now:%Y-%m-%d %H:%M:%S}")
+    return failures
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", type=Path, default=stake_index.DEFAULT_PATH, help="Stake index file")
+    ap.add_argument("--sync", action="store_true", help="Scan the index up to the finalized head first")
+    ap.add_argument("--from-block", type=int, help="With --sync: first block of a fresh index")
+    ap.add_argument("--token", action="append", choices=sorted(bsa.REGISTRY), help="Tokens (repeatable; default all)")
+    ap.add_argument("--query", choices=METRIC_QUERIES, help="Print one query's rows per token")
+    ap.add_argument("--sql", help="Run arbitrary SQL (Trino literals allowed) and print the rows")
+    ap.add_argument("--parity", action="store_true", help="Compare with stake_index and recorded Dune output")
+    ap.add_argument("--cassette", type=Path, help="With --parity: replay.py cassette holding Dune results")
+    ap.add_argument("--strict", action="store_true", help="With --parity: differences from Dune also fail")
+    args = ap.parse_args()
+
+    try:
+        fixture = cassette_index(args.cassette) if args.parity and args.cassette else None
+        if fixture is not None:
+            index, args.strict = fixture, True
+        elif args.sync:
+            index = stake_index.sync(bsa.pick_working_rpc(bsa.resolve_rpc_urls()), args.path, from_block=args.from_block)
+        else:
+            index = stake_index.StakeIndex(stake_index.hardstakes(), args.path)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {type(e).__name__}: {e}")
+        return 1
+    if index.through_block is None:
+        print(f"Error: no stake index at {args.path} (run stake_index.py or pass --sync)")
+        return 1
+    keys = args.token or list(bsa.REGISTRY)
+
+    if args.parity:
+        return 1 if parity(index, keys, cassette=args.cassette, strict=args.strict) else 0
+
+    t0 = time.perf_counter()
+    conn = connect(index)
+    print(f"Loaded {len(index.rows)} transaction(s) (blocks {index.first_block}..{index.through_block}) "
+          f"in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    if args.sql:
+        for row in run(conn, args.sql):
+            print(json.dumps(row))
+        return 0
+    for key in keys:
+        token = bsa.REGISTRY[key]
+        if args.query:
+            print(f"\n=== {token.symbol}: {args.query} ===")
+            for row in run(conn, dune_queries.render(args.query, token).sql):
+                print(f"  {json.dumps(row)}")
+            continue
+        metrics, took = token_metrics(conn, token)
+        print(f"\n=== {token.symbol} ({took * 1000:.1f} ms) ===")
+        for field, value in metrics.items():
+            if field == "weekly_trend":
+                value = json.dumps(value[:3]) + (" ..." if len(value) > 3 else "")
+            print(f"  {field:<18} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Metrics refresh pipeline: Dune, market, on-chain, analytics, validation, render as one DAG.
+
+fetch_metrics.py used to write metrics-data.json and then start
+build_staking_analytics.py in a second interpreter, which re-read the JSON and
+re-fetched prices. Here every stage runs in-process and receives its inputs
+as Python objects:
+
+  dune_merged? ─┬─> dune_vista ─┐
+                └─> dune_bonzi ─┼─> metrics_data ─┬─> analytics ─> validate
+  market ───────────────────────┘                 │       ^
+  onchain ────────────────────────────────────────┼───────┤
+  claims? ────────────────────────────────────────┼───────┘
+                                                  └─> render (staking: analytics, if it succeeded)
+
+onchain and analytics cover every token in tokens.json (one
+staking_analytics*.json per token + staking_analytics.index.json); a token
+that fails is reported and skipped without holding back the others.
+
+Dune queries are executed, read, served from cache or skipped under the
+run's credit and rate budget (dune_budget.py).
+
+dune_merged fetches the merged multi-token Dune queries (dune_queries.py
+--merged) once; each dune_<token> stage takes its rows from there and only
+runs its own queries for the rest. Without merged queries, or if the stage
+fails, the per-token queries are used.
+
+claims catches the local claims ledger (claims_ledger.py) up to the chain
+head; analytics then publishes its ETH-distributed figures instead of the
+Dune ones. If it fails, analytics falls back to the Dune figures.
+
+Stages whose inputs are ready run concurrently (thread pool; they are I/O
+bound). Each successful output is cached as JSON in .pipeline-cache/, so a
+partial run picks up upstream results from the last run instead of refetching.
+
+Every run writes run-report.jsonl / run-report.txt (tracing.py): each
+outbound call and stage timing. --profile also captures a cProfile of the
+analytics build to run-profile.analytics.pstats.
+
+Usage:
+  python3 pipeline.py                      # full refresh (needs DUNE_API_KEY)
+  python3 pipeline.py --from analytics     # analytics + everything downstream
+  python3 pipeline.py --only onchain,analytics
+  python3 pipeline.py --from analytics --profile
+  python3 pipeline.py --list
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import build_staking_analytics as bsa
+import delta
+import fetch_metrics as fm
+import schema
+import tracing
+import validate_staking_analytics as vsa
+
+HERE = Path(__file__).resolve().parent
+CACHE_DIR = HERE / ".pipeline-cache"
+DEFAULT_WORKERS = 4
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    metrics_path: Path = HERE / "metrics-data.json"
+    # Per-token analytics files (tokens.json analytics_output) + staking_analytics.index.json.
+    analytics_dir: Path = HERE
+    pages_dir: Path = HERE
+    cache_dir: Path = CACHE_DIR
+    report_dir: Path = HERE
+    claims_path: Path = HERE / ".claims-ledger.json"
+    # Stages to run under cProfile (pstats written to report_dir).
+    profile: tuple[str, ...] = ()
+    rpc_urls: tuple[str, ...] = field(default_factory=lambda: tuple(bsa.resolve_rpc_urls()))
+
+    @property
+    def staking_path(self) -> Path:
+        """BONZI's file (staking_analytics.json): the one stake.html and the metrics pages read."""
+        return self.analytics_dir / bsa.BONZI.analytics_output
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    run: Callable[..., Any]
+    deps: tuple[str, ...] = ()
+    # Waited for, but a failure hands the stage None instead of skipping it.
+    soft_deps: tuple[str, ...] = ()
+
+
+@dataclass
+class RunResult:
+    outputs: dict[str, Any] = field(default_factory=dict)
+    failed: dict[str, str] = field(default_factory=dict)
+    durations: dict[str, float] = field(default_factory=dict)
+    cached: list[str] = field(default_factory=list)
+
+
+# =============================================================================
+# STAGES - each receives the config plus its dependencies' outputs by name
+# =============================================================================
+
+def stage_dune_merged(cfg: PipelineConfig) -> dict[str, list]:
+    if not fm.API_KEY:
+        raise RuntimeError("DUNE_API_KEY not set")
+    return fm.fetch_merged(fm.QUERIES, fm.dune_scheduler())
+
+
+def _dune_token(token: str, merged: dict[str, list] | None) -> dict[str, Any]:
+    if not fm.API_KEY:
+        raise RuntimeError("DUNE_API_KEY not set")
+    print(f"=== {token.upper()} ===")
+    return fm.fetch_token_metrics(token, fm.QUERIES, merged, fm.dune_scheduler())
+
+
+def stage_dune_vista(cfg: PipelineConfig, dune_merged: dict[str, list] | None = None) -> dict[str, Any]:
+    return _dune_token("vista", dune_merged)
+
+
+def stage_dune_bonzi(cfg: PipelineConfig, dune_merged: dict[str, list] | None = None) -> dict[str, Any]:
+    return _dune_token("bonzi", dune_merged)
+
+
+def stage_market(cfg: PipelineConfig) -> dict[str, Any]:
+    # Sources that miss fm.MARKET_DEADLINE_S keep the value last written to metrics-data.json.
+    return fm.fetch_market_context(fm.load_existing(str(cfg.metrics_path)).get("market_context"))
+
+
+def stage_onchain(cfg: PipelineConfig) -> dict[str, Any]:
+    tokens = list(bsa.REGISTRY.values())
+    chains, errors = bsa.read_onchain_many(tokens, list(cfg.rpc_urls))
+    for key, err in errors.items():
+        print(f"  onchain {key}: {err}")
+    if not chains:
+        raise RuntimeError("no token could be read: " + "; ".join(errors.values()))
+    return {"tokens": chains, "usd": bsa.fetch_token_usd([t.token for t in tokens])}
+
+
+def stage_claims(cfg: PipelineConfig) -> dict[str, Any]:
+    import claims_ledger
+
+    ledger, store, extra = claims_ledger.sync(bsa.pick_working_rpc(list(cfg.rpc_urls)), cfg.claims_path)
+    claims = claims_ledger.published(ledger, store, extra)
+    for key, agg in claims.items():
+        print(f"  claims {key}: {agg['total_eth_distributed']:.6f} ETH, {agg['unique_claimers']} claimers "
+              f"(through block {agg['through_block']})")
+    return claims
+
+
+def stage_metrics_data(
+    cfg: PipelineConfig,
+    dune_vista: dict[str, Any],
+    dune_bonzi: dict[str, Any],
+    market: dict[str, Any],
+) -> dict[str, Any]:
+    metrics = fm.assemble_metrics(dune_vista, dune_bonzi, market, fm.load_existing(str(cfg.metrics_path)))
+    delta.write_json(cfg.metrics_path, metrics)
+    print(f"\nSaved to {cfg.metrics_path}")
+    return metrics
+
+
+def stage_analytics(
+    cfg: PipelineConfig,
+    metrics_data: dict[str, Any],
+    onchain: dict[str, Any],
+    market: dict[str, Any],
+    claims: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Payload per token key (tokens whose on-chain read failed are left out)."""
+    # market_context already holds the CoinGecko ETH price; only fetch it if that call failed
+    # or missed the market deadline (a stale price is last run's).
+    fresh = ((market.get("sources") or {}).get("eth") or {}).get("status", "fresh") == "fresh"
+    eth_usd = (fresh and (market.get("eth") or {}).get("price_usd")) or bsa.fetch_eth_usd()
+    payloads, errors = bsa.build_payloads(
+        metrics_data,
+        list(cfg.rpc_urls),
+        tokens=[bsa.REGISTRY[k] for k in onchain["tokens"] if k in bsa.REGISTRY],
+        onchain=onchain["tokens"],
+        usd=onchain["usd"],
+        eth_usd=eth_usd,
+        claims=claims,
+    )
+    bsa.write_outputs(payloads, cfg.analytics_dir, errors=errors)
+    for key in payloads:
+        print(f"Wrote {cfg.analytics_dir / bsa.REGISTRY[key].analytics_output}")
+    for key, err in errors.items():
+        print(f"  analytics {key}: {err}")
+    if not payloads:
+        raise RuntimeError("; ".join(f"{k}: {e}" for k, e in errors.items()) or "no tokens")
+    return payloads
+
+
+def stage_validate(cfg: PipelineConfig, metrics_data: dict[str, Any], analytics: dict[str, Any]) -> list[str]:
+    # Leaderboards are not populated by any stage yet, so empty ones are allowed here.
+    errors: list[str] = []
+    for key, payload in analytics.items():
+        errs = vsa.validate_text(bsa.payload_text(payload), freshness_hours=None, allow_leaderboard_empty=True)
+        errors += [f"{bsa.REGISTRY[key].analytics_output}: {e}" for e in errs]
+    errors += [f"metrics-data: {e}" for e in schema.METRICS_DATA.validate(metrics_data)]
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    for key in analytics:
+        print(f"staking_analytics OK: {cfg.analytics_dir / bsa.REGISTRY[key].analytics_output}")
+    print(f"metrics-data OK: {cfg.metrics_path}")
+    return errors
+
+
+def stage_render(
+    cfg: PipelineConfig,
+    metrics_data: dict[str, Any],
+    analytics: dict[str, Any] | None,
+) -> list[str]:
+    from render_metrics_page import render_all
+
+    pages = render_all(
+        cfg.metrics_path,
+        cfg.staking_path,
+        cfg.pages_dir,
+        metrics=metrics_data,
+        staking=(analytics or {}).get(bsa.BONZI.key),
+    )
+    for page in pages:
+        print(f"Rendered {page.name}")
+    return [str(p) for p in pages]
+
+
+STAGES: dict[str, Stage] = {
+    s.name: s
+    for s in (
+        Stage("dune_merged", stage_dune_merged),
+        Stage("dune_vista", stage_dune_vista, soft_deps=("dune_merged",)),
+        Stage("dune_bonzi", stage_dune_bonzi, soft_deps=("dune_merged",)),
+        Stage("market", stage_market),
+        Stage("onchain", stage_onchain),
+        Stage("claims", stage_claims),
+        Stage("metrics_data", stage_metrics_data, deps=("dune_vista", "dune_bonzi", "market")),
+        Stage("analytics", stage_analytics, deps=("metrics_data", "onchain", "market"), soft_deps=("claims",)),
+        Stage("validate", stage_validate, deps=("metrics_data", "analytics")),
+        Stage("render", stage_render, deps=("metrics_data",), soft_deps=("analytics",)),
+    )
+}
+
+
+# =============================================================================
+# CACHE + SELECTION
+# =============================================================================
+
+def _cache_path(cfg: PipelineConfig, name: str) -> Path:
+    return cfg.cache_dir / f"{name}.json"
+
+
+def load_cached(cfg: PipelineConfig, name: str) -> tuple[bool, Any]:
+    try:
+        with open(_cache_path(cfg, name), encoding="utf-8") as f:
+            return True, json.load(f)["output"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return False, None
+
+
+def save_cached(cfg: PipelineConfig, name: str, output: Any) -> None:
+    cfg.cache_dir.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "stage": name,
+        "saved_at_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "output": output,
+    }
+    tmp = _cache_path(cfg, name).with_suffix(".tmp")
+    tmp.write_text(json.dumps(entry), encoding="utf-8")
+    tmp.replace(_cache_path(cfg, name))
+
+
+def _all_deps(stage: Stage) -> tuple[str, ...]:
+    return stage.deps + stage.soft_deps
+
+
+def downstream(name: str) -> set[str]:
+    """The stage itself plus everything that (transitively) consumes it."""
+    out = {name}
+    changed = True
+    while changed:
+        changed = False
+        for s in STAGES.values():
+            if s.name not in out and out.intersection(_all_deps(s)):
+                out.add(s.name)
+                changed = True
+    return out
+
+
+def select(only: list[str] | None = None, start: str | None = None) -> set[str]:
+    unknown = [n for n in (only or []) + ([start] if start else []) if n not in STAGES]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)} (see --list)")
+    if only:
+        return set(only)
+    if start:
+        return downstream(start)
+    return set(STAGES)
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+def _run_stage(stage: Stage, cfg: PipelineConfig, inputs: dict[str, Any]) -> tuple[Any, float]:
+    t0 = time.perf_counter()
+    if stage.name not in cfg.profile:
+        return stage.run(cfg, **inputs), time.perf_counter() - t0
+
+    prof = cProfile.Profile()
+    output = prof.runcall(stage.run, cfg, **inputs)
+    elapsed = time.perf_counter() - t0
+    out = cfg.report_dir / f"run-profile.{stage.name}.pstats"
+    prof.dump_stats(str(out))
+    buf = io.StringIO()
+    pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(15)
+    print(f"\n=== PROFILE {stage.name} ({out.name}) ===\n{buf.getvalue()}")
+    return output, elapsed
+
+
+def run_pipeline(
+    only: list[str] | None = None,
+    start: str | None = None,
+    *,
+    cfg: PipelineConfig | None = None,
+    workers: int = DEFAULT_WORKERS,
+    use_cache: bool = True,
+) -> RunResult:
+    cfg = cfg or PipelineConfig()
+    selected = select(only, start)
+    result = RunResult()
+    tracing.start("pipeline")
+
+    # Upstream outputs outside the selection come from the cache; a missing entry is run instead.
+    # Soft deps without a cache entry are simply absent (render falls back to the file on disk).
+    todo = set(selected)
+    absent: set[str] = set()
+    frontier = list(selected)
+    while frontier:
+        stage = STAGES[frontier.pop()]
+        for dep in _all_deps(stage):
+            if dep in todo or dep in result.outputs or dep in absent:
+                continue
+            hit, output = load_cached(cfg, dep) if use_cache else (False, None)
+            if hit:
+                result.outputs[dep] = output
+                result.cached.append(dep)
+                tracing.record_stage(dep, 0.0, "cached", cache="hit")
+            elif dep in stage.soft_deps:
+                absent.add(dep)
+            else:
+                print(f"  no cached output for {dep} - running it")
+                todo.add(dep)
+                frontier.append(dep)
+
+    running: dict[Future, str] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while todo or running:
+            for name in [n for n in STAGES if n in todo]:
+                stage = STAGES[name]
+                blocked = [d for d in stage.deps if d in result.failed]
+                if blocked:
+                    result.failed[name] = f"skipped: upstream {', '.join(blocked)} failed"
+                    tracing.record_stage(name, 0.0, "skipped")
+                    todo.discard(name)
+                    continue
+                deps = _all_deps(stage)
+                if all(d in result.outputs or d in result.failed or d in absent for d in deps):
+                    inputs = {d: result.outputs.get(d) for d in deps}
+                    running[pool.submit(_run_stage, stage, cfg, inputs)] = name
+                    todo.discard(name)
+            if not running:
+                if todo:
+                    raise RuntimeError(f"pipeline stalled with {sorted(todo)} pending")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                try:
+                    output, elapsed = fut.result()
+                except Exception as e:
+                    result.failed[name] = f"{type(e).__name__}: {e}"
+                    tracing.record_stage(name, 0.0, "failed")
+                    continue
+                result.outputs[name] = output
+                result.durations[name] = elapsed
+                tracing.record_stage(name, elapsed)
+                save_cached(cfg, name, output)
+
+    print("\n=== PIPELINE ===")
+    for name in STAGES:
+        if name in result.durations:
+            print(f"  {name:<13} {result.durations[name]:7.2f}s")
+        elif name in result.failed:
+            print(f"  {name:<13}  FAILED  {result.failed[name]}")
+        elif name in result.cached:
+            print(f"  {name:<13}  cached")
+    tracing.write_report(cfg.report_dir)
+    return result
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--only", help="Comma-separated stages to run (others read from cache)")
+    ap.add_argument("--from", dest="start", help="Run this stage and everything downstream of it")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent stages")
+    ap.add_argument("--no-cache", action="store_true", help="Never read cached upstream outputs")
+    ap.add_argument("--profile", action="store_true", help="cProfile the analytics build")
+    ap.add_argument("--list", action="store_true", help="Print the stage graph and exit")
+    args = ap.parse_args()
+
+    if args.list:
+        for s in STAGES.values():
+            deps = ", ".join(s.deps + tuple(f"{d}?" for d in s.soft_deps)) or "-"
+            print(f"  {s.name:<13} <- {deps}")
+        return 0
+    if args.only and args.start:
+        ap.error("--only and --from are mutually exclusive")
+
+    only = [n.strip() for n in args.only.split(",") if n.strip()] if args.only else None
+    cfg = PipelineConfig(profile=("analytics",) if args.profile else ())
+    result = run_pipeline(only, args.start, cfg=cfg, workers=args.workers, use_cache=not args.no_cache)
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
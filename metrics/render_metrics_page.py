@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Pre-render the metrics pages from metrics-data.json + staking_analytics.json.
+
+The pages used to ship empty and fill themselves after fetch('metrics-data.json'),
+so nothing showed until a second request finished. This writes the numbers
+straight into the HTML and embeds the snapshot they came from:
+
+  - metrics.html / metrics-pt.html  rendered from metrics.template.html with the
+                                    strings in metrics-page.i18n.json (cards,
+                                    12-week trend, market bar + signals)
+  - index.html                      [data-metric] cells filled in place, and
+                                    the title of each data-edu="<key>" info
+                                    tooltip set from metrics-data.json educational
+
+Every value node carries data-metric="<path>" data-fmt="<kind>", and
+<script id="metrics-snapshot"> holds the data. ../js/metrics-hydrate.js only
+refetches the JSON and patches those nodes when it is newer than the snapshot.
+
+Run after fetch_metrics.py / build_staking_analytics.py (fetch_metrics does this):
+  python3 render_metrics_page.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import math
+import os
+import re
+from pathlib import Path
+from typing import Any
+
+HERE = Path(__file__).resolve().parent
+TEMPLATE = HERE / "metrics.template.html"
+STRINGS = HERE / "metrics-page.i18n.json"
+IN_PLACE_PAGES = ("index.html",)
+TOKENS = ("vista", "bonzi")
+DEFAULT_TOKEN = "vista"
+
+# Same element/attribute contract as js/metrics-hydrate.js.
+_METRIC_RE = re.compile(
+    r'(<(span|td|div)\b[^>]*\bdata-metric="([^"]+)"[^>]*>)([^<]*)(</\2>)'
+)
+_ATTR_RE = re.compile(r'\b(data-[\w-]+)="([^"]*)"')
+_SNAPSHOT_RE = re.compile(
+    r'(<script type="application/json" id="metrics-snapshot">).*?(</script>)', re.S
+)
+_EDU_RE = re.compile(r'(<span class="info-text" data-edu="(\w+)" title=")[^"]*(")')
+_EACH_TOKEN_RE = re.compile(r"[ \t]*<!-- each-token -->\n(.*?)[ \t]*<!-- /each-token -->\n", re.S)
+_PLACEHOLDER_RE = re.compile(r"\{\{([\w.]+)\}\}")
+
+
+def _load_json(path: Path) -> dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def build_snapshot(metrics: dict[str, Any], staking: dict[str, Any]) -> dict[str, Any]:
+    """Only what the pages display; contracts/query ids/educational stay in the JSON files."""
+    tokens = {t: metrics.get(t) or {} for t in TOKENS}
+    total_eth_paid = sum(
+        float(tokens[t].get(k) or 0) for t in TOKENS for k in ("total_eth_distributed", "lp_total_eth")
+    )
+    return {
+        "metrics": {
+            "updated": metrics.get("updated"),
+            **tokens,
+            "market_context": metrics.get("market_context") or {},
+        },
+        "staking": {
+            "generated_at_utc": staking.get("generated_at_utc"),
+            "onchain_live": staking.get("onchain_live") or {},
+        },
+        "derived": {"total_eth_paid": round(total_eth_paid, 6)},
+    }
+
+
+def _lookup(data: dict[str, Any], path: str) -> Any:
+    cur: Any = data
+    for part in path.split("."):
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(part)
+    return cur
+
+
+def _localize(s: str, locale: str) -> str:
+    if locale.startswith("pt"):
+        return s.replace(",", "\0").replace(".", ",").replace("\0", ".")
+    return s
+
+
+def _round_half_up(v: float) -> int:
+    return int(math.floor(v + 0.5))
+
+
+def _pairs(spec: str) -> list[tuple[str, str]]:
+    return [tuple(p.split(":", 1)) for p in spec.split("|") if ":" in p]  # type: ignore[misc]
+
+
+def format_value(value: Any, fmt: str, attrs: dict[str, str], locale: str) -> str:
+    """Mirror of format() in js/metrics-hydrate.js (toLocaleString semantics)."""
+    if value is None or value == "":
+        return "-"
+    if fmt == "text":
+        return str(value)
+    if fmt == "map":
+        return dict(_pairs(attrs.get("data-map", ""))).get(str(value), str(value))
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if fmt == "band":
+        bands = _pairs(attrs.get("data-bands", ""))
+        for limit, label in bands:
+            if not limit or v < float(limit):
+                return label
+        return bands[-1][1] if bands else "-"
+    if fmt == "int":
+        return _localize(f"{_round_half_up(v):,}", locale)
+    if fmt == "signed":
+        n = _round_half_up(v)
+        return ("+" if n > 0 else "") + _localize(f"{n:,}", locale)
+    if fmt == "usd0":
+        return "$" + _localize(f"{_round_half_up(v):,}", locale)
+    if fmt == "fixed2":
+        return _localize(f"{v:,.2f}", locale)
+    # num: up to 4 decimals, trailing zeros trimmed
+    s = f"{v:,.4f}".rstrip("0").rstrip(".")
+    return _localize(s, locale)
+
+
+def fill_metrics(text: str, snapshot: dict[str, Any], locale: str) -> str:
+    def repl(m: re.Match) -> str:
+        open_tag, _, path, _, close_tag = m.groups()
+        attrs = dict(_ATTR_RE.findall(open_tag))
+        value = _lookup(snapshot, path)
+        out = format_value(value, attrs.get("data-fmt", "num"), attrs, locale)
+        return f"{open_tag}{html.escape(out)}{close_tag}"
+
+    return _METRIC_RE.sub(repl, text)
+
+
+def fill_educational(text: str, educational: dict[str, Any]) -> str:
+    """Info tooltips from metrics-data.json educational (explanation); a key without one keeps its title."""
+    def repl(m: re.Match) -> str:
+        explanation = (educational.get(m.group(2)) or {}).get("explanation")
+        if not explanation:
+            return m.group(0)
+        return f"{m.group(1)}{html.escape(explanation, quote=True)}{m.group(3)}"
+
+    return _EDU_RE.sub(repl, text)
+
+
+def embed_snapshot(text: str, snapshot: dict[str, Any], labels: dict[str, Any] | None = None) -> str:
+    payload = dict(snapshot)
+    if labels:
+        payload["labels"] = labels
+    blob = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+    return _SNAPSHOT_RE.sub(lambda m: m.group(1) + blob + m.group(2), text)
+
+
+def render_trend(weekly: list[dict[str, Any]], months: list[str]) -> str:
+    """Bars newest-first, heights scaled like the old client chart (stake 100px, unstake 30px)."""
+    max_stake = max((int(w.get("stakes") or 0) for w in weekly), default=0) or 1
+    bars = []
+    for w in weekly:
+        week = str(w.get("week") or "")
+        try:
+            label = months[int(week[5:7]) - 1]
+        except (ValueError, IndexError):
+            label = week.split(" ")[0]
+        stakes = int(w.get("stakes") or 0)
+        unstakes = int(w.get("unstakes") or 0)
+        bars.append(
+            '<div class="trend-bar">'
+            f'<div class="bar-stake" style="height: {stakes / max_stake * 100:g}px;"></div>'
+            f'<div class="bar-unstake" style="height: {unstakes / max_stake * 30:g}px;"></div>'
+            f'<div class="bar-label">{html.escape(label)}</div>'
+            "</div>"
+        )
+    return "".join(bars)
+
+
+def render_signals(signals: list[str], translations: dict[str, str]) -> str:
+    return "".join(f"<li>{html.escape(translations.get(s, s))}</li>" for s in signals)
+
+
+def render_template(template: str, strings: dict[str, Any], page: str, snapshot: dict[str, Any]) -> str:
+    def each_token(m: re.Match) -> str:
+        out = []
+        for token in TOKENS:
+            block = m.group(1).replace("{{token}}", token)
+            if token != DEFAULT_TOKEN:
+                block = block.replace(f'data-token="{token}"', f'data-token="{token}" hidden')
+            weekly = _lookup(snapshot, f"metrics.{token}.weekly_trend") or []
+            block = block.replace("{{trend}}", render_trend(weekly, strings["months"]))
+            # 7-day net flow card is coloured by sign, as the old client render did.
+            flow = _lookup(snapshot, f"metrics.{token}.net_flow_7d")
+            positive = isinstance(flow, (int, float)) and flow > 0
+            block = block.replace("{{flow_class}}", "positive" if positive else "negative")
+            out.append(block)
+        return "".join(out)
+
+    text = _EACH_TOKEN_RE.sub(each_token, template)
+    signals = _lookup(snapshot, "metrics.market_context.signals") or []
+
+    def placeholder(m: re.Match) -> str:
+        key = m.group(1)
+        if key == "page":
+            return page
+        if key == "signals":
+            return render_signals(signals, strings.get("signals", {}))
+        if key == "snapshot":
+            return m.group(0)
+        if key.startswith("t."):
+            return html.escape(str(strings[key[2:]]), quote=True)
+        raise KeyError(f"unknown placeholder {{{{{key}}}}} in {TEMPLATE.name}")
+
+    text = _PLACEHOLDER_RE.sub(placeholder, text)
+    text = text.replace("{{snapshot}}", "")
+    text = fill_metrics(text, snapshot, strings["locale"])
+    labels = {"months": strings["months"], "signals": strings.get("signals", {})}
+    return embed_snapshot(text, snapshot, labels)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    # The site may be served straight from this tree while daemon.py re-renders it.
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def render_all(
+    metrics_path: Path = HERE / "metrics-data.json",
+    staking_path: Path = HERE / "staking_analytics.json",
+    out_dir: Path = HERE,
+    *,
+    metrics: dict[str, Any] | None = None,
+    staking: dict[str, Any] | None = None,
+) -> list[Path]:
+    """metrics/staking given in memory (pipeline.py) take precedence over the paths."""
+    if metrics is None:
+        metrics = _load_json(metrics_path)
+    snapshot = build_snapshot(metrics, staking if staking is not None else _load_json(staking_path))
+    written = []
+
+    template = TEMPLATE.read_text(encoding="utf-8")
+    for page, strings in _load_json(STRINGS).items():
+        out = out_dir / page
+        _write_atomic(out, render_template(template, strings, page, snapshot))
+        written.append(out)
+
+    for page in IN_PLACE_PAGES:
+        path = out_dir / page
+        if not path.is_file():
+            continue
+        text = fill_metrics(path.read_text(encoding="utf-8"), snapshot, "en-US")
+        text = fill_educational(text, metrics.get("educational") or {})
+        _write_atomic(path, embed_snapshot(text, snapshot))
+        written.append(path)
+    return written
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--metrics-path", default=str(HERE / "metrics-data.json"))
+    ap.add_argument("--staking-path", default=str(HERE / "staking_analytics.json"))
+    ap.add_argument("--out-dir", default=str(HERE), help="Where the rendered pages are written")
+    args = ap.parse_args()
+
+    for p in render_all(Path(args.metrics_path), Path(args.staking_path), Path(args.out_dir)):
+        print(f"Rendered {p}")
+
+
+if __name__ == "__main__":
+    main()
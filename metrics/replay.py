@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Record/replay stand-in for every upstream the metrics refresh talks to.
+
+Dune, CoinGecko, DeFiLlama, Etherscan and the JSON-RPC nodes are all reached
+through route(url). With METRICS_UPSTREAM_BASE unset that is the identity; set
+it to this server and every request becomes
+
+  http://127.0.0.1:8765/<original host><original path>?<query>
+
+The server then either:
+
+  --record   proxies to the real host and appends each exchange to the
+             cassette, scrubbed first: secret-looking query params, API key
+             values from the environment, key-like path segments of JSON-RPC
+             URLs (Alchemy / Infura /v2/<key>) and anything matching
+             validate_staking_analytics._SECRET_PATTERNS become [REDACTED].
+             Request headers (x-dune-api-key) are forwarded, never stored.
+  (default)  replays the cassette. Requests match on method + host + path +
+             query (+ JSON-RPC method/params for POSTs, ignoring "id"); repeats
+             of one key are served in recorded order, the last one sticking.
+             JSON-RPC nodes are interchangeable, so an RPC body recorded
+             against one node also answers the others. A JSON-RPC batch
+             with no recording of its own is answered element by element.
+
+Fault injection (replay only): --latency-ms / --jitter-ms, per-upstream
+--upstream-latency dune=800, --error-rate (HTTP 502) and --rate-limit-rate
+(HTTP 429 + Retry-After), reproducible with --seed.
+
+Run:
+  DUNE_API_KEY=... python3 replay.py serve --record --cassette cassettes/live.json
+  python3 replay.py serve --cassette cassettes/live.json --latency-ms 80 --rate-limit-rate 0.1
+  python3 replay.py run --cassette cassettes/live.json -- python3 pipeline.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+from tracing import upstream_for
+from validate_staking_analytics import _SECRET_PATTERNS
+
+HERE = Path(__file__).resolve().parent
+CASSETTE_DIR = HERE / "cassettes"
+BASE_ENV = "METRICS_UPSTREAM_BASE"
+DEFAULT_PORT = 8765
+
+REDACTED = "[REDACTED]"
+_SECRET_PARAM_RE = re.compile(r"key|token|secret|signature|auth", re.I)
+# Extend each validator pattern over the value that follows it (key=abc123...).
+_SECRET_VALUE_RES = [re.compile(p.pattern + r"""\s*["']?[^\s"'&,]*""", p.flags) for p in _SECRET_PATTERNS]
+_SECRET_ENV = ("DUNE_API_KEY", "ETHERSCAN_API_KEY", "COINGECKO_API_KEY")
+# A JSON-RPC URL path segment this long is an API key (Alchemy /v2/<key>, Infura /v3/<project id>).
+_PATH_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{16,}$")
+_HOP_HEADERS = {"host", "content-length", "connection", "accept-encoding"}
+
+
+def route(url: str) -> str:
+    """Rewrite an upstream URL onto the stand-in server when METRICS_UPSTREAM_BASE is set."""
+    base = os.environ.get(BASE_ENV)
+    if not base:
+        return url
+    parts = urlsplit(url)
+    target = f"{base.rstrip('/')}/{parts.netloc}{parts.path or '/'}"
+    return f"{target}?{parts.query}" if parts.query else target
+
+
+# =============================================================================
+# CASSETTES
+# =============================================================================
+
+def scrub(text: str) -> str:
+    for rx in _SECRET_VALUE_RES:
+        text = rx.sub(REDACTED, text)
+    for name in _SECRET_ENV:
+        value = os.environ.get(name)
+        if value and len(value) >= 8:
+            text = text.replace(value, REDACTED)
+    return text
+
+
+def scrub_query(query: str) -> str:
+    pairs = [(k, REDACTED if _SECRET_PARAM_RE.search(k) else v) for k, v in parse_qsl(query, keep_blank_values=True)]
+    return urlencode(sorted(pairs))
+
+
+def scrub_path(host: str, path: str) -> str:
+    """path with a JSON-RPC node's API key segments (and secret values anywhere) as [REDACTED]."""
+    if upstream_for("https://" + host).startswith("rpc:"):
+        path = "/".join(REDACTED if _PATH_KEY_RE.match(seg) else seg for seg in path.split("/"))
+    return scrub(path)
+
+
+def rpc_signature(body: bytes | str | None) -> str | None:
+    """JSON-RPC method + params without the id; None for non-RPC bodies."""
+    if not body:
+        return None
+    try:
+        req = json.loads(body)
+    except ValueError:
+        return None
+    if isinstance(req, dict) and "method" in req:
+        return json.dumps([req["method"], req.get("params", [])], sort_keys=True, separators=(",", ":"))
+    if isinstance(req, list):
+        return json.dumps(
+            [[r.get("method"), r.get("params", [])] for r in req if isinstance(r, dict)],
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+    return None
+
+
+def interaction_key(method: str, host: str, path: str, query: str, body: bytes | str | None) -> str:
+    sig = rpc_signature(body) if method == "POST" else None
+    return " ".join(x for x in (method, host, scrub_path(host, path), scrub_query(query), sig) if x)
+
+
+class Cassette:
+    """Ordered list of scrubbed exchanges, saved atomically as JSON."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.interactions: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._served: dict[str, int] = {}
+        self._by_key: dict[str, list[dict[str, Any]]] = {}
+        self._by_rpc: dict[str, list[dict[str, Any]]] = {}
+        if path.is_file():
+            self.interactions = json.loads(path.read_text(encoding="utf-8")).get("interactions", [])
+        for it in self.interactions:
+            self._index(it)
+
+    def _index(self, it: dict[str, Any]) -> None:
+        self._by_key.setdefault(it["key"], []).append(it)
+        sig = it.get("rpc")
+        if sig and upstream_for("https://" + it["host"]).startswith("rpc:"):
+            self._by_rpc.setdefault(sig, []).append(it)
+
+    def add(self, it: dict[str, Any]) -> None:
+        with self._lock:
+            self.interactions.append(it)
+            self._index(it)
+            self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        doc = {
+            "recorded_at_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "interactions": self.interactions,
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(doc, indent=1) + "\n", encoding="utf-8")
+        tmp.replace(self.path)
+
+    def match(self, key: str, host: str, body: bytes | None) -> dict[str, Any] | None:
+        candidates = self._by_key.get(key)
+        if not candidates and upstream_for("https://" + host).startswith("rpc:"):
+            sig = rpc_signature(body)
+            candidates = self._by_rpc.get(sig) if sig else None
+            key = f"rpc {sig}"
+        if not candidates:
+            return None
+        with self._lock:
+            i = self._served.get(key, 0)
+            self._served[key] = i + 1
+        return candidates[min(i, len(candidates) - 1)]
+
+    def match_batch(self, host: str, path: str, query: str, body: bytes | None) -> bytes | None:
+        """Answer a JSON-RPC batch from single-call recordings (build_staking_analytics.RpcBatcher).
+
+        Each element is matched like a lone call; the recorded result is returned under
+        the element's own id. None if any element has no recording.
+        """
+        if not upstream_for("https://" + host).startswith("rpc:"):
+            return None
+        try:
+            reqs = json.loads(body or b"")
+        except ValueError:
+            return None
+        if not isinstance(reqs, list):
+            return None
+        out = []
+        for r in reqs:
+            el = json.dumps(r).encode()
+            hit = self.match(interaction_key("POST", host, path, query, el), host, el)
+            if hit is None or hit.get("status") != 200:
+                return None
+            try:
+                recorded = json.loads(hit["body"])
+            except ValueError:
+                return None
+            out.append({**recorded, "id": r.get("id")})
+        return json.dumps(out).encode()
+
+
+# =============================================================================
+# SERVER
+# =============================================================================
+
+class Faults:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        upstream_latency: dict[str, float] | None = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.upstream_latency = upstream_latency or {}
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay_s(self, upstream: str) -> float:
+        base = self.upstream_latency.get(upstream.split(":")[0], self.latency_ms)
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, base + jitter) / 1000.0
+
+    def roll(self) -> int | None:
+        """HTTP status to inject instead of the recorded response, if any."""
+        with self._lock:
+            r = self._rng.random()
+        if r < self.rate_limit_rate:
+            return 429
+        if r < self.rate_limit_rate + self.error_rate:
+            return 502
+        return None
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: tuple[str, int], cassette: Cassette, *, record: bool, faults: Faults) -> None:
+        super().__init__(addr, _Handler)
+        self.cassette = cassette
+        self.record = record
+        self.faults = faults
+        self.misses: list[str] = []
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # A client that gave up first (its timeout or deadline) is not a stand-in error.
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StandIn
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle("GET", None)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        self._handle("POST", self.rfile.read(length) if length else b"")
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", extra: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str, body: bytes | None) -> None:
+        parts = urlsplit(self.path)
+        host, _, rest = parts.path.lstrip("/").partition("/")
+        path = "/" + rest
+        key = interaction_key(method, host, path, parts.query, body)
+
+        if self.server.record:
+            self._proxy(method, host, path, parts.query, body, key)
+            return
+
+        faults = self.server.faults
+        delay = faults.delay_s(upstream_for("https://" + host))
+        if delay:
+            time.sleep(delay)
+        injected = faults.roll()
+        if injected == 429:
+            self._send(429, b'{"error":"rate limited (injected)"}', extra={"Retry-After": "1"})
+            return
+        if injected:
+            self._send(injected, b'{"error":"upstream error (injected)"}')
+            return
+
+        hit = self.server.cassette.match(key, host, body)
+        if hit is None:
+            batch = self.server.cassette.match_batch(host, path, parts.query, body)
+            if batch is not None:
+                self._send(200, batch)
+                return
+            self.server.misses.append(key)
+            self._send(404, json.dumps({"error": "no recorded interaction", "key": key}).encode())
+            return
+        self._send(hit["status"], hit["body"].encode(), hit.get("content_type") or "application/json")
+
+    def _proxy(self, method: str, host: str, path: str, query: str, body: bytes | None, key: str) -> None:
+        url = f"https://{host}{path}" + (f"?{query}" if query else "")
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in _HOP_HEADERS}
+        req = Request(url, data=body if method == "POST" else None, headers=headers, method=method)
+        try:
+            with urlopen(req, timeout=60) as resp:
+                status, raw, ctype = resp.status, resp.read(), resp.headers.get("Content-Type")
+        except HTTPError as e:
+            status, raw, ctype = e.code, e.read(), e.headers.get("Content-Type")
+        except OSError as e:
+            self._send(502, json.dumps({"error": f"record proxy: {e}"}).encode())
+            return
+        text = raw.decode("utf-8", errors="replace")
+        self.server.cassette.add(
+            {
+                "key": key,
+                "host": host,
+                "method": method,
+                "path": scrub_path(host, path),
+                "query": scrub_query(query),
+                "rpc": rpc_signature(body) if method == "POST" else None,
+                "request_body": scrub(body.decode("utf-8", errors="replace")) if body else None,
+                "status": status,
+                "content_type": ctype,
+                "body": scrub(text),
+            }
+        )
+        self._send(status, raw, ctype or "application/json")
+
+
+def start_server(
+    cassette: Path,
+    *,
+    record: bool = False,
+    faults: Faults | None = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> StandIn:
+    """Start the stand-in on a background thread (port 0 = any free port)."""
+    srv = StandIn((host, port), Cassette(cassette), record=record, faults=faults or Faults())
+    threading.Thread(target=srv.serve_forever, name="replay-standin", daemon=True).start()
+    return srv
+
+
+def parse_upstream_latency(items: list[str]) -> dict[str, float]:
+    """["defillama=3000", ...] (--upstream-latency) -> {"defillama": 3000.0, ...}."""
+    out = {}
+    for item in items:
+        name, _, ms = item.partition("=")
+        out[name.strip()] = float(ms)
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("serve", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--cassette", type=Path, required=True)
+        p.add_argument("--record", action="store_true", help="Proxy to the real upstreams and record")
+        p.add_argument("--port", type=int, default=DEFAULT_PORT if name == "serve" else 0)
+        p.add_argument("--latency-ms", type=float, default=0.0)
+        p.add_argument("--jitter-ms", type=float, default=0.0)
+        p.add_argument("--upstream-latency", action="append", default=[], metavar="NAME=MS",
+                       help="Per-upstream latency (dune, coingecko, defillama, etherscan, rpc)")
+        p.add_argument("--error-rate", type=float, default=0.0, help="Fraction answered with HTTP 502")
+        p.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction answered with HTTP 429")
+        p.add_argument("--seed", type=int, default=None)
+    sub.choices["run"].add_argument("command", nargs=argparse.REMAINDER, help="-- command to run against it")
+    args = ap.parse_args()
+
+    faults = Faults(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        upstream_latency=parse_upstream_latency(args.upstream_latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    if not args.record and not args.cassette.is_file():
+        print(f"Error: cassette not found: {args.cassette}", file=sys.stderr)
+        return 1
+    srv = start_server(args.cassette, record=args.record, faults=faults, port=args.port)
+    mode = "recording" if args.record else "replaying"
+    print(f"Stand-in {mode} {args.cassette} at {srv.base_url} (export {BASE_ENV}={srv.base_url})")
+
+    try:
+        if args.cmd == "serve":
+            threading.Event().wait()
+            return 0
+        command = args.command[1:] if args.command[:1] == ["--"] else args.command
+        command = command or [sys.executable, str(HERE / "pipeline.py")]
+        env = dict(os.environ, **{BASE_ENV: srv.base_url})
+        return subprocess.run(command, cwd=str(HERE), env=env, check=False).returncode
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        srv.shutdown()
+        if srv.misses:
+            print(f"{len(srv.misses)} request(s) had no recorded interaction, e.g. {srv.misses[0]}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
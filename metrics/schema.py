@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Declarative schemas for the public metrics artifacts, compiled once into validators.
+
+  STAKING_ANALYTICS   staking_analytics.json (build_staking_analytics.py)
+  METRICS_DATA        metrics-data.json      (fetch_metrics.py)
+
+A schema is a tree of Obj / Arr / Map / Field specs plus cross-field
+invariants. Schema() compiles the tree into nested closures when the module
+is imported: every check (type, required, nullable, min/max, regex, enum)
+becomes one pre-bound function, so validating is a single walk over the
+data with no spec interpretation. Arrays are checked item by item in place,
+so large leaderboards are never copied.
+
+Objects are open: keys not in the spec are allowed. That way new
+illustrative fields don't break publishing; fields the pages depend on are
+listed and typed.
+
+Errors are "dotted.path: message" strings, e.g.
+  onchain_live.locked_percent_of_supply_rounded: required
+  bonzi.weekly_trend[3].stakes: expected integer, got str
+
+find_secret() scans serialized JSON for API-key material in one pass of a
+single combined pattern. It accepts bytes, so a file can be scanned as
+read, without decoding a second copy.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+ROUTER_EXPECTED = "0x9bD63C5D44fF28390df1EaaFD4eB4BD73E94A72a"
+
+ADDRESS = r"^0x[0-9a-fA-F]{40}$"
+DATE = r"^\d{4}-\d{2}-\d{2}$"
+ISO_UTC = r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?Z$"
+
+SECRET_PATTERNS = [
+    re.compile(r"dune.?api.?key\s*[=:]", re.I),
+    re.compile(r"x-dune-api-key", re.I),
+    re.compile(r"etherscan.?api.?key\s*[=:]", re.I),
+    re.compile(r"rnd_[a-zA-Z0-9_]{16,}", re.I),
+    re.compile(r"sk_live_[a-zA-Z0-9]{16,}", re.I),
+]
+_SECRET_SOURCE = "|".join(f"(?:{p.pattern})" for p in SECRET_PATTERNS)
+_SECRET_RE = re.compile(_SECRET_SOURCE, re.I)
+_SECRET_RE_BYTES = re.compile(_SECRET_SOURCE.encode("ascii"), re.I)
+
+Check = Callable[[Any, str, list], None]
+
+def find_secret(raw: str | bytes) -> str | None:
+    """First secret-like match in serialized JSON, or None."""
+    m = (_SECRET_RE_BYTES if isinstance(raw, (bytes, bytearray, memoryview)) else _SECRET_RE).search(raw)
+    if m is None:
+        return None
+    hit = m.group(0)
+    return hit.decode("ascii", "replace") if isinstance(hit, bytes) else hit
+
+
+# bool is an int subclass; a count or price must never be True/False.
+_TYPES: dict[str, tuple[Callable[[Any], bool], str]] = {
+    "str": (lambda v: isinstance(v, str), "string"),
+    "int": (lambda v: isinstance(v, int) and not isinstance(v, bool), "integer"),
+    "num": (lambda v: isinstance(v, (int, float)) and not isinstance(v, bool), "number"),
+    "bool": (lambda v: isinstance(v, bool), "boolean"),
+    "any": (lambda v: True, "any"),
+}
+
+
+@dataclass(frozen=True)
+class Field:
+    type: str = "any"
+    required: bool = False
+    nullable: bool = True
+    min: float | None = None
+    max: float | None = None
+    pattern: str | None = None
+    enum: tuple[Any, ...] | None = None
+
+
+@dataclass(frozen=True)
+class Obj:
+    fields: dict[str, Any]
+    required: bool = False
+    nullable: bool = False
+
+
+@dataclass(frozen=True)
+class Arr:
+    items: Any
+    required: bool = False
+    max_items: int | None = None
+
+
+@dataclass(frozen=True)
+class Map:
+    """Object with arbitrary keys, every value matching one spec."""
+
+    values: Any
+    required: bool = False
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def _compile(spec: Any) -> Check:
+    if isinstance(spec, Field):
+        return _compile_field(spec)
+    if isinstance(spec, Obj):
+        return _compile_obj(spec)
+    if isinstance(spec, Arr):
+        return _compile_arr(spec)
+    if isinstance(spec, Map):
+        return _compile_map(spec)
+    raise TypeError(f"unknown schema node {spec!r}")
+
+
+def _compile_field(spec: Field) -> Check:
+    is_type, type_name = _TYPES[spec.type]
+    checks: list[Callable[[Any], str | None]] = []
+    if spec.min is not None:
+        lo = spec.min
+        checks.append(lambda v: f"{v} below minimum {lo}" if v < lo else None)
+    if spec.max is not None:
+        hi = spec.max
+        checks.append(lambda v: f"{v} above maximum {hi}" if v > hi else None)
+    if spec.pattern is not None:
+        rx = re.compile(spec.pattern)
+        checks.append(lambda v: None if rx.match(v) else f"{v!r} does not match {rx.pattern}")
+    if spec.enum is not None:
+        allowed = spec.enum
+        checks.append(lambda v: None if v in allowed else f"{v!r} not one of {list(allowed)}")
+    nullable = spec.nullable
+
+    def check(value: Any, path: str, errors: list) -> None:
+        if value is None:
+            if not nullable:
+                errors.append(f"{path}: must not be null")
+            return
+        if not is_type(value):
+            errors.append(f"{path}: expected {type_name}, got {type(value).__name__}")
+            return
+        for c in checks:
+            msg = c(value)
+            if msg:
+                errors.append(f"{path}: {msg}")
+
+    return check
+
+
+def _compile_obj(spec: Obj) -> Check:
+    children = [(key, _compile(sub), getattr(sub, "required", False)) for key, sub in spec.fields.items()]
+    nullable = spec.nullable
+
+    def check(value: Any, path: str, errors: list) -> None:
+        if value is None and nullable:
+            return
+        if not isinstance(value, dict):
+            errors.append(f"{path or '$'}: expected object, got {type(value).__name__}")
+            return
+        for key, child, required in children:
+            if key in value:
+                child(value[key], _join(path, key), errors)
+            elif required:
+                errors.append(f"{_join(path, key)}: required")
+
+    return check
+
+
+def _compile_arr(spec: Arr) -> Check:
+    item = _compile(spec.items)
+    max_items = spec.max_items
+
+    def check(value: Any, path: str, errors: list) -> None:
+        if not isinstance(value, list):
+            errors.append(f"{path}: expected array, got {type(value).__name__}")
+            return
+        if max_items is not None and len(value) > max_items:
+            errors.append(f"{path}: {len(value)} items exceeds {max_items}")
+        for i, v in enumerate(value):
+            item(v, f"{path}[{i}]", errors)
+
+    return check
+
+
+def _compile_map(spec: Map) -> Check:
+    item = _compile(spec.values)
+
+    def check(value: Any, path: str, errors: list) -> None:
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected object, got {type(value).__name__}")
+            return
+        for k, v in value.items():
+            item(v, _join(path, str(k)), errors)
+
+    return check
+
+
+@dataclass
+class Schema:
+    root: Obj
+    invariants: tuple[Callable[[dict[str, Any]], str | None], ...] = ()
+    _check: Check = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._check = _compile(self.root)
+
+    def validate(self, data: Any) -> list[str]:
+        errors: list[str] = []
+        self._check(data, "", errors)
+        if isinstance(data, dict):
+            for inv in self.invariants:
+                try:
+                    msg = inv(data)
+                except (TypeError, ValueError, AttributeError):
+                    # Shape errors are already reported by the field checks.
+                    continue
+                if msg:
+                    errors.append(msg)
+        return errors
+
+
+# =============================================================================
+# staking_analytics.json
+# =============================================================================
+
+_pct = Field("num", min=0, max=100)
+_nonneg = Field("num", min=0)
+_count = Field("int", min=0)
+_text = Field("str", required=True, nullable=False)
+_leaderboard_row = Obj({"address": Field("str", pattern=ADDRESS)})
+
+
+def _router_matches(d: dict[str, Any]) -> str | None:
+    c = d.get("contracts") or {}
+    rd = c.get("router_read_from_factory")
+    if not isinstance(rd, str) or rd.strip().lower().replace(" ", "") != ROUTER_EXPECTED.lower():
+        return f"Router mismatch: router_read_from_factory={rd} expected {ROUTER_EXPECTED}"
+    return None
+
+
+def _router_expected_literal(d: dict[str, Any]) -> str | None:
+    ex = (d.get("contracts") or {}).get("router_expected_canonical")
+    if not isinstance(ex, str) or ex.strip().lower() != ROUTER_EXPECTED.lower():
+        return "router_expected_canonical must equal canonical ROUTER_EXPECTED."
+    return None
+
+
+def _router_flag(d: dict[str, Any]) -> str | None:
+    if not bool((d.get("contracts") or {}).get("factory_router_equals_expected")):
+        return "factory_router_equals_expected must be True."
+    return None
+
+
+def _hardstake_equals_locked(d: dict[str, Any]) -> str | None:
+    lc = d.get("onchain_live") or {}
+    hs, lp = lc.get("hardstake_percent_of_supply_rounded"), lc.get("locked_percent_of_supply_rounded")
+    if hs is not None and lp is not None and round(float(hs), 4) != round(float(lp), 4):
+        return "onchain_live.hardstake_percent_of_supply_rounded must match locked_percent_of_supply_rounded."
+    return None
+
+
+def _scenarios_ascending(d: dict[str, Any]) -> str | None:
+    t = d.get("yield_scenarios_illustrative") or {}
+    rows, width = t.get("rows") or [], len(t.get("columns") or [])
+    if any(len(r) != width for r in rows):
+        return "yield_scenarios_illustrative: every row must have one value per column."
+    stakes = [r[0] for r in rows]
+    if any(s is None for s in stakes) or stakes != sorted(set(stakes)):
+        return "yield_scenarios_illustrative: stake sizes must be strictly ascending."
+    return None
+
+
+def _staked_within_supply(d: dict[str, Any]) -> str | None:
+    lc = d.get("onchain_live") or {}
+    staked, supply = lc.get("pool_total_staked_tokens"), lc.get("total_supply_tokens")
+    if staked is not None and supply and staked > supply * (1 + 1e-9):
+        return "onchain_live.pool_total_staked_tokens exceeds total_supply_tokens."
+    return None
+
+
+STAKING_ANALYTICS = Schema(
+    Obj(
+        {
+            "schema_version": Field("int", required=True, nullable=False, min=1),
+            "generated_at_utc": Field("str", required=True, nullable=False, pattern=ISO_UTC),
+            "snapshot_date": Field("str", required=True, nullable=False, pattern=DATE),
+            "chain_id": Field("int", required=True, enum=(1,)),
+            "access_model": Field("str", enum=("public_json_only",)),
+            "contracts": Obj(
+                {
+                    "token_symbol": Field("str"),
+                    "bonzi_token": Field("str", pattern=ADDRESS),
+                    "bonzi_hardstake": Field("str", pattern=ADDRESS),
+                    "factory": Field("str", pattern=ADDRESS),
+                    "router_expected_canonical": Field("str", required=True, pattern=ADDRESS),
+                    "router_read_from_factory": Field("str", required=True, pattern=ADDRESS),
+                    "factory_router_equals_expected": Field("bool", required=True),
+                },
+                required=True,
+            ),
+            "onchain_live": Obj(
+                {
+                    "rpc_primary_used": Field("str"),
+                    "pool_aggregate_read_method": Field("str", enum=("hardstake_totalSupply", "totalStaked_token")),
+                    "total_supply_tokens": _nonneg,
+                    "pool_total_staked_tokens": _nonneg,
+                    "locked_percent_of_supply_rounded": Field("num", required=True, nullable=False, min=0, max=100),
+                    "hardstake_percent_of_supply_rounded": _pct,
+                    "pair_bonzi_reserve_tokens": _nonneg,
+                    "pair_bonzi_percent_of_supply_rounded": _pct,
+                },
+                required=True,
+            ),
+            "market_prices_optional": Obj({"bonzi_usd": _nonneg, "eth_usd": _nonneg}),
+            "aggregate_claims_optional": Obj(
+                {
+                    "total_eth_distributed_aggregate": _nonneg,
+                    "unique_claimers": _count,
+                    "currently_staking_wallets_aggregate": _count,
+                }
+            ),
+            "leaderboards": Obj(
+                {
+                    "top_stakers_by_amount": Arr(_leaderboard_row),
+                    "top_eth_earners_lifetime": Arr(_leaderboard_row),
+                }
+            ),
+            "roi_pool_aggregate_illustrative": Obj(
+                {
+                    "snapshot_datetime_utc": Field("str", required=True, nullable=False, pattern=ISO_UTC),
+                    "historical_aggregate_label": _text,
+                    "realized_vs_estimated_clarifier": _text,
+                    "usd_notional": _nonneg,
+                    "tvl_proxy_usd": _nonneg,
+                    "pool_age_days_est": _count,
+                    "eth_per_bonzi_pair_reserve_mid": _nonneg,
+                    "staking_tvl_eth_proxy_from_pair_mid": _nonneg,
+                    "eth_mid_proxy_unreliable_for_hero_pct": Field("bool"),
+                },
+                required=True,
+            ),
+            "yield_scenarios_illustrative": Obj(
+                {
+                    "columns": Arr(Field("str", nullable=False), required=True),
+                    "rows": Arr(Arr(Field("num", min=0)), required=True, max_items=200),
+                    "eth_mid_apr_suppressed": Field("bool"),
+                },
+                nullable=True,
+            ),
+            "benchmarks_illustrative": Arr(Obj({"id": _text})),
+            "methodology_public": Field("str"),
+        }
+    ),
+    invariants=(
+        _router_matches,
+        _router_expected_literal,
+        _router_flag,
+        _hardstake_equals_locked,
+        _staked_within_supply,
+        _scenarios_ascending,
+    ),
+)
+
+
+# =============================================================================
+# metrics-data.json
+# =============================================================================
+
+_token = Obj(
+    {
+        "token_address": Field("str", required=True, nullable=False, pattern=ADDRESS),
+        "hardstake_address": Field("str", pattern=ADDRESS),
+        "launch_date": Field("str", pattern=DATE),
+        "token_age_months": _count,
+        "total_holders": _count,
+        "top_10_pct": _pct,
+        "hhi_score": Field("num", min=0, max=10_000),
+        "total_stakers": _count,
+        "diamond_hands": _count,
+        "diamond_hands_pct": _pct,
+        "currently_staking": _count,
+        "retention_pct": _pct,
+        "avg_tenure_days": _nonneg,
+        "max_tenure_days": _nonneg,
+        "holders_1k_plus": _count,
+        "holders_10k_plus": _count,
+        "weekly_trend": Arr(
+            Obj({"week": Field("str", pattern=r"^\d{4}-\d{2}-\d{2}"), "stakes": _count, "unstakes": _count}),
+            required=True,
+        ),
+        "net_flow_7d": Field("int"),
+        "total_eth_distributed": _nonneg,
+        "unique_claimers": _count,
+        "avg_claim_eth": _nonneg,
+        "max_single_claim": _nonneg,
+        "lp_total_eth": _nonneg,
+        "lp_total_distributions": _count,
+        "lp_unique_recipients": _count,
+        "nakamoto_coefficient": _count,
+    },
+    required=True,
+)
+
+
+def _token_invariants(d: dict[str, Any]) -> str | None:
+    for token in ("vista", "bonzi"):
+        t = d.get(token) or {}
+        staking, total = t.get("currently_staking"), t.get("total_stakers")
+        if staking is not None and total is not None and staking > total:
+            return f"{token}.currently_staking ({staking}) exceeds total_stakers ({total})."
+        h1k, h10k = t.get("holders_1k_plus"), t.get("holders_10k_plus")
+        if h1k is not None and h10k is not None and h10k > h1k:
+            return f"{token}.holders_10k_plus ({h10k}) exceeds holders_1k_plus ({h1k})."
+    return None
+
+
+METRICS_DATA = Schema(
+    Obj(
+        {
+            "updated": Field("str", required=True, nullable=False, pattern=DATE),
+            "vista": _token,
+            "bonzi": _token,
+            "dune_queries": Map(Field("str", pattern=r"^\d*$")),
+            "contracts": Map(Map(Field("str"))),
+            "market_context": Obj(
+                {
+                    "fetched_at": Field("str"),
+                    "eth": Obj({"price_usd": _nonneg, "change_24h_pct": Field("num")}),
+                    "gas": Obj({"level": Field("str", enum=("low", "medium", "high"))}),
+                    "dex_volume": Obj({"volume_24h_usd": _nonneg}),
+                    "btc_dominance": Obj({"btc_dominance_pct": _pct, "eth_dominance_pct": _pct}),
+                    "sources": Map(
+                        Obj(
+                            {
+                                "status": Field("str", required=True, enum=("fresh", "stale", "missing")),
+                                "as_of": Field("str"),
+                                "reason": Field("str", enum=("error", "timeout")),
+                            }
+                        )
+                    ),
+                    "signals": Arr(Field("str", nullable=False), required=True),
+                },
+                required=True,
+            ),
+        }
+    ),
+    invariants=(_token_invariants,),
+)
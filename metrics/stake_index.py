@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Stake / unstake transaction index from block bodies (the ethereum.transactions side of the Dune metrics).
+
+Retention, diamond hands, tenure and the weekly trend classify the
+transactions sent to each hardstake contract in fetch_metrics.CONTRACTS by
+4-byte selector (fetch_metrics.STAKE_METHOD / UNSTAKE_METHOD) and success.
+Receipts carry the status but not the calldata, so the scan reads block
+bodies: each range of --batch blocks is one JSON-RPC batch of
+eth_getBlockByNumber(full), with --workers ranges in flight. Only blocks
+holding a transaction to a hardstake then have their receipts read, in one
+eth_getBlockReceipts batch per range (eth_getTransactionReceipt per candidate
+on nodes without it), for the status.
+
+Each such transaction is one 36-byte row in .stake-txs.bin:
+
+  block uint32, timestamp uint32, tx index uint16, from (20 bytes),
+  selector (4 bytes), contract uint8 (position in the header), success uint8
+
+after a header of b"STX2", the 32-byte hash of the node's earliest block
+(the chain the rows come from), uint32 first block, uint32 last scanned
+block, uint8 contract count and the 20-byte contract addresses. Every
+selector is kept, not only the two, because Dune's weekly trend groups all
+successful transactions to the contract. Only finalized blocks (FINALITY_DEPTH behind
+the head) are scanned, so rows never need rolling back; a run resumes after
+the last scanned block. sync() starts over when the file was written for
+another chain (a fake_node.py chain, a testnet); the file lives in
+$METRICS_CACHE_DIR when that is set (fake_node.py run sets it).
+
+token_metrics() derives, from the rows alone, the fields fetch_metrics takes
+from the retention, diamond hands, tenure and weekly trend queries, with the
+semantics of their SQL (dune_queries.TEMPLATES).
+
+Usage:
+  python3 stake_index.py                       # scan from the first launch_date to the finalized head
+  python3 stake_index.py --metrics [--token bonzi]
+  python3 fake_node.py run --history 20000 --touch-rate 0.5 -- python3 stake_index.py --metrics
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import build_staking_analytics as bsa
+import fetch_metrics as fm
+from block_times import CACHE_DIR_ENV, launch_block
+from checkpoints import FINALITY_DEPTH
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_PATH = Path(os.environ.get(CACHE_DIR_ENV) or HERE) / ".stake-txs.bin"
+MAGIC = b"STX2"
+HEADER = struct.Struct("<4s32sIIB")
+ROW = struct.Struct("<IIH20s4sBB")
+BATCH_BLOCKS = 20
+DEFAULT_WORKERS = 4
+SAVE_EVERY_S = 30
+WEEKS = 12
+
+STAKE = bytes.fromhex(fm.STAKE_METHOD[2:])
+UNSTAKE = bytes.fromhex(fm.UNSTAKE_METHOD[2:])
+
+# (block, timestamp, tx index, from, selector, contract, success)
+Row = tuple[int, int, int, bytes, bytes, int, int]
+
+# Endpoints that answered eth_getBlockReceipts with an error; they get per-transaction receipts.
+_no_block_receipts: set[str] = set()
+
+
+def hardstakes() -> list[str]:
+    """Hardstake address per CONTRACTS token, in registry order (the row's contract byte)."""
+    return [c["hardstake"].lower() for key, c in fm.CONTRACTS.items() if key != "protocol" and c.get("hardstake")]
+
+
+class StakeIndex:
+    def __init__(self, contracts: list[str], path: Path | None = DEFAULT_PATH, *, genesis: str | None = None) -> None:
+        """genesis: hash of the node's earliest block; a file written for another chain is then ignored."""
+        self.contracts = [c.lower() for c in contracts]
+        self.path = path
+        self.genesis = genesis
+        self.first_block: int | None = None
+        self.through_block: int | None = None
+        self.rows: list[Row] = []
+        if path is not None and path.is_file():
+            self._load(path)
+
+    def _load(self, path: Path) -> None:
+        raw = path.read_bytes()
+        if raw[:4] == b"STX1":
+            print(f"  {path}: no chain recorded (old format), scanning from scratch")
+            return
+        magic, chain, first, through, n = HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a stake index file")
+        if self.genesis is not None and "0x" + chain.hex() != self.genesis:
+            print(f"  {path}: indexed from another chain, scanning from scratch")
+            return
+        self.genesis = "0x" + chain.hex()
+        off = HEADER.size + 20 * n
+        addrs = ["0x" + raw[HEADER.size + 20 * i: HEADER.size + 20 * (i + 1)].hex() for i in range(n)]
+        if addrs != self.contracts:
+            print(f"  {path}: contract list changed, scanning from scratch")
+            return
+        if (len(raw) - off) % ROW.size:
+            raise ValueError(f"{path}: truncated row")
+        self.rows = list(ROW.iter_unpack(memoryview(raw)[off:]))
+        self.first_block, self.through_block = first, through
+
+    def save(self) -> None:
+        if self.path is None or self.through_block is None:
+            return
+        chain = bytes.fromhex(self.genesis[2:]) if self.genesis else bytes(32)
+        head = HEADER.pack(MAGIC, chain, self.first_block, self.through_block, len(self.contracts))
+        addrs = b"".join(bytes.fromhex(a[2:]) for a in self.contracts)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_bytes(head + addrs + b"".join(ROW.pack(*r) for r in self.rows))
+        os.replace(tmp, self.path)
+
+    def scan(self, rpc_url: str, start: int, end: int, *, batch: int = BATCH_BLOCKS, workers: int = DEFAULT_WORKERS) -> int:
+        """Scan start..end, or from after the last scanned block when resuming. Returns blocks scanned."""
+        if self.through_block is None:
+            self.first_block, self.through_block = start, start - 1
+        ranges = [(lo, min(end, lo + batch - 1)) for lo in range(self.through_block + 1, end + 1, batch)]
+        index = {a: i for i, a in enumerate(self.contracts)}
+        total = sum(hi - lo + 1 for lo, hi in ranges)
+        saved = t0 = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            # Ranges go out a window at a time and are applied in order, so through_block
+            # never passes an unscanned block even if a range fails.
+            window = max(1, workers) * 4
+            for w in range(0, len(ranges), window):
+                chunk = ranges[w:w + window]
+                for (_, hi), rows in zip(chunk, pool.map(lambda r: scan_range(rpc_url, index, *r), chunk)):
+                    self.rows.extend(rows)
+                    self.through_block = hi
+                if time.monotonic() - saved > SAVE_EVERY_S:
+                    self.save()
+                    saved = time.monotonic()
+                    done = self.through_block - ranges[0][0] + 1
+                    print(f"  scanned through {self.through_block} ({100 * done / total:.1f}%, "
+                          f"{done / (saved - t0):.0f} blocks/s), {len(self.rows)} row(s)")
+        self.save()
+        return total
+
+
+def _statuses(rpc_url: str, blocks: list[int], hashes: list[str]) -> dict[str, int]:
+    """Receipt status by transaction hash for the candidates in blocks."""
+    if rpc_url not in _no_block_receipts:
+        try:
+            per_block = bsa.rpc_requests(rpc_url, [("eth_getBlockReceipts", [hex(n)]) for n in blocks], timeout=60)
+            return {r["transactionHash"]: int(r["status"], 16) for rs in per_block for r in rs or []}
+        except RuntimeError as e:
+            print(f"  eth_getBlockReceipts unavailable ({e}); reading receipts per transaction")
+            _no_block_receipts.add(rpc_url)
+    receipts = bsa.rpc_requests(rpc_url, [("eth_getTransactionReceipt", [h]) for h in hashes], timeout=60)
+    return {r["transactionHash"]: int(r["status"], 16) for r in receipts if r}
+
+
+def scan_range(rpc_url: str, contracts: dict[str, int], lo: int, hi: int) -> list[Row]:
+    """Rows for the transactions to contracts (address -> contract byte) in blocks lo..hi."""
+    bodies = bsa.rpc_requests(
+        rpc_url, [("eth_getBlockByNumber", [hex(n), True]) for n in range(lo, hi + 1)], timeout=60
+    )
+    found = []
+    for body in bodies:
+        if not body:
+            raise RuntimeError(f"node has no block body in {lo}..{hi}")
+        n, ts = int(body["number"], 16), int(body["timestamp"], 16)
+        for tx in body.get("transactions") or []:
+            c = contracts.get(str(tx.get("to") or "").lower())
+            if c is None:
+                continue
+            selector = bytes.fromhex(str(tx.get("input") or "0x")[2:10].ljust(8, "0"))
+            found.append((n, ts, int(tx["transactionIndex"], 16), tx["from"], selector, c, tx["hash"]))
+    if not found:
+        return []
+    status = _statuses(rpc_url, sorted({f[0] for f in found}), [f[-1] for f in found])
+    missing = [h for *_, h in found if h not in status]
+    if missing:
+        raise RuntimeError(f"no receipt for {len(missing)} transaction(s) in {lo}..{hi}, e.g. {missing[0]}")
+    return [(n, ts, i, bytes.fromhex(frm[2:]), sel, c, 1 if status[h] else 0) for n, ts, i, frm, sel, c, h in found]
+
+
+def _midnight(day: str) -> int:
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+
+def token_metrics(index: StakeIndex, hardstake: str, launch_date: str, now: datetime | None = None) -> dict[str, Any]:
+    """retention / diamond hands / tenure / weekly trend fields for one contract, as fetch_metrics sets them."""
+    c = index.contracts.index(hardstake.lower())
+    since = _midnight(launch_date)  # block_time > DATE 'launch_date'
+    now_ts = int((now or datetime.now(timezone.utc)).timestamp())
+    latest: dict[bytes, bytes] = {}
+    first_stake: dict[bytes, int] = {}
+    unstakers: set[bytes] = set()
+    weeks: dict[date, list[int]] = {}
+    for _, ts, _, wallet, sel, contract, ok in index.rows:  # already in (block, tx index) order
+        if contract != c or ts <= since:
+            continue
+        if sel == UNSTAKE:
+            unstakers.add(wallet)  # diamond hands' NOT EXISTS does not filter on success
+        if not ok:
+            continue
+        day = datetime.fromtimestamp(ts, timezone.utc).date()
+        counts = weeks.setdefault(day - timedelta(days=day.weekday()), [0, 0])  # date_trunc('week')
+        if sel == STAKE:
+            counts[0] += 1
+            latest[wallet] = sel
+            first_stake.setdefault(wallet, ts)
+        elif sel == UNSTAKE:
+            counts[1] += 1
+            latest[wallet] = sel
+
+    out: dict[str, Any] = {
+        "total_stakers": None, "currently_staking": None, "retention_pct": None,
+        "diamond_hands": None, "diamond_hands_pct": None,
+        "avg_tenure_days": None, "max_tenure_days": None,
+        "weekly_trend": [], "net_flow_7d": None,
+    }
+    staking = sum(1 for sel in latest.values() if sel == STAKE)
+    total = len(latest)
+    if total:
+        out.update(currently_staking=staking, total_stakers=total, retention_pct=round(100 * staking / total, 1))
+    if first_stake:
+        out["diamond_hands"] = len(first_stake.keys() - unstakers)
+        if total:
+            out["diamond_hands_pct"] = round(100 * out["diamond_hands"] / total, 1)
+        days = [(now_ts - ts) // 86400 for ts in first_stake.values()]  # DATE_DIFF('day', first_stake, NOW())
+        out["avg_tenure_days"] = int(sum(days) / len(days) + 0.5)  # ROUND() rounds half away from zero
+        out["max_tenure_days"] = max(days)
+    trend = [{"week": w.isoformat(), "stakes": s, "unstakes": u} for w, (s, u) in sorted(weeks.items(), reverse=True)]
+    out["weekly_trend"] = trend[:WEEKS]
+    if trend:
+        out["net_flow_7d"] = trend[0]["stakes"] - trend[0]["unstakes"]
+    return out
+
+
+def sync(
+    rpc_url: str,
+    path: Path = DEFAULT_PATH,
+    *,
+    from_block: int | None = None,
+    batch: int = BATCH_BLOCKS,
+    workers: int = DEFAULT_WORKERS,
+) -> StakeIndex:
+    """Load the index and scan it up to the finalized head."""
+    genesis = bsa.rpc_request(rpc_url, "eth_getBlockByNumber", ["earliest", False])["hash"]
+    index = StakeIndex(hardstakes(), path, genesis=genesis)
+    end = bsa.block_number(rpc_url) - FINALITY_DEPTH
+    start = index.first_block
+    if start is None:
+        start = from_block if from_block is not None else launch_block(rpc_url, list(bsa.REGISTRY.values()))
+    t0 = time.perf_counter()
+    scanned = index.scan(rpc_url, start, end, batch=batch, workers=workers)
+    print(f"Stake index: {scanned} block(s) scanned in {time.perf_counter() - t0:.1f}s; "
+          f"{len(index.rows)} row(s) for blocks {index.first_block}..{index.through_block}")
+    return index
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", type=Path, default=DEFAULT_PATH, help="Index file")
+    ap.add_argument("--from-block", type=int, help="First block of a fresh index (default: first launch block)")
+    ap.add_argument("--batch", type=int, default=BATCH_BLOCKS, help="Block bodies per JSON-RPC batch")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Batches in flight")
+    ap.add_argument("--metrics", action="store_true", help="Print the local metrics next to metrics-data.json")
+    ap.add_argument("--token", action="append", choices=sorted(bsa.REGISTRY), help="With --metrics (repeatable)")
+    args = ap.parse_args()
+
+    rpc_url = bsa.pick_working_rpc(bsa.resolve_rpc_urls())
+    try:
+        index = sync(rpc_url, args.path, from_block=args.from_block, batch=args.batch, workers=args.workers)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Error: {type(e).__name__}: {e}")
+        return 1
+    if not args.metrics:
+        return 0
+
+    md = fm.load_existing(str(HERE / "metrics-data.json"))
+    for key in args.token or bsa.REGISTRY:
+        token = bsa.REGISTRY[key]
+        local = token_metrics(index, token.hardstake, token.launch_date or "1970-01-01")
+        print(f"\n=== {token.symbol} ({token.hardstake}) ===")
+        dune = md.get(key) or {}
+        for field, value in local.items():
+            if field == "weekly_trend":
+                print(f"  {field:<18} {json.dumps(value[:3])}{' ...' if len(value) > 3 else ''}")
+                continue
+            print(f"  {field:<18} {value!s:>10}   (metrics-data.json: {dune.get(field)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Token registry: the Ethervista tokens the metrics hub tracks (tokens.json).
+
+fetch_metrics.CONTRACTS (published as metrics-data.json "contracts") and the
+per-token staking analytics in build_staking_analytics.py both read this
+file. Adding a token is one entry under "tokens":
+
+  "<key>": {
+    "symbol": "TICKER",
+    "token": "0x...",                  ERC-20
+    "lp_pair": "0x...",                Uniswap-V2 style TOKEN/WETH pair (ETH mid)
+    "hardstake": "0x...",              Ethervista HARDSTAKE pool
+    "launch_date": "YYYY-MM-DD",
+    "analytics_output": "staking_analytics.<key>.json",
+    "reference_stake_units": 10000000  optional; default 1% of live supply
+  }
+
+Registry-only fields (symbol, analytics_output, reference_stake_units) are not
+copied into CONTRACTS, so metrics-data.json keeps its shape.
+
+  python3 token_registry.py     # list tokens
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+HERE = Path(__file__).resolve().parent
+REGISTRY_PATH = HERE / "tokens.json"
+_REGISTRY_ONLY = ("symbol", "analytics_output", "reference_stake_units")
+
+
+@dataclass(frozen=True)
+class Token:
+    key: str
+    symbol: str
+    token: str
+    hardstake: str
+    lp_pair: str | None
+    launch_date: str | None
+    analytics_output: str
+    reference_stake_units: float | None = None
+
+
+def _load_raw(path: Path = REGISTRY_PATH) -> dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load(path: Path = REGISTRY_PATH) -> dict[str, Token]:
+    tokens = {}
+    for key, t in _load_raw(path)["tokens"].items():
+        tokens[key] = Token(
+            key=key,
+            symbol=t.get("symbol") or key.upper(),
+            token=t["token"].lower(),
+            hardstake=t["hardstake"].lower(),
+            lp_pair=(t.get("lp_pair") or "").lower() or None,
+            launch_date=t.get("launch_date"),
+            analytics_output=t.get("analytics_output") or f"staking_analytics.{key}.json",
+            reference_stake_units=t.get("reference_stake_units"),
+        )
+    return tokens
+
+
+def protocol(path: Path = REGISTRY_PATH) -> dict[str, str]:
+    return dict(_load_raw(path)["protocol"])
+
+
+def contracts_map(path: Path = REGISTRY_PATH) -> dict[str, dict[str, str]]:
+    """The metrics-data.json "contracts" block: per-token addresses + protocol."""
+    raw = _load_raw(path)
+    out: dict[str, dict[str, str]] = {
+        key: {k: v for k, v in t.items() if k not in _REGISTRY_ONLY} for key, t in raw["tokens"].items()
+    }
+    out["protocol"] = dict(raw["protocol"])
+    return out
+
+
+def main() -> int:
+    for t in load().values():
+        print(f"{t.key:<8} {t.symbol:<8} token {t.token}  hardstake {t.hardstake}  -> {t.analytics_output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
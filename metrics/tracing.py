@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Lightweight tracing for the metrics refresh: every outbound call + every stage.
+
+fetch_metrics.py and build_staking_analytics.py wrap each HTTP / JSON-RPC
+request in span(); pipeline.py records stage timings. Nothing is kept unless
+start() was called, so library use and the standalone scripts pay nothing.
+span() also goes through the host's circuit breaker (breaker.py) in every
+case: a call to an open circuit raises CircuitOpen without being made.
+
+write_report() then appends one JSON line per event to run-report.jsonl
+(tagged with run_id, so runs can be compared over time) and writes the
+latest summary table to run-report.txt:
+
+  upstream    endpoint                         calls err retry   p50ms   max ms     bytes
+  dune        /api/v1/query/6591451/results        1   0     0   812.0    812.0     4,210
+  rpc:eth.drpc.org  eth_call 0x3618158b:0x18160ddd ...
+
+Event fields:
+  call   upstream, endpoint, method, attempt, status, bytes, latency_ms, error, ts
+  stage  stage, status (ok/failed/skipped/cached), latency_ms, cache (hit/miss), ts
+  dune   key, query_id, planned, served (execute/read/cache/skip), credits, priority, ts
+  breaker  host, state (closed/open/half-open), failures, trips, cooldown_s, retry_at,
+         changed_at, last_error, ts (every known circuit, at the end of the run)
+
+Render the summary of an existing report:
+  python3 tracing.py run-report.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+import breaker
+
+HERE = Path(__file__).resolve().parent
+REPORT_JSONL = "run-report.jsonl"
+REPORT_TXT = "run-report.txt"
+
+UPSTREAMS = {
+    "api.dune.com": "dune",
+    "api.coingecko.com": "coingecko",
+    "api.llama.fi": "defillama",
+    "api.etherscan.io": "etherscan",
+}
+
+_lock = threading.Lock()
+_events: list[dict[str, Any]] | None = None
+_run_id: str | None = None
+
+
+def start(run_name: str = "refresh") -> str:
+    """Begin collecting (idempotent inside one run). Returns the run id."""
+    global _events, _run_id
+    with _lock:
+        if _events is None:
+            _events = []
+            _run_id = f"{run_name}-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+        return _run_id or run_name
+
+
+def run_id() -> str | None:
+    """The current run's id, or None outside a run."""
+    with _lock:
+        return _run_id if _events is not None else None
+
+
+def enabled() -> bool:
+    return _events is not None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _emit(event: dict[str, Any]) -> None:
+    with _lock:
+        if _events is not None:
+            _events.append(event)
+
+
+def upstream_for(url: str) -> str:
+    host = urlsplit(url).hostname or "?"
+    # Anything not in the table is a JSON-RPC node (DEFAULT_RPC_URLS / STAKING_RPC_URLS).
+    return UPSTREAMS.get(host, f"rpc:{host}")
+
+
+@contextmanager
+def span(
+    url: str,
+    *,
+    method: str = "GET",
+    endpoint: str | None = None,
+    attempt: int = 0,
+) -> Iterator[dict[str, Any]]:
+    """Time one outbound request. The caller fills rec["status"] / rec["bytes"].
+
+    Only host + path are recorded (never query strings or headers), so API keys
+    cannot end up in the report. A caller that shortened the timeout to meet
+    its own deadline sets rec["deadline"] before re-raising the timeout; the
+    call is then not counted against the host's circuit (breaker.py).
+    """
+    rec: dict[str, Any] = {
+        "kind": "call",
+        "upstream": upstream_for(url),
+        "endpoint": endpoint or urlsplit(url).path or "/",
+        "method": method,
+        "attempt": attempt,
+        "status": None,
+        "bytes": 0,
+        "error": None,
+    }
+    try:
+        breaker.before(url)
+    except breaker.CircuitOpen:
+        rec.update(error="CircuitOpen", latency_ms=0.0, ts=_now())
+        if _events is not None:
+            _emit(rec)
+        raise
+    t0 = time.perf_counter()
+    failed = False
+    try:
+        yield rec
+    except BaseException as e:
+        rec["error"] = type(e).__name__
+        rec["status"] = rec["status"] or getattr(e, "code", None)
+        # No answer at all (refused, reset, timed out); requests' errors are OSErrors too.
+        failed = isinstance(e, OSError) and not rec["status"] and not rec.get("deadline")
+        raise
+    finally:
+        rec["latency_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        rec["ts"] = _now()
+        failed = failed or (rec["status"] or 0) >= 500
+        breaker.after(url, failed, rec["error"] or (f"HTTP {rec['status']}" if failed else None))
+        if _events is not None:
+            _emit(rec)
+
+
+def record_stage(name: str, seconds: float, status: str = "ok", cache: str = "miss") -> None:
+    if _events is None:
+        return
+    _emit(
+        {
+            "kind": "stage",
+            "stage": name,
+            "status": status,
+            "cache": cache,
+            "latency_ms": round(seconds * 1000, 2),
+            "ts": _now(),
+        }
+    )
+
+
+def record_dune(key: str, query_id: str, planned: str, served: str, credits: float, priority: int) -> None:
+    """One Dune budget decision (dune_budget.py): planned vs what was served, credits spent."""
+    if _events is None:
+        return
+    _emit(
+        {
+            "kind": "dune",
+            "key": key,
+            "query_id": query_id,
+            "planned": planned,
+            "served": served,
+            "credits": credits,
+            "priority": priority,
+            "ts": _now(),
+        }
+    )
+
+
+def events() -> list[dict[str, Any]]:
+    with _lock:
+        return list(_events or [])
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank q-quantile (0 for no values)."""
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))] if s else 0.0
+
+
+def summarize(evts: list[dict[str, Any]]) -> str:
+    calls: dict[tuple[str, str], list[dict[str, Any]]] = {}
+    for e in evts:
+        if e.get("kind") == "call":
+            calls.setdefault((e["upstream"], e["endpoint"]), []).append(e)
+
+    lines = [
+        f"{'upstream':<24} {'endpoint':<40} {'calls':>5} {'err':>4} {'retry':>5} "
+        f"{'p50 ms':>8} {'max ms':>8} {'bytes':>10}"
+    ]
+    # Slowest total time first, so a degraded provider is the first row.
+    for (up, ep), rs in sorted(calls.items(), key=lambda kv: -sum(r["latency_ms"] for r in kv[1])):
+        lat = [r["latency_ms"] for r in rs]
+        errors = sum(1 for r in rs if r.get("error") or (r.get("status") or 200) >= 400)
+        retries = sum(1 for r in rs if r.get("attempt"))
+        lines.append(
+            f"{up[:24]:<24} {ep[:40]:<40} {len(rs):>5} {errors:>4} {retries:>5} "
+            f"{percentile(lat, 0.5):>8.1f} {max(lat):>8.1f} {sum(r.get('bytes') or 0 for r in rs):>10,}"
+        )
+
+    stages = [e for e in evts if e.get("kind") == "stage"]
+    if stages:
+        lines.append("")
+        lines.append(f"{'stage':<24} {'status':<8} {'cache':<6} {'ms':>10}")
+        for e in stages:
+            lines.append(f"{e['stage']:<24} {e['status']:<8} {e['cache']:<6} {e['latency_ms']:>10.1f}")
+
+    dune = [e for e in evts if e.get("kind") == "dune"]
+    if dune:
+        lines.append("")
+        lines.append(f"{'dune query':<28} {'prio':>4} {'planned':<8} {'served':<8} {'credits':>8}")
+        for e in sorted(dune, key=lambda e: (e["priority"], e["key"])):
+            lines.append(
+                f"{e['key'][:28]:<28} {e['priority']:>4} {e['planned']:<8} {e['served']:<8} {e['credits']:>8g}"
+            )
+        lines.append(f"{'total':<28} {'':>4} {'':<8} {'':<8} {sum(e['credits'] for e in dune):>8g}")
+
+    circuits = [e for e in evts if e.get("kind") == "breaker"]
+    if circuits:
+        skipped: dict[str, int] = {}
+        for rs in calls.values():
+            for r in rs:
+                if r.get("error") == "CircuitOpen":
+                    skipped[r["upstream"]] = skipped.get(r["upstream"], 0) + 1
+        lines.append("")
+        lines.append(f"{'circuit':<32} {'state':<9} {'fails':>5} {'trips':>5} {'skipped':>7} {'retry at':<20}")
+        for e in circuits:
+            lines.append(
+                f"{e['host'][:32]:<32} {e['state']:<9} {e['failures']:>5} {e['trips']:>5} "
+                f"{skipped.get(upstream_for('https://' + e['host']), 0):>7} {e['retry_at'] or '-':<20}"
+            )
+    return "\n".join(lines)
+
+
+def write_report(out_dir: Path = HERE) -> Path | None:
+    """Append this run's events to run-report.jsonl, rewrite run-report.txt, end the run."""
+    global _events
+    if _events is None:
+        return None
+    evts = events() + [{"kind": "breaker", **c, "ts": _now()} for c in breaker.snapshot()]
+    with _lock:
+        _events = None
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jsonl = out_dir / REPORT_JSONL
+    with open(jsonl, "a", encoding="utf-8") as f:
+        for e in evts:
+            f.write(json.dumps({"run_id": _run_id, **e}, separators=(",", ":")) + "\n")
+    table = summarize(evts)
+    (out_dir / REPORT_TXT).write_text(f"run {_run_id}\n\n{table}\n", encoding="utf-8")
+    print(f"\n=== RUN REPORT ({_run_id}) ===\n{table}\n\nTrace: {jsonl}")
+    return jsonl
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", type=Path, nargs="?", default=HERE / REPORT_JSONL)
+    ap.add_argument("--run", help="run_id to show (default: the last run in the file)")
+    args = ap.parse_args()
+
+    try:
+        rows = [json.loads(line) for line in args.path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    except FileNotFoundError:
+        print(f"No report at {args.path}", file=sys.stderr)
+        return 1
+    run_id = args.run or (rows[-1]["run_id"] if rows else None)
+    print(f"run {run_id}\n")
+    print(summarize([r for r in rows if r.get("run_id") == run_id]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Validate metrics-data.json before GitHub Pages publish.
+
+Checks (schema.METRICS_DATA, compiled once at import):
+  - updated date, vista / bonzi token blocks, market_context present
+  - Types and ranges: counts are non-negative integers, percentages 0..100,
+    addresses are 0x + 40 hex, weekly_trend rows are {week, stakes, unstakes}
+  - Cross-field: currently_staking <= total_stakers, 10k+ holders <= 1k+ holders
+  - No obvious secret blobs in serialized JSON (Dune/Etherscan key patterns)
+
+Exit 1 on violation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import schema
+
+
+def validate_text(raw: str | bytes) -> list[str]:
+    errors: list[str] = []
+    if schema.find_secret(raw):
+        errors.append(
+            "Secret-like pattern detected in JSON text (blocked). "
+            "Remove API key material — public artifact only."
+        )
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return [f"Invalid JSON: {e}"]
+    return errors + schema.METRICS_DATA.validate(data)
+
+
+def validate_file(path: Path) -> list[str]:
+    return validate_text(path.read_bytes())
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("path", type=Path, nargs="?", default=Path(__file__).parent / "metrics-data.json")
+    args = ap.parse_args()
+    errs = validate_file(args.path.resolve())
+    if errs:
+        print(f"metrics-data validation FAIL: {args.path}", file=sys.stderr)
+        for e in errs:
+            print(f"  - {e}", file=sys.stderr)
+        return 1
+    print(f"metrics-data OK: {args.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,9 +2,10 @@
 """
 Validate public staking_analytics.json before GitHub Pages publish.
 
-Checks:
+Checks (schema.STAKING_ANALYTICS, compiled once at import):
+  - Types, ranges and required fields for every section the pages read
   - Canonical router equality (factory read vs expected literal)
-  - snapshot / generated timestamps present
+  - hardstake % of supply equals locked % of supply
   - No obvious secret blobs in serialized JSON (Dune/Etherscan key patterns)
   - Optional staleness ceiling on generated_at_utc (--freshness-hours)
 
@@ -15,20 +16,15 @@ from __future__ import annotations
 
 import argparse
 import json
-import re
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
 
-ROUTER_EXPECTED = "0x9bD63C5D44fF28390df1EaaFD4eB4BD73E94A72a"
+import schema
+from schema import ROUTER_EXPECTED  # noqa: F401  (re-exported for callers)
 
-_SECRET_PATTERNS = [
-    re.compile(r"dune.?api.?key\s*[=:]", re.I),
-    re.compile(r"x-dune-api-key", re.I),
-    re.compile(r"etherscan.?api.?key\s*[=:]", re.I),
-    re.compile(r"rnd_[a-zA-Z0-9_]{16,}", re.I),
-    re.compile(r"sk_live_[a-zA-Z0-9]{16,}", re.I),
-]
+# Kept for replay.py, which builds its redaction patterns from this list.
+_SECRET_PATTERNS = schema.SECRET_PATTERNS
 
 
 def validate_file(
@@ -37,10 +33,24 @@ def validate_file(
     freshness_hours: float | None,
     allow_leaderboard_empty: bool,
 ) -> list[str]:
+    # Bytes all the way: one buffer is scanned and parsed, no decoded copy.
+    return validate_text(
+        path.read_bytes(),
+        freshness_hours=freshness_hours,
+        allow_leaderboard_empty=allow_leaderboard_empty,
+    )
+
+
+def validate_text(
+    raw: str | bytes,
+    *,
+    freshness_hours: float | None,
+    allow_leaderboard_empty: bool,
+) -> list[str]:
+    """Same checks as validate_file on already-serialized JSON (pipeline hands the text over)."""
     errors: list[str] = []
-    raw = path.read_text(encoding="utf-8")
 
-    if any(p.search(raw) for p in _SECRET_PATTERNS):
+    if schema.find_secret(raw):
         errors.append(
             "Secret-like pattern detected in JSON text (blocked). "
             "Remove API key material — public artifact only."
@@ -48,49 +58,15 @@ def validate_file(
 
     try:
         data = json.loads(raw)
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
         return [f"Invalid JSON: {e}"]
 
-    gen = data.get("generated_at_utc")
-    if not gen or not isinstance(gen, str):
-        errors.append("Missing generated_at_utc (ISO string required).")
-
-    snap = data.get("snapshot_date")
-    if not snap or not isinstance(snap, str):
-        errors.append("Missing snapshot_date (YYYY-MM-DD).")
-
-    c = data.get("contracts") or {}
-    rd = (
-        isinstance(c.get("router_read_from_factory"), str)
-        and c["router_read_from_factory"].strip().lower().replace(" ", "")
-    )
-    ex = ROUTER_EXPECTED.lower()
-    expected_field = (
-        isinstance(c.get("router_expected_canonical"), str)
-        and c["router_expected_canonical"].strip().lower() == ex
-    )
-    if rd != ex:
-        errors.append(
-            f"Router mismatch: router_read_from_factory={c.get('router_read_from_factory')} "
-            f"expected {ROUTER_EXPECTED}"
-        )
-    if not expected_field:
-        errors.append("router_expected_canonical must equal canonical ROUTER_EXPECTED.")
-
-    if not bool(c.get("factory_router_equals_expected")):
-        errors.append("factory_router_equals_expected must be True.")
-
-    lc = data.get("onchain_live") or {}
-    if lc.get("locked_percent_of_supply_rounded") is None:
-        errors.append("onchain_live.locked_percent_of_supply_rounded is required.")
-    hs = lc.get("hardstake_percent_of_supply_rounded")
-    lp = lc.get("locked_percent_of_supply_rounded")
-    if hs is not None and lp is not None and round(float(hs), 4) != round(float(lp), 4):
-        errors.append(
-            "onchain_live.hardstake_percent_of_supply_rounded must match locked_percent_of_supply_rounded."
-        )
+    errors += schema.STAKING_ANALYTICS.validate(data)
+    if not isinstance(data, dict):
+        return errors
 
-    if freshness_hours is not None and gen:
+    gen = data.get("generated_at_utc")
+    if freshness_hours is not None and isinstance(gen, str):
         try:
             # Accept ...Z suffix
             g_clean = gen.replace("Z", "+00:00")
@@ -105,18 +81,6 @@ def validate_file(
         except ValueError:
             errors.append("generated_at_utc not parseable as ISO8601.")
 
-    roi = data.get("roi_pool_aggregate_illustrative") or {}
-    if not roi.get("snapshot_datetime_utc"):
-        errors.append(
-            "roi_pool_aggregate_illustrative.snapshot_datetime_utc required (paired methodology snapshot)."
-        )
-    if roi.get("realized_vs_estimated_clarifier") is None or roi.get(
-        "historical_aggregate_label"
-    ) is None:
-        errors.append(
-            "ROI section must expose historical_aggregate_label and realized_vs_estimated_clarifier."
-        )
-
     lb = data.get("leaderboards") or {}
     stakers_empty = len(lb.get("top_stakers_by_amount") or []) == 0
     earners_empty = len(lb.get("top_eth_earners_lifetime") or []) == 0
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Minimal WebSocket (RFC 6455) over the standard library, for JSON-RPC subscriptions.
+
+Only what eth_subscribe needs: text frames (fragmented ones are reassembled),
+ping/pong and close. connect() is the client chain_stream.py uses;
+read_frame() / write_frame() / accept_key() are the server side of
+fake_node.py. No extensions and no compression.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import select
+import socket
+import ssl
+import struct
+from urllib.parse import urlsplit
+
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+FRAME_TIMEOUT_S = 30
+
+
+class WebSocketClosed(ConnectionError):
+    pass
+
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1(key.encode() + _GUID).digest()).decode()
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise WebSocketClosed("connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock: socket.socket) -> tuple[bool, int, bytes]:
+    """(fin, opcode, payload) of one frame, unmasked."""
+    b0, b1 = _recv_exact(sock, 2)
+    length = b1 & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", _recv_exact(sock, 2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", _recv_exact(sock, 8))
+    mask = _recv_exact(sock, 4) if b1 & 0x80 else None
+    payload = _recv_exact(sock, length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bool(b0 & 0x80), b0 & 0x0F, payload
+
+
+def write_frame(sock: socket.socket, opcode: int, payload: bytes, *, mask: bool) -> None:
+    """Clients must mask what they send, servers must not."""
+    head = bytearray([0x80 | opcode])
+    bit = 0x80 if mask else 0
+    n = len(payload)
+    if n < 126:
+        head.append(bit | n)
+    elif n < 1 << 16:
+        head.append(bit | 126)
+        head += struct.pack("!H", n)
+    else:
+        head.append(bit | 127)
+        head += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        head += key
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    sock.sendall(bytes(head) + payload)
+
+
+class WebSocket:
+    """Client connection. recv_text() answers pings itself and raises WebSocketClosed on close."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+
+    def send_text(self, text: str) -> None:
+        write_frame(self.sock, OP_TEXT, text.encode("utf-8"), mask=True)
+
+    def _readable(self, timeout: float | None) -> bool:
+        if getattr(self.sock, "pending", lambda: 0)():  # TLS record or handshake leftovers already buffered
+            return True
+        return bool(select.select([self.sock], [], [], timeout)[0])
+
+    def recv_text(self, timeout: float | None = None) -> str | None:
+        """Next text message, or None if nothing started arriving within timeout.
+
+        Only the wait for a frame's first byte is bounded by timeout; a frame that
+        has started is read whole (FRAME_TIMEOUT_S), so the stream never desyncs.
+        """
+        parts: list[bytes] = []
+        while True:
+            if not parts and not self._readable(timeout):
+                return None
+            self.sock.settimeout(FRAME_TIMEOUT_S)
+            try:
+                fin, op, payload = read_frame(self.sock)
+            except socket.timeout:
+                raise WebSocketClosed("timed out inside a frame") from None
+            if op == OP_PING:
+                write_frame(self.sock, OP_PONG, payload, mask=True)
+                continue
+            if op == OP_PONG:
+                continue
+            if op == OP_CLOSE:
+                self.close()
+                raise WebSocketClosed("closed by server")
+            if op in (OP_TEXT, OP_BINARY, OP_CONT):
+                parts.append(payload)
+                if fin:
+                    return b"".join(parts).decode("utf-8")
+
+    def close(self) -> None:
+        try:
+            write_frame(self.sock, OP_CLOSE, b"", mask=True)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def connect(url: str, timeout: float = 10) -> WebSocket:
+    """Open ws:// or wss:// url. Raises OSError / WebSocketClosed if the handshake fails."""
+    u = urlsplit(url)
+    secure = u.scheme == "wss"
+    port = u.port or (443 if secure else 80)
+    sock = socket.create_connection((u.hostname, port), timeout=timeout)
+    if secure:
+        sock = ssl.create_default_context().wrap_socket(sock, server_hostname=u.hostname)
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+    sock.sendall(
+        (
+            f"GET {path} HTTP/1.1\r\nHost: {u.netloc}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode()
+    )
+    resp = bytearray()
+    while b"\r\n\r\n" not in resp:
+        chunk = sock.recv(1024)
+        if not chunk:
+            raise WebSocketClosed(f"{u.netloc}: connection closed during handshake")
+        resp += chunk
+        if len(resp) > 16384:
+            raise WebSocketClosed(f"{u.netloc}: oversized handshake response")
+    head, _, rest = bytes(resp).partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    if lines[0].split()[1:2] != ["101"]:
+        sock.close()
+        raise WebSocketClosed(f"{u.netloc}: handshake refused ({lines[0]})")
+    headers = {k.strip().lower(): v.strip() for k, _, v in (ln.partition(":") for ln in lines[1:])}
+    if headers.get("sec-websocket-accept") != accept_key(key):
+        sock.close()
+        raise WebSocketClosed(f"{u.netloc}: bad Sec-WebSocket-Accept")
+    if rest:
+        # A server may push its first frame together with the handshake.
+        sock = _Prefixed(sock, rest)  # type: ignore[assignment]
+    return WebSocket(sock)
+
+
+class _Prefixed:
+    """Socket wrapper replaying bytes already read past the handshake."""
+
+    def __init__(self, sock: socket.socket, prefix: bytes) -> None:
+        self._sock = sock
+        self._prefix = prefix
+
+    def pending(self) -> int:
+        return len(self._prefix) or getattr(self._sock, "pending", lambda: 0)()
+
+    def recv(self, n: int) -> bytes:
+        if self._prefix:
+            out, self._prefix = self._prefix[:n], self._prefix[n:]
+            return out
+        return self._sock.recv(n)
+
+    def __getattr__(self, name: str):
+        return getattr(self._sock, name)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Transcode WAV sources to compact web audio + a manifest the slot page reads.
+
+sounds/winamp-demo.wav is uncompressed 16-bit PCM (~110 KB for 2.5 s). This
+stage writes, next to each sounds/*.wav:
+
+  <stem>.opus.ogg   Opus in Ogg (ffmpeg + libopus)
+  <stem>.mp3        MP3 fallback (ffmpeg + libmp3lame)
+  <stem>.lite.wav   8-bit mono PCM at 11.025 kHz (stdlib only; used when
+                    ffmpeg is not installed, so the build never hard-fails)
+
+and records them in sounds/audio-manifest.json in preference order. The
+Winamp strip in index.html fetches the manifest and plays the first variant
+the browser reports it can play (audio.canPlayType), falling back to the
+original WAV.
+
+Each output's duration is checked against the source (ffprobe for encoded
+files, frame count for PCM); a variant that drifts by more than
+DURATION_TOLERANCE_S is dropped. Sources whose hash is unchanged are skipped,
+unless they were built without ffmpeg and ffmpeg is now installed.
+
+Run:
+  python3 scripts/build_audio.py
+  python3 scripts/build_audio.py --force
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import shutil
+import subprocess
+import sys
+import wave
+from array import array
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SOUNDS_DIR = ROOT / "sounds"
+MANIFEST = SOUNDS_DIR / "audio-manifest.json"
+
+OPUS_BITRATE = "48k"
+MP3_BITRATE = "64k"
+LITE_RATE = 11025
+# Opus/MP3 encoders pad a few ms of priming; 50 ms is well inside audible slack.
+DURATION_TOLERANCE_S = 0.05
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _rel(path: Path) -> str:
+    return path.relative_to(ROOT).as_posix()
+
+
+def wav_duration(path: Path) -> float:
+    with wave.open(str(path), "rb") as w:
+        return w.getnframes() / float(w.getframerate())
+
+
+def probe_duration(path: Path) -> float | None:
+    if not shutil.which("ffprobe"):
+        return None
+    r = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    try:
+        return float(r.stdout.strip())
+    except ValueError:
+        return None
+
+
+def _ffmpeg(src: Path, dest: Path, codec_args: list[str]) -> bool:
+    r = subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", str(src), *codec_args, str(dest)],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if r.returncode != 0:
+        print(f"  ffmpeg failed for {_rel(dest)}: {r.stderr.strip()[:200]}")
+        dest.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def encode_lite_pcm(src: Path, dest: Path) -> None:
+    """Mix to mono, box-filter downsample to LITE_RATE, write unsigned 8-bit PCM."""
+    with wave.open(str(src), "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width != 2:
+        raise ValueError(f"{_rel(src)}: only 16-bit PCM sources are supported (got {8 * width}-bit)")
+    samples = array("h", raw)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if channels > 1:
+        samples = array("h", (sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)))
+
+    factor = max(1, round(rate / LITE_RATE))
+    out_rate = rate // factor
+    n = len(samples) // factor
+    lite = bytearray(n)
+    for i in range(n):
+        acc = sum(samples[i * factor:(i + 1) * factor]) // factor
+        lite[i] = (acc >> 8) + 128
+    with wave.open(str(dest), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(1)
+        w.setframerate(out_rate)
+        w.writeframes(bytes(lite))
+
+
+def build_source(src: Path) -> dict:
+    duration = wav_duration(src)
+    base = src.with_suffix("")
+    variants = []
+    if shutil.which("ffmpeg"):
+        jobs = (
+            (Path(f"{base}.opus.ogg"), 'audio/ogg; codecs="opus"', ["-vn", "-c:a", "libopus", "-b:a", OPUS_BITRATE]),
+            (Path(f"{base}.mp3"), "audio/mpeg", ["-vn", "-c:a", "libmp3lame", "-b:a", MP3_BITRATE]),
+        )
+        for dest, mime, args in jobs:
+            if not _ffmpeg(src, dest, args):
+                continue
+            got = probe_duration(dest)
+            if got is not None and abs(got - duration) > DURATION_TOLERANCE_S:
+                print(f"  dropped {_rel(dest)}: duration {got:.3f}s vs source {duration:.3f}s")
+                dest.unlink(missing_ok=True)
+                continue
+            variants.append({"path": _rel(dest), "type": mime, "bytes": dest.stat().st_size, "duration_s": got})
+    else:
+        print("  ffmpeg not found - writing downsampled PCM only")
+
+    lite = Path(f"{base}.lite.wav")
+    encode_lite_pcm(src, lite)
+    got = wav_duration(lite)
+    if abs(got - duration) > DURATION_TOLERANCE_S:
+        print(f"  dropped {_rel(lite)}: duration {got:.3f}s vs source {duration:.3f}s")
+        lite.unlink(missing_ok=True)
+    else:
+        variants.append({"path": _rel(lite), "type": "audio/wav", "bytes": lite.stat().st_size, "duration_s": round(got, 4)})
+
+    return {
+        "sha256": _sha256(src),
+        "bytes": src.stat().st_size,
+        "duration_s": round(duration, 4),
+        "ffmpeg": bool(shutil.which("ffmpeg")),
+        "variants": variants,
+    }
+
+
+def _fresh(entry: dict | None, digest: str) -> bool:
+    return bool(
+        entry
+        and entry.get("sha256") == digest
+        and entry.get("variants")
+        # Built without ffmpeg: the Opus/MP3 variants are missing, not dropped.
+        and (entry.get("ffmpeg") or not shutil.which("ffmpeg"))
+        and all((ROOT / v["path"]).exists() for v in entry["variants"])
+    )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--force", action="store_true", help="Re-encode even when the source hash is cached")
+    args = ap.parse_args()
+
+    try:
+        manifest = json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    print("Transcoding audio...")
+    saved = 0
+    for src in sorted(SOUNDS_DIR.glob("*.wav")):
+        if src.name.endswith(".lite.wav"):
+            continue
+        key = _rel(src)
+        if wav_duration(src) <= 0:
+            print(f"  skipped {key}: empty")
+            continue
+        digest = _sha256(src)
+        if not args.force and _fresh(manifest.get(key), digest):
+            print(f"  cached: {key}")
+            entry = manifest[key]
+        else:
+            entry = manifest[key] = build_source(src)
+        if not entry["variants"]:
+            continue
+        best = min(v["bytes"] for v in entry["variants"])
+        saved += entry["bytes"] - best
+        for v in entry["variants"]:
+            pct = 100.0 * (1 - v["bytes"] / entry["bytes"])
+            print(f"  {v['path']}: {v['bytes']:,} B ({pct:.0f}% smaller than {entry['bytes']:,} B source)")
+
+    MANIFEST.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    print(f"Saved {saved:,} B on first play (smallest variant per source). Manifest: {_rel(MANIFEST)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Split i18n/<lang>.json into per-page bundles.
+
+Every page only reads the keys in its own data-i18n attributes, but the
+loaders used to fetch the whole language file (pt.json is 500+ keys). This
+scans each HTML page plus the shared nav includes and writes:
+
+  i18n/pages/<slug>.<lang>.json   keys used by that page
+  i18n/pages/_nav.<lang>.json     keys used by includes/nav.html + mobile-menu
+
+<slug> is the page path without .html, "/" replaced by "__"
+(index.html -> index, manual/index.html -> manual__index). The loaders
+(js/i18n-loader.js, js/nav-loader.js) compute the same slug and fall back to
+the full i18n/<lang>.json when a bundle is missing.
+
+Also reports orphaned keys (in en.json, used nowhere) and keys used in HTML
+that en.json does not define.
+
+Run:
+  python3 scripts/build_i18n_bundles.py          # write bundles + report
+  python3 scripts/build_i18n_bundles.py --check  # exit 1 if bundles are stale
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+I18N_DIR = ROOT / "i18n"
+BUNDLE_DIR = I18N_DIR / "pages"
+NAV_INCLUDES = ("includes/nav.html", "includes/mobile-menu.html")
+NAV_SLUG = "_nav"
+# Archived variants, the offline fallback copy and nav fragments are not pages.
+SKIP_DIRS = {"includes", "public_fallback", "i18n", "node_modules"}
+SKIP_HTML = {"nav-test.html"}
+
+_KEY_RE = re.compile(r"""data-i18n\s*=\s*["']([^"']+)["']""")
+
+
+def page_slug(rel_path: str) -> str:
+    """Mirror of getPageSlug() in js/i18n-loader.js."""
+    return re.sub(r"\.html$", "", rel_path).replace("/", "__")
+
+
+def html_pages() -> list[Path]:
+    pages = []
+    for p in sorted(ROOT.rglob("*.html")):
+        rel = p.relative_to(ROOT)
+        if p.name in SKIP_HTML:
+            continue
+        if any(part.startswith(".") or part in SKIP_DIRS for part in rel.parts[:-1]):
+            continue
+        pages.append(p)
+    return pages
+
+
+def scan_keys(path: Path) -> set[str]:
+    return set(_KEY_RE.findall(path.read_text(encoding="utf-8")))
+
+
+def load_languages() -> dict[str, dict[str, str]]:
+    langs = {}
+    for p in sorted(I18N_DIR.glob("*.json")):
+        data = json.loads(p.read_text(encoding="utf-8"))
+        langs[p.stem] = {k: v for k, v in data.items() if isinstance(v, str)}
+    return langs
+
+
+def collect_usage() -> dict[str, set[str]]:
+    """slug -> data-i18n keys. Nav keys are removed from page bundles."""
+    nav_keys: set[str] = set()
+    for rel in NAV_INCLUDES:
+        p = ROOT / rel
+        if p.exists():
+            nav_keys |= scan_keys(p)
+    usage = {NAV_SLUG: nav_keys}
+    for p in html_pages():
+        keys = scan_keys(p) - nav_keys
+        if keys:
+            usage[page_slug(p.relative_to(ROOT).as_posix())] = keys
+    return usage
+
+
+def render_bundles(usage: dict[str, set[str]], langs: dict[str, dict[str, str]]) -> dict[str, str]:
+    """file name -> serialized bundle. Missing keys are left out (loader falls back to en)."""
+    out = {}
+    for slug, keys in sorted(usage.items()):
+        for lang, table in sorted(langs.items()):
+            bundle = {k: table[k] for k in sorted(keys) if k in table}
+            out[f"{slug}.{lang}.json"] = json.dumps(bundle, ensure_ascii=False, separators=(",", ":")) + "\n"
+    return out
+
+
+def report(usage: dict[str, set[str]], langs: dict[str, dict[str, str]]) -> None:
+    used = set().union(*usage.values())
+    en = langs.get("en", {})
+    orphaned = sorted(set(en) - used)
+    undefined = sorted(used - set(en))
+    print(f"# i18n bundles - {len(usage) - 1} page(s), {len(used)} key(s) in use")
+    print(f"  orphaned (in en.json, used by no page): {len(orphaned)}")
+    for k in orphaned[:40]:
+        print(f"    {k}")
+    if len(orphaned) > 40:
+        print(f"    ... +{len(orphaned) - 40} more")
+    print(f"  undefined (used in HTML, missing from en.json): {len(undefined)}")
+    for k in undefined[:40]:
+        print(f"    {k}")
+    if len(undefined) > 40:
+        print(f"    ... +{len(undefined) - 40} more")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--check", action="store_true", help="Do not write; exit 1 if bundles are stale")
+    args = ap.parse_args()
+
+    langs = load_languages()
+    usage = collect_usage()
+    bundles = render_bundles(usage, langs)
+    report(usage, langs)
+
+    existing = {p.name for p in BUNDLE_DIR.glob("*.json")} if BUNDLE_DIR.exists() else set()
+    stale = sorted(
+        name for name, text in bundles.items()
+        if not (BUNDLE_DIR / name).exists() or (BUNDLE_DIR / name).read_text(encoding="utf-8") != text
+    )
+    extra = sorted(existing - set(bundles))
+
+    if args.check:
+        if stale or extra:
+            print(f"\nStale bundles: {len(stale)} outdated, {len(extra)} obsolete. "
+                  "Run python3 scripts/build_i18n_bundles.py", file=sys.stderr)
+            return 1
+        print("\nbundles up to date.")
+        return 0
+
+    BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+    for name in stale:
+        (BUNDLE_DIR / name).write_text(bundles[name], encoding="utf-8")
+    for name in extra:
+        (BUNDLE_DIR / name).unlink()
+    print(f"\nWrote {len(stale)} bundle(s), removed {len(extra)} to {BUNDLE_DIR.relative_to(ROOT)}/")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
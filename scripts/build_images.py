@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""Responsive image build: optimized PNG / WebP / AVIF variants + <picture> rewrite.
+
+The logos ship as single full-size PNGs (winamp-logo 260 KB, defiants-logo
+370 KB) even where they render at 24 px. This stage:
+
+  1. Encodes every source in SOURCES at each width in WIDTHS (capped at the
+     source width) as lossless-optimized PNG, lossless WebP and AVIF, in
+     parallel worker processes.
+  2. Names outputs by source hash (assets/optimized/<stem>-<hash8>-<w>w.<ext>)
+     so they can be cached forever, and records them in
+     assets/optimized/manifest.json. A source whose hash and outputs are
+     unchanged is skipped, so reruns are instant.
+  3. With --rewrite-html, turns <img src="<source>"> tags into
+     <picture><source type=avif><source type=webp><img srcset ...></picture>
+     with explicit width/height (kept from the tag; a missing one is scaled
+     from a numeric other, or both intrinsic). sizes is the tag's own, else the
+     CSS width of its class (CSS_SIZES), else its width attribute, else 100vw.
+
+Requires Pillow (pip install Pillow). AVIF needs Pillow >= 11.2 built with
+libavif, or the pillow-avif-plugin package; without it AVIF is skipped and
+the <picture> just omits that <source>.
+
+Run:
+  python3 scripts/build_images.py                  # encode (cached)
+  python3 scripts/build_images.py --rewrite-html   # encode + rewrite pages
+  python3 scripts/build_images.py --force          # ignore the cache
+  python3 scripts/build_images.py --check-rewrite  # rewrite a sample page with a synthetic manifest (no Pillow)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT_DIR = ROOT / "assets" / "optimized"
+MANIFEST = OUT_DIR / "manifest.json"
+
+SOURCES = (
+    "assets/winamp-logo.png",
+    "assets/bonzi-logo.png",
+    "bonzi-logo.png",
+    "defiants-logo.png",
+    "unidos-logo.png",
+)
+# 24 px nav logo at 1x/2x/4x up to hero-sized renders.
+WIDTHS = (24, 48, 96, 192, 384, 768)
+FORMATS = ("avif", "webp", "png")
+MIME = {"avif": "image/avif", "webp": "image/webp", "png": "image/png"}
+AVIF_QUALITY = 80
+
+# Rendered widths of images sized only by CSS (the pages' .nav-logo-img / .bonzi-logo-img rules).
+CSS_SIZES = {"nav-logo-img": "28px", "bonzi-logo-img": "24px"}
+
+SKIP_DIRS = {"public_fallback", "node_modules"}
+
+# A ">" inside a quoted attribute (alt="a > b") does not end the tag.
+_IMG_RE = re.compile(r"""<img\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.I)
+_ATTR_RE = re.compile(r"""\b([\w-]+)\s*=\s*("[^"]*"|'[^']*')""")
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _avif_supported() -> bool:
+    try:
+        from PIL import features
+
+        if features.check("avif"):
+            return True
+    except (ImportError, ValueError):
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+
+        return True
+    except ImportError:
+        return False
+
+
+def _encode(job: tuple[str, str, int, str]) -> dict:
+    """Worker: resize one source to one width/format. Returns the variant record."""
+    from PIL import Image
+
+    src, fmt, width, dest = job
+    if fmt == "avif":
+        try:
+            import pillow_avif  # noqa: F401
+        except ImportError:
+            pass
+    with Image.open(ROOT / src) as im:
+        im.load()
+        if im.width != width:
+            height = max(1, round(im.height * width / im.width))
+            im = im.resize((width, height), Image.LANCZOS)
+        out = ROOT / dest
+        if fmt == "png":
+            im.save(out, "PNG", optimize=True)
+        elif fmt == "webp":
+            im.save(out, "WEBP", lossless=True, quality=100, method=6)
+        else:
+            im.save(out, "AVIF", quality=AVIF_QUALITY)
+        return {"w": im.width, "h": im.height, "path": dest, "bytes": out.stat().st_size}
+
+
+def _load_manifest() -> dict:
+    try:
+        return json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _entry_fresh(entry: dict | None, digest: str, formats: tuple[str, ...]) -> bool:
+    if not entry or entry.get("sha256") != digest:
+        return False
+    variants = entry.get("variants", {})
+    return all(
+        variants.get(fmt) and all((ROOT / v["path"]).exists() for v in variants[fmt])
+        for fmt in formats
+    )
+
+
+def build(force: bool = False, workers: int | None = None) -> dict:
+    from PIL import Image
+
+    formats = FORMATS if _avif_supported() else tuple(f for f in FORMATS if f != "avif")
+    if "avif" not in formats:
+        print("  AVIF encoder not available - skipping AVIF variants")
+
+    manifest = _load_manifest()
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    jobs: list[tuple[str, str, int, str]] = []
+    pending: dict[str, dict] = {}
+
+    for src in SOURCES:
+        path = ROOT / src
+        if not path.exists():
+            print(f"  missing source: {src}")
+            continue
+        digest = _sha256(path)
+        if not force and _entry_fresh(manifest.get(src), digest, formats):
+            print(f"  cached: {src}")
+            continue
+        with Image.open(path) as im:
+            width, height = im.size
+        stem = f"{path.stem}-{digest[:8]}"
+        widths = sorted({w for w in WIDTHS if w < width} | {width})
+        pending[src] = {
+            "sha256": digest,
+            "width": width,
+            "height": height,
+            "bytes": path.stat().st_size,
+            "variants": {fmt: [] for fmt in formats},
+        }
+        for fmt in formats:
+            for w in widths:
+                dest = (OUT_DIR / f"{stem}-{w}w.{fmt}").relative_to(ROOT).as_posix()
+                jobs.append((src, fmt, w, dest))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (src, fmt, _, _), rec in zip(jobs, pool.map(_encode, jobs)):
+                pending[src]["variants"][fmt].append(rec)
+
+    for src, entry in pending.items():
+        keep = {r["path"] for recs in entry["variants"].values() for r in recs}
+        for recs in (manifest.get(src) or {}).get("variants", {}).values():
+            for v in recs:
+                if v["path"] not in keep:
+                    (ROOT / v["path"]).unlink(missing_ok=True)
+        for recs in entry["variants"].values():
+            recs.sort(key=lambda r: r["w"])
+        manifest[src] = entry
+        smallest = min((r["bytes"] for recs in entry["variants"].values() for r in recs), default=0)
+        print(f"  built: {src} ({entry['bytes']:,} B source, smallest variant {smallest:,} B)")
+
+    MANIFEST.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return manifest
+
+
+def _html_pages() -> list[Path]:
+    pages = []
+    for p in sorted(ROOT.rglob("*.html")):
+        rel = p.relative_to(ROOT)
+        if any(part.startswith(".") or part in SKIP_DIRS for part in rel.parts[:-1]):
+            continue
+        pages.append(p)
+    return pages
+
+
+def _resolve_src(page: Path, src: str) -> str | None:
+    if "://" in src or src.startswith("data:"):
+        return None
+    target = ROOT / src.lstrip("/") if src.startswith("/") else page.parent / src
+    try:
+        return Path(os.path.normpath(target)).relative_to(ROOT).as_posix()
+    except ValueError:
+        return None
+
+
+def _url(page: Path, variant_path: str, absolute: bool) -> str:
+    if absolute:
+        return "/" + variant_path
+    return os.path.relpath(ROOT / variant_path, page.parent).replace(os.sep, "/")
+
+
+def _srcset(page: Path, variants: list[dict], absolute: bool) -> str:
+    return ", ".join(f"{_url(page, v['path'], absolute)} {v['w']}w" for v in variants)
+
+
+def _inside_picture(text: str, pos: int) -> bool:
+    return text.rfind("<picture", 0, pos) > text.rfind("</picture>", 0, pos)
+
+
+def rewrite_page(page: Path, manifest: dict) -> int:
+    text = page.read_text(encoding="utf-8")
+    count = 0
+
+    def repl(m: re.Match) -> str:
+        nonlocal count
+        tag = m.group(0)
+        attrs = {k.lower(): v[1:-1] for k, v in _ATTR_RE.findall(tag)}
+        src = attrs.get("src")
+        if not src or "srcset" in attrs or _inside_picture(text, m.start()):
+            return tag
+        entry = manifest.get(_resolve_src(page, src) or "")
+        if not entry:
+            return tag
+        absolute = src.startswith("/")
+        width, height = attrs.get("width"), attrs.get("height")
+        if width is None and height is None:
+            width, height = str(entry["width"]), str(entry["height"])
+        elif height is None and width.isdigit():
+            height = str(max(1, round(int(width) * entry["height"] / entry["width"])))
+        elif width is None and height.isdigit():
+            width = str(max(1, round(int(height) * entry["width"] / entry["height"])))
+        # A non-numeric one (width="50%") has no aspect ratio to scale by: the other stays unset.
+        css = [CSS_SIZES[c] for c in attrs.get("class", "").split() if c in CSS_SIZES]
+        if attrs.get("sizes"):
+            sizes = attrs["sizes"]
+        elif css:
+            sizes = css[0]
+        elif "width" in attrs and attrs["width"].isdigit():
+            sizes = f"{attrs['width']}px"
+        else:
+            sizes = "100vw"
+        variants = entry["variants"]
+
+        new_img = tag[:-1].rstrip().rstrip("/").rstrip()
+        extra = f' srcset="{_srcset(page, variants["png"], absolute)}"'
+        if "sizes" not in attrs:
+            extra += f' sizes="{sizes}"'
+        if "width" not in attrs and width is not None:
+            extra += f' width="{width}"'
+        if "height" not in attrs and height is not None:
+            extra += f' height="{height}"'
+        sources = "".join(
+            f'<source type="{MIME[fmt]}" srcset="{_srcset(page, variants[fmt], absolute)}" sizes="{sizes}">'
+            for fmt in FORMATS
+            if fmt != "png" and variants.get(fmt)
+        )
+        count += 1
+        return f"<picture>{sources}{new_img}{extra}></picture>"
+
+    new_text = _IMG_RE.sub(repl, text)
+    if count:
+        page.write_text(new_text, encoding="utf-8")
+    return count
+
+
+def check_rewrite() -> int:
+    """rewrite_page on a throwaway page against a synthetic 512x256 manifest entry; 1 on any unexpected tag."""
+    import tempfile
+
+    global ROOT
+    variants = {
+        fmt: [{"w": w, "path": f"assets/optimized/logo-0123abcd-{w}w.{fmt}"} for w in (24, 512)] for fmt in FORMATS
+    }
+    entry = {"width": 512, "height": 256, "variants": variants}
+    cases = [
+        ('<img src="logo.png" alt="">', ('sizes="100vw"', 'width="512"', 'height="256"')),
+        ('<img src="logo.png" class="nav-logo-img" alt="">', ('sizes="28px"', 'width="512"', 'height="256"')),
+        ('<img src="logo.png" width="100">', ('sizes="100px"', 'height="50"')),
+        ('<img src="logo.png" height="64">', ('sizes="100vw"', 'width="128"')),
+        ('<img src="logo.png" width="50%">', ('sizes="100vw"', '!height=')),
+        ('<img src="logo.png" alt="a > b" width="24" height="24">', ('alt="a > b"', 'sizes="24px"', 'height="24"')),
+        ('<img src="/logo.png" sizes="10vw">', ('sizes="10vw"', 'srcset="/assets/optimized/')),
+    ]
+    failures = 0
+    saved_root = ROOT
+    with tempfile.TemporaryDirectory() as tmp:
+        ROOT = Path(tmp)
+        try:
+            page = ROOT / "page.html"
+            for tag, expected in cases:
+                page.write_text(tag + "\n", encoding="utf-8")
+                n = rewrite_page(page, {"logo.png": entry})
+                out = page.read_text(encoding="utf-8").strip()
+                img = re.search(r"<img\b.*?>(?=</picture>)", out)
+                img_text = img.group(0) if img else ""
+                ok = n == 1 and out.count("<picture>") == 1 and all(
+                    (e[1:] not in img_text) if e.startswith("!") else (e in img_text) for e in expected
+                )
+                failures += not ok
+                print(f"  {'ok  ' if ok else 'FAIL'} {tag}\n       {img_text}")
+        finally:
+            ROOT = saved_root
+    print(f"{len(cases) - failures}/{len(cases)} rewrites as expected")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--force", action="store_true", help="Re-encode even when the source hash is cached")
+    ap.add_argument("--rewrite-html", action="store_true", help="Rewrite <img> tags into <picture>/srcset")
+    ap.add_argument("--workers", type=int, default=None, help="Encoder processes (default: CPU count)")
+    ap.add_argument("--check-rewrite", action="store_true", help="Only exercise the <img> rewrite (no Pillow needed)")
+    args = ap.parse_args()
+
+    if args.check_rewrite:
+        return check_rewrite()
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        print("Error: Pillow not installed (pip install Pillow)", file=sys.stderr)
+        return 1
+
+    print("Building responsive image variants...")
+    manifest = build(force=args.force, workers=args.workers)
+
+    if args.rewrite_html:
+        total = 0
+        for page in _html_pages():
+            n = rewrite_page(page, manifest)
+            if n:
+                print(f"  rewrote {n} <img> in {page.relative_to(ROOT)}")
+                total += n
+        print(f"Rewrote {total} <img> tag(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
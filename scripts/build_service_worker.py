@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Generate sw.js + precache-manifest.json for the slot and staking flows.
+
+index.html and stake.html (stake-tg.html redirects there) are reopened over
+and over inside Telegram's webview, and each open used to go back to the
+network. This writes a service worker at the site root that:
+
+  - precaches PRECACHE (pages, their CSS/JS, nav includes, small JSON) plus
+    the small WebP variants from assets/optimized/manifest.json (the nav/logo
+    sizes), each with a content-hash revision, cache-first (a ?v= request
+    for one of them goes to the network);
+  - serves page navigations from the precache, refreshed in the background;
+  - serves hashed assets (assets/optimized/*-<hash>-*) cache-first at runtime;
+  - serves metrics/staking_analytics.json and metrics/metrics-data.json
+    stale-while-revalidate (instant numbers, refreshed in the background),
+    except version-pinned ?v= requests from js/versioned-json.js, which go
+    to the network and refresh the cached copy.
+
+The cache name is derived from the manifest hash, so any changed file gives a
+new VERSION, a new worker and a clean cache; unchanged builds are byte-identical.
+The build fails if the precache exceeds --budget-kb.
+
+Run:
+  python3 scripts/build_service_worker.py
+  python3 scripts/build_service_worker.py --check   # exit 1 if sw.js is stale
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SW_PATH = ROOT / "sw.js"
+MANIFEST_PATH = ROOT / "precache-manifest.json"
+IMAGE_MANIFEST = ROOT / "assets" / "optimized" / "manifest.json"
+
+PRECACHE = (
+    "index.html",
+    "stake.html",
+    "stake-tg.html",
+    "stake-faq-i18n.json",
+    "css/bonzi-design.css",
+    "css/nav.css",
+    "js/nav-loader.js",
+    "js/i18n-loader.js",
+    "js/versioned-json.js",
+    "includes/nav.html",
+    "includes/mobile-menu.html",
+    "sounds/audio-manifest.json",
+    "bonzi-logo.png",
+)
+STALE_WHILE_REVALIDATE = (
+    "/metrics/staking_analytics.json",
+    "/metrics/metrics-data.json",
+)
+# Larger/other-format variants are still cached on first use (HASHED_ASSET route).
+PRECACHE_IMAGE_FORMAT = "webp"
+PRECACHE_IMAGE_MAX_W = 96
+DEFAULT_BUDGET_KB = 1024
+
+SW_TEMPLATE = """\
+/* Generated by scripts/build_service_worker.py - do not edit by hand. */
+'use strict';
+
+const VERSION = '__VERSION__';
+const PRECACHE = 'bonzi-precache-' + VERSION;
+const RUNTIME_ASSETS = 'bonzi-assets-v1';
+const RUNTIME_DATA = 'bonzi-data-v1';
+const KEEP = [PRECACHE, RUNTIME_ASSETS, RUNTIME_DATA];
+
+const PRECACHE_MANIFEST = __MANIFEST__;
+const PRECACHE_URLS = new Set(PRECACHE_MANIFEST.map(e => e.url));
+const STALE_WHILE_REVALIDATE = new Set(__SWR__);
+const HASHED_ASSET = /^\\/assets\\/optimized\\/.+-[0-9a-f]{8}-\\d+w\\.\\w+$/;
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(PRECACHE)
+            .then(cache => cache.addAll(PRECACHE_MANIFEST.map(e => new Request(e.url, { cache: 'reload' }))))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(k => k.startsWith('bonzi-') && !KEEP.includes(k)).map(k => caches.delete(k))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function cacheFirst(cacheName, request, key) {
+    return caches.open(cacheName).then(cache =>
+        cache.match(key || request).then(hit => hit || fetch(request).then(res => {
+            if (res.ok) cache.put(key || request, res.clone());
+            return res;
+        }))
+    );
+}
+
+function staleWhileRevalidate(cacheName, request, key) {
+    return caches.open(cacheName).then(cache =>
+        cache.match(key).then(hit => {
+            const refresh = fetch(request, { cache: 'no-store' }).then(res => {
+                if (res.ok) cache.put(key, res.clone());
+                return res;
+            });
+            if (hit) {
+                refresh.catch(() => {});
+                return hit;
+            }
+            return refresh;
+        })
+    );
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    let path = url.pathname;
+    if (path.endsWith('/')) path += 'index.html';
+
+    if (STALE_WHILE_REVALIDATE.has(path) && url.searchParams.has('v')) {
+        // Pinned to one version (js/versioned-json.js): a stale copy would be stored under the wrong version.
+        event.respondWith(fetch(request, { cache: 'no-store' }).then(res => {
+            if (res.ok) {
+                const copy = res.clone();
+                caches.open(RUNTIME_DATA).then(cache => cache.put(path, copy));
+            }
+            return res;
+        }));
+    } else if (STALE_WHILE_REVALIDATE.has(path)) {
+        event.respondWith(staleWhileRevalidate(RUNTIME_DATA, request, path));
+    } else if (HASHED_ASSET.test(path)) {
+        event.respondWith(cacheFirst(RUNTIME_ASSETS, request));
+    } else if (PRECACHE_URLS.has(path) && request.mode === 'navigate') {
+        // Pages open instantly from the precache but never lag more than one visit behind.
+        event.respondWith(staleWhileRevalidate(PRECACHE, request, path));
+    } else if (PRECACHE_URLS.has(path) && !url.searchParams.has('v')) {
+        // A ?v= request asks for a version the precache may not hold yet, so it goes to the network.
+        event.respondWith(cacheFirst(PRECACHE, request, path));
+    }
+});
+"""
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _hashed_assets() -> list[str]:
+    try:
+        manifest = json.loads(IMAGE_MANIFEST.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return []
+    return sorted(
+        v["path"]
+        for entry in manifest.values()
+        for v in entry.get("variants", {}).get(PRECACHE_IMAGE_FORMAT, [])
+        if v["w"] <= PRECACHE_IMAGE_MAX_W
+    )
+
+
+def build_manifest() -> list[dict]:
+    entries = []
+    for rel in list(PRECACHE) + _hashed_assets():
+        path = ROOT / rel
+        if not path.is_file():
+            print(f"  missing precache entry: {rel}")
+            continue
+        entries.append({"url": "/" + rel, "revision": _sha256(path)[:16], "bytes": path.stat().st_size})
+    return entries
+
+
+def render(entries: list[dict]) -> tuple[str, str]:
+    manifest_json = json.dumps(entries, indent=2) + "\n"
+    version = hashlib.sha256(manifest_json.encode()).hexdigest()[:12]
+    public = [{"url": e["url"], "revision": e["revision"]} for e in entries]
+    sw = (
+        SW_TEMPLATE.replace("__VERSION__", version)
+        .replace("__MANIFEST__", json.dumps(public, indent=4))
+        .replace("__SWR__", json.dumps(list(STALE_WHILE_REVALIDATE)))
+    )
+    return sw, manifest_json
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--budget-kb", type=int, default=DEFAULT_BUDGET_KB, help="Max total precache size")
+    ap.add_argument("--check", action="store_true", help="Do not write; exit 1 if sw.js is stale")
+    args = ap.parse_args()
+
+    entries = build_manifest()
+    total = sum(e["bytes"] for e in entries)
+    print(f"# Precache - {len(entries)} file(s), {total / 1024:.1f} KB (budget {args.budget_kb} KB)")
+    for e in sorted(entries, key=lambda e: -e["bytes"])[:5]:
+        print(f"  {e['bytes'] / 1024:8.1f} KB  {e['url']}")
+    if total > args.budget_kb * 1024:
+        print(f"Precache over budget by {(total - args.budget_kb * 1024) / 1024:.1f} KB", file=sys.stderr)
+        return 1
+
+    sw, manifest_json = render(entries)
+    if args.check:
+        current = SW_PATH.read_text(encoding="utf-8") if SW_PATH.exists() else ""
+        if current != sw:
+            print("sw.js is stale. Run python3 scripts/build_service_worker.py", file=sys.stderr)
+            return 1
+        print("sw.js up to date.")
+        return 0
+
+    SW_PATH.write_text(sw, encoding="utf-8")
+    MANIFEST_PATH.write_text(manifest_json, encoding="utf-8")
+    print(f"Wrote {SW_PATH.relative_to(ROOT)} ({sw.splitlines()[3]}) and {MANIFEST_PATH.relative_to(ROOT)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,7 +8,8 @@ Checks:
   1. Language selector set        - all pages should offer the same N languages.
   2. Theme default consistency    - every page's data-theme-default should match.
   3. Em dash in user-visible text - U+2014 is banned in visible strings.
-  4. i18n JSON parity             - pt/zh must not be missing keys or left in English.
+  4. i18n JSON parity             - pt/zh must not be missing keys or left in English,
+                                    in the full files and in the per-page bundles.
 
 Does NOT check rendered layout (nav overlap, margins). That needs a headless
 screenshot pass - see README / phase 2.
@@ -79,6 +80,15 @@ def _load(path):
         return None
 
 
+def _parity(where, flat_en, tgt):
+    missing = [k for k in flat_en if k not in tgt]
+    if missing:
+        add("i18n", "P2", where, f"{len(missing)} missing keys: {missing[:5]}")
+    untranslated = [k for k in flat_en if isinstance(tgt.get(k), str) and tgt[k] == flat_en[k]]
+    if untranslated:
+        add("i18n", "P3", where, f"{len(untranslated)} still in English: {untranslated[:5]}")
+
+
 def check_i18n_parity():
     i18n = ROOT / "i18n"
     en = _load(i18n / "en.json") or _load(ROOT / ".archive" / "i18n" / "en.json")
@@ -90,12 +100,27 @@ def check_i18n_parity():
         if tgt is None:
             add("i18n", "P2", f"i18n/{lang}.json", "file missing")
             continue
-        missing = [k for k in flat_en if k not in tgt]
-        if missing:
-            add("i18n", "P2", f"i18n/{lang}.json", f"{len(missing)} missing keys: {missing[:5]}")
-        untranslated = [k for k in flat_en if isinstance(tgt.get(k), str) and tgt[k] == flat_en[k]]
-        if untranslated:
-            add("i18n", "P3", f"i18n/{lang}.json", f"{len(untranslated)} still in English: {untranslated[:5]}")
+        _parity(f"i18n/{lang}.json", flat_en, tgt)
+
+    # Per-page bundles from scripts/build_i18n_bundles.py are what the loaders
+    # actually fetch, so check them too: same parity rules per page, plus drift
+    # from the source file (bundle not rebuilt after an i18n/<lang>.json edit).
+    pages = i18n / "pages"
+    for en_bundle in sorted(pages.glob("*.en.json")):
+        slug = en_bundle.name[: -len(".en.json")]
+        page_en = _load(en_bundle) or {}
+        for lang in ("en", "pt", "zh"):
+            src = _load(i18n / f"{lang}.json") or {}
+            bundle = page_en if lang == "en" else _load(pages / f"{slug}.{lang}.json")
+            where = f"i18n/pages/{slug}.{lang}.json"
+            if bundle is None:
+                add("i18n", "P2", where, "bundle missing")
+                continue
+            drift = [k for k, v in bundle.items() if src.get(k) != v]
+            if drift:
+                add("i18n", "P2", where, f"{len(drift)} keys out of date with i18n/{lang}.json: {drift[:5]}")
+            if lang != "en":
+                _parity(where, page_en, bundle)
 
 
 def main():
@@ -0,0 +1,138 @@
+/* Generated by scripts/build_service_worker.py - do not edit by hand. */
+'use strict';
+
+const VERSION = '35a892c99c0d';
+const PRECACHE = 'bonzi-precache-' + VERSION;
+const RUNTIME_ASSETS = 'bonzi-assets-v1';
+const RUNTIME_DATA = 'bonzi-data-v1';
+const KEEP = [PRECACHE, RUNTIME_ASSETS, RUNTIME_DATA];
+
+const PRECACHE_MANIFEST = [
+    {
+        "url": "/index.html",
+        "revision": "720dc2ce133248bf"
+    },
+    {
+        "url": "/stake.html",
+        "revision": "bf2fa775349df14d"
+    },
+    {
+        "url": "/stake-tg.html",
+        "revision": "5ae0f17157a56b67"
+    },
+    {
+        "url": "/stake-faq-i18n.json",
+        "revision": "1f582595214f9e3c"
+    },
+    {
+        "url": "/css/bonzi-design.css",
+        "revision": "1e782d0ec7aea153"
+    },
+    {
+        "url": "/css/nav.css",
+        "revision": "379b343519526dbd"
+    },
+    {
+        "url": "/js/nav-loader.js",
+        "revision": "6d4896af9db2c5bd"
+    },
+    {
+        "url": "/js/i18n-loader.js",
+        "revision": "f8636e370a5e578c"
+    },
+    {
+        "url": "/js/versioned-json.js",
+        "revision": "daef458b684de179"
+    },
+    {
+        "url": "/includes/nav.html",
+        "revision": "9fdc9acdb7cadfe7"
+    },
+    {
+        "url": "/includes/mobile-menu.html",
+        "revision": "23cfe2569f710489"
+    },
+    {
+        "url": "/sounds/audio-manifest.json",
+        "revision": "b422be6839e5c51e"
+    },
+    {
+        "url": "/bonzi-logo.png",
+        "revision": "08d654ab35b82380"
+    }
+];
+const PRECACHE_URLS = new Set(PRECACHE_MANIFEST.map(e => e.url));
+const STALE_WHILE_REVALIDATE = new Set(["/metrics/staking_analytics.json", "/metrics/metrics-data.json"]);
+const HASHED_ASSET = /^\/assets\/optimized\/.+-[0-9a-f]{8}-\d+w\.\w+$/;
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(PRECACHE)
+            .then(cache => cache.addAll(PRECACHE_MANIFEST.map(e => new Request(e.url, { cache: 'reload' }))))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(k => k.startsWith('bonzi-') && !KEEP.includes(k)).map(k => caches.delete(k))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function cacheFirst(cacheName, request, key) {
+    return caches.open(cacheName).then(cache =>
+        cache.match(key || request).then(hit => hit || fetch(request).then(res => {
+            if (res.ok) cache.put(key || request, res.clone());
+            return res;
+        }))
+    );
+}
+
+function staleWhileRevalidate(cacheName, request, key) {
+    return caches.open(cacheName).then(cache =>
+        cache.match(key).then(hit => {
+            const refresh = fetch(request, { cache: 'no-store' }).then(res => {
+                if (res.ok) cache.put(key, res.clone());
+                return res;
+            });
+            if (hit) {
+                refresh.catch(() => {});
+                return hit;
+            }
+            return refresh;
+        })
+    );
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    let path = url.pathname;
+    if (path.endsWith('/')) path += 'index.html';
+
+    if (STALE_WHILE_REVALIDATE.has(path) && url.searchParams.has('v')) {
+        // Pinned to one version (js/versioned-json.js): a stale copy would be stored under the wrong version.
+        event.respondWith(fetch(request, { cache: 'no-store' }).then(res => {
+            if (res.ok) {
+                const copy = res.clone();
+                caches.open(RUNTIME_DATA).then(cache => cache.put(path, copy));
+            }
+            return res;
+        }));
+    } else if (STALE_WHILE_REVALIDATE.has(path)) {
+        event.respondWith(staleWhileRevalidate(RUNTIME_DATA, request, path));
+    } else if (HASHED_ASSET.test(path)) {
+        event.respondWith(cacheFirst(RUNTIME_ASSETS, request));
+    } else if (PRECACHE_URLS.has(path) && request.mode === 'navigate') {
+        // Pages open instantly from the precache but never lag more than one visit behind.
+        event.respondWith(staleWhileRevalidate(PRECACHE, request, path));
+    } else if (PRECACHE_URLS.has(path) && !url.searchParams.has('v')) {
+        // A ?v= request asks for a version the precache may not hold yet, so it goes to the network.
+        event.respondWith(cacheFirst(PRECACHE, request, path));
+    }
+});